@@ -1,9 +1,19 @@
 """Endpoint pour les statistiques d'optimisation."""
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from app.services.semantic_cache import get_response_cache
+from app.services.query_embedding import get_query_embedding_cache
+from app.services.embedding_batcher import get_embedding_batcher
+from app.services.executors import get_executors_stats
 from app.services.request_batcher import get_batcher
+from app.services.admission import get_admission_controller
+from app.services.db_pool import get_pools_stats
+from app.services.order_cache import get_order_cache
+from app.services.message_analyzer import get_intent_stats
+from app.services.rag_pipeline import get_speculation_stats
+from app.services.lru_cache import get_lru_caches_stats
+from app.services.cache_warmer import get_warmup_stats
 from app.core.config import settings
 
 router = APIRouter(prefix="/optimization", tags=["optimization"])
@@ -23,9 +33,20 @@ async def get_optimization_stats() -> Dict[str, Any]:
             "request_batching_enabled": settings.enable_request_batching,
             "max_concurrent_requests": settings.max_concurrent_llm_requests,
             "batch_window_ms": settings.batch_window_ms,
+            "embedding_batching_enabled": settings.enable_embedding_batching,
         },
         "semantic_cache": {},
+        "query_embeddings": {},
+        "embedding_batcher": {},
         "request_batcher": {},
+        "executors": {},
+        "admission": {},
+        "db_pools": {},
+        "order_cache": {},
+        "intent_analysis": {},
+        "speculative_retrieval": {},
+        "lru_caches": {},
+        "cache_warmup": {},
     }
     
     # Stats du cache sémantique
@@ -35,6 +56,18 @@ async def get_optimization_stats() -> Dict[str, Any]:
     except Exception as e:
         stats["semantic_cache"] = {"error": str(e)}
     
+    # Stats du cache d'embeddings de requêtes
+    try:
+        stats["query_embeddings"] = get_query_embedding_cache().get_stats()
+    except Exception as e:
+        stats["query_embeddings"] = {"error": str(e)}
+    
+    # Stats du micro-batching des embeddings
+    try:
+        stats["embedding_batcher"] = get_embedding_batcher().get_stats()
+    except Exception as e:
+        stats["embedding_batcher"] = {"error": str(e)}
+    
     # Stats du batcher
     try:
         batcher = get_batcher()
@@ -42,6 +75,54 @@ async def get_optimization_stats() -> Dict[str, Any]:
     except Exception as e:
         stats["request_batcher"] = {"error": str(e)}
     
+    # Saturation des pools d'exécution (embedding, db, llm)
+    try:
+        stats["executors"] = get_executors_stats()
+    except Exception as e:
+        stats["executors"] = {"error": str(e)}
+    
+    # Contrôle d'admission (files par priorité, délestage, temps en file)
+    try:
+        stats["admission"] = get_admission_controller().get_stats()
+    except Exception as e:
+        stats["admission"] = {"error": str(e)}
+    
+    # Pools de connexions SQL Server (en cours d'utilisation, attentes, latence de connexion)
+    try:
+        stats["db_pools"] = get_pools_stats()
+    except Exception as e:
+        stats["db_pools"] = {"error": str(e)}
+    
+    # Cache des snapshots de commande (taux de hit, temps base économisé)
+    try:
+        stats["order_cache"] = get_order_cache().get_stats()
+    except Exception as e:
+        stats["order_cache"] = {"error": str(e)}
+    
+    # Analyse d'intention: part des messages décidés par règles / cache / LLM
+    try:
+        stats["intent_analysis"] = get_intent_stats()
+    except Exception as e:
+        stats["intent_analysis"] = {"error": str(e)}
+    
+    # Retrieval spéculatif: utilisés / annulés, TTFT et temps de réponse par bras A/B
+    try:
+        stats["speculative_retrieval"] = get_speculation_stats()
+    except Exception as e:
+        stats["speculative_retrieval"] = {"error": str(e)}
+    
+    # Caches LRU + TTL (intentions, cache exact, dedup batcher, quick cache LLM)
+    try:
+        stats["lru_caches"] = get_lru_caches_stats()
+    except Exception as e:
+        stats["lru_caches"] = {"error": str(e)}
+    
+    # Préchauffage du cache (dernier passage)
+    try:
+        stats["cache_warmup"] = get_warmup_stats()
+    except Exception as e:
+        stats["cache_warmup"] = {"error": str(e)}
+    
     return stats
 
 
@@ -67,6 +148,24 @@ async def cleanup_cache() -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/order-cache/invalidate")
+async def invalidate_order_cache(order_number: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Invalide le snapshot d'une commande (ou tout le cache si order_number absent).
+    
+    À appeler quand une commande change de statut hors du cycle normal
+    (correction manuelle, annulation) pour ne pas attendre la fin du TTL.
+    """
+    try:
+        cache = get_order_cache()
+        if order_number:
+            removed = cache.invalidate(order_number)
+            return {"status": "success", "order_number": order_number, "removed_entries": int(removed)}
+        return {"status": "success", "removed_entries": cache.clear()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/health")
 async def optimization_health() -> Dict[str, Any]:
     """Vérifie la santé des services d'optimisation."""
@@ -2,8 +2,10 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 from fastapi.responses import StreamingResponse
 from typing import List
+from starlette.background import BackgroundTask
 import json
 import asyncio
+import time
 
 from app.models.schemas import (
     ChatRequest,
@@ -15,9 +17,22 @@ from app.models.schemas import (
     MessageAnalysisResponse
 )
 from app.core.config import settings
+from app.services.executors import run_db, run_embedding, run_llm, run_probe, ExecutorSaturatedError
+from app.services.db_pool import PoolTimeoutError
+from app.services.order_logic import ORDER_LOOKUP_BUSY_MESSAGE
+from app.services.cache_warmer import record_query
+from app.services.admission import (
+    get_admission_controller,
+    resolve_priority,
+    AdmissionRejectedError,
+    Deadline,
+    DeadlineExceededError,
+    PRIORITY_HEADER,
+)
 
 # Import du système de métriques pour tracker les requêtes actives
 from app.api import system_metrics
+from app.api.sse import sse_event, text_segments, coalesce_token_events
 
 router = APIRouter()
 
@@ -49,17 +64,38 @@ def get_vectorstore():
     return vectorstore
 
 
+def get_request_priority(http_request: Request, question: str, pipeline):
+    """Priorité d'admission: suivi de commande HIGH, RAG NORMAL, benchmark LOW."""
+    has_order_number = bool(question) and pipeline.message_analyzer.extract_order_number_regex(question) is not None
+    return resolve_priority(http_request.headers.get(PRIORITY_HEADER), is_order_tracking=has_order_number)
+
+
+def overloaded_response(e: AdmissionRejectedError) -> HTTPException:
+    """503 + Retry-After quand la requête est délestée."""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def order_lookup_busy() -> HTTPException:
+    """503 + Retry-After quand le pool SQL Server est saturé (PoolTimeoutError)."""
+    return HTTPException(status_code=503, detail=ORDER_LOOKUP_BUSY_MESSAGE, headers={"Retry-After": "2"})
+
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, pipeline=Depends(get_rag_pipeline)):
+async def chat(http_request: Request, request: ChatRequest, pipeline=Depends(get_rag_pipeline)):
     """Handle chat requests.
     
     Args:
+        http_request: HTTP request object (priority header)
         request: Chat request with user question and optional conversation history
         pipeline: RAG pipeline instance
         
     Returns:
         Chat response with answer and sources
     """
+    priority = get_request_priority(http_request, request.question, pipeline)
+    deadline = Deadline(settings.chat_request_deadline_s)
+    record_query(request.question, has_history=bool(request.history))
+    
     # Track la requête active pour les métriques
     system_metrics.active_chatbot_requests["count"] += 1
     if system_metrics.active_chatbot_requests["count"] > system_metrics.active_chatbot_requests["peak"]:
@@ -69,12 +105,20 @@ async def chat(request: ChatRequest, pipeline=Depends(get_rag_pipeline)):
         # Convert history to list of dicts for the pipeline
         history_list = [{"role": msg.role, "content": msg.content} for msg in request.history] if request.history else []
         
-        response = await pipeline.generate_response(
-            query=request.question,
-            conversation_id=request.conversation_id,
-            history=history_list
-        )
+        async with get_admission_controller().admit(priority, deadline):
+            response = await pipeline.generate_response(
+                query=request.question,
+                conversation_id=request.conversation_id,
+                history=history_list,
+                deadline=deadline
+            )
         return response
+    except AdmissionRejectedError as e:
+        raise overloaded_response(e)
+    except DeadlineExceededError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "2"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
     finally:
@@ -98,103 +142,122 @@ async def chat_stream(http_request: Request, request: ChatRequest, pipeline=Depe
     print(f"[DEBUG] /chat/stream called with question: {request.question[:50] if request.question else 'EMPTY'}...")
     print(f"[DEBUG] History length: {len(request.history) if request.history else 0}")
     
+    # Admission avant d'ouvrir le flux: un refus reste un vrai 503
+    priority = get_request_priority(http_request, request.question, pipeline)
+    deadline = Deadline(settings.chat_request_deadline_s)
+    record_query(request.question, has_history=bool(request.history))
+    admission = get_admission_controller()
+    try:
+        await admission.acquire(priority, deadline)
+    except AdmissionRejectedError as e:
+        raise overloaded_response(e)
+    admitted_at = time.perf_counter()
+    released = False
+    
+    def release_admission():
+        nonlocal released
+        if not released:
+            released = True
+            admission.release(time.perf_counter() - admitted_at)
+    
     # Track la requête active pour les métriques
     system_metrics.active_chatbot_requests["count"] += 1
     if system_metrics.active_chatbot_requests["count"] > system_metrics.active_chatbot_requests["peak"]:
         system_metrics.active_chatbot_requests["peak"] = system_metrics.active_chatbot_requests["count"]
     
-    async def generate():
+    async def events():
+        # Convert history to list of dicts
+        history_list = [{"role": msg.role, "content": msg.content} for msg in request.history] if request.history else []
+        
+        # 1. Analyze intent with LLM-First approach
+        # Le LLM décide si c'est du suivi de commande ou une question générale;
+        # le retrieval démarre en parallèle (annulé si suivi de commande)
+        analyzed = await pipeline.analyze_and_prefetch(request.question, history_list)
+        analysis = analyzed.analysis
         try:
-            # 1. Analyze intent with LLM-First approach
-            # Le LLM décide si c'est du suivi de commande ou une question générale
-            analysis = await pipeline.message_analyzer.analyze_message(request.question)
-            
             # Send analysis to client
-            yield f"data: {json.dumps({'type': 'analysis', 'intent': analysis['intent'], 'reasoning': analysis.get('reasoning'), 'order_number': analysis.get('order_number')})}\n\n"
-            
+            yield {'type': 'analysis', 'intent': analysis['intent'], 'reasoning': analysis.get('reasoning'), 'order_number': analysis.get('order_number')}
+        
             # 2. Handle Order Tracking with SQL
             if analysis['intent'] == 'order_tracking':
                 order_number = analysis.get('order_number')
-                
+            
                 if order_number:
                     # Fetch from database
                     from app.services.database import db_service
                     from app.services.order_logic import generate_order_status_response
-                    
-                    order_data = db_service.get_order_tracking_details(order_number)
-                    
+                
+                    try:
+                        order_data = await run_db(db_service.get_order_tracking_details, order_number)
+                    except PoolTimeoutError:
+                        yield {'type': 'token', 'content': ORDER_LOOKUP_BUSY_MESSAGE}
+                        yield {'type': 'done'}
+                        return
+                
                     if order_data:
                         # Generate response from DB data
                         response_text = generate_order_status_response(
                             order_data, 
                             current_status_id=order_data.get("status_id")
                         )
-                        
-                        # Stream the SQL response with typing effect
-                        for char in response_text:
-                            if await http_request.is_disconnected():
-                                return
-                            yield f"data: {json.dumps({'type': 'token', 'content': char})}\n\n"
-                            await asyncio.sleep(0.003)  # Typing effect optimisé (3ms au lieu de 5ms)
-                        
+                    
+                        # Réponse déjà complète: envoyée par segments, l'effet
+                        # de frappe est géré côté client
+                        for segment in text_segments(response_text):
+                            yield {'type': 'token', 'content': segment}
+                    
                         # Send sources
-                        yield f"data: {json.dumps({'type': 'sources', 'sources': [{'content': f'Commande #{order_number}', 'metadata': {'source': 'Base de données CoolLibri'}}]})}\n\n"
-                        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                        yield {'type': 'sources', 'sources': [{'content': f'Commande #{order_number}', 'metadata': {'source': 'Base de données CoolLibri'}}]}
+                        yield {'type': 'done'}
                         return
                     else:
                         # Order not found
                         error_msg = f"Je ne trouve pas la commande numéro {order_number} dans notre base de données. Êtes-vous sûr du numéro ?"
-                        for char in error_msg:
-                            yield f"data: {json.dumps({'type': 'token', 'content': char})}\n\n"
-                        yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                        yield {'type': 'token', 'content': error_msg}
+                        yield {'type': 'done'}
                         return
                 else:
                     # Need order number - ask user
                     ask_msg = "Pour suivre votre commande, j'ai besoin de votre numéro de commande. Pouvez-vous me le donner ?"
-                    for char in ask_msg:
-                        yield f"data: {json.dumps({'type': 'token', 'content': char})}\n\n"
-                    yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                    yield {'type': 'token', 'content': ask_msg}
+                    yield {'type': 'done'}
                     return
-            
+        
             # 3. Standard RAG Flow for general questions
-            # Convert history to list of dicts
-            history_list = [{"role": msg.role, "content": msg.content} for msg in request.history] if request.history else []
-            
-            # Get context from vectorstore
-            context_docs = pipeline.vectorstore.similarity_search(request.question, k=pipeline.top_k)
-            context = "\n\n".join([doc.page_content for doc, _ in context_docs])
-            
-            # Stream the response with disconnect detection
-            async for chunk in pipeline.llm_service.generate_response_stream_async(
+            # Retrieval, rerank et caches partagés avec /chat (RAGPipeline.stream_response)
+            async for event in pipeline.stream_response(
                 query=request.question,
-                context=context,
                 history=history_list,
-                is_disconnected=http_request.is_disconnected
+                is_disconnected=http_request.is_disconnected,
+                deadline=deadline,
+                analyzed=analyzed
             ):
-                yield f"data: {json.dumps({'type': 'token', 'content': chunk})}\n\n"
-            
-            # Vérifier avant d'envoyer les sources
-            if await http_request.is_disconnected():
-                return
-            
-            # Send sources AFTER the response is complete
-            sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc, _ in context_docs]
-            yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
-            
-            # Send completion signal
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                if event['type'] == 'token':
+                    pipeline.record_first_token(analyzed)
+                yield event
+        finally:
+            # Client parti avant la génération: retrieval spéculatif abandonné
+            pipeline.discard_prefetch(analyzed)
+    
+    async def generate():
+        try:
+            # Tokens du provider regroupés en frames de stream_coalesce_ms
+            async for event in coalesce_token_events(events(), settings.stream_coalesce_ms):
+                yield sse_event(event)
             
         except asyncio.CancelledError:
             # Requête annulée (client déconnecté)
             pass
         except Exception as e:
             if not await http_request.is_disconnected():
-                yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+                yield sse_event({'type': 'error', 'message': str(e)})
         finally:
             # Fin de la requête streaming - décrémente le compteur
             system_metrics.active_chatbot_requests["count"] = max(0, system_metrics.active_chatbot_requests["count"] - 1)
+            release_admission()
     
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    # background: libère aussi le slot si le flux n'a jamais démarré
+    return StreamingResponse(generate(), media_type="text/event-stream", background=BackgroundTask(release_admission))
 
 
 @router.post("/chat/analyze", response_model=MessageAnalysisResponse)
@@ -238,11 +301,18 @@ async def health_check(
     Returns:
         Health status of all services
     """
+    async def probe(func, default):
+        # Pool dédié + délai court: /health répond même quand /chat sature
+        try:
+            return await run_probe(func)
+        except (ExecutorSaturatedError, asyncio.TimeoutError):
+            return default
+    
     return HealthResponse(
         status="healthy",
         version=settings.app_version,
-        ollama_available=ollama.is_available(),
-        vectorstore_loaded=vs.count() > 0
+        ollama_available=await probe(ollama.is_available, False),
+        vectorstore_loaded=await probe(vs.count, 0) > 0
     )
 
 
@@ -254,7 +324,7 @@ async def get_stats(vs=Depends(get_vectorstore)):
         Statistics including document count
     """
     return {
-        "total_documents": vs.count(),
+        "total_documents": await run_embedding(vs.count),
         "collection_name": vs.collection_name
     }
 
@@ -274,7 +344,9 @@ async def get_order(order_number: int, last_name: str = None):
     try:
         from app.services.database import db_service
         
-        order_data = db_service.get_order_by_number(str(order_number), last_name)
+        order_data = await run_db(db_service.get_order_by_number, str(order_number), last_name)
+    except PoolTimeoutError:
+        raise order_lookup_busy()
     except Exception as e:
         raise HTTPException(
             status_code=500, 
@@ -315,7 +387,8 @@ async def validate_customer_name(request: CustomerValidationRequest):
         from app.services.order_tracking_service import OrderTrackingService
         
         tracking_service = OrderTrackingService()
-        is_valid, full_name, error_message = tracking_service.validate_customer_name(
+        is_valid, full_name, error_message = await run_db(
+            tracking_service.validate_customer_name,
             str(request.order_number), 
             request.customer_name
         )
@@ -331,6 +404,8 @@ async def validate_customer_name(request: CustomerValidationRequest):
                 "error_message": error_message
             }
             
+    except PoolTimeoutError:
+        raise order_lookup_busy()
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -354,7 +429,7 @@ async def get_order_tracking(order_number: int):
         from app.services.order_logic import generate_order_status_response
         
         tracking_service = OrderTrackingService()
-        order_data = tracking_service.get_order_tracking_info(str(order_number))
+        order_data = await run_db(tracking_service.get_order_tracking_info, str(order_number))
         
         if not order_data:
             raise HTTPException(
@@ -373,6 +448,8 @@ async def get_order_tracking(order_number: int):
         
     except HTTPException:
         raise
+    except PoolTimeoutError:
+        raise order_lookup_busy()
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -383,14 +460,17 @@ async def get_order_tracking(order_number: int):
 @router.get("/order/{order_number}/tracking/stream")
 async def stream_order_tracking(order_number: int, http_request: Request):
     """
-    Stream la réponse de suivi de commande avec un effet de typing naturel.
+    Stream la réponse de suivi de commande (étapes de réflexion puis réponse).
+    
+    Tout est envoyé dès que disponible: le rythme d'affichage des étapes
+    (effet de typing) est géré par le client.
     
     Args:
         order_number: Numéro de commande
         http_request: HTTP request object to detect client disconnection
     
     Returns:
-        Streaming response avec effet typing
+        Streaming response (thinking, final_response, done)
     """
     async def generate():
         try:
@@ -398,13 +478,14 @@ async def stream_order_tracking(order_number: int, http_request: Request):
             from app.services.order_logic import generate_order_status_response
             
             tracking_service = OrderTrackingService()
-            order_data = tracking_service.get_order_tracking_info(str(order_number))
+            order_data = await run_db(tracking_service.get_order_tracking_info, str(order_number))
             
             if not order_data:
                 yield f"data: {json.dumps({'type': 'error', 'message': f'Commande #{order_number} introuvable'})}\n\n"
                 return
             
-            # Étapes de réflexion (effet ChatGPT thinking)
+            # Étapes de réflexion (effet ChatGPT thinking): envoyées d'un coup,
+            # le client les affiche à son rythme
             thinking_steps = [
                 "🔍 Recherche de la commande...",
                 "📋 Analyse des informations...",
@@ -414,18 +495,8 @@ async def stream_order_tracking(order_number: int, http_request: Request):
                 "📦 Calcul des estimations de livra..."
             ]
             
-            # Envoyer les étapes de thinking
             for step in thinking_steps:
-                # Vérifier si le client est toujours connecté
-                if await http_request.is_disconnected():
-                    return  # Client déconnecté, arrêter proprement
-                
-                yield f"data: {json.dumps({'type': 'thinking', 'content': step})}\n\n"
-                await asyncio.sleep(1.2)  # 1.2 seconde par étape
-            
-            # Vérifier avant de générer la réponse
-            if await http_request.is_disconnected():
-                return
+                yield sse_event({'type': 'thinking', 'content': step})
             
             # Générer la réponse complète
             tracking_response = generate_order_status_response(order_data)
@@ -439,6 +510,8 @@ async def stream_order_tracking(order_number: int, http_request: Request):
         except asyncio.CancelledError:
             # Requête annulée (client déconnecté)
             pass
+        except PoolTimeoutError:
+            yield sse_event({'type': 'error', 'message': ORDER_LOOKUP_BUSY_MESSAGE})
         except Exception as e:
             if not await http_request.is_disconnected():
                 yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
@@ -0,0 +1,100 @@
+"""
+Server-Sent Events - formatage et regroupement des frames de tokens.
+
+Les providers envoient un token (quelques caractères) par chunk: une frame
+SSE par token multiplie les écritures réseau et les re-rendus côté client.
+coalesce_token_events regroupe les tokens arrivés dans une fenêtre de
+quelques dizaines de ms en une seule frame, sans jamais retarder le flux
+au-delà de cette fenêtre. Le rythme d'affichage (effet machine à écrire)
+est géré par le client (widget / frontend), plus par le serveur.
+"""
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+
+def sse_event(payload: Dict[str, Any]) -> str:
+    """Formate un événement SSE."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def text_segments(text: str, max_chars: int = 80) -> List[str]:
+    """Découpe un texte déjà complet en segments (coupés sur les espaces)."""
+    segments = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + max_chars)
+        if end < len(text):
+            space = text.rfind(" ", start, end)
+            if space > start:
+                end = space + 1
+        segments.append(text[start:end])
+        start = end
+    return segments
+
+
+async def coalesce_token_events(
+    events: AsyncIterator[Dict[str, Any]],
+    window_ms: float = 30.0,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Regroupe les événements {"type": "token"} consécutifs.
+
+    Le premier token d'un groupe ouvre une fenêtre de window_ms: tout ce qui
+    arrive avant sa fin part dans la même frame. Les autres événements
+    (sources, done, ...) vident d'abord le groupe en cours, l'ordre est
+    conservé. window_ms <= 0 désactive le regroupement.
+    """
+    if window_ms <= 0:
+        async for event in events:
+            yield event
+        return
+
+    window = window_ms / 1000.0
+    iterator = events.__aiter__()
+    buffer: List[str] = []
+    opened_at = 0.0
+    pending = None
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+
+            timeout = max(0.0, opened_at + window - time.perf_counter()) if buffer else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # Fenêtre écoulée: envoyer le groupe sans attendre le token suivant
+                yield {"type": "token", "content": "".join(buffer)}
+                buffer = []
+                continue
+
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+
+            if event.get("type") == "token":
+                if not buffer:
+                    opened_at = time.perf_counter()
+                buffer.append(event.get("content", ""))
+                continue
+
+            if buffer:
+                yield {"type": "token", "content": "".join(buffer)}
+                buffer = []
+            yield event
+
+        if buffer:
+            yield {"type": "token", "content": "".join(buffer)}
+    finally:
+        if pending is not None and not pending.done():
+            # Client parti: arrêter aussi le générateur amont (appel LLM)
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
@@ -58,11 +58,21 @@ class Settings(BaseSettings):
     
     # Embedding Model
     embedding_model: str = "intfloat/multilingual-e5-large"  # +25% précision vs base, 1024 dims
+    embedding_backend: str = "torch"  # torch | onnx (ONNX Runtime, quantization int8)
+    embedding_onnx_cache_dir: str = "./data/onnx"  # Modèle converti une fois, memory-mappé ensuite
     
     # Paths
     vectorstore_path: str = "./data/vectorstore"
     docs_path: str = "../docs"
     
+    # Extraction des documents (indexation)
+    pdf_extraction_workers: int = 0          # Processus d'extraction (0 = un par CPU, 1 = séquentiel)
+    pdf_extraction_timeout_s: float = 120.0  # Au-delà, le fichier est ignoré (réessayé au prochain passage)
+    pdf_pages_per_task: int = 16             # Les gros PDF sont découpés en tranches de pages
+    extraction_cache_dir: str = "./data/extraction_cache"  # Texte extrait par hash de fichier ("" = désactivé)
+    index_embed_batch_size: int = 64         # Chunks embeddés puis upsertés ensemble
+    index_queue_size: int = 4                # Profondeur des files entre étages (borne la mémoire)
+    
     # SQL Server Database Configuration
     sql_server_host: str = "alpha.messages.fr"
     sql_server_port: int = 1433
@@ -73,7 +83,10 @@ class Settings(BaseSettings):
     
     # Cache
     enable_cache: bool = True
-    cache_max_size: int = 100
+    cache_max_size: int = 100                # Cache exact des réponses (LRU)
+    cache_ttl_s: float = 3600.0
+    intent_cache_size: int = 500             # Cache des intentions analysées par le LLM
+    intent_cache_ttl_s: float = 3600.0
     
     # Optimisations Cloud LLM
     enable_request_batching: bool = False    # Désactivé pour cloud (inutile)
@@ -86,6 +99,66 @@ class Settings(BaseSettings):
     semantic_cache_size: int = 1000          # Augmenté pour plus de cache
     semantic_similarity_threshold: float = 0.92
     semantic_cache_ttl: float = 7200.0       # 2 heures (économise les appels API)
+    semantic_cache_persist_path: str = ""    # Fichier SQLite partagé par les workers ("" = mémoire seule)
+    semantic_cache_sync_interval_s: float = 2.0       # Relecture des écritures des autres workers
+    semantic_cache_cleanup_interval_s: float = 300.0  # Purge des entrées expirées sur disque
+    semantic_cache_persist_max_entries: int = 20000
+    
+    # Préchauffage du cache (questions fréquentes rejouées en priorité basse)
+    query_log_path: str = ""                 # Journal JSONL des questions reçues ("" = désactivé)
+    cache_warmup_on_startup: bool = False
+    cache_warmup_path: str = ""              # Fichier de questions (défaut: le journal, top-N)
+    cache_warmup_top_n: int = 50
+    cache_warmup_concurrency: int = 2
+    
+    # Cache LRU des embeddings de requêtes (1 embedding par question, pas 3)
+    query_embedding_cache_size: int = 1000
+    
+    # Micro-batching des embeddings (regroupe les encode() concurrents)
+    enable_embedding_batching: bool = True
+    embedding_batch_window_ms: float = 5.0   # Fenêtre d'accumulation
+    embedding_max_batch_size: int = 32       # Taille max d'un batch encode()
+    
+    # Pools d'exécution bornés (travail bloquant hors de l'event loop)
+    embedding_executor_workers: int = 2      # CPU: embeddings + requêtes Chroma
+    embedding_executor_queue: int = 64
+    db_executor_workers: int = 8             # I/O SQL Server (pyodbc)
+    db_executor_queue: int = 64
+    llm_executor_workers: int = 16           # Appels LLM synchrones (Ollama)
+    llm_executor_queue: int = 128
+    probe_executor_workers: int = 2          # /health: isolé des pools de /chat
+    probe_executor_queue: int = 4
+    health_probe_timeout_s: float = 2.0      # Au-delà, le service est signalé indisponible
+    
+    # Pool de connexions SQL Server (réutilisées entre requêtes de suivi de commande)
+    db_pool_max_size: int = 8                # >= db_executor_workers pour ne pas attendre
+    db_pool_checkout_timeout_s: float = 5.0  # Attente max d'une connexion libre
+    db_pool_max_lifetime_s: float = 1800.0   # Recyclage des connexions trop anciennes
+    db_pool_health_check_interval_s: float = 30.0  # SELECT 1 si inactive depuis plus longtemps
+    
+    # Cache des snapshots de commande (TTL 0 = désactivé pour ce cas)
+    order_cache_ttl_s: float = 60.0          # Commande en cours (statut qui évolue)
+    order_cache_final_ttl_s: float = 3600.0  # Livrée (12) / Terminée (16)
+    order_cache_negative_ttl_s: float = 30.0 # Numéro inconnu (énumération)
+    order_cache_max_size: int = 5000
+    
+    # Contrôle d'admission /chat et /chat/stream (délestage 503 + Retry-After)
+    admission_max_concurrent: int = 32       # Requêtes chat traitées en parallèle
+    admission_max_queue: int = 128           # Places en file d'attente (toutes priorités)
+    admission_queue_quota_high: int = 128    # Suivi de commande
+    admission_queue_quota_normal: int = 96   # Questions générales (RAG)
+    admission_queue_quota_low: int = 16      # Benchmark / analytics
+    admission_max_wait_high_s: float = 20.0  # Attente max en file par priorité
+    admission_max_wait_normal_s: float = 10.0
+    admission_max_wait_low_s: float = 3.0
+    chat_request_deadline_s: float = 60.0    # Au-delà, la requête (et l'appel LLM) est abandonnée
+    
+    # Retrieval spéculatif: lancé pendant l'analyse d'intention LLM, annulé si suivi de commande
+    speculative_retrieval_ratio: float = 1.0  # Part des requêtes éligibles en spéculatif (A/B: 0.5, désactivé: 0)
+    
+    # Streaming SSE: tokens envoyés à la vitesse du provider, regroupés en frames
+    stream_coalesce_ms: float = 30.0         # Fenêtre de regroupement (0 = une frame par chunk)
+    stream_disconnect_check_s: float = 0.25  # Intervalle min. entre deux is_disconnected()
     
     # Connexions HTTP (pour cloud providers)
     http_connection_pool_size: int = 20
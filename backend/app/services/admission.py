@@ -0,0 +1,301 @@
+"""
+Contrôle d'admission - limite le travail accepté par /chat et /chat/stream.
+
+Sans contrôle global, chaque requête acceptée démarre analyse + retrieval +
+LLM même quand le serveur est déjà saturé: toutes les requêtes ralentissent
+et les clients abandonnent avant d'avoir leur réponse.
+
+Ce service:
+1. Limite les requêtes en cours (max_concurrent) avec une file d'attente bornée
+2. Sert la file par priorité: HIGH (suivi de commande) avant NORMAL (RAG)
+   avant LOW (benchmark / analytics), avec un quota de places par priorité
+3. Refuse immédiatement (503 + Retry-After) quand l'attente estimée dépasse
+   le temps d'attente maximum de la priorité ou le deadline de la requête
+4. Fournit un Deadline propagé jusqu'à l'appel LLM
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.request_batcher import RequestPriority
+
+
+class DeadlineExceededError(TimeoutError):
+    """Levée quand le deadline d'une requête est dépassé."""
+
+
+class Deadline:
+    """Échéance absolue d'une requête (horloge monotone)."""
+
+    def __init__(self, timeout_s: float):
+        self.timeout_s = timeout_s
+        self.expires_at = time.monotonic() + timeout_s
+
+    def remaining(self) -> float:
+        """Secondes restantes (0 si dépassé)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str = "") -> None:
+        """Lève DeadlineExceededError si le deadline est dépassé."""
+        if self.expired:
+            raise DeadlineExceededError(f"Deadline dépassé{f' avant {stage}' if stage else ''}")
+
+    async def wait_for(self, aw: Awaitable[Any], stage: str = "") -> Any:
+        """Attend aw dans le temps restant; l'annule au-delà."""
+        self.check(stage)
+        try:
+            return await asyncio.wait_for(aw, timeout=self.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError(f"Deadline dépassé{f' pendant {stage}' if stage else ''}") from None
+
+
+class AdmissionRejectedError(RuntimeError):
+    """Levée quand une requête est refusée (file pleine ou attente trop longue)."""
+
+    def __init__(self, priority: RequestPriority, reason: str, estimated_wait_s: float = 0.0):
+        super().__init__(f"Serveur surchargé ({priority.name}: {reason})")
+        self.priority = priority
+        self.reason = reason
+        self.estimated_wait_s = estimated_wait_s
+
+    @property
+    def retry_after(self) -> int:
+        """Valeur du header Retry-After (secondes, 1 à 30)."""
+        return min(30, max(1, math.ceil(self.estimated_wait_s)))
+
+
+class AdmissionController:
+    """
+    Sémaphore prioritaire avec file bornée et délestage.
+
+    Fonctionnement:
+    1. Slot libre et personne en file -> admission immédiate
+    2. Sinon, attente estimée = temps de service moyen (EWMA) x (position + 1)
+       / max_concurrent; refus si elle dépasse max_wait de la priorité ou le
+       temps restant du deadline
+    3. À chaque libération, le slot est donné au premier de la file
+       (priorité puis ordre d'arrivée)
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 32,
+        max_queue: int = 128,
+        queue_quotas: Optional[Dict[RequestPriority, int]] = None,
+        max_wait_s: Optional[Dict[RequestPriority, float]] = None,
+        initial_service_time_s: float = 2.0,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_quotas = queue_quotas or {p: max_queue for p in RequestPriority}
+        self.max_wait_s = max_wait_s or {p: 30.0 for p in RequestPriority}
+
+        self._active = 0
+        self._queue: List[tuple] = []  # heap de (priorité, séquence, future)
+        self._queued: Dict[RequestPriority, int] = {p: 0 for p in RequestPriority}
+        self._sequence = itertools.count()
+
+        # Temps de service moyen (moyenne mobile exponentielle)
+        self._service_time_s = initial_service_time_s
+        self._ewma_alpha = 0.2
+
+        # Stats
+        self.stats = {
+            "admitted": 0,
+            "admitted_immediately": 0,
+            "rejected_queue_full": 0,
+            "rejected_wait": 0,
+            "timed_out_in_queue": 0,
+            "peak_active": 0,
+            "peak_queued": 0,
+        }
+        self._priority_stats: Dict[RequestPriority, Dict[str, int]] = {
+            p: {"admitted": 0, "rejected": 0} for p in RequestPriority
+        }
+        self._queue_times_ms: Dict[RequestPriority, deque] = {p: deque(maxlen=500) for p in RequestPriority}
+
+    @property
+    def queued(self) -> int:
+        return sum(self._queued.values())
+
+    def estimate_wait(self, priority: RequestPriority) -> float:
+        """Attente estimée (s) pour une nouvelle requête de cette priorité."""
+        if self._active < self.max_concurrent and not self._queue:
+            return 0.0
+        # Les requêtes de priorité supérieure ou égale passent avant
+        ahead = sum(n for p, n in self._queued.items() if p.value <= priority.value)
+        return self._service_time_s * (ahead + 1) / self.max_concurrent
+
+    def _reject(self, priority: RequestPriority, reason: str, stat: str, estimated_wait_s: float):
+        self.stats[stat] += 1
+        self._priority_stats[priority]["rejected"] += 1
+        print(f"🚦 Requête {priority.name} refusée: {reason}")
+        raise AdmissionRejectedError(priority, reason, estimated_wait_s)
+
+    def _record_admission(self, priority: RequestPriority, queued_at: float):
+        self.stats["admitted"] += 1
+        self._priority_stats[priority]["admitted"] += 1
+        self.stats["peak_active"] = max(self.stats["peak_active"], self._active)
+        self._queue_times_ms[priority].append((time.perf_counter() - queued_at) * 1000)
+
+    async def acquire(self, priority: RequestPriority, deadline: Optional[Deadline] = None) -> float:
+        """
+        Réserve un slot d'exécution.
+
+        Returns:
+            Temps passé en file (ms)
+
+        Raises:
+            AdmissionRejectedError: file pleine, attente estimée trop longue,
+                ou deadline atteint pendant l'attente
+        """
+        queued_at = time.perf_counter()
+
+        if self._active < self.max_concurrent and not self._queue:
+            self._active += 1
+            self.stats["admitted_immediately"] += 1
+            self._record_admission(priority, queued_at)
+            return 0.0
+
+        if self.queued >= self.max_queue or self._queued[priority] >= self.queue_quotas[priority]:
+            self._reject(priority, "file d'attente pleine", "rejected_queue_full", self.estimate_wait(priority))
+
+        estimated = self.estimate_wait(priority)
+        budget = self.max_wait_s[priority]
+        if deadline is not None:
+            budget = min(budget, deadline.remaining())
+        if estimated > budget:
+            self._reject(priority, f"attente estimée {estimated:.1f}s > {budget:.1f}s", "rejected_wait", estimated)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority.value, next(self._sequence), future))
+        self._queued[priority] += 1
+        self.stats["peak_queued"] = max(self.stats["peak_queued"], self.queued)
+
+        try:
+            await asyncio.wait_for(future, timeout=budget)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Slot attribué au moment de l'abandon: le rendre
+                self.release()
+            else:
+                future.cancel()
+                self._queued[priority] -= 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.stats["timed_out_in_queue"] += 1
+            self._priority_stats[priority]["rejected"] += 1
+            raise AdmissionRejectedError(priority, "attente maximale atteinte", self.estimate_wait(priority))
+
+        self._record_admission(priority, queued_at)
+        return (time.perf_counter() - queued_at) * 1000
+
+    def release(self, service_time_s: Optional[float] = None):
+        """Libère un slot et le donne au premier de la file."""
+        if service_time_s is not None:
+            self._service_time_s += self._ewma_alpha * (service_time_s - self._service_time_s)
+        while self._queue:
+            priority_value, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue  # Abandonné (timeout / client parti), déjà décompté
+            self._queued[RequestPriority(priority_value)] -= 1
+            # Le slot passe directement au suivant: _active inchangé
+            future.set_result(None)
+            return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def admit(self, priority: RequestPriority, deadline: Optional[Deadline] = None):
+        """Context manager: acquire() puis release() avec mesure du temps de service."""
+        queue_ms = await self.acquire(priority, deadline)
+        started = time.perf_counter()
+        try:
+            yield queue_ms
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques d'admission."""
+
+        def pct(values: List[float], p: float) -> float:
+            if not values:
+                return 0.0
+            return round(values[min(len(values) - 1, int(len(values) * p))], 2)
+
+        per_priority = {}
+        for priority in RequestPriority:
+            waits = sorted(self._queue_times_ms[priority])
+            per_priority[priority.name] = {
+                **self._priority_stats[priority],
+                "queued": self._queued[priority],
+                "queue_quota": self.queue_quotas[priority],
+                "max_wait_s": self.max_wait_s[priority],
+                "queue_time_ms": {
+                    "p50": pct(waits, 0.50),
+                    "p95": pct(waits, 0.95),
+                    "max": round(waits[-1], 2) if waits else 0.0,
+                },
+            }
+        return {
+            **self.stats,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": self.queued,
+            "avg_service_time_s": round(self._service_time_s, 3),
+            "priorities": per_priority,
+        }
+
+
+PRIORITY_HEADER = "X-Request-Priority"
+
+
+def resolve_priority(header_value: Optional[str], is_order_tracking: bool = False) -> RequestPriority:
+    """
+    Priorité d'une requête chat.
+
+    Le header X-Request-Priority permet seulement de se déclasser en LOW
+    (scripts de benchmark / analytics): un client ne peut pas s'auto-promouvoir.
+    """
+    if header_value and header_value.strip().lower() == "low":
+        return RequestPriority.LOW
+    return RequestPriority.HIGH if is_order_tracking else RequestPriority.NORMAL
+
+
+# Singleton global
+_admission_controller: Optional[AdmissionController] = None
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Retourne l'instance singleton du contrôleur d'admission."""
+    global _admission_controller
+    if _admission_controller is None:
+        with _admission_lock:
+            if _admission_controller is None:
+                _admission_controller = AdmissionController(
+                    max_concurrent=settings.admission_max_concurrent,
+                    max_queue=settings.admission_max_queue,
+                    queue_quotas={
+                        RequestPriority.HIGH: settings.admission_queue_quota_high,
+                        RequestPriority.NORMAL: settings.admission_queue_quota_normal,
+                        RequestPriority.LOW: settings.admission_queue_quota_low,
+                    },
+                    max_wait_s={
+                        RequestPriority.HIGH: settings.admission_max_wait_high_s,
+                        RequestPriority.NORMAL: settings.admission_max_wait_normal_s,
+                        RequestPriority.LOW: settings.admission_max_wait_low_s,
+                    },
+                )
+    return _admission_controller
@@ -0,0 +1,360 @@
+"""
+Préchauffage du cache de réponses - les FAQ connues avant les premiers clients.
+
+Après un démarrage à froid, les premiers utilisateurs paient toute la
+latence LLM pour les mêmes questions fréquentes. Ce module:
+1. Journalise les questions reçues (JSONL, optionnel, écrit par un thread de fond)
+   pour connaître le trafic réel - jamais les suivis de commande
+2. Charge une liste de questions (fichier texte / JSONL, ou top-N du journal)
+3. Les rejoue dans RAGPipeline en priorité basse, avec une concurrence limitée,
+   ce qui remplit le cache sémantique (et le store persistant s'il est actif)
+4. Mesure la part du trafic réel couverte par le jeu préchauffé
+
+Les questions de suivi de commande (décidées par les règles) sont ignorées:
+leur réponse dépend de la base, pas du cache.
+"""
+import asyncio
+import json
+import os
+import queue
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.admission import AdmissionRejectedError, Deadline, get_admission_controller
+from app.services.message_analyzer import MessageAnalyzer
+from app.services.request_batcher import RequestPriority
+from app.services.semantic_cache import normalize_embedding
+
+
+_rules = MessageAnalyzer(llm_service=None)  # Règles uniquement (pas d'appel LLM)
+_log_queue: "queue.Queue" = queue.Queue(maxsize=10000)
+_log_writer: Optional[threading.Thread] = None
+_log_writer_lock = threading.Lock()
+_log_stats = {"queued": 0, "written": 0, "skipped_order_tracking": 0, "dropped": 0, "errors": 0}
+_last_report: Dict[str, Any] = {}
+_startup_task: Optional[asyncio.Task] = None
+
+
+def normalize_question(question: str) -> str:
+    """Forme canonique (même normalisation que le cache exact)."""
+    return re.sub(r'\s+', ' ', question.lower().strip())
+
+
+def is_cacheable(question: str) -> bool:
+    """Question générale (réponse RAG cachable), pas un suivi de commande."""
+    if not question.strip():
+        return False
+    decision = _rules.classify_with_rules(question)
+    return decision is None or decision["intent"] != "order_tracking"
+
+
+# ============================================================================
+# Journal des questions (trafic réel)
+# ============================================================================
+
+def record_query(question: str, has_history: bool = False) -> None:
+    """
+    Met une question en file pour le journal JSONL (no-op si QUERY_LOG_PATH est vide).
+    Aucune I/O sur l'event loop: tri et écriture dans le thread de fond.
+    """
+    path = settings.query_log_path
+    if not path or not question:
+        return
+    _ensure_log_writer()
+    try:
+        _log_queue.put_nowait((path, time.time(), question, has_history))
+        _log_stats["queued"] += 1
+    except queue.Full:
+        # Disque lent: on perd des lignes de statistiques plutôt que de bloquer /chat
+        _log_stats["dropped"] += 1
+
+
+def _ensure_log_writer() -> None:
+    global _log_writer
+    if _log_writer is None:
+        with _log_writer_lock:
+            if _log_writer is None:
+                _log_writer = threading.Thread(target=_log_writer_loop, name="query-log", daemon=True)
+                _log_writer.start()
+
+
+def _log_writer_loop() -> None:
+    """Vide la file par lots: suivis de commande écartés (données client), append par fichier."""
+    while True:
+        batch = [_log_queue.get()]
+        try:
+            while True:
+                try:
+                    batch.append(_log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            _write_log_batch(batch)
+        except Exception as e:
+            # Le thread ne doit jamais mourir: les questions suivantes seraient perdues
+            _log_stats["errors"] += 1
+            print(f"⚠️ Query log error: {e}")
+        finally:
+            for _ in batch:
+                _log_queue.task_done()
+
+
+def _write_log_batch(batch: List[tuple]) -> None:
+    lines: Dict[str, List[str]] = {}
+    for path, ts, question, has_history in batch:
+        if not is_cacheable(question):
+            _log_stats["skipped_order_tracking"] += 1
+            continue
+        lines.setdefault(path, []).append(
+            json.dumps({"ts": ts, "question": question, "history": has_history}, ensure_ascii=False)
+        )
+    for path, entries in lines.items():
+        try:
+            # Lignes courtes en mode append: atomique entre workers
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(line + "\n" for line in entries))
+            _log_stats["written"] += len(entries)
+        except OSError as e:
+            _log_stats["errors"] += 1
+            print(f"⚠️ Query log error: {e}")
+
+
+def flush_query_log(timeout_s: float = 5.0) -> bool:
+    """Attend l'écriture des questions en file (tests, arrêt), au plus timeout_s secondes."""
+    if _log_writer is None:
+        return True
+    deadline = time.monotonic() + timeout_s
+    while _log_queue.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            print(f"⚠️ Query log: {_log_queue.unfinished_tasks} questions non écrites à l'arrêt")
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def iter_questions(path: str) -> Iterable[str]:
+    """
+    Questions d'un fichier, une par occurrence.
+
+    Formats: .txt (une question par ligne, # = commentaire), .json (liste)
+    ou .jsonl (champ question / message / query). Les entrées JSONL avec
+    historique sont ignorées (jamais servies par le cache).
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            records = json.load(f)
+        elif path.endswith(".jsonl"):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    for record in records:
+        if isinstance(record, dict):
+            if record.get("history"):
+                continue
+            record = record.get("question") or record.get("message") or record.get("query") or ""
+        if isinstance(record, str) and record.strip():
+            yield record.strip()
+
+
+def load_questions(path: str, top_n: Optional[int] = None) -> List[str]:
+    """
+    Questions cachables d'un fichier, dédupliquées et triées par fréquence.
+
+    Args:
+        path: Fichier de questions ou journal QUERY_LOG_PATH
+        top_n: Ne garder que les N questions les plus fréquentes
+    """
+    counts: Counter = Counter()
+    first_form: Dict[str, str] = {}
+    for question in iter_questions(path):
+        if not is_cacheable(question):
+            continue
+        key = normalize_question(question)
+        counts[key] += 1
+        first_form.setdefault(key, question)
+    return [first_form[key] for key, _ in counts.most_common(top_n)]
+
+
+# ============================================================================
+# Préchauffage
+# ============================================================================
+
+async def _warm_one(pipeline, question: str, report: Dict[str, Any], attempts: int = 3) -> None:
+    """Rejoue une question en priorité basse (réessaie si l'admission la déleste)."""
+    started = time.perf_counter()
+    for attempt in range(attempts):
+        deadline = Deadline(settings.chat_request_deadline_s)
+        try:
+            async with get_admission_controller().admit(RequestPriority.LOW, deadline):
+                response = await pipeline.generate_response(
+                    query=question, deadline=deadline, priority=RequestPriority.LOW
+                )
+            break
+        except AdmissionRejectedError as e:
+            # Trafic réel prioritaire: on attend et on réessaie
+            if attempt == attempts - 1:
+                report["rejected"] += 1
+                return
+            await asyncio.sleep(e.retry_after)
+        except Exception as e:
+            report["failed"] += 1
+            report["errors"].append(f"{question[:60]}: {e}")
+            return
+    elapsed = time.perf_counter() - started
+    if response.intent == "order_tracking":
+        report["skipped"] += 1
+    else:
+        report["warmed"] += 1
+        report["llm_time_s"] += elapsed
+
+
+async def warm_cache(pipeline, questions: List[str], concurrency: int = 2) -> Dict[str, Any]:
+    """
+    Remplit le cache de réponses avec une liste de questions.
+
+    Args:
+        pipeline: RAGPipeline (cache sémantique actif)
+        questions: Questions à rejouer (dédupliquées dans l'ordre)
+        concurrency: Questions traitées en parallèle (le trafic réel passe avant)
+
+    Returns:
+        Rapport: questions rejouées / ignorées / délestées / en erreur
+    """
+    global _last_report
+    unique: Dict[str, str] = {}
+    for question in questions:
+        if is_cacheable(question):
+            unique.setdefault(normalize_question(question), question)
+    report: Dict[str, Any] = {
+        "questions": len(unique),
+        "warmed": 0,
+        "skipped": 0,
+        "rejected": 0,
+        "failed": 0,
+        "errors": [],
+        "llm_time_s": 0.0,
+        "running": True,
+    }
+    _last_report = report
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(question: str):
+        async with semaphore:
+            await _warm_one(pipeline, question, report)
+
+    try:
+        await asyncio.gather(*(run(q) for q in unique.values()))
+    finally:
+        report["running"] = False
+        report["duration_s"] = round(time.perf_counter() - started, 2)
+        report["llm_time_s"] = round(report["llm_time_s"], 2)
+        report["errors"] = report["errors"][:10]
+    print(
+        f"🔥 Cache warm-up: {report['warmed']}/{report['questions']} questions en {report['duration_s']}s "
+        f"({report['rejected']} délestées, {report['failed']} en erreur)"
+    )
+    return report
+
+
+# ============================================================================
+# Couverture du trafic réel
+# ============================================================================
+
+def coverage_report(
+    warm_questions: List[str],
+    traffic: List[str],
+    embed_func: Optional[Callable[[str], Any]] = None,
+    threshold: float = 0.92,
+) -> Dict[str, Any]:
+    """
+    Part du trafic réel qu'aurait servie le jeu préchauffé.
+
+    Une question est couverte si sa forme normalisée est dans le jeu
+    (cache exact) ou, avec embed_func, si sa similarité cosinus avec une
+    question du jeu atteint le seuil du cache sémantique. Estimation haute:
+    le cache exige aussi le même contexte RAG.
+    """
+    warm_keys = {normalize_question(q) for q in warm_questions}
+    faq_traffic = [q for q in traffic if is_cacheable(q)]
+    exact = 0
+    semantic = 0
+    uncovered: Counter = Counter()
+
+    matrix = None
+    if embed_func is not None and warm_questions:
+        vectors = [normalize_embedding(embed_func(q)) for q in warm_questions]
+        vectors = [v for v in vectors if v is not None]
+        matrix = np.vstack(vectors) if vectors else None
+
+    for question in faq_traffic:
+        key = normalize_question(question)
+        if key in warm_keys:
+            exact += 1
+            continue
+        if matrix is not None:
+            vector = normalize_embedding(embed_func(question))
+            if vector is not None and float(np.max(matrix @ vector)) >= threshold:
+                semantic += 1
+                continue
+        uncovered[key] += 1
+
+    total = len(faq_traffic)
+    covered = exact + semantic
+    return {
+        "traffic_questions": len(traffic),
+        "faq_questions": total,
+        "order_tracking_excluded": len(traffic) - total,
+        "warm_set_size": len(warm_keys),
+        "covered_exact": exact,
+        "covered_semantic": semantic,
+        "coverage": f"{covered / total:.1%}" if total else "0.0%",
+        "top_uncovered": [{"question": q, "count": c} for q, c in uncovered.most_common(10)],
+    }
+
+
+# ============================================================================
+# Hook de démarrage
+# ============================================================================
+
+def start_startup_warmup(pipeline) -> Optional[asyncio.Task]:
+    """Lance le préchauffage en tâche de fond (CACHE_WARMUP_ON_STARTUP)."""
+    global _startup_task
+    path = settings.cache_warmup_path or settings.query_log_path
+    if not settings.cache_warmup_on_startup or not path:
+        return None
+    if not os.path.exists(path):
+        print(f"⚠️ Cache warm-up: fichier introuvable ({path})")
+        return None
+    questions = load_questions(path, top_n=settings.cache_warmup_top_n)
+    _startup_task = asyncio.create_task(
+        warm_cache(pipeline, questions, concurrency=settings.cache_warmup_concurrency)
+    )
+    return _startup_task
+
+
+async def cancel_startup_warmup() -> None:
+    """Arrêt: annule un préchauffage encore en cours."""
+    global _startup_task
+    task, _startup_task = _startup_task, None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+
+def get_warmup_stats() -> Dict[str, Any]:
+    """Rapport du dernier préchauffage (vide si aucun)."""
+    return {
+        "on_startup": settings.cache_warmup_on_startup,
+        "query_log": settings.query_log_path or None,
+        "query_log_stats": dict(_log_stats),
+        "last_run": dict(_last_report),
+    }
@@ -1,6 +1,8 @@
 """SQL Server database service for CoolLibri orders."""
 from typing import Optional, Dict, Any, List
 from app.core.config import Settings
+from app.services.db_pool import get_connection_pool, PoolTimeoutError
+from app.services.order_cache import get_order_cache
 
 # Import pyodbc optionnel (pas disponible sur tous les environnements cloud)
 try:
@@ -14,13 +16,22 @@ settings = Settings()
 
 
 class DatabaseService:
-    """Service pour interagir avec la base de données SQL Server CoolLibri."""
+    """
+    Service pour interagir avec la base de données SQL Server CoolLibri.
+    
+    Les connexions viennent du pool partagé "coollibri" (app.services.db_pool):
+    chaque appel emprunte sa propre connexion, même sur le singleton db_service.
+    """
+    
+    POOL_NAME = "coollibri"
     
     def __init__(self):
-        """Initialize database connection."""
+        """Initialize database connection pool."""
+        self.connection = None
+        self._checkout = None
         if not PYODBC_AVAILABLE:
             self.connection_string = None
-            self.connection = None
+            self.pool = None
             return
             
         self.connection_string = (
@@ -31,18 +42,36 @@ class DatabaseService:
             f"PWD={settings.sql_server_password};"
             "TrustServerCertificate=yes;"
         )
-        self.connection = None
+        # Pool créé une seule fois, les connexions sont ouvertes à la demande
+        self.pool = get_connection_pool(self.POOL_NAME, self._open_connection)
     
-    def connect(self) -> bool:
-        """Établir la connexion à la base de données."""
-        if not PYODBC_AVAILABLE:
+    def _open_connection(self):
+        """Ouvre une nouvelle connexion physique (appelé par le pool)."""
+        return pyodbc.connect(self.connection_string, timeout=10)
+    
+    def _pool_available(self) -> bool:
+        if self.pool is None:
             print("⚠️ pyodbc non disponible - connexion BDD impossible")
             return False
+        return True
+    
+    def connect(self) -> bool:
+        """
+        Emprunter une connexion du pool dans self.connection.
+        
+        Réservé aux scripts d'exploration mono-thread: les méthodes du service
+        utilisent self.pool.connection() pour ne jamais partager de connexion.
+        """
+        if not self._pool_available():
+            return False
             
         try:
-            self.connection = pyodbc.connect(self.connection_string, timeout=10)
-            print("✅ Connexion SQL Server établie avec succès")
+            self._checkout = self.pool.acquire()
+            self.connection = self._checkout.raw
             return True
+        except PoolTimeoutError as e:
+            print(f"❌ {e}")
+            return False
         except pyodbc.Error as e:
             print(f"❌ Erreur de connexion SQL Server: {e}")
             return False
@@ -51,56 +80,71 @@ class DatabaseService:
             return False
     
     def disconnect(self):
-        """Fermer la connexion à la base de données."""
-        if self.connection:
-            self.connection.close()
-            print("🔌 Connexion SQL Server fermée")
+        """Rendre la connexion empruntée par connect() au pool."""
+        if self._checkout:
+            self.pool.release(self._checkout)
+            self._checkout = None
+            self.connection = None
     
     def test_connection(self) -> Dict[str, Any]:
         """Tester la connexion et retourner des infos sur le serveur."""
         if not PYODBC_AVAILABLE:
             return {"success": False, "error": "pyodbc non disponible sur cet environnement"}
-            
-        if not self.connect():
-            return {"success": False, "error": "Impossible de se connecter"}
         
         try:
-            cursor = self.connection.cursor()
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
             
-            # Test query
-            cursor.execute("SELECT @@VERSION as ServerVersion, DB_NAME() as DatabaseName")
-            row = cursor.fetchone()
+                # Test query
+                cursor.execute("SELECT @@VERSION as ServerVersion, DB_NAME() as DatabaseName")
+                row = cursor.fetchone()
             
-            result = {
-                "success": True,
-                "server_version": row.ServerVersion if row else "Unknown",
-                "database": row.DatabaseName if row else "Unknown"
-            }
+                result = {
+                    "success": True,
+                    "server_version": row.ServerVersion if row else "Unknown",
+                    "database": row.DatabaseName if row else "Unknown"
+                }
             
-            cursor.close()
-            return result
+                cursor.close()
+                return result
             
         except Exception as e:
             return {"success": False, "error": str(e)}
-        finally:
-            self.disconnect()
     
-    def get_order_tracking_details(self, order_number: str) -> Optional[Dict[str, Any]]:
+    def get_order_tracking_details(self, order_number: str, use_cache: bool = True) -> Optional[Dict[str, Any]]:
         """
         Récupérer TOUS les détails de tracking d'une commande avec jointures complètes.
         
+        Passe par le cache des snapshots de commande (TTL selon le statut,
+        cache négatif pour les numéros inconnus).
+        
         Args:
             order_number: Numéro de commande (OrderId)
+            use_cache: False pour forcer la lecture en base
         
         Returns:
             Dictionnaire avec les détails complets de tracking ou None
         """
-        if not self.connect():
+        if not self._pool_available():
             return None
         
         try:
-            cursor = self.connection.cursor()
-            
+            if not use_cache:
+                return self._fetch_order_tracking_details(order_number)
+            return get_order_cache().get_or_fetch(order_number, self._fetch_order_tracking_details)
+        except PoolTimeoutError:
+            # Pool saturé: ce n'est pas "commande introuvable", l'appelant demande de réessayer
+            raise
+        except Exception as e:
+            # Erreur base: rien n'est mis en cache
+            print(f"❌ Erreur SQL: {e}")
+            return None
+    
+    def _fetch_order_tracking_details(self, order_number: str) -> Optional[Dict[str, Any]]:
+        """Jointure complète commande / lignes / produit / adresse / statut / transporteur (lève en cas d'erreur)."""
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+        
             # Requête complète avec TOUTES les jointures nécessaires
             query = """
                 SELECT 
@@ -156,16 +200,16 @@ class DatabaseService:
                 LEFT JOIN dbo.ShippingCompany sc ON ol.ShippingCompanyId = sc.ShippingCompanyId
                 WHERE o.OrderId = ?
             """
-            
+        
             cursor.execute(query, (order_number,))
-            
+        
             # Récupérer toutes les lignes
             rows = cursor.fetchall()
-            
+        
             if not rows:
                 cursor.close()
                 return None
-            
+        
             # Construire le résultat structuré COMPLET
             first_row = rows[0]
             order_data = {
@@ -190,7 +234,7 @@ class DatabaseService:
                 },
                 "items": []
             }
-            
+        
             # Ajouter chaque ligne de commande avec infos complètes
             for row in rows:
                 item = {
@@ -219,15 +263,9 @@ class DatabaseService:
                     }
                 }
                 order_data["items"].append(item)
-            
+        
             cursor.close()
             return order_data
-            
-        except Exception as e:
-            print(f"❌ Erreur SQL: {e}")
-            return None
-        finally:
-            self.disconnect()
     
     def get_order_by_number(self, order_number: str, last_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
@@ -237,69 +275,67 @@ class DatabaseService:
     
     def list_tables(self) -> List[str]:
         """Lister toutes les tables de la base de données."""
-        if not self.connect():
+        if not self._pool_available():
             return []
         
         try:
-            cursor = self.connection.cursor()
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
             
-            query = """
-                SELECT TABLE_SCHEMA + '.' + TABLE_NAME as FullTableName
-                FROM INFORMATION_SCHEMA.TABLES 
-                WHERE TABLE_TYPE = 'BASE TABLE'
-                ORDER BY TABLE_NAME
-            """
+                query = """
+                    SELECT TABLE_SCHEMA + '.' + TABLE_NAME as FullTableName
+                    FROM INFORMATION_SCHEMA.TABLES 
+                    WHERE TABLE_TYPE = 'BASE TABLE'
+                    ORDER BY TABLE_NAME
+                """
             
-            cursor.execute(query)
-            tables = [row.FullTableName for row in cursor.fetchall()]
+                cursor.execute(query)
+                tables = [row.FullTableName for row in cursor.fetchall()]
             
-            cursor.close()
-            return tables
+                cursor.close()
+                return tables
             
         except Exception as e:
             print(f"❌ Erreur SQL: {e}")
             return []
-        finally:
-            self.disconnect()
     
     def get_table_schema(self, table_name: str) -> List[Dict[str, str]]:
         """Obtenir le schéma d'une table (colonnes et types)."""
-        if not self.connect():
+        if not self._pool_available():
             return []
         
         try:
-            cursor = self.connection.cursor()
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
             
-            query = """
-                SELECT 
-                    COLUMN_NAME,
-                    DATA_TYPE,
-                    IS_NULLABLE,
-                    CHARACTER_MAXIMUM_LENGTH
-                FROM INFORMATION_SCHEMA.COLUMNS
-                WHERE TABLE_NAME = ?
-                ORDER BY ORDINAL_POSITION
-            """
+                query = """
+                    SELECT 
+                        COLUMN_NAME,
+                        DATA_TYPE,
+                        IS_NULLABLE,
+                        CHARACTER_MAXIMUM_LENGTH
+                    FROM INFORMATION_SCHEMA.COLUMNS
+                    WHERE TABLE_NAME = ?
+                    ORDER BY ORDINAL_POSITION
+                """
             
-            cursor.execute(query, (table_name,))
+                cursor.execute(query, (table_name,))
             
-            columns = []
-            for row in cursor.fetchall():
-                columns.append({
-                    "name": row.COLUMN_NAME,
-                    "type": row.DATA_TYPE,
-                    "nullable": row.IS_NULLABLE,
-                    "max_length": row.CHARACTER_MAXIMUM_LENGTH
-                })
+                columns = []
+                for row in cursor.fetchall():
+                    columns.append({
+                        "name": row.COLUMN_NAME,
+                        "type": row.DATA_TYPE,
+                        "nullable": row.IS_NULLABLE,
+                        "max_length": row.CHARACTER_MAXIMUM_LENGTH
+                    })
             
-            cursor.close()
-            return columns
+                cursor.close()
+                return columns
             
         except Exception as e:
             print(f"❌ Erreur SQL: {e}")
             return []
-        finally:
-            self.disconnect()
 
 
 # Singleton instance
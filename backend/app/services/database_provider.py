@@ -25,6 +25,7 @@ if backend_path not in sys.path:
 # Import des configs
 from DBCoollibri.config import DB_CONFIG as COOLLIBRI_CONFIG
 from DBChrono24.config import DB_CONFIG as CHRONO24_CONFIG
+from app.services.db_pool import get_connection_pool, PoolTimeoutError
 
 
 class DatabaseProvider(str, Enum):
@@ -47,6 +48,9 @@ class BaseDatabaseService:
         self.config = config
         self.connection_string = self._build_connection_string()
         self.connection = None
+        self._checkout = None
+        # Un pool par provider, partagé par toutes les instances (factory, tests)
+        self.pool = get_connection_pool(f"provider-{self.provider}", self._open_connection)
         
     def _build_connection_string(self) -> str:
         """Construit la chaîne de connexion."""
@@ -59,74 +63,73 @@ class BaseDatabaseService:
             "TrustServerCertificate=yes;"
         )
     
+    def _open_connection(self):
+        """Ouvre une nouvelle connexion physique (appelé par le pool)."""
+        return pyodbc.connect(
+            self.connection_string, 
+            timeout=self.config.get('timeout', 10)
+        )
+    
     def connect(self) -> bool:
-        """Établir la connexion à la base de données."""
+        """Emprunter une connexion du pool dans self.connection (usage mono-thread)."""
         try:
-            self.connection = pyodbc.connect(
-                self.connection_string, 
-                timeout=self.config.get('timeout', 10)
-            )
-            print(f"✅ Connexion {self.display_name} établie")
+            self._checkout = self.pool.acquire()
+            self.connection = self._checkout.raw
             return True
-        except pyodbc.Error as e:
+        except (pyodbc.Error, PoolTimeoutError) as e:
             print(f"❌ Erreur connexion {self.display_name}: {e}")
             return False
     
     def disconnect(self):
-        """Fermer la connexion."""
-        if self.connection:
-            self.connection.close()
+        """Rendre la connexion empruntée au pool."""
+        if self._checkout:
+            self.pool.release(self._checkout)
+            self._checkout = None
             self.connection = None
-            print(f"🔌 Connexion {self.display_name} fermée")
     
     def test_connection(self) -> Dict[str, Any]:
         """Tester la connexion et retourner des infos."""
-        if not self.connect():
-            return {"success": False, "provider": self.provider, "error": "Connexion impossible"}
-        
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT @@VERSION, DB_NAME()")
-            row = cursor.fetchone()
-            
-            result = {
-                "success": True,
-                "provider": self.provider,
-                "display_name": self.display_name,
-                "database": row[1] if row else "Unknown",
-                "server_version": row[0][:100] if row else "Unknown"  # Tronquer
-            }
-            cursor.close()
-            return result
-        except pyodbc.Error as e:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute("SELECT @@VERSION, DB_NAME()")
+                row = cursor.fetchone()
+                
+                result = {
+                    "success": True,
+                    "provider": self.provider,
+                    "display_name": self.display_name,
+                    "database": row[1] if row else "Unknown",
+                    "server_version": row[0][:100] if row else "Unknown"  # Tronquer
+                }
+                cursor.close()
+                return result
+        except (pyodbc.Error, PoolTimeoutError) as e:
             return {"success": False, "provider": self.provider, "error": str(e)}
-        finally:
-            self.disconnect()
     
     def execute_query(self, query: str, params: tuple = None) -> Optional[list]:
         """Exécuter une requête SELECT et retourner les résultats."""
-        if not self.connect():
-            return None
-        
         try:
-            cursor = self.connection.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            columns = [column[0] for column in cursor.description]
-            results = []
-            for row in cursor.fetchall():
-                results.append(dict(zip(columns, row)))
-            
-            cursor.close()
-            return results
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                
+                columns = [column[0] for column in cursor.description]
+                results = []
+                for row in cursor.fetchall():
+                    results.append(dict(zip(columns, row)))
+                
+                cursor.close()
+                return results
+        except PoolTimeoutError as e:
+            print(f"❌ {e}")
+            return None
         except pyodbc.Error as e:
             print(f"❌ Erreur SQL: {e}")
             return None
-        finally:
-            self.disconnect()
     
     def get_tables(self) -> Optional[list]:
         """Lister toutes les tables de la base."""
@@ -0,0 +1,317 @@
+"""
+Pool de connexions SQL Server (pyodbc) - réutilise les connexions entre requêtes.
+
+Chaque question de suivi de commande faisait un pyodbc.connect() complet
+(handshake TLS + login SQL Server) puis un close(). De plus, la connexion
+était stockée sur le singleton db_service: deux requêtes concurrentes
+écrasaient mutuellement leur connexion.
+
+Ce pool:
+1. Borne le nombre de connexions ouvertes (max_size)
+2. Prête une connexion par appelant (checkout), jamais partagée
+3. Attend au plus checkout_timeout_s une connexion libre (PoolTimeoutError)
+4. Vérifie une connexion restée inactive avant de la prêter (SELECT 1)
+5. Recycle les connexions au-delà de max_lifetime_s (bascule de serveur, fuites)
+6. Jette une connexion si une erreur remonte pendant son utilisation
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+
+class PoolTimeoutError(TimeoutError):
+    """Levée quand aucune connexion n'est libérée avant checkout_timeout_s."""
+
+    def __init__(self, pool_name: str, timeout_s: float):
+        super().__init__(f"Pool '{pool_name}': aucune connexion disponible après {timeout_s:.1f}s")
+        self.pool_name = pool_name
+        self.timeout_s = timeout_s
+
+
+@dataclass
+class PooledConnection:
+    """Connexion DB-API et ses métadonnées de cycle de vie."""
+    raw: Any
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class ConnectionPool:
+    """
+    Pool borné et thread-safe de connexions DB-API.
+
+    Les appels pyodbc tournent dans le pool d'exécution "db" (run_db):
+    la synchronisation est donc faite avec un threading.Condition.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connect_func: Callable[[], Any],
+        max_size: int = 8,
+        checkout_timeout_s: float = 5.0,
+        max_lifetime_s: float = 1800.0,
+        health_check_interval_s: float = 30.0,
+        health_check_query: str = "SELECT 1",
+    ):
+        self.name = name
+        self.connect_func = connect_func
+        self.max_size = max_size
+        self.checkout_timeout_s = checkout_timeout_s
+        self.max_lifetime_s = max_lifetime_s
+        self.health_check_interval_s = health_check_interval_s
+        self.health_check_query = health_check_query
+
+        self._cond = threading.Condition()
+        self._idle: List[PooledConnection] = []  # LIFO: la plus récente d'abord
+        self._total = 0  # Connexions ouvertes (idle + prêtées + en cours de création)
+        self._waiters = 0
+        self._closed = False
+
+        self._connect_times_ms: deque = deque(maxlen=500)
+        self._checkout_waits_ms: deque = deque(maxlen=500)
+        self.stats = {
+            "connects": 0,
+            "connect_failures": 0,
+            "checkouts": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "recycled": 0,
+            "discarded": 0,
+            "peak_in_use": 0,
+            "peak_waiters": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Checkout / checkin
+    # ------------------------------------------------------------------
+
+    def acquire(self) -> PooledConnection:
+        """
+        Prête une connexion (à rendre avec release()).
+
+        Raises:
+            PoolTimeoutError: aucune connexion libre avant checkout_timeout_s
+            Exception: erreur du driver à la création d'une connexion
+        """
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.checkout_timeout_s
+
+        while True:
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError(f"Pool '{self.name}' fermé")
+                while not self._idle and self._total >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        print(f"⏳ Pool '{self.name}': timeout de checkout ({self.checkout_timeout_s:.1f}s)")
+                        raise PoolTimeoutError(self.name, self.checkout_timeout_s)
+                    self._waiters += 1
+                    self.stats["peak_waiters"] = max(self.stats["peak_waiters"], self._waiters)
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    # Place réservée: la connexion est créée hors du verrou
+                    self._total += 1
+                    create = True
+
+            if create:
+                entry = self._create()
+            elif not self._is_usable(entry):
+                self._discard(entry, recycled=time.monotonic() - entry.created_at > self.max_lifetime_s)
+                continue
+
+            with self._cond:
+                self.stats["checkouts"] += 1
+                self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self.in_use)
+                self._checkout_waits_ms.append((time.perf_counter() - started) * 1000)
+            return entry
+
+    def release(self, entry: PooledConnection, broken: bool = False):
+        """Rend une connexion au pool (ou la ferme si broken / trop vieille)."""
+        if broken or self._closed or time.monotonic() - entry.created_at > self.max_lifetime_s:
+            self._discard(entry, recycled=not broken and not self._closed)
+            return
+
+        try:
+            # Pas de transaction implicite laissée ouverte pour le prochain appelant
+            entry.raw.rollback()
+        except Exception:
+            self._discard(entry)
+            return
+
+        entry.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager: prête une connexion DB-API brute.
+
+        Si une exception remonte du bloc, la connexion est jetée (état inconnu).
+        """
+        entry = self.acquire()
+        try:
+            yield entry.raw
+        except BaseException:
+            self.release(entry, broken=True)
+            raise
+        else:
+            self.release(entry)
+
+    # ------------------------------------------------------------------
+    # Cycle de vie des connexions
+    # ------------------------------------------------------------------
+
+    def _create(self) -> PooledConnection:
+        started = time.perf_counter()
+        try:
+            raw = self.connect_func()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self.stats["connect_failures"] += 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats["connects"] += 1
+            self._connect_times_ms.append((time.perf_counter() - started) * 1000)
+        return PooledConnection(raw=raw)
+
+    def _is_usable(self, entry: PooledConnection) -> bool:
+        """Durée de vie max + health check si la connexion est restée inactive."""
+        now = time.monotonic()
+        if now - entry.created_at > self.max_lifetime_s:
+            return False
+        if now - entry.last_used < self.health_check_interval_s:
+            return True
+        try:
+            cursor = entry.raw.cursor()
+            cursor.execute(self.health_check_query)
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception as e:
+            with self._cond:
+                self.stats["health_check_failures"] += 1
+            print(f"⚠️ Pool '{self.name}': connexion inactive invalide, remplacée ({e})")
+            return False
+
+    def _discard(self, entry: PooledConnection, recycled: bool = False):
+        try:
+            entry.raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._total -= 1
+            self.stats["recycled" if recycled else "discarded"] += 1
+            self._cond.notify()
+
+    def close(self):
+        """Ferme les connexions inactives; les connexions prêtées seront fermées à leur retour."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for entry in idle:
+            try:
+                entry.raw.close()
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------------
+    # Métriques
+    # ------------------------------------------------------------------
+
+    @property
+    def in_use(self) -> int:
+        return self._total - len(self._idle)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne l'état et les métriques du pool."""
+
+        def pct(values: List[float], p: float) -> float:
+            if not values:
+                return 0.0
+            return round(values[min(len(values) - 1, int(len(values) * p))], 2)
+
+        with self._cond:
+            connect_times = sorted(self._connect_times_ms)
+            waits = sorted(self._checkout_waits_ms)
+            return {
+                **self.stats,
+                "max_size": self.max_size,
+                "open": self._total,
+                "in_use": self.in_use,
+                "idle": len(self._idle),
+                "waiters": self._waiters,
+                "connect_latency_ms": {
+                    "p50": pct(connect_times, 0.50),
+                    "p95": pct(connect_times, 0.95),
+                    "max": round(connect_times[-1], 2) if connect_times else 0.0,
+                },
+                "checkout_wait_ms": {
+                    "p50": pct(waits, 0.50),
+                    "p95": pct(waits, 0.95),
+                    "max": round(waits[-1], 2) if waits else 0.0,
+                },
+            }
+
+
+# Un pool par base (clé = nom), partagé par toutes les instances de service
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(name: str, connect_func: Optional[Callable[[], Any]] = None) -> ConnectionPool:
+    """
+    Retourne le pool singleton `name`, créé au premier appel avec connect_func.
+
+    Raises:
+        ValueError: pool inconnu et connect_func non fourni
+    """
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                if connect_func is None:
+                    raise ValueError(f"Unknown connection pool: {name}")
+                pool = ConnectionPool(
+                    name,
+                    connect_func,
+                    max_size=settings.db_pool_max_size,
+                    checkout_timeout_s=settings.db_pool_checkout_timeout_s,
+                    max_lifetime_s=settings.db_pool_max_lifetime_s,
+                    health_check_interval_s=settings.db_pool_health_check_interval_s,
+                )
+                _pools[name] = pool
+                print(f"🔌 Pool de connexions '{name}' créé (max {pool.max_size})")
+    return pool
+
+
+def get_pools_stats() -> Dict[str, Any]:
+    """Stats de tous les pools de connexions créés."""
+    return {name: pool.get_stats() for name, pool in list(_pools.items())}
+
+
+def close_pools():
+    """Ferme tous les pools (arrêt de l'application)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,438 @@
+"""
+Indexation incrémentale des documents - seuls les chunks nouveaux sont embeddés.
+
+L'ancienne indexation vidait la collection et ré-embeddait tout docs/ à
+chaque passage (plusieurs minutes avec e5-large sur CPU pour une seule FAQ
+modifiée), avec des IDs positionnels doc_{i} instables.
+
+Ici:
+1. Chaque chunk a un ID adressé par son contenu (hash source + texte)
+2. Un manifeste (JSON, à côté du vectorstore) garde le hash de chaque fichier
+3. Fichier inchangé: rien n'est relu; fichier modifié: seuls ses chunks
+   nouveaux sont embeddés (upsert), ses chunks disparus supprimés
+4. Fichier supprimé de docs/: ses chunks sont supprimés
+5. Changement de modèle d'embedding ou de découpage: reconstruction complète
+
+Pipeline en flux (mémoire bornée quelle que soit la taille du corpus):
+
+    extraction (thread, pool de processus) --file d'attente bornée-->
+    découpage + diff + embedding par lots fixes (thread principal) --file bornée-->
+    upsert / suppressions / manifeste (thread d'écriture)
+
+Un fichier n'entre dans le manifeste qu'une fois tous ses chunks écrits:
+après un crash, le passage suivant reprend aux fichiers non terminés (et ne
+ré-embedde pas les chunks déjà présents dans la collection).
+"""
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.extraction_cache import file_digest
+from app.services.vectorstore import VectorStoreService, content_chunk_id
+
+
+MANIFEST_NAME = "index_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def index_signature() -> Dict[str, Any]:
+    """Paramètres qui rendent les chunks / embeddings existants incompatibles."""
+    return {
+        "version": MANIFEST_VERSION,
+        "embedding_model": settings.embedding_model,
+        "chunk_size": settings.chunk_size,
+        "chunk_overlap": settings.chunk_overlap,
+    }
+
+
+class IndexManifest:
+    """Manifeste des fichiers indexés: nom -> hash, taille, chunks."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.signature: Dict[str, Any] = {}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.embed_s_per_chunk: Optional[float] = None
+
+    @classmethod
+    def load(cls, path: str) -> "IndexManifest":
+        manifest = cls(path)
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+                manifest.signature = data.get("signature", {})
+                manifest.files = data.get("files", {})
+                manifest.embed_s_per_chunk = data.get("embed_s_per_chunk")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Manifeste illisible ({e}): reconstruction complète")
+        return manifest
+
+    def save(self) -> None:
+        """Écriture atomique (fichier temporaire puis rename)."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"signature": self.signature, "files": self.files, "embed_s_per_chunk": self.embed_s_per_chunk},
+                f,
+                ensure_ascii=False,
+                indent=1,
+            )
+        os.replace(tmp_path, self.path)
+
+    def reset(self, signature: Dict[str, Any]) -> None:
+        self.signature = signature
+        self.files = {}
+
+
+@dataclass
+class IndexSummary:
+    """Bilan d'un passage d'indexation."""
+    full_rebuild: bool = False
+    files_added: int = 0
+    files_changed: int = 0
+    files_removed: int = 0
+    files_unchanged: int = 0
+    files_failed: int = 0
+    chunks_added: int = 0
+    chunks_changed: int = 0
+    chunks_removed: int = 0
+    chunks_unchanged: int = 0
+    embed_seconds: float = 0.0
+    embed_seconds_saved: float = 0.0
+    total_chunks: int = 0
+    batches: int = 0
+    elapsed_s: float = 0.0
+    throughput_chunks_s: float = 0.0
+    peak_rss_mb: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Pic de mémoire résidente du process (None si non mesurable, ex. Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss: octets sur macOS, Ko ailleurs
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1024
+
+
+# Fin de flux entre deux étages
+_DONE = object()
+
+
+@dataclass
+class _FilePlan:
+    """Ce qu'il reste à écrire pour un fichier avant de l'inscrire au manifeste."""
+    path: Path
+    digest: str
+    is_new: bool
+    chunks: int
+    new_chunks: int
+    kept_ids: List[str] = field(default_factory=list)
+    kept_metadatas: List[dict] = field(default_factory=list)
+    removed_ids: List[str] = field(default_factory=list)
+
+
+class DocumentIndexer:
+    """
+    Synchronise la collection Chroma avec le dossier docs/.
+
+    processor: objet avec list_documents(dir) et process_file(path), et
+    optionnellement process_files(paths) pour l'extraction parallèle
+    (PDFProcessor).
+    """
+
+    def __init__(
+        self,
+        vectorstore: VectorStoreService,
+        processor,
+        manifest_path: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        queue_size: Optional[int] = None,
+    ):
+        self.vectorstore = vectorstore
+        self.processor = processor
+        self.manifest_path = manifest_path or os.path.join(vectorstore.persist_directory, MANIFEST_NAME)
+        self.batch_size = batch_size or settings.index_embed_batch_size
+        self.queue_size = queue_size or settings.index_queue_size
+        self.progress: Dict[str, Any] = {}
+
+    # ------------------------------------------------------------------ étages
+
+    @staticmethod
+    def _put(q: "queue.Queue", item: Any, stop: threading.Event) -> bool:
+        """put bloquant (file bornée) mais abandonné si un autre étage a échoué."""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(q: "queue.Queue", stop: threading.Event) -> Any:
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _extract_stage(self, changed: List[Tuple[Path, str]], out_q: "queue.Queue", stop: threading.Event) -> None:
+        """Extraction + découpage, par groupes de la taille du pool d'extraction."""
+        group = max(1, getattr(self.processor, "workers", 1))
+        for start in range(0, len(changed), group):
+            part = changed[start:start + group]
+            if hasattr(self.processor, "process_files"):
+                documents = self.processor.process_files([str(path) for path, _ in part])
+            else:
+                documents = {str(path): self.processor.process_file(str(path)) for path, _ in part}
+            for path, digest in part:
+                if not self._put(out_q, (path, digest, documents.pop(str(path), None)), stop):
+                    return
+        self._put(out_q, _DONE, stop)
+
+    def _write_stage(self, in_q: "queue.Queue", manifest: IndexManifest, summary: IndexSummary, stop: threading.Event) -> None:
+        """Upsert des lots, puis suppressions + manifeste quand un fichier est complet."""
+        plans: Dict[str, _FilePlan] = {}
+        remaining: Dict[str, int] = {}
+
+        def complete_if_done(name: str) -> None:
+            if name not in plans or remaining.get(name, 0) > 0:
+                return
+            plan = plans.pop(name)
+            remaining.pop(name, None)
+            # Chunks conservés: position (chunk_id / total_chunks) mise à jour sans ré-embedding
+            self.vectorstore.update_metadatas(plan.kept_ids, plan.kept_metadatas)
+            self.vectorstore.delete_ids(plan.removed_ids)
+            if plan.is_new:
+                summary.files_added += 1
+                summary.chunks_added += plan.new_chunks
+            else:
+                summary.files_changed += 1
+                summary.chunks_changed += plan.new_chunks
+            summary.chunks_removed += len(plan.removed_ids)
+            summary.chunks_unchanged += len(plan.kept_ids)
+            stat = plan.path.stat()
+            manifest.files[name] = {
+                "sha256": plan.digest,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "chunks": plan.chunks,
+            }
+            manifest.save()
+            self.progress["files_done"] += 1
+
+        while True:
+            item = self._get(in_q, stop)
+            if item is _DONE:
+                return
+            kind, payload = item
+            if kind == "file":
+                plans[payload.path.name] = payload
+                remaining[payload.path.name] = remaining.get(payload.path.name, 0) + payload.new_chunks
+                complete_if_done(payload.path.name)
+                continue
+            ids, documents, embeddings = payload
+            started = time.perf_counter()
+            self.vectorstore.collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=[doc.page_content for doc in documents],
+                metadatas=[doc.metadata for doc in documents],
+            )
+            self.progress["upsert_s"] += time.perf_counter() - started
+            sources = [doc.metadata["source"] for doc in documents]
+            for source in sources:
+                remaining[source] = remaining.get(source, 0) - 1
+            for source in set(sources):
+                complete_if_done(source)
+
+    def _plan_file(self, path: Path, digest: str, documents, manifest: IndexManifest) -> Tuple[_FilePlan, List[Tuple[str, Any]]]:
+        """Diff d'un fichier avec la collection: chunks à embedder, conservés, supprimés."""
+        name = path.name
+
+        # IDs adressés par contenu (doublons dans un même fichier fusionnés)
+        chunks: Dict[str, Any] = {}
+        for doc in documents:
+            chunks.setdefault(content_chunk_id(name, doc.page_content), doc)
+
+        # La collection fait foi (reprise propre après un passage interrompu)
+        existing = set(self.vectorstore.get_ids(source=name))
+        new_chunks = [(cid, doc) for cid, doc in chunks.items() if cid not in existing]
+        kept_ids = [cid for cid in chunks if cid in existing]
+        plan = _FilePlan(
+            path=path,
+            digest=digest,
+            is_new=name not in manifest.files,
+            chunks=len(chunks),
+            new_chunks=len(new_chunks),
+            kept_ids=kept_ids,
+            kept_metadatas=[chunks[cid].metadata for cid in kept_ids],
+            removed_ids=sorted(existing - set(chunks)),
+        )
+        return plan, new_chunks
+
+    def _embed_batch(self, batch: List[Tuple[str, Any]], out_q: "queue.Queue", summary: IndexSummary, stop: threading.Event) -> None:
+        texts = [doc.page_content for _, doc in batch]
+        started = time.perf_counter()
+        embeddings = self.vectorstore.embedding_service.embed_texts(texts, show_progress_bar=False)
+        summary.embed_seconds += time.perf_counter() - started
+        summary.batches += 1
+        self.progress["chunks_embedded"] += len(batch)
+        self._put(out_q, ("batch", ([cid for cid, _ in batch], [doc for _, doc in batch], embeddings)), stop)
+        self._report_progress()
+
+    def _report_progress(self, force: bool = False) -> None:
+        now = time.perf_counter()
+        if not force and now - self.progress["last_report"] < 2.0:
+            return
+        self.progress["last_report"] = now
+        elapsed = now - self.progress["started"]
+        rate = self.progress["chunks_embedded"] / elapsed if elapsed > 0 else 0.0
+        print(
+            f"   [{self.progress['files_done']}/{self.progress['files_total']} files] "
+            f"{self.progress['chunks_embedded']} chunks embedded ({rate:.1f} chunks/s)"
+        )
+
+    def _run_pipeline(self, changed: List[Tuple[Path, str]], manifest: IndexManifest, summary: IndexSummary) -> None:
+        """Extraction -> embedding par lots -> écriture, avec files bornées entre étages."""
+        files_q: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        batches_q: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+
+        def guarded(target, *args):
+            def run():
+                try:
+                    target(*args)
+                except BaseException as e:
+                    errors.append(e)
+                    stop.set()
+            return threading.Thread(target=run, name=f"indexer-{target.__name__.strip('_')}", daemon=True)
+
+        extractor = guarded(self._extract_stage, changed, files_q, stop)
+        writer = guarded(self._write_stage, batches_q, manifest, summary, stop)
+        extractor.start()
+        writer.start()
+
+        batch: List[Tuple[str, Any]] = []
+        try:
+            while True:
+                item = self._get(files_q, stop)
+                if item is _DONE:
+                    break
+                path, digest, documents = item
+                if documents is None:
+                    # Extraction en échec / timeout: chunks actuels conservés, réessai au prochain passage
+                    summary.files_failed += 1
+                    self.progress["files_done"] += 1
+                    continue
+                plan, new_chunks = self._plan_file(path, digest, documents, manifest)
+                del documents
+                self._put(batches_q, ("file", plan), stop)
+                for chunk in new_chunks:
+                    batch.append(chunk)
+                    if len(batch) >= self.batch_size:
+                        self._embed_batch(batch, batches_q, summary, stop)
+                        batch = []
+            if batch and not stop.is_set():
+                self._embed_batch(batch, batches_q, summary, stop)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            self._put(batches_q, _DONE, stop)
+            writer.join()
+            stop.set()
+            extractor.join()
+        if errors:
+            raise errors[0]
+
+    # ------------------------------------------------------------------ entrée
+
+    def sync(self, docs_path: str, full: bool = False) -> IndexSummary:
+        """
+        Indexe docs_path de façon incrémentale.
+
+        Args:
+            docs_path: Dossier des documents
+            full: Forcer la reconstruction complète
+
+        Returns:
+            IndexSummary (chunks ajoutés / modifiés / supprimés, temps économisé, débit)
+        """
+        started = time.perf_counter()
+        summary = IndexSummary()
+        manifest = IndexManifest.load(self.manifest_path)
+        signature = index_signature()
+
+        # Collection indexée sans manifeste (anciens IDs doc_{i}) ou paramètres changés
+        stale = manifest.signature != signature or (not manifest.files and self.vectorstore.count() > 0)
+        if full or stale:
+            summary.full_rebuild = True
+            self.vectorstore.clear()
+            manifest.reset(signature)
+            manifest.save()
+
+        files = self.processor.list_documents(docs_path)
+        present = {path.name for path in files}
+
+        changed = []
+        for path in files:
+            entry = manifest.files.get(path.name)
+            digest = file_digest(str(path))
+            if entry is not None and entry.get("sha256") == digest:
+                summary.files_unchanged += 1
+                summary.chunks_unchanged += entry.get("chunks", 0)
+                continue
+            changed.append((path, digest))
+
+        self.progress = {
+            "files_total": len(changed),
+            "files_done": 0,
+            "chunks_embedded": 0,
+            "upsert_s": 0.0,
+            "started": time.perf_counter(),
+            "last_report": time.perf_counter(),
+        }
+        if changed:
+            print(f"Indexing {len(changed)} new or changed files (batches of {self.batch_size} chunks)...")
+            self._run_pipeline(changed, manifest, summary)
+            self._report_progress(force=True)
+
+        for name in sorted(set(manifest.files) - present):
+            removed_ids = self.vectorstore.get_ids(source=name)
+            self.vectorstore.delete_ids(removed_ids)
+            summary.files_removed += 1
+            summary.chunks_removed += len(removed_ids)
+            del manifest.files[name]
+            manifest.save()
+
+        # Temps économisé: chunks non ré-embeddés x coût moyen d'un embedding
+        embedded = summary.chunks_added + summary.chunks_changed
+        if embedded:
+            manifest.embed_s_per_chunk = summary.embed_seconds / embedded
+        if manifest.embed_s_per_chunk is not None:
+            summary.embed_seconds_saved = summary.chunks_unchanged * manifest.embed_s_per_chunk
+        manifest.save()
+
+        summary.total_chunks = self.vectorstore.count()
+        summary.elapsed_s = time.perf_counter() - started
+        summary.throughput_chunks_s = embedded / summary.elapsed_s if summary.elapsed_s > 0 else 0.0
+        summary.peak_rss_mb = peak_rss_mb()
+        return summary
@@ -0,0 +1,218 @@
+"""Embedding backends: PyTorch SentenceTransformer and ONNX Runtime (int8)."""
+import json
+import os
+import re
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+
+
+class BaseEmbeddingBackend(ABC):
+    """Base class for embedding backends."""
+
+    name: str = "base"
+
+    @abstractmethod
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """Encode texts into a (len(texts), dim) float32 matrix."""
+        pass
+
+    @abstractmethod
+    def get_dimension(self) -> int:
+        """Return the embedding dimension."""
+        pass
+
+
+class TorchEmbeddingBackend(BaseEmbeddingBackend):
+    """Plain PyTorch SentenceTransformer (reference backend)."""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        return self.model.encode(texts, convert_to_tensor=False, show_progress_bar=show_progress_bar)
+
+    def get_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+class OnnxEmbeddingBackend(BaseEmbeddingBackend):
+    """
+    ONNX Runtime backend with dynamic int8 quantization.
+
+    Premier démarrage: export ONNX du transformer + quantization dynamique
+    int8, écrits dans cache_dir (poids en "external data").
+    Démarrages suivants: chargement direct du modèle converti; ONNX Runtime
+    memory-map les poids externes au lieu de les copier en RAM.
+
+    Reproduit le pipeline SentenceTransformer de e5: mean pooling sur
+    l'attention mask puis normalisation L2.
+    """
+
+    name = "onnx"
+    MODEL_FILE = "model-int8.onnx"
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, model_name: str, cache_dir: str, batch_size: int = 32, num_threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model_dir = os.path.join(cache_dir, re.sub(r'[^A-Za-z0-9_.-]+', '__', model_name))
+
+        if not self._is_exported():
+            self.export(model_name, self.model_dir)
+
+        with open(os.path.join(self.model_dir, self.MANIFEST_FILE), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            os.path.join(self.model_dir, self.MODEL_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _is_exported(self) -> bool:
+        manifest_path = os.path.join(self.model_dir, self.MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return False
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return manifest.get("model_name") == self.model_name and \
+            os.path.exists(os.path.join(self.model_dir, self.MODEL_FILE))
+
+    @classmethod
+    def export(cls, model_name: str, model_dir: str) -> None:
+        """Export the SentenceTransformer to ONNX and quantize it to int8 (once)."""
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        print(f"⚙️ Export ONNX int8 de {model_name} (une seule fois)...")
+        os.makedirs(model_dir, exist_ok=True)
+
+        st_model = SentenceTransformer(model_name, device="cpu")
+        transformer = st_model[0].auto_model.eval()
+        tokenizer = st_model.tokenizer
+
+        # e5-large fp32 dépasse 2 Go: torch écrit les poids en fichiers externes,
+        # on isole donc l'export intermédiaire dans un dossier temporaire
+        export_dir = tempfile.mkdtemp(prefix="fp32-", dir=model_dir)
+        fp32_path = os.path.join(export_dir, "model-fp32.onnx")
+        sample = tokenizer(["query: export"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                tuple(sample[name] for name in input_names),
+                fp32_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+                do_constant_folding=True,
+            )
+
+        # Poids en "external data": memory-mappés par ONNX Runtime au chargement
+        try:
+            quantize_dynamic(
+                fp32_path,
+                os.path.join(model_dir, cls.MODEL_FILE),
+                weight_type=QuantType.QInt8,
+                use_external_data_format=True,
+            )
+        finally:
+            shutil.rmtree(export_dir, ignore_errors=True)
+
+        tokenizer.save_pretrained(model_dir)
+        manifest = {
+            "model_name": model_name,
+            "dimension": st_model.get_sentence_embedding_dimension(),
+            "max_seq_length": st_model.max_seq_length,
+            "input_names": input_names,
+            "quantization": "dynamic-int8",
+        }
+        # Manifest écrit en dernier: un export interrompu sera refait
+        manifest_path = os.path.join(model_dir, cls.MANIFEST_FILE)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        print(f"✓ Modèle ONNX int8 exporté dans {model_dir}")
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.manifest["max_seq_length"],
+            return_tensors="np",
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self._input_names if name in encoded}
+        hidden = self.session.run(None, feeds)[0]
+
+        # Mean pooling sur les tokens réels puis normalisation L2
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            batches.append(self._encode_batch(texts[start:start + self.batch_size]))
+            if show_progress_bar:
+                print(f"   Embeddings ONNX: {min(start + self.batch_size, len(texts))}/{len(texts)}")
+        if not batches:
+            return np.zeros((0, self.get_dimension()), dtype=np.float32)
+        embeddings = np.vstack(batches)
+        return embeddings[0] if single else embeddings
+
+    def get_dimension(self) -> int:
+        return int(self.manifest["dimension"])
+
+
+def create_embedding_backend(model_name: str, settings) -> BaseEmbeddingBackend:
+    """Factory function to create the embedding backend based on settings."""
+    backend = settings.embedding_backend.lower()
+
+    if backend == "onnx":
+        try:
+            return OnnxEmbeddingBackend(
+                model_name,
+                cache_dir=settings.embedding_onnx_cache_dir,
+                batch_size=settings.embedding_max_batch_size,
+            )
+        except ImportError as e:
+            print(f"⚠️ Backend ONNX indisponible ({e}) - pip install -r requirements-onnx.txt")
+            print("⚠️ Falling back to torch")
+            return TorchEmbeddingBackend(model_name)
+
+    elif backend == "torch":
+        return TorchEmbeddingBackend(model_name)
+
+    else:
+        raise ValueError(f"Unknown embedding backend: {backend}. Use 'torch' or 'onnx'")
@@ -0,0 +1,224 @@
+"""
+Embedding Batcher - Regroupe les embeddings concurrents en un seul encode().
+
+Sans batching, chaque requête chat lance un forward pass de taille 1 et
+les requêtes concurrentes se disputent le CPU. Ce service:
+1. Collecte les appels embed() concurrents pendant quelques ms (ou jusqu'à N)
+2. Lance UN encode() batché dans un thread worker dédié
+3. Résout la future de chaque appelant avec son vecteur
+"""
+import asyncio
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+# Bornes supérieures des classes de l'histogramme des tailles de batch
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+
+
+class EmbeddingBatcher:
+    """
+    File asyncio d'embeddings avec micro-batching.
+
+    Fonctionnement:
+    1. embed() met (texte, future) en queue et attend la future
+    2. La boucle prend le premier élément puis accumule pendant window_ms
+       (ou jusqu'à max_batch_size éléments)
+    3. encode_func(textes) tourne dans un thread dédié (1 seul worker:
+       un batch à la fois, pas de contention CPU)
+    """
+
+    def __init__(
+        self,
+        encode_func: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        window_ms: float = 5.0,
+        max_batch_size: int = 32,
+    ):
+        self.encode_func = encode_func
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-batch")
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._batch_task: Optional[asyncio.Task] = None
+
+        # Stats
+        self.stats = {
+            "total_requests": 0,
+            "total_batches": 0,
+            "batched_items": 0,
+            "errors": 0,
+        }
+        self._batch_size_histogram: Dict[int, int] = {b: 0 for b in BATCH_SIZE_BUCKETS}
+        self._batch_size_histogram_overflow = 0
+        self._batch_latencies_ms: deque = deque(maxlen=500)
+        self._stats_lock = threading.Lock()
+
+    def _ensure_started(self):
+        """Démarre la boucle de batch sur l'event loop courant si besoin."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._batch_task is not None and not self._batch_task.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._batch_task = loop.create_task(self._batch_loop())
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Calcule l'embedding d'un texte via le prochain batch.
+
+        Args:
+            text: Texte à encoder
+
+        Returns:
+            Vecteur d'embedding
+        """
+        if self.encode_func is None:
+            raise RuntimeError("EmbeddingBatcher: encode_func non configurée")
+        self._ensure_started()
+        future = self._loop.create_future()
+        with self._stats_lock:
+            self.stats["total_requests"] += 1
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        """Attend un premier élément puis accumule pendant la fenêtre."""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.window_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            # Vider d'abord ce qui est déjà en queue (sans attendre)
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_loop(self):
+        """Boucle principale: collecte -> encode batché -> résolution."""
+        while True:
+            try:
+                batch = await self._collect_batch()
+            except asyncio.CancelledError:
+                break
+
+            # Ignorer les appelants qui ont abandonné entre-temps
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            start = time.perf_counter()
+            try:
+                vectors = await self._loop.run_in_executor(self._executor, self.encode_func, texts)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    if not future.done():
+                        future.cancel()
+                break
+            except Exception as e:
+                print(f"❌ Erreur embedding batch ({len(texts)} textes): {e}")
+                with self._stats_lock:
+                    self.stats["errors"] += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._record_batch(len(texts), (time.perf_counter() - start) * 1000)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    def _record_batch(self, size: int, latency_ms: float):
+        with self._stats_lock:
+            self.stats["total_batches"] += 1
+            self.stats["batched_items"] += size
+            self._batch_latencies_ms.append(latency_ms)
+            for bucket in BATCH_SIZE_BUCKETS:
+                if size <= bucket:
+                    self._batch_size_histogram[bucket] += 1
+                    break
+            else:
+                self._batch_size_histogram_overflow += 1
+
+    async def stop(self):
+        """Arrête la boucle de batch."""
+        if self._batch_task:
+            self._batch_task.cancel()
+            try:
+                await self._batch_task
+            except asyncio.CancelledError:
+                pass
+            self._batch_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du batcher d'embeddings."""
+        with self._stats_lock:
+            latencies = sorted(self._batch_latencies_ms)
+            total_batches = self.stats["total_batches"]
+            histogram = {f"<={b}": n for b, n in self._batch_size_histogram.items()}
+            histogram[f">{BATCH_SIZE_BUCKETS[-1]}"] = self._batch_size_histogram_overflow
+
+            def pct(p: float) -> float:
+                if not latencies:
+                    return 0.0
+                return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+            return {
+                **self.stats,
+                "window_ms": self.window_ms,
+                "max_batch_size": self.max_batch_size,
+                "queue_depth": self._queue.qsize() if self._queue else 0,
+                "avg_batch_size": round(self.stats["batched_items"] / total_batches, 2) if total_batches else 0.0,
+                "batch_size_histogram": histogram,
+                "batch_latency_ms": {
+                    "avg": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+                    "p50": pct(0.50),
+                    "p95": pct(0.95),
+                    "max": round(latencies[-1], 2) if latencies else 0.0,
+                },
+            }
+
+
+# Singleton global
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_embedding_batcher(
+    encode_func: Optional[Callable[[List[str]], List[List[float]]]] = None
+) -> EmbeddingBatcher:
+    """Retourne l'instance singleton du batcher d'embeddings."""
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        with _batcher_lock:
+            if _embedding_batcher is None:
+                _embedding_batcher = EmbeddingBatcher(
+                    encode_func=encode_func,
+                    window_ms=settings.embedding_batch_window_ms,
+                    max_batch_size=settings.embedding_max_batch_size,
+                )
+    if encode_func is not None and _embedding_batcher.encode_func is None:
+        _embedding_batcher.encode_func = encode_func
+    return _embedding_batcher
+
+
+async def shutdown_embedding_batcher():
+    """Arrête proprement le batcher d'embeddings."""
+    if _embedding_batcher:
+        await _embedding_batcher.stop()
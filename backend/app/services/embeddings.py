@@ -1,22 +1,35 @@
-"""Embedding service using SentenceTransformers."""
-from sentence_transformers import SentenceTransformer
-from typing import List
+"""Embedding service (SentenceTransformers or ONNX Runtime backend)."""
+from typing import List, Optional
 import numpy as np
 
+from app.core.config import settings
+from app.services.embedding_backends import BaseEmbeddingBackend, create_embedding_backend
+from app.services.embedding_batcher import get_embedding_batcher
+from app.services.executors import run_embedding
+from app.services.query_embedding import QueryEmbeddingContext, get_query_embedding_cache
+
 
 class EmbeddingService:
     """Service for generating text embeddings."""
     
-    def __init__(self, model_name: str = "intfloat/multilingual-e5-large"):
+    def __init__(
+        self,
+        model_name: str = "intfloat/multilingual-e5-large",
+        backend: Optional[BaseEmbeddingBackend] = None
+    ):
         """Initialize embedding service.
         
         Args:
             model_name: Name of the SentenceTransformer model (default: e5-large)
+            backend: Embedding backend (default: built from settings.embedding_backend)
         """
         self.model_name = model_name
-        print(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
-        print(f"✓ Embedding model loaded successfully")
+        print(f"Loading embedding model: {model_name} (backend: {settings.embedding_backend})")
+        self.backend = backend or create_embedding_backend(model_name, settings)
+        print(f"✓ Embedding model loaded successfully ({self.backend.name})")
+        
+        # Micro-batching: les embed async concurrents partagent un seul encode()
+        self._batcher = get_embedding_batcher(self._encode_batch) if settings.enable_embedding_batching else None
     
     def embed_text(self, text: str) -> List[float]:
         """Generate embedding for a single text.
@@ -27,19 +40,74 @@ class EmbeddingService:
         Returns:
             Embedding vector
         """
-        embedding = self.model.encode(text, convert_to_tensor=False)
+        embedding = self.backend.encode(text)
         return embedding.tolist()
     
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        """Encode a micro-batch of texts (runs in the batcher worker thread)."""
+        embeddings = self.backend.encode(texts, show_progress_bar=False)
+        return embeddings.tolist()
+    
+    async def embed_text_async(self, text: str) -> List[float]:
+        """Generate embedding for a single text without blocking the event loop.
+        
+        Concurrent calls are grouped into one batched encode by the
+        embedding batcher.
+        
+        Args:
+            text: Input text
+            
+        Returns:
+            Embedding vector
+        """
+        if self._batcher is None:
+            return await run_embedding(self.embed_text, text)
+        return await self._batcher.embed(text)
+    
+    async def embed_query_async(self, query: str) -> List[float]:
+        """Async version of embed_query (LRU first, then micro-batched encode).
+        
+        Args:
+            query: User question
+            
+        Returns:
+            Embedding vector
+        """
+        return await get_query_embedding_cache().get_or_compute_async(query, self.embed_text_async)
+    
+    def embed_query(self, query: str) -> List[float]:
+        """Generate embedding for a user query, using the recent-queries LRU.
+        
+        Args:
+            query: User question
+            
+        Returns:
+            Embedding vector
+        """
+        return get_query_embedding_cache().get_or_compute(query, self.embed_text)
+    
+    def query_context(self, query: str) -> QueryEmbeddingContext:
+        """Create a request-scoped context that embeds the query at most once.
+        
+        Args:
+            query: User question
+            
+        Returns:
+            QueryEmbeddingContext shared by retrieval and cache lookups
+        """
+        return QueryEmbeddingContext(query, self.embed_query, self.embed_query_async)
+    
+    def embed_texts(self, texts: List[str], show_progress_bar: bool = True) -> List[List[float]]:
         """Generate embeddings for multiple texts.
         
         Args:
             texts: List of input texts
+            show_progress_bar: Per-call progress bar (off for batched indexing)
             
         Returns:
             List of embedding vectors
         """
-        embeddings = self.model.encode(texts, convert_to_tensor=False, show_progress_bar=True)
+        embeddings = self.backend.encode(texts, show_progress_bar=show_progress_bar)
         return embeddings.tolist()
     
     def get_embedding_dimension(self) -> int:
@@ -48,4 +116,4 @@ class EmbeddingService:
         Returns:
             Embedding dimension
         """
-        return self.model.get_sentence_embedding_dimension()
+        return self.backend.get_dimension()
@@ -0,0 +1,192 @@
+"""
+Pools d'exécution bornés - sortent le travail bloquant de l'event loop.
+
+generate_response est async mais appelait directement du code bloquant
+(embedding CPU + requête Chroma, pyodbc, client Ollama synchrone): une
+requête lente gelait toutes les connexions du worker uvicorn.
+
+Pools séparés, dimensionnés indépendamment:
+- embedding: CPU (embeddings hors micro-batching, requêtes Chroma)
+- db: I/O SQL Server (pyodbc)
+- llm: appels HTTP LLM synchrones (client Ollama)
+- probe: sondes de /health (jamais bloquées derrière la file de /chat)
+
+Chaque pool a une file d'attente bornée: au-delà, la soumission est
+refusée (ExecutorSaturatedError) au lieu d'empiler du travail.
+"""
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.core.config import settings
+
+
+class ExecutorSaturatedError(RuntimeError):
+    """Levée quand la file d'un pool est pleine."""
+
+    def __init__(self, pool_name: str, pending: int):
+        super().__init__(f"Pool '{pool_name}' saturé ({pending} tâches en cours/en attente)")
+        self.pool_name = pool_name
+        self.pending = pending
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor avec file bornée et métriques de saturation."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._wait_times_ms: deque = deque(maxlen=500)
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "peak_pending": 0,
+        }
+
+    @property
+    def pending(self) -> int:
+        return self._active + self._queued
+
+    def _run_tracked(self, submitted_at: float, func: Callable, args, kwargs):
+        """Exécuté dans un thread du pool."""
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._wait_times_ms.append((time.perf_counter() - submitted_at) * 1000)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _on_done(self, future):
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Exécute func(*args, **kwargs) dans le pool sans bloquer l'event loop.
+
+        Raises:
+            ExecutorSaturatedError: si la file d'attente du pool est pleine
+        """
+        with self._lock:
+            pending = self._active + self._queued
+            if pending >= self.max_workers + self.max_queue:
+                self.stats["rejected"] += 1
+                raise ExecutorSaturatedError(self.name, pending)
+            self._queued += 1
+            self.stats["submitted"] += 1
+            self.stats["peak_pending"] = max(self.stats["peak_pending"], pending + 1)
+
+        call = functools.partial(self._run_tracked, time.perf_counter(), func, args, kwargs)
+        future = self._executor.submit(call)
+        # Appelant annulé avant le démarrage de la tâche: elle ne passera
+        # jamais par _run_tracked, on la retire de la file ici
+        future.add_done_callback(self._on_done)
+        try:
+            result = await asyncio.wrap_future(future)
+        except Exception:
+            with self._lock:
+                self.stats["failed"] += 1
+            raise
+        with self._lock:
+            self.stats["completed"] += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne l'état de saturation du pool."""
+        with self._lock:
+            waits = sorted(self._wait_times_ms)
+            return {
+                **self.stats,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._queued,
+                "saturation": f"{self._active / self.max_workers:.0%}",
+                "queue_wait_ms": {
+                    "p50": round(waits[len(waits) // 2], 2) if waits else 0.0,
+                    "p99": round(waits[min(len(waits) - 1, int(len(waits) * 0.99))], 2) if waits else 0.0,
+                    "max": round(waits[-1], 2) if waits else 0.0,
+                },
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Singletons globaux (un pool par type de travail)
+_executors: Dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _pool_sizes() -> Dict[str, tuple]:
+    return {
+        "embedding": (settings.embedding_executor_workers, settings.embedding_executor_queue),
+        "db": (settings.db_executor_workers, settings.db_executor_queue),
+        "llm": (settings.llm_executor_workers, settings.llm_executor_queue),
+        "probe": (settings.probe_executor_workers, settings.probe_executor_queue),
+    }
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    """Retourne le pool singleton `name` (embedding | db | llm | probe)."""
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                sizes = _pool_sizes()
+                if name not in sizes:
+                    raise ValueError(f"Unknown executor: {name}. Use 'embedding', 'db', 'llm' or 'probe'")
+                max_workers, max_queue = sizes[name]
+                executor = BoundedExecutor(name, max_workers=max_workers, max_queue=max_queue)
+                _executors[name] = executor
+    return executor
+
+
+async def run_embedding(func: Callable, *args, **kwargs) -> Any:
+    """Exécute un travail CPU d'embedding / recherche vectorielle."""
+    return await get_executor("embedding").run(func, *args, **kwargs)
+
+
+async def run_db(func: Callable, *args, **kwargs) -> Any:
+    """Exécute un accès base de données bloquant."""
+    return await get_executor("db").run(func, *args, **kwargs)
+
+
+async def run_llm(func: Callable, *args, **kwargs) -> Any:
+    """Exécute un appel LLM synchrone."""
+    return await get_executor("llm").run(func, *args, **kwargs)
+
+
+async def run_probe(func: Callable, *args, timeout_s: float = None, **kwargs) -> Any:
+    """Exécute une sonde de santé (pool dédié, délai max health_probe_timeout_s)."""
+    timeout_s = settings.health_probe_timeout_s if timeout_s is None else timeout_s
+    return await asyncio.wait_for(get_executor("probe").run(func, *args, **kwargs), timeout_s)
+
+
+def get_executors_stats() -> Dict[str, Any]:
+    """Stats de saturation de tous les pools."""
+    return {name: get_executor(name).get_stats() for name in _pool_sizes()}
+
+
+def shutdown_executors():
+    """Arrête tous les pools."""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown()
+        _executors.clear()
@@ -0,0 +1,104 @@
+"""
+Cache d'extraction de texte - un PDF inchangé n'est jamais re-parsé.
+
+pdfplumber est lent (plusieurs secondes par gros PDF) alors que docs/ change
+rarement. Le texte brut extrait est gardé sur disque:
+- <hash>-v<version>.txt: texte extrait, adressé par le SHA-256 du fichier
+- index.json: chemin -> (taille, mtime, hash), pour éviter de re-hasher un
+  fichier dont ni la taille ni la date de modification n'ont bougé
+
+Un fichier "touché" (mtime modifié, contenu identique) est re-hashé puis
+retrouvé par son hash. Changer EXTRACTOR_VERSION invalide tout le cache.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+EXTRACTOR_VERSION = 1
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 du contenu d'un fichier (lecture par blocs)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Cache disque du texte extrait, par hash de fichier + mtime."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index: Dict[str, Dict[str, Any]] = self._load_index()
+        self.stats = {"hits": 0, "misses": 0, "rehashed": 0, "writes": 0}
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self) -> None:
+        tmp_path = f"{self._index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _text_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}-v{EXTRACTOR_VERSION}.txt")
+
+    def _fingerprint(self, path: str) -> Tuple[str, int, int]:
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def digest(self, path: str) -> str:
+        """Hash du fichier, sans relecture si taille et mtime n'ont pas changé."""
+        key, size, mtime_ns = self._fingerprint(path)
+        with self._lock:
+            entry = self._index.get(key)
+        if entry is not None and entry["size"] == size and entry["mtime_ns"] == mtime_ns:
+            return entry["sha256"]
+        digest = file_digest(path)
+        with self._lock:
+            if entry is not None:
+                self.stats["rehashed"] += 1
+            self._index[key] = {"size": size, "mtime_ns": mtime_ns, "sha256": digest}
+            self._save_index()
+        return digest
+
+    def get(self, path: str) -> Optional[str]:
+        """Texte extrait en cache, ou None."""
+        text_path = self._text_path(self.digest(path))
+        try:
+            with open(text_path, encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        return text
+
+    def set(self, path: str, text: str) -> None:
+        """Enregistre le texte extrait (écriture atomique)."""
+        text_path = self._text_path(self.digest(path))
+        tmp_path = f"{text_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, text_path)
+        with self._lock:
+            self.stats["writes"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "files": len(self._index), "cache_dir": self.cache_dir}
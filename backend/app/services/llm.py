@@ -3,12 +3,18 @@ import ollama
 import httpx
 from typing import Optional, List, Dict, AsyncGenerator, Callable
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-import threading
 import hashlib
 
 # Import the new provider system
-from app.services.llm_provider import create_llm_provider, BaseLLMProvider, get_optimal_config
+from app.services.llm_provider import (
+    create_llm_provider,
+    BaseLLMProvider,
+    get_optimal_config,
+    stream_ollama_generate,
+    LLM_ERROR_PREFIX,
+)
+from app.services.executors import run_llm
+from app.services.lru_cache import LRUCache
 from app.core.config import settings
 
 
@@ -64,13 +70,8 @@ class OllamaService:
         # Client async pour les requêtes non-bloquantes
         self._async_client: Optional[httpx.AsyncClient] = None
         
-        # 8 workers pour gérer plusieurs utilisateurs simultanés
-        self._executor = ThreadPoolExecutor(max_workers=8)
-        
         # Cache de réponses rapide (pour dedup dans la même seconde)
-        self._quick_cache: Dict[str, tuple] = {}
-        self._quick_cache_ttl = 2.0
-        self._cache_lock = threading.Lock()
+        self._quick_cache = LRUCache("llm_quick", max_size=50, default_ttl_s=2.0)
     
     def _get_async_client(self) -> httpx.AsyncClient:
         """Retourne le client async, le créant si nécessaire."""
@@ -92,32 +93,14 @@ class OllamaService:
     
     def _check_quick_cache(self, prompt: str) -> Optional[str]:
         """Vérifie le cache rapide pour éviter les requêtes dupliquées."""
-        import time
-        key = self._get_cache_key(prompt)
-        with self._cache_lock:
-            if key in self._quick_cache:
-                response, timestamp = self._quick_cache[key]
-                if time.time() - timestamp < self._quick_cache_ttl:
-                    print("⚡ Quick cache HIT (dedup)")
-                    return response
-                else:
-                    del self._quick_cache[key]
-        return None
+        response = self._quick_cache.get(self._get_cache_key(prompt))
+        if response is not None:
+            print("⚡ Quick cache HIT (dedup)")
+        return response
     
     def _add_to_quick_cache(self, prompt: str, response: str):
         """Ajoute une réponse au cache rapide."""
-        import time
-        key = self._get_cache_key(prompt)
-        with self._cache_lock:
-            # Limiter la taille du cache
-            if len(self._quick_cache) > 50:
-                # Supprimer les entrées expirées
-                now = time.time()
-                expired = [k for k, (_, t) in self._quick_cache.items() 
-                          if now - t > self._quick_cache_ttl]
-                for k in expired:
-                    del self._quick_cache[k]
-            self._quick_cache[key] = (response, time.time())
+        self._quick_cache.set(self._get_cache_key(prompt), response)
     
     def is_available(self) -> bool:
         """Check if LLM service is available.
@@ -148,7 +131,8 @@ class OllamaService:
             return await self.provider.generate(prompt, max_tokens)
         
         try:
-            response = self.client.generate(
+            response = await run_llm(
+                self.client.generate,
                 model=self.model,
                 prompt=prompt,
                 options={
@@ -202,83 +186,35 @@ class OllamaService:
                 yield chunk
             return
         
-        # Fallback to Ollama
-        import queue as thread_queue
+        # Fallback to Ollama: stream natif async sur le client httpx poolé
+        history_text = ""
+        if history:
+            history_text = "\n\nHISTORIQUE DE CONVERSATION:\n"
+            for msg in history[-4:]:
+                role = "Client" if msg["role"] == "user" else "Assistant"
+                history_text += f"{role}: {msg['content']}\n"
         
-        cancel_event = threading.Event()
-        chunk_queue = thread_queue.Queue()
-
-        def sync_generate():
-            """Runs in thread pool - generates chunks and puts them in queue."""
-            try:
-                # Build the prompt
-                history_text = ""
-                if history:
-                    history_text = "\n\nHISTORIQUE DE CONVERSATION:\n"
-                    for msg in history[-4:]:
-                        role = "Client" if msg["role"] == "user" else "Assistant"
-                        history_text += f"{role}: {msg['content']}\n"
-                
-                system_prompt = self._get_system_prompt()
-                prompt = self._build_prompt(query, context, history_text)
-                
-                stream = self.client.generate(
-                    model=self.model,
-                    prompt=prompt,
-                    system=system_prompt,
-                    stream=True,
-                    options={
+        try:
+            async for chunk in stream_ollama_generate(
+                self._get_async_client(),
+                {
+                    "model": self.model,
+                    "prompt": self._build_prompt(query, context, history_text),
+                    "system": self._get_system_prompt(),
+                    "options": {
                         "temperature": 0,
                         "top_p": 0.3,
                         "top_k": 30,
                         "num_predict": 900,
                         "repeat_penalty": 1.3,
                     }
-                )
-                
-                for chunk in stream:
-                    if cancel_event.is_set():
-                        break
-                    if 'response' in chunk:
-                        chunk_queue.put(chunk['response'])
-                
-            except Exception as e:
-                if not cancel_event.is_set():
-                    chunk_queue.put(f"__ERROR__:{str(e)}")
-            finally:
-                chunk_queue.put(None)
-        
-        loop = asyncio.get_event_loop()
-        future = loop.run_in_executor(self._executor, sync_generate)
-        
-        try:
-            while True:
-                if is_disconnected and await is_disconnected():
-                    cancel_event.set()
-                    return
-                
-                try:
-                    chunk = chunk_queue.get_nowait()
-                    
-                    if chunk is None:
-                        break
-                    
-                    if isinstance(chunk, str) and chunk.startswith("__ERROR__:"):
-                        yield "Désolé, une erreur s'est produite."
-                        break
-                    
-                    yield chunk
-                    await asyncio.sleep(0.12)
-                    
-                except thread_queue.Empty:
-                    await asyncio.sleep(0.01)
-                    continue
-                    
-        except asyncio.CancelledError:
-            cancel_event.set()
-            raise
-        finally:
-            cancel_event.set()
+                },
+                is_disconnected
+            ):
+                yield chunk
+        except Exception as e:
+            print(f"Error in Ollama streaming: {e}")
+            yield f"{LLM_ERROR_PREFIX}."
     
     def _get_system_prompt(self) -> str:
         """Returns the system prompt."""
@@ -422,7 +358,7 @@ RÉPONSE DU SERVICE CLIENT:"""
             return response['response']
         except Exception as e:
             print(f"Error generating response: {e}")
-            return "Désolé, une erreur s'est produite lors de la génération de la réponse."
+            return f"{LLM_ERROR_PREFIX} lors de la génération de la réponse."
     
     def generate_response_stream(
         self,
@@ -516,4 +452,4 @@ RÉPONSE DU SERVICE CLIENT:"""
             pass
         except Exception as e:
             print(f"Error generating streaming response: {e}")
-            yield "Désolé, une erreur s'est produite lors de la génération de la réponse."
+            yield f"{LLM_ERROR_PREFIX} lors de la génération de la réponse."
@@ -1,11 +1,73 @@
 """Multi-provider LLM service supporting Mistral AI, Groq, and Ollama."""
 import os
+import json
+import time
 import httpx
 import asyncio
-from typing import Optional, List, Dict, AsyncGenerator, Callable
+from typing import Optional, List, Dict, AsyncGenerator, Awaitable, Callable
 from abc import ABC, abstractmethod
-from concurrent.futures import ThreadPoolExecutor
-import threading
+
+from app.services.executors import run_llm
+from app.core.config import settings
+
+
+# Début des messages d'erreur renvoyés à la place d'une réponse (jamais mis en cache)
+LLM_ERROR_PREFIX = "Désolé, une erreur s'est produite"
+
+
+def throttle_disconnect_check(
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+    interval_s: Optional[float] = None
+) -> Optional[Callable[[], Awaitable[bool]]]:
+    """Limite is_disconnected() à un appel réel toutes les interval_s secondes
+    (settings.stream_disconnect_check_s par défaut).
+    
+    Appelé à chaque token, is_disconnected() coûte un aller-retour sur la
+    file ASGI; une déconnexion détectée 250 ms plus tard ne change rien.
+    """
+    if is_disconnected is None:
+        return None
+    if interval_s is None:
+        interval_s = settings.stream_disconnect_check_s
+    last_check = 0.0
+    
+    async def check() -> bool:
+        nonlocal last_check
+        now = time.monotonic()
+        if now - last_check < interval_s:
+            return False
+        last_check = now
+        return await is_disconnected()
+    
+    return check
+
+
+async def stream_ollama_generate(
+    client: httpx.AsyncClient,
+    payload: Dict,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+) -> AsyncGenerator[str, None]:
+    """Stream natif asyncio de /api/generate (NDJSON) via un client httpx poolé.
+    
+    Remplace le pont thread -> queue.Queue interrogée toutes les 10 ms:
+    chaque token est lu directement par l'event loop, sans thread ni polling.
+    Fermer le générateur ferme la réponse HTTP (Ollama arrête la génération).
+    """
+    check_disconnected = throttle_disconnect_check(is_disconnected)
+    async with client.stream("POST", "/api/generate", json={**payload, "stream": True}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            if check_disconnected and await check_disconnected():
+                return
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(chunk["error"])
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done"):
+                return
 
 
 class BaseLLMProvider(ABC):
@@ -95,6 +157,7 @@ class MistralProvider(BaseLLMProvider):
         """Stream response tokens from Mistral API."""
         try:
             full_messages = [{"role": "system", "content": system_prompt}] + messages
+            check_disconnected = throttle_disconnect_check(is_disconnected)
             
             async with self._client.stream(
                 "POST",
@@ -110,7 +173,7 @@ class MistralProvider(BaseLLMProvider):
             ) as response:
                 response.raise_for_status()
                 async for line in response.aiter_lines():
-                    if is_disconnected and await is_disconnected():
+                    if check_disconnected and await check_disconnected():
                         return
                     
                     if line.startswith("data: "):
@@ -118,19 +181,16 @@ class MistralProvider(BaseLLMProvider):
                         if data == "[DONE]":
                             break
                         try:
-                            import json
                             chunk = json.loads(data)
                             if chunk["choices"][0].get("delta", {}).get("content"):
                                 content = chunk["choices"][0]["delta"]["content"]
                                 yield content
-                                # Délai naturel style ChatGPT
-                                await asyncio.sleep(0.12)
                         except (json.JSONDecodeError, KeyError, IndexError):
                             continue
                             
         except Exception as e:
             print(f"Error in Mistral streaming: {e}")
-            yield "Désolé, une erreur s'est produite."
+            yield f"{LLM_ERROR_PREFIX}."
 
 
 class GroqProvider(BaseLLMProvider):
@@ -193,6 +253,7 @@ class GroqProvider(BaseLLMProvider):
         """Stream response tokens from Groq API."""
         try:
             full_messages = [{"role": "system", "content": system_prompt}] + messages
+            check_disconnected = throttle_disconnect_check(is_disconnected)
             
             async with self._client.stream(
                 "POST",
@@ -207,7 +268,7 @@ class GroqProvider(BaseLLMProvider):
             ) as response:
                 response.raise_for_status()
                 async for line in response.aiter_lines():
-                    if is_disconnected and await is_disconnected():
+                    if check_disconnected and await check_disconnected():
                         return
                     
                     if line.startswith("data: "):
@@ -215,19 +276,16 @@ class GroqProvider(BaseLLMProvider):
                         if data == "[DONE]":
                             break
                         try:
-                            import json
                             chunk = json.loads(data)
                             if chunk["choices"][0].get("delta", {}).get("content"):
                                 content = chunk["choices"][0]["delta"]["content"]
                                 yield content
-                                # Délai naturel style ChatGPT
-                                await asyncio.sleep(0.12)
                         except (json.JSONDecodeError, KeyError, IndexError):
                             continue
                             
         except Exception as e:
             print(f"Error in Groq streaming: {e}")
-            yield "Désolé, une erreur s'est produite."
+            yield f"{LLM_ERROR_PREFIX}."
 
 
 class OllamaProvider(BaseLLMProvider):
@@ -238,7 +296,12 @@ class OllamaProvider(BaseLLMProvider):
     def __init__(self, base_url: str = "http://localhost:11434", model: str = "mistral:latest"):
         self.base_url = base_url
         self.model = model
-        self._executor = ThreadPoolExecutor(max_workers=8)
+        # Client async poolé pour le streaming (/api/generate en NDJSON)
+        self._async_client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(300.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+        )
         try:
             import ollama
             self.client = ollama.Client(host=base_url)
@@ -261,7 +324,8 @@ class OllamaProvider(BaseLLMProvider):
     async def generate(self, prompt: str, max_tokens: int = 50) -> str:
         """Simple generation for intent analysis."""
         try:
-            response = self.client.generate(
+            response = await run_llm(
+                self.client.generate,
                 model=self.model,
                 prompt=prompt,
                 options={"temperature": 0, "num_predict": max_tokens}
@@ -277,69 +341,33 @@ class OllamaProvider(BaseLLMProvider):
         system_prompt: str,
         is_disconnected: Callable[[], bool] = None
     ) -> AsyncGenerator[str, None]:
-        """Stream response tokens from Ollama."""
-        import queue as thread_queue
-        
-        cancel_event = threading.Event()
-        chunk_queue = thread_queue.Queue()
-        
+        """Stream response tokens from Ollama (async httpx, no thread)."""
         # Build prompt from messages
         prompt = ""
         for msg in messages:
             role = "Client" if msg["role"] == "user" else "Assistant"
             prompt += f"{role}: {msg['content']}\n"
         
-        def sync_generate():
-            try:
-                stream = self.client.generate(
-                    model=self.model,
-                    prompt=prompt,
-                    system=system_prompt,
-                    stream=True,
-                    options={
+        try:
+            async for chunk in stream_ollama_generate(
+                self._async_client,
+                {
+                    "model": self.model,
+                    "prompt": prompt,
+                    "system": system_prompt,
+                    "options": {
                         "temperature": 0,
                         "top_p": 0.3,
                         "num_predict": 900,
                         "repeat_penalty": 1.3,
                     }
-                )
-                for chunk in stream:
-                    if cancel_event.is_set():
-                        break
-                    if 'response' in chunk:
-                        chunk_queue.put(chunk['response'])
-            except Exception as e:
-                if not cancel_event.is_set():
-                    chunk_queue.put(f"__ERROR__:{str(e)}")
-            finally:
-                chunk_queue.put(None)
-        
-        loop = asyncio.get_event_loop()
-        loop.run_in_executor(self._executor, sync_generate)
-        
-        try:
-            while True:
-                if is_disconnected and await is_disconnected():
-                    cancel_event.set()
-                    return
-                
-                try:
-                    chunk = chunk_queue.get_nowait()
-                    if chunk is None:
-                        break
-                    if isinstance(chunk, str) and chunk.startswith("__ERROR__:"):
-                        yield "Désolé, une erreur s'est produite."
-                        break
-                    yield chunk
-                    await asyncio.sleep(0.12)
-                except thread_queue.Empty:
-                    await asyncio.sleep(0.01)
-                    continue
-        except asyncio.CancelledError:
-            cancel_event.set()
-            raise
-        finally:
-            cancel_event.set()
+                },
+                is_disconnected
+            ):
+                yield chunk
+        except Exception as e:
+            print(f"Error in Ollama streaming: {e}")
+            yield f"{LLM_ERROR_PREFIX}."
 
 
 def create_llm_provider(settings) -> BaseLLMProvider:
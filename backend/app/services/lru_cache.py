@@ -0,0 +1,165 @@
+"""
+Cache LRU + TTL réutilisable - un seul composant pour les caches mémoire.
+
+Remplace les dicts ad hoc (cache d'intentions, cache exact des réponses,
+dedup du batcher, quick cache Ollama) qui évinçaient par ordre d'insertion
+(les entrées chaudes partaient avant les froides), n'expiraient jamais ou
+copiaient tout sous un verrou global.
+
+Caractéristiques:
+1. get / set en O(1) (OrderedDict: move_to_end / popitem)
+2. TTL par entrée (défaut du cache ou valeur passée à set)
+3. Compteurs hits / misses / expirations / évictions
+4. Verrous optionnellement shardés (clé -> shard) pour limiter la contention
+5. Tous les caches nommés sont visibles via get_lru_caches_stats()
+"""
+import math
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class _Shard:
+    """Un OrderedDict protégé par son propre verrou."""
+
+    __slots__ = ("entries", "lock", "stats")
+
+    def __init__(self):
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()  # clé -> (valeur, expire_à | None)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "sets": 0}
+
+
+class LRUCache:
+    """
+    Cache LRU thread-safe avec TTL par entrée.
+
+    Les valeurs sont stockées telles quelles (pas de copie): l'appelant ne
+    doit pas modifier un objet obtenu par get().
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int = 1000,
+        default_ttl_s: Optional[float] = None,
+        shards: int = 1,
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.default_ttl_s = default_ttl_s
+        self._shards: List[_Shard] = [_Shard() for _ in range(max(1, shards))]
+        # Taille max répartie entre shards (l'éviction LRU est locale au shard)
+        self._shard_max_size = max(1, math.ceil(max_size / len(self._shards)))
+        _register(self)
+
+    def _shard(self, key: Hashable) -> _Shard:
+        if len(self._shards) == 1:
+            return self._shards[0]
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retourne la valeur (et la marque comme récente), ou default si absente / expirée."""
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None:
+                shard.stats["misses"] += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del shard.entries[key]
+                shard.stats["expired"] += 1
+                shard.stats["misses"] += 1
+                return default
+            shard.entries.move_to_end(key)
+            shard.stats["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_s: Optional[float] = None) -> None:
+        """Ajoute / remplace une entrée (ttl_s: None = TTL par défaut du cache)."""
+        ttl = self.default_ttl_s if ttl_s is None else ttl_s
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        shard = self._shard(key)
+        with shard.lock:
+            shard.entries[key] = (value, expires_at)
+            shard.entries.move_to_end(key)
+            shard.stats["sets"] += 1
+            while len(shard.entries) > self._shard_max_size:
+                shard.entries.popitem(last=False)
+                shard.stats["evictions"] += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """Retire une entrée, retourne True si elle existait."""
+        shard = self._shard(key)
+        with shard.lock:
+            return shard.entries.pop(key, None) is not None
+
+    def clear(self) -> int:
+        """Vide le cache, retourne le nombre d'entrées retirées."""
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                removed += len(shard.entries)
+                shard.entries.clear()
+        return removed
+
+    def cleanup_expired(self) -> int:
+        """Retire les entrées expirées (sinon retirées paresseusement à la lecture)."""
+        now = time.monotonic()
+        removed = 0
+        for shard in self._shards:
+            with shard.lock:
+                expired = [k for k, (_, exp) in shard.entries.items() if exp is not None and now >= exp]
+                for k in expired:
+                    del shard.entries[k]
+                shard.stats["expired"] += len(expired)
+                removed += len(expired)
+        return removed
+
+    def __contains__(self, key: Hashable) -> bool:
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            return entry is not None and (entry[1] is None or time.monotonic() < entry[1])
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self._shards)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques agrégées de tous les shards."""
+        totals = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "sets": 0}
+        size = 0
+        for shard in self._shards:
+            with shard.lock:
+                for name, value in shard.stats.items():
+                    totals[name] += value
+                size += len(shard.entries)
+        lookups = totals["hits"] + totals["misses"]
+        return {
+            **totals,
+            "hit_rate": f"{totals['hits'] / lookups:.1%}" if lookups else "0.0%",
+            "size": size,
+            "max_size": self.max_size,
+            "default_ttl_s": self.default_ttl_s,
+            "shards": len(self._shards),
+        }
+
+
+# Registre des caches nommés (références faibles: un cache jeté disparaît des stats)
+_caches: "weakref.WeakValueDictionary[str, LRUCache]" = weakref.WeakValueDictionary()
+_caches_lock = threading.Lock()
+
+
+def _register(cache: LRUCache) -> None:
+    with _caches_lock:
+        _caches[cache.name] = cache
+
+
+def get_lru_caches_stats() -> Dict[str, Any]:
+    """Stats de tous les caches LRU vivants, par nom."""
+    with _caches_lock:
+        caches = dict(_caches)
+    return {name: cache.get_stats() for name, cache in sorted(caches.items())}
@@ -1,26 +1,117 @@
 """Service intelligent pour analyser les messages utilisateurs avec LLM-first."""
 import re
 import json
+import time
 import hashlib
 import threading
+import unicodedata
+from collections import deque
 from typing import Optional, Dict, Any
+from app.core.config import settings
 from app.services.llm import OllamaService
+from app.services.lru_cache import LRUCache
 
 
-# Cache global thread-safe pour les intentions (clé = hash du message normalisé)
-_INTENT_CACHE: Dict[str, Dict[str, Any]] = {}
-_CACHE_MAX_SIZE = 500  # Limiter la taille du cache
-_CACHE_LOCK = threading.Lock()  # Verrou pour accès concurrent
+# Cache global thread-safe pour les intentions (clé = hash du message normalisé):
+# LRU (les intentions fréquentes restent), TTL, verrous shardés
+_INTENT_CACHE = LRUCache(
+    "intent",
+    max_size=settings.intent_cache_size,
+    default_ttl_s=settings.intent_cache_ttl_s,
+    shards=4,
+)
+
+
+# ============================================
+# PRÉ-CLASSIFICATION DÉTERMINISTE (avant le LLM)
+# ============================================
+# Textes sans accents et en minuscules (voir _normalize_for_rules)
+
+# Message réduit à un numéro de commande: "13348", "#13348", "n° 13348"
+_BARE_ORDER_NUMBER = re.compile(r'^(?:commande|n°|no|#)?\s*[:#]?\s*(\d{4,6})\s*[.!?]*$')
+
+# Numéro explicitement rattaché à une commande: "commande 13348", "colis n° 13348"
+_EXPLICIT_ORDER_NUMBER = re.compile(r'(?:commande|colis|suivi|numero|n°)\s*(?:n°|numero|no|#)?\s*[:#]?\s*(\d{4,6})\b')
+
+# Demandes de statut sans ambiguïté
+_TRACKING_PHRASES = [
+    "ou en est ma commande", "ou en est la commande", "ou en est mon colis",
+    "suivre ma commande", "suivi de ma commande", "suivi commande",
+    "statut de ma commande", "etat de ma commande", "ou est ma commande", "ou est mon colis",
+]
+
+# Réclamations / questions produit: jamais du suivi de statut (cf. prompt LLM)
+_GENERAL_KEYWORDS = [
+    "annul", "reclamation", "defaut", "floue", "qualite", "probleme", "rembours",
+    "rendu", "3d", "fichier", "pdf", "dpi", "abime", "ecrase", "mouille", "manqu",
+    "decoll", "marge", "reliure", "couverture", "tarif", "prix", "devis", "format",
+]
+
+# Salutations / remerciements seuls
+_GREETING = re.compile(
+    r'^(?:bonjour|bonsoir|salut|hello|coucou|merci(?: beaucoup)?|bonne (?:journee|soiree)|au revoir)'
+    r'(?:\s+(?:a vous|a toi|beaucoup))?[\s!.,]*$'
+)
+
+# Formulations de FAQ (question sur le service, pas sur une commande)
+_FAQ_OPENINGS = (
+    "comment ", "quel ", "quelle ", "quels ", "quelles ", "qu'est-ce", "que ", "pourquoi ",
+    "est-ce que ", "combien ", "existe-t-il", "avez-vous", "acceptez-vous", "pouvez-vous",
+    "proposez-vous", "faites-vous", "puis-je", "dois-je", "je peux ",
+)
+_ORDER_WORDS = ("commande", "colis", "livraison", "expedi", "envoi", "recu", "suivi")
+
+
+def _normalize_for_rules(message: str) -> str:
+    """Minuscule, sans accents, espaces compactés."""
+    text = unicodedata.normalize("NFKD", message.lower().strip())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.replace("\u2019", "'")
+    return re.sub(r'\s+', ' ', text)
+
+
+# Instrumentation par niveau de décision (règles, cache, LLM, fallback)
+_TIER_STATS: Dict[str, Dict[str, Any]] = {
+    tier: {"decisions": 0, "latencies_ms": deque(maxlen=500)}
+    for tier in ("rules", "cache", "llm", "fallback")
+}
+_TIER_STATS_LOCK = threading.Lock()
+
+
+def _record_tier(tier: str, started: float) -> None:
+    with _TIER_STATS_LOCK:
+        _TIER_STATS[tier]["decisions"] += 1
+        _TIER_STATS[tier]["latencies_ms"].append((time.perf_counter() - started) * 1000)
+
+
+def get_intent_stats() -> Dict[str, Any]:
+    """Taux de décision et latence de chaque niveau de l'analyse d'intention."""
+    with _TIER_STATS_LOCK:
+        total = sum(stats["decisions"] for stats in _TIER_STATS.values())
+        result = {"total_messages": total}
+        for tier, stats in _TIER_STATS.items():
+            latencies = sorted(stats["latencies_ms"])
+            result[tier] = {
+                "decisions": stats["decisions"],
+                "decision_rate": f"{stats['decisions'] / total:.1%}" if total else "0.0%",
+                "latency_ms": {
+                    "p50": round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+                    "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3) if latencies else 0.0,
+                },
+            }
+        return result
 
 
 class MessageAnalyzer:
     """
     Analyse les messages avec le LLM comme cerveau principal.
     
-    Flux LLM-First + Cache (Thread-Safe):
-    1. Vérifier si l'intention est en cache (avec verrou)
-    2. Sinon, le LLM analyse le message et détermine l'intention
-    3. Mettre en cache le résultat (avec verrou)
+    Flux Règles + Cache + LLM (Thread-Safe):
+    1. Règles déterministes: numéro seul / "commande N" -> suivi,
+       salutations / FAQ évidentes -> question générale
+    2. Sinon, vérifier si l'intention est en cache (avec verrou)
+    3. Sinon, le LLM analyse le message (cas ambigus uniquement)
+    4. Mettre en cache le résultat (avec verrou)
     
     Optimisé pour plusieurs utilisateurs simultanés.
     """
@@ -42,30 +133,15 @@ class MessageAnalyzer:
         return hashlib.md5(normalized.encode()).hexdigest()
     
     def _check_cache(self, message: str) -> Optional[Dict[str, Any]]:
-        """Vérifie si l'intention est en cache (thread-safe)."""
-        key = self._get_cache_key(message)
-        with _CACHE_LOCK:
-            if key in _INTENT_CACHE:
-                cached = _INTENT_CACHE[key].copy()
-                cached["source"] = "cache"
-                print(f"⚡ Cache HIT: {cached['intent']}")
-                return cached
-        return None
+        """Vérifie si l'intention est en cache (thread-safe, entrée en lecture seule)."""
+        cached = _INTENT_CACHE.get(self._get_cache_key(message))
+        if cached:
+            print(f"⚡ Cache HIT: {cached['intent']}")
+        return cached
     
     def _add_to_cache(self, message: str, analysis: Dict[str, Any]) -> None:
         """Ajoute une analyse au cache (thread-safe)."""
-        global _INTENT_CACHE
-        key = self._get_cache_key(message)
-        
-        with _CACHE_LOCK:
-            # Limiter la taille du cache
-            if len(_INTENT_CACHE) >= _CACHE_MAX_SIZE:
-                # Supprimer les 100 plus anciennes entrées
-                keys_to_remove = list(_INTENT_CACHE.keys())[:100]
-                for k in keys_to_remove:
-                    del _INTENT_CACHE[k]
-            
-            _INTENT_CACHE[key] = analysis.copy()
+        _INTENT_CACHE.set(self._get_cache_key(message), dict(analysis))
     
     async def analyze_with_llm(self, message: str) -> Dict[str, Any]:
         """
@@ -184,7 +260,7 @@ JSON uniquement:
                 intent = "general_question"  # Par défaut
         
         # Essayer d'extraire un numéro de commande avec regex
-        order_number = self._extract_order_number_regex(message)
+        order_number = self.extract_order_number_regex(message)
         
         return {
             "intent": intent,
@@ -193,9 +269,11 @@ JSON uniquement:
             "source": "fallback"
         }
     
-    def _extract_order_number_regex(self, message: str) -> Optional[str]:
+    def extract_order_number_regex(self, message: str) -> Optional[str]:
         """
-        Extraction de numéro de commande par regex (utilisé en fallback uniquement).
+        Extraction de numéro de commande par regex, sans appel LLM.
+        
+        Utilisée en fallback de l'analyse et pour la priorité d'admission de /chat.
         """
         cleaned = message.lower().strip()
         
@@ -211,14 +289,60 @@ JSON uniquement:
         
         return None
     
+    def classify_with_rules(self, message: str) -> Optional[Dict[str, Any]]:
+        """
+        Pré-classification sans LLM des messages non ambigus.
+        
+        Returns:
+            {"intent", "order_number", "reasoning"} ou None si le message
+            est ambigu (à envoyer au LLM)
+        """
+        text = _normalize_for_rules(message)
+        if not text:
+            return None
+        
+        # 1. Numéro de commande seul
+        match = _BARE_ORDER_NUMBER.match(text)
+        if match:
+            return {"intent": "order_tracking", "order_number": match.group(1), "reasoning": "numéro seul"}
+        
+        has_general = any(kw in text for kw in _GENERAL_KEYWORDS)
+        has_tracking = any(phrase in text for phrase in _TRACKING_PHRASES)
+        explicit = _EXPLICIT_ORDER_NUMBER.search(text)
+        
+        # Signaux contradictoires ("annuler ma commande 13348 ? où en est-elle") -> LLM
+        if has_general and (has_tracking or explicit):
+            return None
+        
+        # 2. "commande N" / demande de statut explicite
+        if explicit:
+            return {"intent": "order_tracking", "order_number": explicit.group(1), "reasoning": "commande + numéro"}
+        if has_tracking:
+            return {
+                "intent": "order_tracking",
+                "order_number": self.extract_order_number_regex(message),
+                "reasoning": "demande de suivi",
+            }
+        
+        # 3. Salutations, réclamations / questions produit, FAQ
+        if _GREETING.match(text):
+            return {"intent": "general_question", "order_number": None, "reasoning": "salutation"}
+        if has_general:
+            return {"intent": "general_question", "order_number": None, "reasoning": "mot-clé produit/réclamation"}
+        if text.startswith(_FAQ_OPENINGS) and not any(word in text for word in _ORDER_WORDS):
+            return {"intent": "general_question", "order_number": None, "reasoning": "formulation FAQ"}
+        
+        return None
+    
     async def analyze_message(self, message: str) -> Dict[str, Any]:
         """
         Analyse complète du message utilisateur.
         
         FLUX OPTIMISÉ:
-        1. Vérifier le cache
-        2. Si pas en cache, le LLM analyse
-        3. Mettre en cache le résultat
+        1. Règles déterministes (aucun appel réseau)
+        2. Vérifier le cache
+        3. Si pas en cache, le LLM analyse
+        4. Mettre en cache le résultat
         
         Returns:
             {
@@ -226,18 +350,35 @@ JSON uniquement:
                 "order_number": str | None,
                 "needs_order_input": bool,
                 "confidence": "high" | "medium" | "low",
-                "source": "llm" | "fallback" | "cache"
+                "source": "rules" | "llm" | "fallback" | "cache"
             }
         """
-        # Étape 1: Vérifier le cache (TTFB ~0ms si hit)
+        started = time.perf_counter()
+        
+        # Étape 1: Règles (numéro seul, "commande N", salutations, FAQ évidentes)
+        ruled = self.classify_with_rules(message)
+        if ruled:
+            _record_tier("rules", started)
+            result = {
+                "intent": ruled["intent"],
+                "order_number": ruled["order_number"],
+                "needs_order_input": ruled["intent"] == "order_tracking" and ruled["order_number"] is None,
+                "confidence": "high",
+                "source": "rules"
+            }
+            print(f"⚡ Règles: {result['intent']} ({ruled['reasoning']})")
+            return result
+        
+        # Étape 2: Vérifier le cache (TTFB ~0ms si hit)
         cached = self._check_cache(message)
         if cached:
             intent = cached["intent"]
             order_number = cached.get("order_number")
             # Re-extraire le numéro au cas où le message en contient un nouveau
             if not order_number:
-                order_number = self._extract_order_number_regex(message)
+                order_number = self.extract_order_number_regex(message)
             needs_order_input = (intent == "order_tracking" and order_number is None)
+            _record_tier("cache", started)
             return {
                 "intent": intent,
                 "order_number": order_number,
@@ -246,12 +387,13 @@ JSON uniquement:
                 "source": "cache"
             }
         
-        # Étape 2: Le LLM analyse tout
+        # Étape 3: Le LLM analyse les cas ambigus
         analysis = await self.analyze_with_llm(message)
         
         intent = analysis["intent"]
         order_number = analysis.get("order_number")
         source = analysis.get("source", "llm")
+        _record_tier("llm" if source == "llm" else "fallback", started)
         
         # Mettre en cache (seulement si LLM a répondu)
         if source == "llm":
@@ -0,0 +1,196 @@
+"""
+Cache des snapshots de commande - évite de relancer la jointure 6 tables.
+
+Les clients reposent la même question ("où en est ma commande 13348") et le
+chat, /order/{n}, /order/{n}/tracking et /order/{n}/tracking/stream
+relançaient chacun get_order_tracking_details.
+
+Ce cache:
+1. Garde le snapshot d'une commande avec un TTL dépendant de son statut:
+   court pendant la fabrication, long une fois Livrée (12) / Terminée (16)
+2. Garde aussi les numéros inconnus (cache négatif, TTL court) pour absorber
+   l'énumération de numéros de commande
+3. Peut être invalidé à la main (une commande ou tout le cache)
+4. Mesure le taux de hit et le temps base de données économisé
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+
+# Statuts définitifs: le snapshot ne bouge plus (ou presque)
+FINAL_STATUSES = (12, 16)  # Livrée, Terminée
+
+
+def normalize_order_number(order_number: Any) -> str:
+    return str(order_number).strip().lstrip("#")
+
+
+@dataclass
+class OrderSnapshot:
+    """Entrée du cache: données de commande (None = commande inconnue)."""
+    data: Optional[Dict[str, Any]]
+    expires_at: float
+    fetch_ms: float
+
+
+class OrderSnapshotCache:
+    """LRU thread-safe des snapshots de commande, avec TTL par statut."""
+
+    def __init__(
+        self,
+        default_ttl_s: float = 60.0,
+        status_ttls: Optional[Dict[int, float]] = None,
+        negative_ttl_s: float = 30.0,
+        max_size: int = 1000,
+    ):
+        self.default_ttl_s = default_ttl_s
+        self.status_ttls = status_ttls or {}
+        self.negative_ttl_s = negative_ttl_s
+        self.max_size = max_size
+        self._entries: OrderedDict[str, OrderSnapshot] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "negative_stores": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "db_time_ms": 0.0,
+            "db_time_saved_ms": 0.0,
+        }
+
+    def ttl_for(self, data: Optional[Dict[str, Any]]) -> float:
+        """TTL d'un snapshot selon le statut de la commande."""
+        if data is None:
+            return self.negative_ttl_s
+        return self.status_ttls.get(data.get("status_id"), self.default_ttl_s)
+
+    def get(self, order_number: Any) -> tuple:
+        """
+        Cherche une commande dans le cache.
+
+        Returns:
+            (trouvé, données): trouvé=True avec données=None pour une
+            commande connue comme inexistante (cache négatif)
+        """
+        key = normalize_order_number(order_number)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return False, None
+            if time.monotonic() >= entry.expires_at:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.stats["negative_hits" if entry.data is None else "hits"] += 1
+            self.stats["db_time_saved_ms"] += entry.fetch_ms
+        # Copie: les appelants ne doivent pas modifier le snapshot partagé
+        return True, copy.deepcopy(entry.data)
+
+    def set(self, order_number: Any, data: Optional[Dict[str, Any]], fetch_ms: float = 0.0) -> None:
+        """Stocke un snapshot (data=None: commande inexistante)."""
+        key = normalize_order_number(order_number)
+        ttl = self.ttl_for(data)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = OrderSnapshot(
+                data=copy.deepcopy(data),
+                expires_at=time.monotonic() + ttl,
+                fetch_ms=fetch_ms,
+            )
+            self._entries.move_to_end(key)
+            self.stats["negative_stores" if data is None else "stores"] += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get_or_fetch(
+        self,
+        order_number: Any,
+        fetch: Callable[[str], Optional[Dict[str, Any]]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Retourne le snapshot caché ou appelle fetch(order_number).
+
+        fetch doit lever une exception en cas d'erreur base de données:
+        seul un None "commande introuvable" est mis en cache négatif.
+        """
+        found, data = self.get(order_number)
+        if found:
+            return data
+
+        started = time.perf_counter()
+        data = fetch(normalize_order_number(order_number))
+        fetch_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.stats["db_time_ms"] += fetch_ms
+        self.set(order_number, data, fetch_ms)
+        return data
+
+    def invalidate(self, order_number: Any) -> bool:
+        """Retire une commande du cache (ex: changement de statut connu)."""
+        with self._lock:
+            removed = self._entries.pop(normalize_order_number(order_number), None) is not None
+            if removed:
+                self.stats["invalidations"] += 1
+            return removed
+
+    def clear(self) -> int:
+        """Vide le cache, retourne le nombre d'entrées retirées."""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self.stats["invalidations"] += removed
+            return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du cache."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["negative_hits"] + self.stats["misses"]
+            hits = self.stats["hits"] + self.stats["negative_hits"]
+            negative_entries = sum(1 for entry in self._entries.values() if entry.data is None)
+            return {
+                **self.stats,
+                "db_time_ms": round(self.stats["db_time_ms"], 2),
+                "db_time_saved_ms": round(self.stats["db_time_saved_ms"], 2),
+                "hit_rate": f"{hits / lookups:.1%}" if lookups else "0.0%",
+                "size": len(self._entries),
+                "negative_entries": negative_entries,
+                "max_size": self.max_size,
+                "default_ttl_s": self.default_ttl_s,
+                "status_ttls": self.status_ttls,
+                "negative_ttl_s": self.negative_ttl_s,
+            }
+
+
+# Singleton global
+_order_cache: Optional[OrderSnapshotCache] = None
+_order_cache_lock = threading.Lock()
+
+
+def get_order_cache() -> OrderSnapshotCache:
+    """Retourne l'instance singleton du cache de commandes."""
+    global _order_cache
+    if _order_cache is None:
+        with _order_cache_lock:
+            if _order_cache is None:
+                _order_cache = OrderSnapshotCache(
+                    default_ttl_s=settings.order_cache_ttl_s,
+                    status_ttls={status: settings.order_cache_final_ttl_s for status in FINAL_STATUSES},
+                    negative_ttl_s=settings.order_cache_negative_ttl_s,
+                    max_size=settings.order_cache_max_size,
+                )
+    return _order_cache
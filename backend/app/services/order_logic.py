@@ -7,6 +7,12 @@ from datetime import datetime, timedelta
 import re
 from app.services.smart_date_handler import SmartDateHandler
 
+# Pool de connexions saturé (PoolTimeoutError): la commande existe peut-être, on invite à réessayer
+ORDER_LOOKUP_BUSY_MESSAGE = (
+    "Notre service de suivi est très sollicité en ce moment. "
+    "Pouvez-vous réessayer dans quelques secondes ?"
+)
+
 # Correspondance des statuts avec des messages clients
 STATUS_MESSAGES = {
     1: {
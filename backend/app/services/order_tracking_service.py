@@ -1,7 +1,7 @@
 """Service pour le tracking intelligent des commandes avec calcul de dates."""
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
-from app.services.database import DatabaseService
+from app.services.database import db_service
 
 
 class OrderTrackingService:
@@ -39,7 +39,8 @@ class OrderTrackingService:
     }
     
     def __init__(self):
-        self.db = DatabaseService()
+        # Singleton: les connexions viennent du pool partagé, pas d'une connexion par instance
+        self.db = db_service
     
     def get_order_tracking_info(self, order_number: str) -> Optional[Dict[str, Any]]:
         """Récupère les infos complètes de tracking."""
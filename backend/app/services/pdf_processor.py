@@ -1,7 +1,17 @@
-"""PDF processing service for document extraction."""
+"""PDF processing service for document extraction.
+
+Extraction is the slow part of indexing (pdfplumber), so:
+- PDFs are extracted in a process pool, large PDFs split into page ranges
+- each file has a timeout (a stuck PDF does not block the whole run)
+- extracted text is cached on disk by file hash + mtime (extraction_cache)
+"""
+import multiprocessing
 import os
 import re
-from typing import List, Dict, Optional
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from pathlib import Path
 import PyPDF2
 import pdfplumber
@@ -9,17 +19,85 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
 from app.core.config import settings
+from app.services.extraction_cache import ExtractionCache
+
+
+# pdfplumber output shorter than this: fall back to PyPDF2
+MIN_PDFPLUMBER_CHARS = 100
+
+
+# ============================================================================
+# Extraction workers (module level: picklable for the process pool)
+# ============================================================================
+
+def extract_pages_pdfplumber(pdf_path: str, start: int = 0, end: Optional[int] = None) -> str:
+    """Extract the text of pages [start, end) with pdfplumber."""
+    parts = []
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages[start:end]:
+                page_text = page.extract_text()
+                if page_text:
+                    parts.append(page_text + "\n")
+    except Exception as e:
+        print(f"Error extracting text with pdfplumber from {pdf_path}: {e}")
+    return "".join(parts)
+
+
+def extract_pypdf2(pdf_path: str) -> str:
+    """Extract the text of the whole file with PyPDF2."""
+    parts = []
+    try:
+        with open(pdf_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            for page in pdf_reader.pages:
+                parts.append((page.extract_text() or "") + "\n")
+    except Exception as e:
+        print(f"Error extracting text with PyPDF2 from {pdf_path}: {e}")
+    return "".join(parts)
+
+
+def count_pages(pdf_path: str) -> int:
+    """Number of pages (0 if the file cannot be read)."""
+    try:
+        with open(pdf_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+    except Exception:
+        return 0
+
+
+def _report_pid(pid_queue) -> None:
+    """Pool initializer: tell the parent which worker PIDs to kill on timeout."""
+    pid_queue.put(os.getpid())
+
+
+def _terminate_pool(executor: ProcessPoolExecutor, pid_queue) -> None:
+    """Kill the workers (a timed-out extraction cannot be cancelled otherwise)."""
+    executor.shutdown(wait=False, cancel_futures=True)
+    while not pid_queue.empty():
+        try:
+            os.kill(pid_queue.get(), signal.SIGTERM)
+        except OSError:
+            pass  # worker already exited
 
 
 class PDFProcessor:
     """Service to process PDF files and extract text."""
     
-    def __init__(self, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        workers: Optional[int] = None,
+        cache_dir: Optional[str] = None
+    ):
         """Initialize PDF processor.
         
         Args:
             chunk_size: Size of text chunks (default: from config, optimized for Mistral)
             chunk_overlap: Overlap between chunks (default: from config)
+            workers: Extraction processes (default: config, 0 = one per CPU, 1 = no pool)
+            cache_dir: Extraction cache directory (default: config, "" = no cache)
         """
         # Utiliser la config centralisée par défaut
         chunk_size = chunk_size or settings.chunk_size
@@ -32,6 +110,14 @@ class PDFProcessor:
             length_function=len,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
+        
+        workers = settings.pdf_extraction_workers if workers is None else workers
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout_s = settings.pdf_extraction_timeout_s
+        self.pages_per_task = settings.pdf_pages_per_task
+        cache_dir = settings.extraction_cache_dir if cache_dir is None else cache_dir
+        self.extraction_cache = ExtractionCache(cache_dir) if cache_dir else None
+        self.stats = {"files": 0, "cache_hits": 0, "extracted": 0, "pypdf2_fallbacks": 0, "timeouts": 0, "failures": 0}
     
     def extract_text_pypdf2(self, pdf_path: str) -> str:
         """Extract text using PyPDF2.
@@ -42,15 +128,7 @@ class PDFProcessor:
         Returns:
             Extracted text
         """
-        text = ""
-        try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-        except Exception as e:
-            print(f"Error extracting text with PyPDF2 from {pdf_path}: {e}")
-        return text
+        return extract_pypdf2(pdf_path)
     
     def extract_text_pdfplumber(self, pdf_path: str) -> str:
         """Extract text using pdfplumber (more accurate).
@@ -61,16 +139,7 @@ class PDFProcessor:
         Returns:
             Extracted text
         """
-        text = ""
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-        except Exception as e:
-            print(f"Error extracting text with pdfplumber from {pdf_path}: {e}")
-        return text
+        return extract_pages_pdfplumber(pdf_path)
     
     def clean_text(self, text: str) -> str:
         """Clean extracted text.
@@ -89,35 +158,21 @@ class PDFProcessor:
         text = re.sub(r'\n\d+\n', '\n', text)
         return text.strip()
     
-    def process_pdf(self, pdf_path: str) -> List[Document]:
-        """Process a PDF file and create chunks.
-        
-        Args:
-            pdf_path: Path to PDF file
-            
-        Returns:
-            List of Document objects
-        """
-        # Extract text (try pdfplumber first, fallback to PyPDF2)
-        text = self.extract_text_pdfplumber(pdf_path)
-        if not text or len(text) < 100:
-            text = self.extract_text_pypdf2(pdf_path)
-        
-        # Clean text
+    def _to_documents(self, text: str, file_path: str) -> List[Document]:
+        """Clean, chunk and wrap a file's text into Documents."""
         text = self.clean_text(text)
         
         if not text:
-            print(f"Warning: No text extracted from {pdf_path}")
+            print(f"Warning: No text extracted from {file_path}")
             return []
         
         # Create chunks
         chunks = self.text_splitter.split_text(text)
         
         # Create Document objects with metadata
-        documents = []
-        filename = Path(pdf_path).name
-        for i, chunk in enumerate(chunks):
-            doc = Document(
+        filename = Path(file_path).name
+        return [
+            Document(
                 page_content=chunk,
                 metadata={
                     "source": filename,
@@ -125,9 +180,28 @@ class PDFProcessor:
                     "total_chunks": len(chunks)
                 }
             )
-            documents.append(doc)
+            for i, chunk in enumerate(chunks)
+        ]
+    
+    def process_pdf(self, pdf_path: str) -> List[Document]:
+        """Process a PDF file and create chunks.
+        
+        Args:
+            pdf_path: Path to PDF file
+            
+        Returns:
+            List of Document objects
+        """
+        text = self.extraction_cache.get(pdf_path) if self.extraction_cache else None
+        if text is None:
+            # Extract text (try pdfplumber first, fallback to PyPDF2)
+            text = self.extract_text_pdfplumber(pdf_path)
+            if not text or len(text) < MIN_PDFPLUMBER_CHARS:
+                text = self.extract_text_pypdf2(pdf_path)
+            if self.extraction_cache:
+                self.extraction_cache.set(pdf_path, text)
         
-        return documents
+        return self._to_documents(text, pdf_path)
     
     def process_txt(self, txt_path: str) -> List[Document]:
         """Process a TXT file and create chunks.
@@ -143,34 +217,172 @@ class PDFProcessor:
             with open(txt_path, 'r', encoding='utf-8') as f:
                 text = f.read()
             
-            # Clean text
-            text = self.clean_text(text)
+            return self._to_documents(text, txt_path)
+        except Exception as e:
+            print(f"Error processing TXT file {txt_path}: {e}")
+            return []
+    
+    def _collect(self, futures: Dict[Future, Any]) -> Tuple[Dict[Any, Any], set, bool]:
+        """Wait for pool futures with a per-task timeout (counted once it runs).
+        
+        Returns:
+            (key -> result, keys that failed or timed out, whether any timed out)
+        """
+        results: Dict[Any, Any] = {}
+        failed = set()
+        started: Dict[Future, float] = {}
+        pending = set(futures)
+        timed_out = False
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    print(f"Error extracting {futures[future]}: {e}")
+                    failed.add(futures[future])
+            now = time.monotonic()
+            for future in list(pending):
+                if future.running():
+                    started.setdefault(future, now)
+                if future in started and now - started[future] > self.timeout_s:
+                    print(f"⏱️ Extraction timeout ({self.timeout_s:.0f}s): {futures[future]}")
+                    self.stats["timeouts"] += 1
+                    failed.add(futures[future])
+                    pending.discard(future)
+                    timed_out = True
+        return results, failed, timed_out
+    
+    def _extract_pdfs(self, pdf_paths: Sequence[str]) -> Dict[str, Optional[str]]:
+        """Extract several PDFs in parallel (None = failed / timed out)."""
+        if not pdf_paths:
+            return {}
+        
+        if self.workers <= 1:
+            # Sequential (workers=1): no pool, no page split, no per-file timeout
+            texts = {path: self.extract_text_pdfplumber(path) for path in pdf_paths}
+            for path, text in texts.items():
+                if not text or len(text) < MIN_PDFPLUMBER_CHARS:
+                    self.stats["pypdf2_fallbacks"] += 1
+                    texts[path] = self.extract_text_pypdf2(path)
+            return texts
+        
+        # Tasks: whole file, or page ranges for large PDFs
+        tasks: List[Tuple[str, int, Optional[int]]] = []
+        for path in pdf_paths:
+            pages = count_pages(path)
+            if pages > self.pages_per_task:
+                tasks.extend((path, start, start + self.pages_per_task) for start in range(0, pages, self.pages_per_task))
+            else:
+                tasks.append((path, 0, None))
+        
+        pid_queue = multiprocessing.SimpleQueue()
+        executor = ProcessPoolExecutor(
+            max_workers=min(self.workers, len(tasks)),
+            initializer=_report_pid,
+            initargs=(pid_queue,),
+        )
+        timed_out = False
+        try:
+            futures = {executor.submit(extract_pages_pdfplumber, *task): task for task in tasks}
+            results, failed, timed_out = self._collect(futures)
+            failed_paths = {task[0] for task in failed}
             
-            if not text:
-                print(f"Warning: No text extracted from {txt_path}")
-                return []
+            # Reassemble page ranges in order (list join, no quadratic +=)
+            texts: Dict[str, Optional[str]] = {}
+            for path in pdf_paths:
+                if path in failed_paths:
+                    texts[path] = None
+                    continue
+                texts[path] = "".join(results[task] for task in tasks if task[0] == path)
             
-            # Create chunks
-            chunks = self.text_splitter.split_text(text)
+            # PyPDF2 fallback on whole files whose pdfplumber output is too short
+            short = [p for p, t in texts.items() if t is not None and len(t) < MIN_PDFPLUMBER_CHARS]
+            if short and not timed_out:
+                self.stats["pypdf2_fallbacks"] += len(short)
+                fallback, fallback_failed, timed_out = self._collect({executor.submit(extract_pypdf2, p): p for p in short})
+                for path in short:
+                    texts[path] = fallback.get(path) if path not in fallback_failed else None
+            elif short:
+                # Pool being torn down: fall back in-process
+                for path in short:
+                    texts[path] = extract_pypdf2(path)
+            return texts
+        finally:
+            if timed_out:
+                _terminate_pool(executor, pid_queue)
+            else:
+                executor.shutdown(wait=True)
+    
+    def process_files(self, file_paths: Sequence[str]) -> Dict[str, Optional[List[Document]]]:
+        """Process several PDF/TXT files: cached or parallel extraction, then chunking.
+        
+        Args:
+            file_paths: Paths of the files
             
-            # Create Document objects with metadata
-            documents = []
-            filename = Path(txt_path).name
-            for i, chunk in enumerate(chunks):
-                doc = Document(
-                    page_content=chunk,
-                    metadata={
-                        "source": filename,
-                        "chunk_id": i,
-                        "total_chunks": len(chunks)
-                    }
-                )
-                documents.append(doc)
+        Returns:
+            Path -> Documents (None if extraction failed or timed out), in input order
+        """
+        file_paths = [str(path) for path in file_paths]
+        pdf_texts: Dict[str, str] = {}
+        to_extract: List[str] = []
+        
+        for path in file_paths:
+            if not path.lower().endswith(".pdf"):
+                continue
+            cached = self.extraction_cache.get(path) if self.extraction_cache else None
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                pdf_texts[path] = cached
+            else:
+                to_extract.append(path)
+        
+        failed = set()
+        for path, text in self._extract_pdfs(to_extract).items():
+            if text is None:
+                self.stats["failures"] += 1
+                failed.add(path)
+                continue
+            self.stats["extracted"] += 1
+            pdf_texts[path] = text
+            if self.extraction_cache:
+                self.extraction_cache.set(path, text)
+        
+        results: Dict[str, Optional[List[Document]]] = {}
+        for path in file_paths:
+            self.stats["files"] += 1
+            if path in failed:
+                results[path] = None
+            elif path in pdf_texts:
+                results[path] = self._to_documents(pdf_texts[path], path)
+            else:
+                results[path] = self.process_txt(path)
+        return results
+    
+    def list_documents(self, directory_path: str) -> List[Path]:
+        """List the PDF and TXT files of a directory (not recursive).
+        
+        Args:
+            directory_path: Path to directory containing PDFs and TXT files
             
-            return documents
-        except Exception as e:
-            print(f"Error processing TXT file {txt_path}: {e}")
-            return []
+        Returns:
+            Sorted file paths, PDFs first
+        """
+        directory = Path(directory_path)
+        return sorted(directory.glob("*.pdf")) + sorted(directory.glob("*.txt"))
+    
+    def process_file(self, file_path: str) -> List[Document]:
+        """Process one PDF or TXT file and create chunks.
+        
+        Args:
+            file_path: Path to the file
+            
+        Returns:
+            List of Document objects
+        """
+        if str(file_path).lower().endswith(".pdf"):
+            return self.process_pdf(str(file_path))
+        return self.process_txt(str(file_path))
     
     def process_directory(self, directory_path: str) -> List[Document]:
         """Process all PDF and TXT files in a directory.
@@ -181,33 +393,23 @@ class PDFProcessor:
         Returns:
             List of all Document objects
         """
-        all_documents = []
+        files = self.list_documents(directory_path)
+        pdf_count = sum(1 for f in files if f.suffix == ".pdf")
         
-        # Process PDF files
-        pdf_files = list(Path(directory_path).glob("*.pdf"))
-        txt_files = list(Path(directory_path).glob("*.txt"))
-        
-        total_files = len(pdf_files) + len(txt_files)
-        
-        if total_files == 0:
+        if not files:
             print(f"Warning: No PDF or TXT files found in {directory_path}")
             return []
         
-        print(f"Processing {len(pdf_files)} PDF files and {len(txt_files)} TXT files...")
+        print(f"Processing {pdf_count} PDF files and {len(files) - pdf_count} TXT files "
+              f"({self.workers} extraction workers)...")
         
-        # Process PDFs
-        for pdf_file in pdf_files:
-            print(f"Processing PDF: {pdf_file.name}")
-            documents = self.process_pdf(str(pdf_file))
-            all_documents.extend(documents)
-            print(f"  → Created {len(documents)} chunks")
-        
-        # Process TXTs
-        for txt_file in txt_files:
-            print(f"Processing TXT: {txt_file.name}")
-            documents = self.process_txt(str(txt_file))
+        all_documents = []
+        for path, documents in self.process_files(files).items():
+            if documents is None:
+                print(f"  ✗ {Path(path).name}: extraction failed")
+                continue
             all_documents.extend(documents)
-            print(f"  → Created {len(documents)} chunks")
+            print(f"  → {Path(path).name}: {len(documents)} chunks")
         
-        print(f"\nTotal: {len(all_documents)} chunks from {total_files} documents")
+        print(f"\nTotal: {len(all_documents)} chunks from {len(files)} documents")
         return all_documents
@@ -0,0 +1,151 @@
+"""
+Embeddings de requêtes - calculés une seule fois par requête RAG.
+
+Une même question était embeddée jusqu'à 3 fois par requête (recherche
+vectorielle, lecture du cache sémantique, écriture du cache sémantique).
+Ce module fournit:
+1. QueryEmbeddingCache: LRU borné des embeddings récents (clé = texte normalisé)
+2. QueryEmbeddingContext: embedding calculé paresseusement, une seule fois,
+   et partagé par toutes les étapes d'une requête
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+
+def normalize_query_text(text: str) -> str:
+    """Normalise une requête (minuscule, espaces compactés) pour servir de clé."""
+    return re.sub(r'\s+', ' ', text.lower().strip())
+
+
+class QueryEmbeddingCache:
+    """LRU thread-safe des embeddings de requêtes récentes."""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    def get(self, text: str) -> Optional[List[float]]:
+        """Retourne l'embedding caché pour ce texte, ou None."""
+        key = normalize_query_text(text)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return embedding
+
+    def set(self, text: str, embedding: List[float]) -> None:
+        """Ajoute un embedding (éviction du moins récemment utilisé)."""
+        key = normalize_query_text(text)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def get_or_compute(self, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+        """Retourne l'embedding caché ou le calcule (hors verrou) et le cache."""
+        embedding = self.get(text)
+        if embedding is None:
+            embedding = compute(text)
+            self.set(text, embedding)
+        return embedding
+
+    async def get_or_compute_async(
+        self,
+        text: str,
+        compute: Callable[[str], Awaitable[List[float]]]
+    ) -> List[float]:
+        """Version async de get_or_compute (compute est une coroutine)."""
+        embedding = self.get(text)
+        if embedding is None:
+            embedding = await compute(text)
+            self.set(text, embedding)
+        return embedding
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retourne les statistiques du cache d'embeddings."""
+        with self._lock:
+            total = self.stats["hits"] + self.stats["misses"]
+            hit_rate = self.stats["hits"] / total if total > 0 else 0
+            return {
+                **self.stats,
+                "total_requests": total,
+                "hit_rate": f"{hit_rate:.2%}",
+                "size": len(self._entries),
+                "max_size": self.max_size,
+            }
+
+
+class QueryEmbeddingContext:
+    """
+    Embedding de la question d'une requête, calculé au plus une fois.
+
+    Créé au début d'une requête puis passé à la recherche vectorielle,
+    à la lecture et à l'écriture du cache sémantique.
+    """
+
+    def __init__(
+        self,
+        query: str,
+        embed_func: Callable[[str], List[float]],
+        async_embed_func: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+    ):
+        self.query = query
+        self._embed_func = embed_func
+        self._async_embed_func = async_embed_func
+        self._vector: Optional[List[float]] = None
+
+    @property
+    def vector(self) -> List[float]:
+        """Embedding de la requête (calculé au premier accès)."""
+        if self._vector is None:
+            self._vector = self._embed_func(self.query)
+        return self._vector
+
+    async def get_vector(self) -> List[float]:
+        """Embedding de la requête, calculé sans bloquer l'event loop si possible."""
+        if self._vector is None:
+            if self._async_embed_func is not None:
+                self._vector = await self._async_embed_func(self.query)
+            else:
+                self._vector = self._embed_func(self.query)
+        return self._vector
+
+    @property
+    def is_computed(self) -> bool:
+        return self._vector is not None
+
+
+# Singleton global
+_query_embedding_cache: Optional[QueryEmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Retourne l'instance singleton du cache d'embeddings de requêtes."""
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        with _cache_lock:
+            if _query_embedding_cache is None:
+                _query_embedding_cache = QueryEmbeddingCache(
+                    max_size=settings.query_embedding_cache_size,
+                )
+    return _query_embedding_cache
@@ -1,8 +1,13 @@
 """RAG pipeline service orchestrating all components."""
+import asyncio
+import random
+import threading
 import time
 import re
 import hashlib
-from typing import List, Tuple, Optional
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple, Optional, AsyncGenerator, Awaitable, Callable
 from datetime import datetime
 import uuid
 from langchain.schema import Document
@@ -10,15 +15,100 @@ from langchain.schema import Document
 from app.services.embeddings import EmbeddingService
 from app.services.vectorstore import VectorStoreService
 from app.services.llm import OllamaService
+from app.services.llm_provider import LLM_ERROR_PREFIX
 from app.services.message_analyzer import MessageAnalyzer
-from app.services.order_logic import generate_order_status_response
+from app.services.order_logic import generate_order_status_response, ORDER_LOOKUP_BUSY_MESSAGE
 from app.services.database import db_service
+from app.services.db_pool import PoolTimeoutError
 from app.services.semantic_cache import get_response_cache, SemanticCache
 from app.services.request_batcher import get_batcher, RequestPriority
+from app.services.admission import Deadline
+from app.services.executors import run_db, run_embedding, run_llm
+from app.services.lru_cache import LRUCache
 from app.models.schemas import ChatResponse, SourceDocument
 from app.core.config import settings
 
 
+NO_DOCUMENTS_ANSWER = "Je n'ai pas trouvé d'information pertinente pour répondre à votre question."
+
+
+@dataclass
+class PreparedContext:
+    """Résultat des étapes retrieval + rerank + contexte d'une requête."""
+    query_embedding: List[float]
+    documents: List[Tuple[Document, float]]
+    context: str
+    context_hash: str
+
+
+@dataclass
+class AnalyzedQuery:
+    """Intention d'une requête + retrieval lancé en parallèle (spéculatif)."""
+    analysis: Dict[str, Any]
+    prefetch: Optional["asyncio.Task"] = None  # Task -> Optional[PreparedContext]
+    arm: Optional[str] = None  # "speculative" | "sequential" (A/B), None si non éligible
+    started_at: float = field(default_factory=time.perf_counter)
+    ttft_recorded: bool = False
+
+
+# A/B du retrieval spéculatif: mesures par bras (requêtes éligibles uniquement)
+_SPECULATION_STATS: Dict[str, Any] = {
+    "started": 0,
+    "used": 0,
+    "cancelled": 0,
+    "arms": {
+        arm: {"ttft_ms": deque(maxlen=500), "response_ms": deque(maxlen=500)}
+        for arm in ("speculative", "sequential")
+    },
+}
+_SPECULATION_LOCK = threading.Lock()
+
+
+def get_speculation_stats() -> Dict[str, Any]:
+    """Compteurs du retrieval spéculatif et temps (TTFT, réponse) par bras A/B."""
+
+    def summary(values) -> Dict[str, Any]:
+        values = sorted(values)
+        if not values:
+            return {"count": 0, "p50": 0.0, "p95": 0.0}
+        return {
+            "count": len(values),
+            "p50": round(values[len(values) // 2], 1),
+            "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+        }
+
+    with _SPECULATION_LOCK:
+        return {
+            "started": _SPECULATION_STATS["started"],
+            "used": _SPECULATION_STATS["used"],
+            "cancelled": _SPECULATION_STATS["cancelled"],
+            "ratio": settings.speculative_retrieval_ratio,
+            "arms": {
+                arm: {name: summary(values) for name, values in timings.items()}
+                for arm, timings in _SPECULATION_STATS["arms"].items()
+            },
+        }
+
+
+def _record_arm_timing(analyzed: AnalyzedQuery, metric: str) -> None:
+    if analyzed.arm is None:
+        return
+    with _SPECULATION_LOCK:
+        _SPECULATION_STATS["arms"][analyzed.arm][metric].append(
+            (time.perf_counter() - analyzed.started_at) * 1000
+        )
+
+
+def replay_segments(text: str, words_per_segment: int = 4) -> List[str]:
+    """Découpe une réponse en cache en segments de quelques mots pour la rejouer en SSE."""
+    words = re.findall(r'\S+\s*', text)
+    leading = text[:len(text) - len(text.lstrip())]
+    segments = ["".join(words[i:i + words_per_segment]) for i in range(0, len(words), words_per_segment)]
+    if segments and leading:
+        segments[0] = leading + segments[0]
+    return segments
+
+
 def fix_email_format(text: str) -> str:
     """Corrige les emails CoolLibri malformés dans le texte.
     
@@ -63,7 +153,8 @@ class RAGPipeline:
         self.llm_service = llm_service
         self.top_k = top_k
         self.rerank_top_n = rerank_top_n
-        self.cache = {}  # Simple in-memory cache
+        # Cache exact des réponses (question normalisée, sans historique)
+        self.cache = LRUCache("rag_exact", max_size=settings.cache_max_size, default_ttl_s=settings.cache_ttl_s)
         self.message_analyzer = MessageAnalyzer(llm_service)
         
         # Cache sémantique pour les réponses
@@ -77,7 +168,7 @@ class RAGPipeline:
     def _init_semantic_cache(self):
         """Initialise le cache sémantique avec la fonction d'embedding."""
         try:
-            # Utiliser le vectorstore pour les embeddings
+            # Fallback si l'appelant ne fournit pas l'embedding déjà calculé
             def embed_query(query: str):
                 return self.vectorstore.embedding_service.embed_query(query)
             
@@ -94,16 +185,23 @@ class RAGPipeline:
         content = "".join([doc.page_content[:100] for doc, _ in documents[:3]])
         return hashlib.md5(content.encode()).hexdigest()[:12]
     
-    def retrieve_documents(self, query: str) -> List[Tuple[Document, float]]:
+    def retrieve_documents(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
         """Retrieve relevant documents for a query.
         
         Args:
             query: User query
+            query_embedding: Precomputed query embedding
             
         Returns:
             List of (Document, score) tuples
         """
-        return self.vectorstore.similarity_search(query, k=self.top_k)
+        return self.vectorstore.similarity_search(
+            query, k=self.top_k, query_embedding=query_embedding
+        )
     
     def rerank_documents(
         self,
@@ -139,12 +237,96 @@ class RAGPipeline:
                 f"[Document {i} - Source: {source}]\n{doc.page_content}\n"
             )
         return "\n".join(context_parts)
+
+    async def _call_llm(self, query: str, context: str, history: Optional[List[dict]] = None) -> str:
+        """Appel LLM exécuté par le batcher (hors event loop)."""
+        return await run_llm(
+            self.llm_service.generate_response,
+            query=query,
+            context=context,
+            history=history
+        )
+
+    async def analyze_and_prefetch(
+        self,
+        query: str,
+        history: Optional[List[dict]] = None
+    ) -> AnalyzedQuery:
+        """Analyse l'intention et lance le retrieval en parallèle si utile.
+        
+        Le retrieval (embedding + recherche vectorielle + rerank) démarre en
+        même temps que l'analyse d'intention au lieu d'attendre l'appel LLM
+        d'analyse. Il est annulé si la requête s'avère être un suivi de commande.
+        
+        Éligibles: messages que les règles ne tranchent pas (ils iront au
+        cache d'intention ou au LLM) et sans réponse en cache exact. Une part
+        settings.speculative_retrieval_ratio part en mode spéculatif, le reste
+        en séquentiel, pour comparer les deux bras (A/B).
+        """
+        analyzed = AnalyzedQuery(analysis={})
+        eligible = (
+            self.message_analyzer.classify_with_rules(query) is None
+            and self._get_exact_cached(query, history) is None
+        )
+        if eligible:
+            speculate = random.random() < settings.speculative_retrieval_ratio
+            analyzed.arm = "speculative" if speculate else "sequential"
+            if speculate:
+                analyzed.prefetch = asyncio.ensure_future(self._prepare_context(query))
+                with _SPECULATION_LOCK:
+                    _SPECULATION_STATS["started"] += 1
+        
+        try:
+            analyzed.analysis = await self.message_analyzer.analyze_message(query)
+        except BaseException:
+            self.discard_prefetch(analyzed)
+            raise
+        
+        if analyzed.analysis["intent"] == "order_tracking":
+            if analyzed.prefetch is not None:
+                with _SPECULATION_LOCK:
+                    _SPECULATION_STATS["cancelled"] += 1
+            self.discard_prefetch(analyzed)
+            analyzed.arm = None  # Pas de génération: hors A/B
+        return analyzed
+    
+    @staticmethod
+    def discard_prefetch(analyzed: Optional[AnalyzedQuery]) -> None:
+        """Annule le retrieval spéculatif s'il n'a pas été utilisé."""
+        task = analyzed.prefetch if analyzed else None
+        if task is None:
+            return
+        analyzed.prefetch = None
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()  # Erreur éventuelle marquée comme lue (pas de warning asyncio)
+    
+    async def _prepared_for(self, query: str, analyzed: Optional[AnalyzedQuery]) -> Optional["PreparedContext"]:
+        """Contexte préparé: résultat du retrieval spéculatif, sinon calculé maintenant."""
+        task = analyzed.prefetch if analyzed else None
+        if task is None:
+            return await self._prepare_context(query)
+        analyzed.prefetch = None
+        with _SPECULATION_LOCK:
+            _SPECULATION_STATS["used"] += 1
+        return await task
+    
+    @staticmethod
+    def record_first_token(analyzed: Optional[AnalyzedQuery]) -> None:
+        """Enregistre le time-to-first-token de la requête (une seule fois)."""
+        if analyzed is None or analyzed.ttft_recorded:
+            return
+        analyzed.ttft_recorded = True
+        _record_arm_timing(analyzed, "ttft_ms")
     
     async def generate_response(
         self,
         query: str,
         conversation_id: Optional[str] = None,
-        history: Optional[List[dict]] = None
+        history: Optional[List[dict]] = None,
+        deadline: Optional[Deadline] = None,
+        priority: RequestPriority = RequestPriority.NORMAL
     ) -> ChatResponse:
         """Generate a response using the RAG pipeline.
         
@@ -152,6 +334,8 @@ class RAGPipeline:
             query: User question
             conversation_id: Optional conversation ID
             history: Optional conversation history [{"role": "user|assistant", "content": "..."}]
+            deadline: Optional request deadline; the LLM call is abandoned once it expires
+            priority: Priority of the LLM call in the request batcher (LOW for cache warm-up)
             
         Returns:
             ChatResponse object
@@ -163,8 +347,10 @@ class RAGPipeline:
             conversation_id = str(uuid.uuid4())
             
         # 1. Analyze intent with LLM-First approach
-        # Le LLM décide si c'est du suivi de commande ou une question générale
-        analysis = await self.message_analyzer.analyze_message(query)
+        # Le LLM décide si c'est du suivi de commande ou une question générale;
+        # le retrieval démarre en parallèle (annulé si suivi de commande)
+        analyzed = await self.analyze_and_prefetch(query, history)
+        analysis = analyzed.analysis
         intent = analysis["intent"]
         order_number = analysis.get("order_number")
         reasoning = analysis.get("reasoning")
@@ -176,7 +362,18 @@ class RAGPipeline:
             if order_number:
                 # Fetch order details from DB
                 print(f"🔍 Searching for order {order_number}...")
-                order_data = db_service.get_order_tracking_details(order_number)
+                try:
+                    order_data = await run_db(db_service.get_order_tracking_details, order_number)
+                except PoolTimeoutError as e:
+                    print(f"⚠️ {e}")
+                    return ChatResponse(
+                        answer=ORDER_LOOKUP_BUSY_MESSAGE,
+                        sources=[],
+                        conversation_id=conversation_id,
+                        processing_time=time.time() - start_time,
+                        intent=intent,
+                        reasoning=reasoning
+                    )
                 
                 if order_data:
                     # Generate status response
@@ -221,24 +418,23 @@ class RAGPipeline:
         # 3. Standard RAG Flow (General Question)
         
         # Check cache (only if no history, as context changes with history)
-        cache_key = query.lower().strip()
-        if cache_key in self.cache and not history:
-            cached_response = self.cache[cache_key]
-            cached_response.conversation_id = conversation_id
-            cached_response.timestamp = datetime.utcnow()
+        cached_response = self._get_exact_cached(query, history)
+        if cached_response:
+            self.discard_prefetch(analyzed)
+            # Copie: l'objet en cache est partagé entre requêtes concurrentes
+            updates = {"conversation_id": conversation_id, "timestamp": datetime.utcnow()}
             # Update intent/reasoning in cached response if missing
-            if not hasattr(cached_response, 'intent') or not cached_response.intent:
-                cached_response.intent = intent
-                cached_response.reasoning = reasoning
-            return cached_response
+            if not cached_response.intent:
+                updates.update(intent=intent, reasoning=reasoning)
+            return cached_response.model_copy(update=updates)
         
-        # Retrieve documents
-        retrieved_docs = self.retrieve_documents(query)
+        # Retrieve, rerank and format context (déjà lancé pendant l'analyse)
+        prepared = await self._prepared_for(query, analyzed)
         
-        if not retrieved_docs:
+        if prepared is None:
             # No documents found
             return ChatResponse(
-                answer="Je n'ai pas trouvé d'information pertinente pour répondre à votre question.",
+                answer=NO_DOCUMENTS_ANSWER,
                 sources=[],
                 conversation_id=conversation_id,
                 processing_time=time.time() - start_time,
@@ -246,86 +442,231 @@ class RAGPipeline:
                 reasoning=reasoning
             )
         
-        # Rerank documents
-        reranked_docs = self.rerank_documents(query, retrieved_docs)
-        
-        # Format context
-        context = self.format_context(reranked_docs)
-        
         # Check semantic cache before calling LLM
-        context_hash = self._get_context_hash(reranked_docs)
-        if self._semantic_cache and not history:
-            cached_answer = self._semantic_cache.get(query, context_hash)
-            if cached_answer:
-                print(f"🧠 Semantic Cache HIT")
-                # Prepare source documents
-                sources = [
-                    SourceDocument(
-                        content=doc.page_content,
-                        metadata=doc.metadata,
-                        relevance_score=score
-                    )
-                    for doc, score in reranked_docs
-                ]
-                return ChatResponse(
-                    answer=cached_answer,
-                    sources=sources,
-                    conversation_id=conversation_id,
-                    processing_time=time.time() - start_time,
-                    intent=intent,
-                    reasoning=reasoning
-                )
+        cached_answer = self._get_semantic_cached(query, prepared, history)
+        if cached_answer:
+            _record_arm_timing(analyzed, "response_ms")
+            return ChatResponse(
+                answer=cached_answer,
+                sources=self._to_sources(prepared.documents),
+                conversation_id=conversation_id,
+                processing_time=time.time() - start_time,
+                intent=intent,
+                reasoning=reasoning
+            )
         
         # Generate answer with LLM (now with history)
-        answer = self.llm_service.generate_response(
+        # Single-flight: les questions identiques en cours partagent un seul appel LLM
+        llm_call = self._batcher.submit(
             query=query,
-            context=context,
-            history=history
+            context=prepared.context,
+            process_func=self._call_llm,
+            history=history,
+            priority=priority
         )
+        # Le deadline annule l'attente (et l'appel partagé quand plus personne n'attend),
+        # mais le thread run_llm déjà lancé n'est pas interruptible: il termine sa requête
+        # HTTP (délai du client httpx) en occupant son slot du pool "llm" jusque-là
+        answer = await (deadline.wait_for(llm_call, stage="l'appel LLM") if deadline else llm_call)
         
         # Post-traitement: corriger les emails malformés
         answer = fix_email_format(answer)
         
+        # Create response
+        response = ChatResponse(
+            answer=answer,
+            sources=self._to_sources(prepared.documents),
+            conversation_id=conversation_id,
+            processing_time=time.time() - start_time,
+            intent=intent,
+            reasoning=reasoning
+        )
+        
+        _record_arm_timing(analyzed, "response_ms")
+        
+        # Store in semantic cache + exact cache
+        self._store_answer(query, response, prepared, history)
+        
+        return response
+    
+    async def stream_response(
+        self,
+        query: str,
+        history: Optional[List[dict]] = None,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        deadline: Optional[Deadline] = None,
+        analyzed: Optional[AnalyzedQuery] = None
+    ) -> AsyncGenerator[dict, None]:
+        """Stream a RAG answer (general questions) as events.
+        
+        Shares retrieval, rerank, context building and both cache tiers
+        with generate_response. A cache hit is replayed as a stream; a
+        completed stream is written to the caches.
+        
+        Args:
+            query: User question
+            history: Optional conversation history
+            is_disconnected: Async callable returning True once the client is gone
+            deadline: Optional request deadline (checked before the LLM call)
+            analyzed: Result of analyze_and_prefetch (speculative retrieval + TTFT timing)
+            
+        Yields:
+            {"type": "token", "content": str} events, then
+            {"type": "sources", "sources": [...]} and {"type": "done", "cached": bool}
+        """
+        start_time = time.time()
+        
+        # 1. Cache exact
+        cached_response = self._get_exact_cached(query, history)
+        if cached_response:
+            self.discard_prefetch(analyzed)
+            print("⚡ Stream: Exact Cache HIT")
+            for segment in replay_segments(cached_response.answer):
+                yield {"type": "token", "content": segment}
+            yield {"type": "sources", "sources": [
+                {"content": s.content, "metadata": s.metadata} for s in cached_response.sources
+            ]}
+            yield {"type": "done", "cached": True}
+            return
+        
+        # 2. Retrieval + rerank + contexte (mêmes étapes que generate_response,
+        #    éventuellement déjà lancés pendant l'analyse d'intention)
+        prepared = await self._prepared_for(query, analyzed)
+        if prepared is None:
+            yield {"type": "token", "content": NO_DOCUMENTS_ANSWER}
+            yield {"type": "sources", "sources": []}
+            yield {"type": "done", "cached": False}
+            return
+        sources = [{"content": doc.page_content, "metadata": doc.metadata} for doc, _ in prepared.documents]
+        
+        # 3. Cache sémantique
+        cached_answer = self._get_semantic_cached(query, prepared, history)
+        if cached_answer:
+            for segment in replay_segments(cached_answer):
+                yield {"type": "token", "content": segment}
+            yield {"type": "sources", "sources": sources}
+            yield {"type": "done", "cached": True}
+            return
+        
+        # Personne n'attend plus la réponse: ne pas lancer le LLM
+        if deadline:
+            deadline.check("la génération")
+        
+        # 4. Génération en streaming
+        chunks = []
+        async for chunk in self.llm_service.generate_response_stream_async(
+            query=query,
+            context=prepared.context,
+            history=history,
+            is_disconnected=is_disconnected
+        ):
+            chunks.append(chunk)
+            yield {"type": "token", "content": chunk}
+        
+        # Client parti en cours de route: réponse incomplète, pas de cache
+        if is_disconnected and await is_disconnected():
+            return
+        
+        yield {"type": "sources", "sources": sources}
+        yield {"type": "done", "cached": False}
+        
+        # 5. Réponse complète -> caches (comme generate_response)
+        answer = fix_email_format("".join(chunks))
+        self._store_answer(
+            query,
+            ChatResponse(
+                answer=answer,
+                sources=self._to_sources(prepared.documents),
+                conversation_id=str(uuid.uuid4()),
+                processing_time=time.time() - start_time,
+                intent="general_question"
+            ),
+            prepared,
+            history
+        )
+    
+    def _get_exact_cached(self, query: str, history: Optional[List[dict]]) -> Optional[ChatResponse]:
+        """Cache exact (question normalisée), seulement sans historique."""
+        if history or not settings.enable_cache:
+            return None
+        return self.cache.get(query.lower().strip())
+    
+    async def _prepare_context(self, query: str) -> Optional["PreparedContext"]:
+        """Retrieval + rerank + contexte formaté; None si aucun document."""
+        # Embedding de la question: calculé une seule fois pour la recherche
+        # vectorielle, la lecture et l'écriture du cache sémantique
+        query_context = self.vectorstore.embedding_service.query_context(query)
+        query_embedding = await query_context.get_vector()
+        
+        # Retrieve documents
+        retrieved_docs = await run_embedding(
+            self.retrieve_documents, query, query_embedding=query_embedding
+        )
+        if not retrieved_docs:
+            return None
+        
+        # Rerank documents
+        reranked_docs = self.rerank_documents(query, retrieved_docs)
+        
+        return PreparedContext(
+            query_embedding=query_embedding,
+            documents=reranked_docs,
+            context=self.format_context(reranked_docs),
+            context_hash=self._get_context_hash(reranked_docs)
+        )
+    
+    def _get_semantic_cached(
+        self,
+        query: str,
+        prepared: "PreparedContext",
+        history: Optional[List[dict]]
+    ) -> Optional[str]:
+        """Cache sémantique (questions similaires, même contexte), sans historique."""
+        if not self._semantic_cache or history:
+            return None
+        cached_answer = self._semantic_cache.get(
+            query, prepared.context_hash, embedding=prepared.query_embedding
+        )
+        if cached_answer:
+            print(f"🧠 Semantic Cache HIT")
+        return cached_answer
+    
+    def _store_answer(
+        self,
+        query: str,
+        response: ChatResponse,
+        prepared: "PreparedContext",
+        history: Optional[List[dict]]
+    ):
+        """Écrit une réponse complète dans le cache sémantique et le cache exact."""
+        if not response.answer.strip() or LLM_ERROR_PREFIX in response.answer:
+            return
+        
         # Store in semantic cache
         if self._semantic_cache and not history:
             try:
-                embedding = self.vectorstore.embedding_service.embed_query(query)
                 self._semantic_cache.set(
                     query=query,
-                    value=answer,
-                    context_hash=context_hash,
-                    embedding=embedding
+                    value=response.answer,
+                    context_hash=prepared.context_hash,
+                    embedding=prepared.query_embedding
                 )
             except Exception as e:
                 print(f"⚠️ Erreur cache sémantique: {e}")
         
-        # Prepare source documents
-        sources = [
+        # Cache the response (same condition as the read side)
+        if history or not settings.enable_cache:
+            return
+        self.cache.set(query.lower().strip(), response)
+    
+    @staticmethod
+    def _to_sources(documents: List[Tuple[Document, float]]) -> List[SourceDocument]:
+        """Prepare source documents."""
+        return [
             SourceDocument(
                 content=doc.page_content,
                 metadata=doc.metadata,
                 relevance_score=score
             )
-            for doc, score in reranked_docs
+            for doc, score in documents
         ]
-        
-        # Create response
-        response = ChatResponse(
-            answer=answer,
-            sources=sources,
-            conversation_id=conversation_id,
-            processing_time=time.time() - start_time,
-            intent=intent,
-            reasoning=reasoning
-        )
-        
-        # Cache the response
-        self.cache[cache_key] = response
-        
-        # Limit cache size (simple LRU-like behavior)
-        if len(self.cache) > 100:
-            # Remove oldest entry
-            oldest_key = next(iter(self.cache))
-            del self.cache[oldest_key]
-        
-        return response
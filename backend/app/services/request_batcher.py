@@ -5,6 +5,7 @@ Ce service implémente:
 1. Batching des requêtes (regroupe les requêtes arrivant dans une fenêtre de temps)
 2. Queue de requêtes avec priorité
 3. Gestion intelligente des connexions
+4. Single-flight: les requêtes identiques concurrentes partagent un seul appel LLM
 """
 import asyncio
 import time
@@ -15,6 +16,9 @@ from collections import deque
 from enum import Enum
 import hashlib
 
+from app.core.config import settings
+from app.services.lru_cache import LRUCache
+
 
 class RequestPriority(Enum):
     HIGH = 0      # Suivi de commande (rapide, DB)
@@ -32,6 +36,7 @@ class BatchedRequest:
     priority: RequestPriority = RequestPriority.NORMAL
     created_at: float = field(default_factory=time.time)
     future: asyncio.Future = field(default=None)
+    process_func: Optional[Callable[[str, str, Optional[List[Dict]]], Awaitable[str]]] = None
     
     def __post_init__(self):
         if self.future is None:
@@ -47,9 +52,11 @@ class RequestBatcher:
     Batches les requêtes LLM pour optimiser le throughput.
     
     Fonctionnement:
-    1. Les requêtes arrivent et sont mises en queue
-    2. Après BATCH_WINDOW_MS, toutes les requêtes accumulées sont traitées
-    3. Les requêtes similaires peuvent partager le même résultat (dedup)
+    1. Les requêtes arrivent et sont mises en queue (une queue par priorité)
+    2. _batch_loop les dépile HIGH avant NORMAL avant LOW, dans la limite
+       de max_concurrent requêtes en cours
+    3. Single-flight: une requête identique (même question/contexte/historique)
+       déjà en cours n'est pas relancée, elle attend le même résultat
     """
     
     def __init__(
@@ -72,29 +79,40 @@ class RequestBatcher:
         # Sémaphore pour limiter les requêtes parallèles
         self._semaphore = asyncio.Semaphore(max_concurrent)
         
-        # Lock pour accès thread-safe
-        self._lock = asyncio.Lock()
+        # Réveille _batch_loop quand une requête est mise en queue
+        self._work_available = asyncio.Event()
+        
+        # Requêtes en cours (query_hash -> future partagée)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Nombre d'appelants qui attendent chaque future partagée
+        self._waiters: Dict[str, int] = {}
         
         # Stats
         self.stats = {
             "total_requests": 0,
             "batched_requests": 0,
             "deduped_requests": 0,
+            "coalesced_requests": 0,
+            "executed_requests": 0,
+            "failed_requests": 0,
+            "abandoned_requests": 0,
             "avg_batch_size": 0.0,
         }
         
-        # Dedup cache (query_hash -> (result, timestamp))
-        self._dedup_cache: Dict[str, tuple] = {}
-        self._dedup_ttl = 5.0  # 5 secondes de TTL pour dedup
+        # Dedup cache (query_hash -> résultat tout juste calculé, 5 s de TTL)
+        self._dedup_cache = LRUCache("batcher_dedup", max_size=1000, default_ttl_s=5.0)
         
         # Batch processing task
         self._batch_task: Optional[asyncio.Task] = None
         self._running = False
+        self._tasks: set = set()  # Références fortes vers les _execute en cours
+        self._request_counter = 0
     
-    def _get_query_hash(self, query: str, context: str = "") -> str:
-        """Génère un hash pour identifier les requêtes similaires."""
-        normalized = query.lower().strip()
-        return hashlib.md5(f"{normalized}:{len(context)}".encode()).hexdigest()
+    def _get_query_hash(self, query: str, context: str = "", history: Optional[List[Dict]] = None) -> str:
+        """Génère un hash pour identifier les requêtes identiques."""
+        normalized = " ".join(query.lower().split())
+        history_key = "|".join(f"{m.get('role')}:{m.get('content')}" for m in history) if history else ""
+        return hashlib.md5(f"{normalized}\x00{context}\x00{history_key}".encode()).hexdigest()
     
     async def start(self):
         """Démarre le batch processor."""
@@ -113,6 +131,13 @@ class RequestBatcher:
                 await self._batch_task
             except asyncio.CancelledError:
                 pass
+        # Les requêtes jamais démarrées ne seront pas traitées
+        for queue in self._queues.values():
+            while queue:
+                request = queue.popleft()
+                if not request.future.done():
+                    request.future.set_exception(RuntimeError("Request Batcher arrêté"))
+                self._inflight.pop(request.id, None)
         print("🛑 Request Batcher arrêté")
     
     async def submit(
@@ -138,54 +163,141 @@ class RequestBatcher:
         """
         self.stats["total_requests"] += 1
         
-        # Check dedup cache
-        query_hash = self._get_query_hash(query, context)
-        now = time.time()
-        
-        if query_hash in self._dedup_cache:
-            result, cached_at = self._dedup_cache[query_hash]
-            if now - cached_at < self._dedup_ttl:
-                self.stats["deduped_requests"] += 1
-                print(f"⚡ Dedup HIT pour requête similaire")
-                return result
-        
-        # Si haute priorité ou pas de batching actif, traitement direct
-        if priority == RequestPriority.HIGH:
-            async with self._semaphore:
-                result = await process_func(query, context, history)
-                self._dedup_cache[query_hash] = (result, now)
-                return result
-        
-        # Sinon, traitement via sémaphore pour limiter la concurrence
-        async with self._semaphore:
-            result = await process_func(query, context, history)
-            self._dedup_cache[query_hash] = (result, now)
+        # Check dedup cache (résultat tout juste calculé)
+        query_hash = self._get_query_hash(query, context, history)
+        
+        result = self._dedup_cache.get(query_hash)
+        if result is not None:
+            self.stats["deduped_requests"] += 1
+            print(f"⚡ Dedup HIT pour requête similaire")
             return result
+        
+        # Single-flight: requête identique déjà en cours -> même future
+        inflight = self._inflight.get(query_hash)
+        if inflight is not None and not inflight.done():
+            self.stats["coalesced_requests"] += 1
+            print(f"🔗 Requête identique en cours - résultat partagé")
+            return await self._await_shared(query_hash, inflight)
+        
+        if not self._running:
+            await self.start()
+        
+        request = BatchedRequest(
+            id=query_hash,
+            query=query,
+            context=context,
+            history=history,
+            priority=priority,
+            process_func=process_func,
+        )
+        # Marquer l'exception comme lue si tous les appelants ont abandonné
+        request.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[query_hash] = request.future
+        self._queues[priority].append(request)
+        self.stats["batched_requests"] += 1
+        self._work_available.set()
+        
+        return await self._await_shared(query_hash, request.future)
+    
+    async def _await_shared(self, query_hash: str, future: asyncio.Future) -> str:
+        """Attend une future partagée; l'annule quand plus personne ne l'attend."""
+        self._waiters[query_hash] = self._waiters.get(query_hash, 0) + 1
+        try:
+            # shield: l'annulation d'un appelant n'annule pas les autres
+            return await asyncio.shield(future)
+        finally:
+            self._waiters[query_hash] -= 1
+            if self._waiters[query_hash] <= 0:
+                del self._waiters[query_hash]
+                if not future.done():
+                    # Tous les appelants sont partis (deadline, déconnexion):
+                    # l'appel LLM est annulé, ou jamais lancé s'il est en queue
+                    self.stats["abandoned_requests"] += 1
+                    future.cancel()
+    
+    def _next_request(self) -> Optional[BatchedRequest]:
+        """Dépile la prochaine requête: HIGH, puis NORMAL, puis LOW."""
+        for priority in (RequestPriority.HIGH, RequestPriority.NORMAL, RequestPriority.LOW):
+            if self._queues[priority]:
+                return self._queues[priority].popleft()
+        return None
     
     async def _batch_loop(self):
         """Boucle principale de traitement des batches."""
         while self._running:
             try:
-                await asyncio.sleep(self.batch_window_ms / 1000.0)
-                await self._process_batches()
+                # Attendre un slot libre AVANT de choisir la requête, pour
+                # qu'une requête HIGH arrivée entre-temps passe devant
+                await self._semaphore.acquire()
+                request = self._next_request()
+                if request is None:
+                    self._semaphore.release()
+                    self._work_available.clear()
+                    try:
+                        await asyncio.wait_for(
+                            self._work_available.wait(),
+                            timeout=self.batch_window_ms / 1000.0,
+                        )
+                    except asyncio.TimeoutError:
+                        await self._process_batches()
+                    continue
+                task = asyncio.create_task(self._execute(request))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 print(f"❌ Erreur batch loop: {e}")
     
+    async def _execute(self, request: BatchedRequest):
+        """Exécute une requête et résout sa future partagée."""
+        if request.future.done():
+            # Abandonnée pendant qu'elle était en queue: ne pas appeler le LLM
+            self._finish(request)
+            return
+        task = asyncio.current_task()
+        
+        def cancel_task(future: asyncio.Future):
+            if future.cancelled():
+                task.cancel()
+        
+        request.future.add_done_callback(cancel_task)
+        try:
+            result = await request.process_func(request.query, request.context, request.history)
+            self._dedup_cache.set(request.id, result)
+            self.stats["executed_requests"] += 1
+            if not request.future.done():
+                request.future.set_result(result)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.stats["failed_requests"] += 1
+            if not request.future.done():
+                request.future.set_exception(e)
+        finally:
+            request.future.remove_done_callback(cancel_task)
+            self._finish(request)
+    
+    def _finish(self, request: BatchedRequest):
+        """Retire la requête des requêtes en cours et libère son slot."""
+        if self._inflight.get(request.id) is request.future:
+            del self._inflight[request.id]
+        self._semaphore.release()
+    
     async def _process_batches(self):
         """Traite les batches en attente."""
         # Nettoyer le cache dedup périmé
-        now = time.time()
-        expired = [k for k, (_, t) in self._dedup_cache.items() if now - t > self._dedup_ttl]
-        for k in expired:
-            del self._dedup_cache[k]
+        self._dedup_cache.cleanup_expired()
     
     def get_stats(self) -> Dict[str, Any]:
         """Retourne les statistiques du batcher."""
+        executed = self.stats["executed_requests"] + self.stats["failed_requests"]
+        served = executed + self.stats["coalesced_requests"]
         return {
             **self.stats,
+            "avg_batch_size": round(served / executed, 2) if executed else 0.0,
             "queue_sizes": {p.name: len(q) for p, q in self._queues.items()},
+            "inflight_requests": len(self._inflight),
             "dedup_cache_size": len(self._dedup_cache),
         }
 
@@ -202,9 +314,9 @@ def get_batcher() -> RequestBatcher:
         with _batcher_lock:
             if _batcher is None:
                 _batcher = RequestBatcher(
-                    batch_window_ms=100,
-                    max_batch_size=8,
-                    max_concurrent=4,
+                    batch_window_ms=settings.batch_window_ms,
+                    max_batch_size=settings.max_batch_size,
+                    max_concurrent=settings.max_concurrent_llm_requests,
                 )
     return _batcher
 
@@ -5,6 +5,13 @@ Améliore le cache simple en:
 1. Détectant les questions similaires (pas juste identiques)
 2. Cachant les embeddings des questions fréquentes
 3. Cachant le contexte RAG pour éviter les recherches répétées
+
+Le tier sémantique est un index matriciel: une matrice float32 contiguë
+d'embeddings pré-normalisés + un tableau parallèle de métadonnées.
+Une recherche = un produit matrice-vecteur + argmax, sans verrou global.
+
+Persistance optionnelle (semantic_store.py): fichier SQLite partagé par
+les workers, rechargé au démarrage et synchronisé en tâche de fond.
 """
 import time
 import hashlib
@@ -15,6 +22,9 @@ from collections import OrderedDict
 import re
 import numpy as np
 
+from app.core.config import settings
+from app.services.semantic_store import SemanticStore, StoredEntry
+
 
 @dataclass
 class CacheEntry:
@@ -35,13 +45,212 @@ class CacheEntry:
         self.access_count += 1
 
 
+def normalize_embedding(embedding: Any) -> Optional[np.ndarray]:
+    """Convertit un embedding en vecteur float32 de norme 1 (None si nul)."""
+    if embedding is None:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    if norm == 0.0:
+        return None
+    return vector / norm
+
+
+class SemanticIndex:
+    """
+    Index vectoriel du tier sémantique.
+
+    Stockage:
+    - _matrix: matrice float32 (capacity x dim), lignes pré-normalisées
+    - _entries: tableau parallèle de CacheEntry (ligne i <-> _entries[i])
+    - _size: nombre de lignes valides
+
+    Lecture sans verrou (seqlock): les écrivains incrémentent _generation
+    avant et après chaque mutation (impair = mutation en cours). Un lecteur
+    qui observe une génération impaire ou modifiée pendant son calcul
+    recommence sous verrou. Les ajouts écrivent au-delà de _size avant de
+    le publier, donc ils ne perturbent pas un lecteur concurrent.
+    """
+
+    def __init__(self, capacity: int, initial_rows: int = 64):
+        self.capacity = max(1, capacity)
+        self._initial_rows = max(1, min(initial_rows, self.capacity))
+        self._matrix: Optional[np.ndarray] = None
+        self._entries: List[Optional[CacheEntry]] = []
+        self._size = 0
+        self._generation = 0
+        self._write_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _begin_write(self):
+        self._generation += 1
+
+    def _end_write(self):
+        self._generation += 1
+
+    def _ensure_row_available(self, dim: int):
+        """Alloue/agrandit la matrice (doublement, plafonné à capacity)."""
+        if self._matrix is None or self._matrix.shape[1] != dim:
+            self._matrix = np.zeros((self._initial_rows, dim), dtype=np.float32)
+            self._entries = [None] * self._initial_rows
+            self._size = 0
+            return
+        rows = self._matrix.shape[0]
+        if self._size < rows:
+            return
+        new_rows = min(self.capacity, rows * 2)
+        grown = np.zeros((new_rows, dim), dtype=np.float32)
+        grown[:self._size] = self._matrix[:self._size]
+        # Les lecteurs qui tiennent l'ancienne matrice restent cohérents
+        self._matrix = grown
+        self._entries = self._entries + [None] * (new_rows - rows)
+
+    def _find_locked(self, key: str) -> Optional[int]:
+        for i in range(self._size):
+            entry = self._entries[i]
+            if entry is not None and entry.key == key:
+                return i
+        return None
+
+    def add(self, entry: CacheEntry, vector: np.ndarray) -> int:
+        """
+        Ajoute une entrée (vecteur déjà normalisé).
+        Une entrée de même clé est remplacée sur place (jamais deux lignes).
+
+        Returns:
+            Nombre d'entrées évincées pour faire de la place
+        """
+        with self._write_lock:
+            row = self._find_locked(entry.key)
+            if row is not None and self._matrix.shape[1] == vector.shape[0]:
+                self._begin_write()
+                try:
+                    self._matrix[row] = vector
+                    self._entries[row] = entry
+                finally:
+                    self._end_write()
+                return 0
+            if row is not None:
+                self._compact_locked([i for i in range(self._size) if i != row])
+
+            evicted = 0
+            if self._size >= self.capacity:
+                evicted = self._evict_locked(target=self.capacity // 2)
+
+            dim = vector.shape[0]
+            if self._matrix is not None and self._matrix.shape[1] != dim:
+                # Changement de modèle d'embedding: on repart de zéro
+                self._begin_write()
+                self._matrix = None
+                self._size = 0
+                self._end_write()
+
+            self._ensure_row_available(dim)
+            row = self._size
+            self._matrix[row] = vector
+            self._entries[row] = entry
+            # Publication: la ligne est visible une fois _size incrémenté
+            self._size = row + 1
+            return evicted
+
+    def _evict_locked(self, target: int) -> int:
+        """Retire les entrées expirées puis les moins récemment utilisées."""
+        size = self._size
+        entries = self._entries[:size]
+        keep = [i for i, e in enumerate(entries) if e is not None and not e.is_expired()]
+        if len(keep) > target:
+            keep.sort(key=lambda i: entries[i].last_accessed, reverse=True)
+            keep = sorted(keep[:target])
+        return self._compact_locked(keep)
+
+    def _compact_locked(self, keep: List[int]) -> int:
+        """Compacte la matrice en place pour ne garder que les lignes `keep`."""
+        size = self._size
+        removed = size - len(keep)
+        if removed <= 0:
+            return 0
+        self._begin_write()
+        try:
+            kept = len(keep)
+            if kept:
+                self._matrix[:kept] = self._matrix[keep]
+            self._entries[:kept] = [self._entries[i] for i in keep]
+            for i in range(kept, size):
+                self._entries[i] = None
+            self._size = kept
+        finally:
+            self._end_write()
+        return removed
+
+    def remove(self, key: str) -> bool:
+        """Retire l'entrée de clé `key` (invalidation, tombstone d'un autre worker)."""
+        with self._write_lock:
+            row = self._find_locked(key)
+            if row is None:
+                return False
+            self._compact_locked([i for i in range(self._size) if i != row])
+            return True
+
+    def cleanup_expired(self) -> int:
+        """Supprime les entrées expirées (compaction en place)."""
+        with self._write_lock:
+            keep = [
+                i for i, e in enumerate(self._entries[:self._size])
+                if e is not None and not e.is_expired()
+            ]
+            return self._compact_locked(keep)
+
+    def clear(self):
+        with self._write_lock:
+            self._begin_write()
+            self._matrix = None
+            self._entries = []
+            self._size = 0
+            self._end_write()
+
+    def _scan(self, matrix, entries, size, vector, threshold) -> Tuple[Optional[CacheEntry], float]:
+        if matrix is None or size == 0 or matrix.shape[1] != vector.shape[0]:
+            return None, 0.0
+        scores = matrix[:size] @ vector
+        # Meilleur candidat non expiré (quasi toujours le premier argmax)
+        for _ in range(min(size, 8)):
+            idx = int(np.argmax(scores))
+            score = float(scores[idx])
+            if score < threshold:
+                return None, 0.0
+            entry = entries[idx]
+            if entry is not None and not entry.is_expired():
+                return entry, score
+            scores[idx] = -np.inf
+        return None, 0.0
+
+    def search(self, vector: np.ndarray, threshold: float) -> Tuple[Optional[CacheEntry], float]:
+        """
+        Cherche l'entrée la plus similaire (vecteur requête normalisé).
+
+        Returns:
+            (entry, similarité) ou (None, 0.0)
+        """
+        generation = self._generation
+        if generation % 2 == 0:
+            matrix, entries, size = self._matrix, self._entries, self._size
+            result = self._scan(matrix, entries, size, vector, threshold)
+            if self._generation == generation:
+                return result
+        # Mutation concurrente: relire sous verrou
+        with self._write_lock:
+            return self._scan(self._matrix, self._entries, self._size, vector, threshold)
+
+
 class SemanticCache:
     """
     Cache sémantique avec similarité cosinus.
     
     Fonctionnalités:
     1. Cache exact (hash) - O(1)
-    2. Cache sémantique (similarité) - O(n) mais limité aux top-K
+    2. Cache sémantique (similarité) - un produit matrice-vecteur vectorisé
     3. LRU éviction
     4. TTL configurable
     """
@@ -52,6 +261,7 @@ class SemanticCache:
         similarity_threshold: float = 0.92,  # 92% de similarité minimum
         default_ttl: float = 3600.0,         # 1 heure
         embedding_func: Optional[callable] = None,
+        store: Optional[SemanticStore] = None,
     ):
         self.max_size = max_size
         self.similarity_threshold = similarity_threshold
@@ -61,10 +271,10 @@ class SemanticCache:
         # Cache exact (hash -> entry)
         self._exact_cache: OrderedDict[str, CacheEntry] = OrderedDict()
         
-        # Cache sémantique (liste pour recherche par similarité)
-        self._semantic_cache: List[CacheEntry] = []
+        # Cache sémantique (matrice d'embeddings normalisés + métadonnées)
+        self._semantic_index = SemanticIndex(capacity=max(1, max_size // 2))
         
-        # Lock pour thread-safety
+        # Lock pour thread-safety (cache exact + stats uniquement)
         self._lock = threading.RLock()
         
         # Stats
@@ -74,6 +284,11 @@ class SemanticCache:
             "misses": 0,
             "evictions": 0,
         }
+        
+        # Persistance (fichier partagé entre workers)
+        self._store: Optional[SemanticStore] = None
+        if store is not None:
+            self.attach_store(store)
     
     def _normalize_query(self, query: str) -> str:
         """Normalise une requête pour le cache exact."""
@@ -88,68 +303,61 @@ class SemanticCache:
         normalized = self._normalize_query(query)
         return hashlib.sha256(normalized.encode()).hexdigest()[:16]
     
-    def _cosine_similarity(self, a: np.ndarray, b: np.ndarray) -> float:
-        """Calcule la similarité cosinus entre deux vecteurs."""
-        if a is None or b is None:
-            return 0.0
-        norm_a = np.linalg.norm(a)
-        norm_b = np.linalg.norm(b)
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
-        return float(np.dot(a, b) / (norm_a * norm_b))
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[stat] += amount
     
-    def get(self, query: str, context_hash: str = "") -> Optional[Any]:
+    def get(
+        self,
+        query: str,
+        context_hash: str = "",
+        embedding: Optional[np.ndarray] = None,
+    ) -> Optional[Any]:
         """
         Recherche une entrée dans le cache.
         
         Args:
             query: Question utilisateur
             context_hash: Hash optionnel du contexte
+            embedding: Embedding déjà calculé de la requête (évite embedding_func)
             
         Returns:
             Valeur cachée ou None
         """
+        # 1. Essayer le cache exact (O(1), sous verrou)
+        key = self._get_exact_key(query + context_hash)
         with self._lock:
-            # 1. Essayer le cache exact
-            key = self._get_exact_key(query + context_hash)
-            if key in self._exact_cache:
-                entry = self._exact_cache[key]
+            entry = self._exact_cache.get(key)
+            if entry is not None:
                 if not entry.is_expired():
                     entry.touch()
                     # Move to end (LRU)
                     self._exact_cache.move_to_end(key)
                     self.stats["exact_hits"] += 1
                     return entry.value
-                else:
-                    # Expired, remove
-                    del self._exact_cache[key]
-            
-            # 2. Essayer le cache sémantique (si embedding disponible)
-            if self.embedding_func and len(self._semantic_cache) > 0:
-                try:
-                    query_embedding = self.embedding_func(query)
-                    best_match = None
-                    best_similarity = 0.0
-                    
-                    for entry in self._semantic_cache:
-                        if entry.is_expired():
-                            continue
-                        if entry.embedding is not None:
-                            similarity = self._cosine_similarity(query_embedding, entry.embedding)
-                            if similarity > best_similarity and similarity >= self.similarity_threshold:
-                                best_similarity = similarity
-                                best_match = entry
-                    
-                    if best_match:
+                # Expired, remove
+                del self._exact_cache[key]
+        
+        # 2. Essayer le cache sémantique (sans verrou global)
+        if (embedding is not None or self.embedding_func) and len(self._semantic_index) > 0:
+            try:
+                if embedding is None:
+                    embedding = self.embedding_func(query)
+                query_vector = normalize_embedding(embedding)
+                if query_vector is not None:
+                    best_match, best_similarity = self._semantic_index.search(
+                        query_vector, self.similarity_threshold
+                    )
+                    if best_match is not None:
                         best_match.touch()
-                        self.stats["semantic_hits"] += 1
+                        self._count("semantic_hits")
                         print(f"🧠 Semantic Cache HIT (similarity: {best_similarity:.2%})")
                         return best_match.value
-                except Exception as e:
-                    print(f"⚠️ Semantic cache error: {e}")
-            
-            self.stats["misses"] += 1
-            return None
+            except Exception as e:
+                print(f"⚠️ Semantic cache error: {e}")
+        
+        self._count("misses")
+        return None
     
     def set(
         self,
@@ -169,51 +377,103 @@ class SemanticCache:
             ttl: Time-to-live optionnel
             embedding: Embedding optionnel pour cache sémantique
         """
+        vector = normalize_embedding(embedding)
+        key = self._get_exact_key(query + context_hash)
+        entry = CacheEntry(
+            key=key,
+            value=value,
+            embedding=vector,
+            ttl=ttl or self.default_ttl,
+        )
+        self._insert(entry)
+        
+        # Écriture disque différée (thread de fond du store)
+        if self._store is not None:
+            self._store.put(key, query, value, vector, entry.created_at, entry.ttl)
+    
+    def _insert(self, entry: CacheEntry) -> None:
+        """Ajoute une entrée en mémoire (cache exact + index sémantique)."""
+        key, vector = entry.key, entry.embedding
         with self._lock:
             # Éviction si nécessaire
-            while len(self._exact_cache) >= self.max_size:
+            while key not in self._exact_cache and len(self._exact_cache) >= self.max_size:
                 # Remove oldest (LRU)
                 oldest_key = next(iter(self._exact_cache))
                 del self._exact_cache[oldest_key]
                 self.stats["evictions"] += 1
             
-            key = self._get_exact_key(query + context_hash)
-            entry = CacheEntry(
-                key=key,
-                value=value,
-                embedding=embedding,
-                ttl=ttl or self.default_ttl,
-            )
-            
             self._exact_cache[key] = entry
-            
-            # Ajouter au cache sémantique si embedding fourni
-            if embedding is not None:
-                # Limiter la taille du cache sémantique
-                if len(self._semantic_cache) >= self.max_size // 2:
-                    # Remove les plus anciens
-                    self._semantic_cache = sorted(
-                        self._semantic_cache,
-                        key=lambda e: e.last_accessed,
-                        reverse=True
-                    )[:self.max_size // 4]
-                
-                self._semantic_cache.append(entry)
+            self._exact_cache.move_to_end(key)
+        
+        # Ajouter au cache sémantique si embedding fourni
+        if vector is not None:
+            evicted = self._semantic_index.add(entry, vector)
+            if evicted:
+                self._count("evictions", evicted)
     
     def invalidate(self, query: str, context_hash: str = "") -> bool:
         """Invalide une entrée spécifique."""
         with self._lock:
             key = self._get_exact_key(query + context_hash)
-            if key in self._exact_cache:
-                del self._exact_cache[key]
-                return True
-            return False
+            found = self._exact_cache.pop(key, None) is not None
+        found = self._semantic_index.remove(key) or found
+        if self._store is not None:
+            self._store.delete(key)
+        return found
     
     def clear(self) -> None:
         """Vide le cache."""
+        self._clear_memory()
+        if self._store is not None:
+            self._store.clear()
+    
+    def _clear_memory(self) -> None:
         with self._lock:
             self._exact_cache.clear()
-            self._semantic_cache.clear()
+        self._semantic_index.clear()
+    
+    def attach_store(self, store: SemanticStore) -> int:
+        """
+        Branche le store persistant: chargement à chaud des entrées valides
+        puis synchronisation en tâche de fond avec les autres workers.
+        
+        Returns:
+            Nombre d'entrées chargées
+        """
+        entries = store.load(limit=self.max_size)
+        for stored in entries:
+            self._insert(self._from_stored(stored))
+        self._store = store
+        store.start(self._apply_sync)
+        return len(entries)
+    
+    @staticmethod
+    def _from_stored(stored: StoredEntry) -> CacheEntry:
+        return CacheEntry(
+            key=stored.key,
+            value=stored.value,
+            embedding=normalize_embedding(stored.embedding),
+            created_at=stored.created_at,
+            ttl=stored.ttl,
+        )
+    
+    def _apply_sync(self, cleared: bool, entries: List[StoredEntry]) -> None:
+        """Applique en mémoire les écritures des autres workers."""
+        if cleared:
+            self._clear_memory()
+        for stored in entries:
+            if stored.deleted:
+                with self._lock:
+                    self._exact_cache.pop(stored.key, None)
+                self._semantic_index.remove(stored.key)
+            else:
+                self._insert(self._from_stored(stored))
+    
+    def close(self) -> None:
+        """Écrit les entrées en attente et détache le store."""
+        store, self._store = self._store, None
+        if store is not None:
+            store.close()
     
     def cleanup_expired(self) -> int:
         """Nettoie les entrées expirées."""
@@ -224,13 +484,10 @@ class SemanticCache:
             ]
             for key in expired_keys:
                 del self._exact_cache[key]
-            
-            self._semantic_cache = [
-                e for e in self._semantic_cache
-                if not e.is_expired()
-            ]
-            
-            return len(expired_keys)
+        
+        self._semantic_index.cleanup_expired()
+        
+        return len(expired_keys)
     
     def get_stats(self) -> Dict[str, Any]:
         """Retourne les statistiques du cache."""
@@ -244,7 +501,8 @@ class SemanticCache:
                 "total_requests": total_requests,
                 "hit_rate": f"{hit_rate:.2%}",
                 "exact_cache_size": len(self._exact_cache),
-                "semantic_cache_size": len(self._semantic_cache),
+                "semantic_cache_size": len(self._semantic_index),
+                "persistence": self._store.get_stats() if self._store is not None else None,
             }
 
 
@@ -265,4 +523,22 @@ def get_response_cache(embedding_func: Optional[callable] = None) -> SemanticCac
                     default_ttl=3600.0,
                     embedding_func=embedding_func,
                 )
+                if settings.semantic_cache_persist_path:
+                    try:
+                        store = SemanticStore(
+                            settings.semantic_cache_persist_path,
+                            sync_interval_s=settings.semantic_cache_sync_interval_s,
+                            cleanup_interval_s=settings.semantic_cache_cleanup_interval_s,
+                            max_entries=settings.semantic_cache_persist_max_entries,
+                        )
+                        loaded = _response_cache.attach_store(store)
+                        print(f"💾 Cache sémantique persistant: {loaded} entrées chargées ({store.path})")
+                    except Exception as e:
+                        print(f"⚠️ Cache sémantique persistant indisponible: {e}")
     return _response_cache
+
+
+def close_response_cache() -> None:
+    """Arrêt: écrit les entrées en attente dans le store persistant."""
+    if _response_cache is not None:
+        _response_cache.close()
@@ -0,0 +1,340 @@
+"""
+Persistance du cache sémantique - fichier SQLite partagé par les workers.
+
+Le cache sémantique (semantic_cache.py) vit en mémoire: chaque redémarrage
+le vide et N workers uvicorn = N caches froids (donc N fois les appels LLM).
+
+Ce store ajoute un niveau disque optionnel:
+1. Un fichier SQLite en mode WAL: lecteurs et écrivain ne se bloquent pas,
+   tous les workers d'une machine ouvrent le même fichier
+2. Embeddings stockés en blob float32 (déjà normalisés)
+3. Écritures groupées en une transaction par un thread de fond (atomiques,
+   jamais sur le chemin de la requête)
+4. Synchronisation: chaque worker relit périodiquement les lignes écrites
+   par les autres (id croissant), invalidations et vidages compris
+5. Nettoyage en tâche de fond des entrées expirées et du surplus
+6. Chargement à chaud des entrées valides au démarrage
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    query TEXT NOT NULL DEFAULT '',
+    value TEXT,
+    embedding BLOB,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    writer TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_expires ON entries(expires_at);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class StoredEntry:
+    """Ligne du store telle que rechargée en mémoire."""
+    key: str
+    query: str
+    value: Any
+    embedding: Optional[np.ndarray]
+    created_at: float
+    ttl: float
+    deleted: bool = False
+
+
+# Rappel de synchronisation: (vidé par un autre worker, nouvelles lignes)
+SyncCallback = Callable[[bool, List[StoredEntry]], None]
+
+
+class SemanticStore:
+    """
+    Store SQLite du cache sémantique.
+
+    Une connexion par instance, protégée par un verrou (le thread de fond
+    et le chargement à chaud l'utilisent). Les écritures passent par une
+    file vidée par le thread de fond ou par flush().
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sync_interval_s: float = 2.0,
+        cleanup_interval_s: float = 300.0,
+        max_entries: int = 20000,
+        max_pending_writes: int = 10000,
+        tombstone_ttl_s: float = 60.0,
+    ):
+        self.path = path
+        self.sync_interval_s = sync_interval_s
+        self.cleanup_interval_s = cleanup_interval_s
+        self.max_entries = max_entries
+        self.max_pending_writes = max_pending_writes
+        self.tombstone_ttl_s = tombstone_ttl_s
+        # Identifiant de ce process: ses propres lignes ne sont pas relues
+        self.writer_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._db_lock = threading.Lock()
+
+        self._pending: List[Tuple] = []
+        self._pending_lock = threading.Lock()
+        self._last_id = 0
+        self._cleared_at = self._read_cleared_at()
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._on_sync: Optional[SyncCallback] = None
+        self._last_cleanup = time.time()
+
+        self.stats = {
+            "writes": 0,
+            "write_batches": 0,
+            "dropped_writes": 0,
+            "warm_loaded": 0,
+            "synced_from_peers": 0,
+            "peer_clears": 0,
+            "cleaned_up": 0,
+            "errors": 0,
+        }
+
+    # ------------------------------------------------------------------ lecture
+
+    def _read_cleared_at(self) -> float:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'cleared_at'").fetchone()
+        return row[0] if row else 0.0
+
+    @staticmethod
+    def _to_entry(row: Tuple) -> StoredEntry:
+        key, query, value, blob, created_at, expires_at, deleted = row
+        return StoredEntry(
+            key=key,
+            query=query,
+            value=json.loads(value) if value is not None else None,
+            embedding=np.frombuffer(blob, dtype=np.float32).copy() if blob else None,
+            created_at=created_at,
+            ttl=expires_at - created_at,
+            deleted=bool(deleted),
+        )
+
+    def load(self, limit: int) -> List[StoredEntry]:
+        """
+        Chargement à chaud: les `limit` entrées valides les plus récentes
+        (de la plus ancienne à la plus récente, pour respecter l'ordre LRU).
+        """
+        with self._db_lock:
+            # Même snapshot pour le max(id) et les lignes: rien n'est perdu
+            self._conn.execute("BEGIN")
+            try:
+                self._last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+                rows = self._conn.execute(
+                    "SELECT key, query, value, embedding, created_at, expires_at, deleted FROM entries "
+                    "WHERE deleted = 0 AND expires_at > ? AND id <= ? ORDER BY id DESC LIMIT ?",
+                    (time.time(), self._last_id, limit),
+                ).fetchall()
+                self._cleared_at = self._read_cleared_at()
+            finally:
+                self._conn.execute("COMMIT")
+        entries = [self._to_entry(row) for row in reversed(rows)]
+        self.stats["warm_loaded"] += len(entries)
+        return entries
+
+    def poll(self) -> Tuple[bool, List[StoredEntry]]:
+        """
+        Lignes écrites par les autres workers depuis le dernier appel.
+
+        Returns:
+            (cache vidé par un autre worker, nouvelles lignes dont suppressions)
+        """
+        with self._db_lock:
+            self._conn.execute("BEGIN")
+            try:
+                cleared_at = self._read_cleared_at()
+                rows = self._conn.execute(
+                    "SELECT id, key, query, value, embedding, created_at, expires_at, deleted, writer "
+                    "FROM entries WHERE id > ? ORDER BY id",
+                    (self._last_id,),
+                ).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        cleared = cleared_at > self._cleared_at
+        self._cleared_at = cleared_at
+        if rows:
+            self._last_id = rows[-1][0]
+        entries = [self._to_entry(row[1:-1]) for row in rows if row[-1] != self.writer_id]
+        return cleared, entries
+
+    # ---------------------------------------------------------------- écriture
+
+    def _enqueue(self, op: Tuple) -> None:
+        with self._pending_lock:
+            if len(self._pending) >= self.max_pending_writes:
+                self.stats["dropped_writes"] += 1
+                return
+            self._pending.append(op)
+
+    def put(
+        self,
+        key: str,
+        query: str,
+        value: Any,
+        embedding: Optional[np.ndarray],
+        created_at: float,
+        ttl: float,
+    ) -> None:
+        """Programme l'écriture d'une entrée (valeur sérialisable en JSON)."""
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            self.stats["errors"] += 1
+            return
+        blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+        self._enqueue((key, query, payload, blob, created_at, created_at + ttl, 0))
+
+    def delete(self, key: str) -> None:
+        """Programme une suppression (ligne tombstone relue par les autres workers)."""
+        now = time.time()
+        self._enqueue((key, "", None, None, now, now + self.tombstone_ttl_s, 1))
+
+    def clear(self) -> None:
+        """Vide le store pour tous les workers (immédiat, pas de file)."""
+        with self._pending_lock:
+            self._pending.clear()
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM entries")
+                self._conn.execute("INSERT OR REPLACE INTO meta(name, value) VALUES ('cleared_at', ?)", (now,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._cleared_at = now
+
+    def flush(self) -> int:
+        """Écrit les opérations en attente en une seule transaction."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        rows = [op + (self.writer_id,) for op in pending]
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # REPLACE = nouvel id: la ligne est relue par les autres workers
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries"
+                    "(key, query, value, embedding, created_at, expires_at, deleted, writer) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.stats["writes"] += len(rows)
+        self.stats["write_batches"] += 1
+        return len(rows)
+
+    def cleanup(self) -> int:
+        """Supprime les lignes expirées (tombstones compris) et le surplus le plus ancien."""
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                removed = self._conn.execute(
+                    "DELETE FROM entries WHERE expires_at <= ?", (time.time(),)
+                ).rowcount
+                removed += self._conn.execute(
+                    "DELETE FROM entries WHERE id IN ("
+                    "SELECT id FROM entries ORDER BY id DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.stats["cleaned_up"] += removed
+        return removed
+
+    # ----------------------------------------------------------- thread de fond
+
+    def sync_once(self) -> None:
+        """Un cycle: écrire la file, relire les autres workers, nettoyer si dû."""
+        self.flush()
+        if self._on_sync is not None:
+            cleared, entries = self.poll()
+            if cleared:
+                self.stats["peer_clears"] += 1
+            if cleared or entries:
+                self.stats["synced_from_peers"] += sum(1 for e in entries if not e.deleted)
+                self._on_sync(cleared, entries)
+        if time.time() - self._last_cleanup >= self.cleanup_interval_s:
+            self._last_cleanup = time.time()
+            self.cleanup()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.sync_interval_s):
+            try:
+                self.sync_once()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"⚠️ Semantic store sync error: {e}")
+
+    def start(self, on_sync: SyncCallback) -> None:
+        """Démarre le thread de synchronisation / nettoyage."""
+        self._on_sync = on_sync
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="semantic-store-sync", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """Arrête le thread, écrit la file et ferme la connexion."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ Semantic store flush error: {e}")
+        with self._db_lock:
+            self._conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._pending_lock:
+            pending = len(self._pending)
+        try:
+            with self._db_lock:
+                rows = self._conn.execute("SELECT COUNT(*) FROM entries WHERE deleted = 0").fetchone()[0]
+        except sqlite3.Error:
+            rows = None
+        return {
+            **self.stats,
+            "path": self.path,
+            "rows": rows,
+            "pending_writes": pending,
+            "sync_interval_s": self.sync_interval_s,
+        }
@@ -1,12 +1,23 @@
 """Vector store service using ChromaDB."""
+import hashlib
 import os
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 import chromadb
 from chromadb.config import Settings
 from langchain.schema import Document
 from app.services.embeddings import EmbeddingService
 
 
+def content_chunk_id(source: str, text: str) -> str:
+    """Stable chunk ID: hash of the source file name and the chunk text.
+    
+    The same chunk keeps the same ID across runs (re-indexing upserts it
+    in place), whatever its position in the document.
+    """
+    digest = hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+    return f"chunk_{digest[:32]}"
+
+
 class VectorStoreService:
     """Service for managing vector storage and retrieval."""
     
@@ -38,16 +49,26 @@ class VectorStoreService:
         
         print(f"✓ Vector store initialized with {self.collection.count()} documents")
     
-    def add_documents(self, documents: List[Document]) -> None:
-        """Add documents to the vector store.
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None) -> None:
+        """Add (or replace) documents in the vector store.
         
         Args:
             documents: List of Document objects
+            ids: Chunk IDs (default: content-addressed, see content_chunk_id)
         """
         if not documents:
             print("No documents to add")
             return
         
+        # Content-addressed IDs: identical chunks collapse onto one entry
+        if ids is None:
+            ids = [content_chunk_id(doc.metadata.get("source", ""), doc.page_content) for doc in documents]
+        unique: Dict[str, Document] = {}
+        for chunk_id, doc in zip(ids, documents):
+            unique.setdefault(chunk_id, doc)
+        ids = list(unique)
+        documents = list(unique.values())
+        
         print(f"Adding {len(documents)} documents to vector store...")
         
         # Extract texts and metadata
@@ -57,11 +78,8 @@ class VectorStoreService:
         # Generate embeddings
         embeddings = self.embedding_service.embed_texts(texts)
         
-        # Generate IDs
-        ids = [f"doc_{i}" for i in range(len(documents))]
-        
-        # Add to collection
-        self.collection.add(
+        # Upsert: re-adding an existing chunk replaces it instead of failing
+        self.collection.upsert(
             embeddings=embeddings,
             documents=texts,
             metadatas=metadatas,
@@ -70,18 +88,56 @@ class VectorStoreService:
         
         print(f"✓ Added {len(documents)} documents to vector store")
     
-    def similarity_search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+    def get_ids(self, source: Optional[str] = None) -> List[str]:
+        """List stored chunk IDs, optionally for one source file.
+        
+        Args:
+            source: Source file name (metadata "source")
+            
+        Returns:
+            Chunk IDs
+        """
+        where = {"source": source} if source is not None else None
+        return self.collection.get(where=where, include=[])["ids"]
+    
+    def update_metadatas(self, ids: List[str], metadatas: List[dict]) -> None:
+        """Update chunk metadata without re-embedding.
+        
+        Args:
+            ids: Chunk IDs
+            metadatas: New metadata, one per ID
+        """
+        if ids:
+            self.collection.update(ids=ids, metadatas=metadatas)
+    
+    def delete_ids(self, ids: List[str]) -> None:
+        """Delete chunks by ID.
+        
+        Args:
+            ids: Chunk IDs
+        """
+        if ids:
+            self.collection.delete(ids=ids)
+    
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 5,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
         """Search for similar documents.
         
         Args:
             query: Search query
             k: Number of results to return
+            query_embedding: Precomputed query embedding (skips re-embedding)
             
         Returns:
             List of (Document, score) tuples
         """
         # Generate query embedding
-        query_embedding = self.embedding_service.embed_text(query)
+        if query_embedding is None:
+            query_embedding = self.embedding_service.embed_query(query)
         
         # Search
         results = self.collection.query(
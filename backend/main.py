@@ -19,6 +19,11 @@ from app.services.vectorstore import VectorStoreService
 from app.services.llm import OllamaService
 from app.services.rag_pipeline import RAGPipeline
 from app.services.request_batcher import init_batcher, shutdown_batcher
+from app.services.embedding_batcher import shutdown_embedding_batcher
+from app.services.executors import shutdown_executors
+from app.services.db_pool import close_pools
+from app.services.semantic_cache import close_response_cache
+from app.services.cache_warmer import start_startup_warmup, cancel_startup_warmup, flush_query_log
 from app.middleware.rate_limit import RateLimitMiddleware, get_rate_limit_stats
 
 # Configurer le logging pour ignorer les erreurs de socket déconnectés
@@ -180,10 +185,16 @@ async def startup_event():
         await init_batcher()
         print("✓ Request Batcher initialisé")
     
+    # Préchauffage du cache en tâche de fond (CACHE_WARMUP_ON_STARTUP)
+    warmup_task = start_startup_warmup(rag_pipeline)
+    
     # Afficher les optimisations actives
     print("\n🔧 Optimisations actives:")
     print(f"   - Cache sémantique: {'✓' if settings.enable_semantic_cache else '✗'}")
+    print(f"   - Cache sémantique persistant: {settings.semantic_cache_persist_path or '✗'}")
+    print(f"   - Préchauffage du cache: {'✓' if warmup_task else '✗'}")
     print(f"   - Request batching: {'✓' if settings.enable_request_batching else '✗'}")
+    print(f"   - Embedding micro-batching: {'✓' if settings.enable_embedding_batching else '✗'} ({settings.embedding_batch_window_ms}ms, max {settings.embedding_max_batch_size})")
     print(f"   - Max requêtes parallèles: {settings.max_concurrent_llm_requests}")
     
     print("\n✅ LibriAssist API is ready!")
@@ -196,7 +207,13 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown."""
     print("🛑 Arrêt de LibriAssist API...")
+    await cancel_startup_warmup()
+    flush_query_log()
     await shutdown_batcher()
+    await shutdown_embedding_batcher()
+    shutdown_executors()
+    close_pools()
+    close_response_cache()
     print("✅ Cleanup terminé")
 
 
@@ -0,0 +1,122 @@
+"""
+Benchmark des backends d'embedding: débit d'encodage et RSS (torch vs onnx int8).
+
+Chaque backend est mesuré dans un sous-processus dédié pour que le RSS
+reflète uniquement ce backend (chargement du modèle + encodage).
+
+Usage:
+    python scripts/benchmark_embedding_backends.py [--backends torch onnx] [--passages 256]
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docs")
+
+
+def load_passages(limit: int):
+    """Paragraphes des fichiers .txt de docs/."""
+    passages = []
+    for path in sorted(glob.glob(os.path.join(DOCS_DIR, "*.txt"))):
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            for paragraph in f.read().split("\n\n"):
+                paragraph = paragraph.strip()
+                if len(paragraph) >= 40:
+                    passages.append(paragraph)
+    return passages[:limit]
+
+
+def rss_mb() -> float:
+    import psutil
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+
+def run_child(backend_name: str, passages_count: int, batch_size: int) -> dict:
+    """Mesure un backend (exécuté dans le sous-processus)."""
+    from app.core.config import settings
+    from app.services.embedding_backends import TorchEmbeddingBackend, OnnxEmbeddingBackend
+
+    passages = load_passages(passages_count)
+    rss_start = rss_mb()
+
+    start = time.perf_counter()
+    if backend_name == "onnx":
+        backend = OnnxEmbeddingBackend(settings.embedding_model, cache_dir=settings.embedding_onnx_cache_dir,
+                                       batch_size=batch_size)
+    else:
+        backend = TorchEmbeddingBackend(settings.embedding_model)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = rss_mb()
+
+    # Warm-up
+    backend.encode(passages[:4])
+
+    # Requêtes unitaires (cas /chat)
+    singles = passages[:32]
+    start = time.perf_counter()
+    for text in singles:
+        backend.encode([text])
+    single_seconds = time.perf_counter() - start
+
+    # Débit batché (cas indexation)
+    start = time.perf_counter()
+    for i in range(0, len(passages), batch_size):
+        backend.encode(passages[i:i + batch_size])
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "backend": backend.name,
+        "load_seconds": round(load_seconds, 2),
+        "single_latency_ms": round(single_seconds / len(singles) * 1000, 1),
+        "batch_throughput": round(len(passages) / batch_seconds, 1),
+        "rss_model_mb": round(rss_loaded - rss_start, 1),
+        "rss_peak_mb": round(rss_mb(), 1),
+        "passages": len(passages),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des backends d'embedding")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx"])
+    parser.add_argument("--passages", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.passages, args.batch_size)))
+        return
+
+    print("=" * 80)
+    print(f"🧪 BENCHMARK BACKENDS D'EMBEDDING ({args.passages} passages de docs/)")
+    print("=" * 80)
+    print(f"{'Backend':>8} | {'chargement':>10} | {'1 requête':>10} | {'débit batch':>13} | {'RSS modèle':>10} | {'RSS pic':>8}")
+    print("-" * 80)
+
+    for backend_name in args.backends:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", backend_name,
+             "--passages", str(args.passages), "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True,
+        )
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            print(f"{backend_name:>8} | ❌ échec: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'inconnu'}")
+            continue
+        r = json.loads(lines[-1])
+        print(
+            f"{r['backend']:>8} | {r['load_seconds']:>8.2f} s | {r['single_latency_ms']:>7.1f} ms | "
+            f"{r['batch_throughput']:>7.1f} txt/s | {r['rss_model_mb']:>7.0f} MB | {r['rss_peak_mb']:>5.0f} MB"
+        )
+
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
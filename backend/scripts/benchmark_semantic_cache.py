@@ -0,0 +1,113 @@
+"""
+Micro-benchmark du cache sémantique: latence de lookup à 500, 5k et 50k entrées.
+
+Compare l'index matriciel (produit matrice-vecteur + argmax) à l'ancienne
+boucle Python (similarité cosinus calculée entrée par entrée).
+
+Usage:
+    python scripts/benchmark_semantic_cache.py [--dim 1024] [--lookups 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.semantic_cache import SemanticCache
+
+
+SIZES = [500, 5_000, 50_000]
+
+
+def legacy_lookup(entries, query_embedding, threshold):
+    """Ancienne recherche: boucle Python + 2 normes par entrée."""
+    best_match, best_similarity = None, 0.0
+    for key, embedding in entries:
+        norm_a = np.linalg.norm(query_embedding)
+        norm_b = np.linalg.norm(embedding)
+        if norm_a == 0 or norm_b == 0:
+            continue
+        similarity = float(np.dot(query_embedding, embedding) / (norm_a * norm_b))
+        if similarity > best_similarity and similarity >= threshold:
+            best_similarity = similarity
+            best_match = key
+    return best_match
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def bench_size(size: int, dim: int, lookups: int, legacy_lookups: int):
+    rng = np.random.default_rng(size)
+    embeddings = rng.standard_normal((size, dim)).astype(np.float32)
+    queries = embeddings[rng.integers(0, size, lookups)] + 0.01
+
+    current = {"vector": None}
+    # Capacité sémantique = max_size // 2
+    cache = SemanticCache(
+        max_size=size * 2 + 2,
+        similarity_threshold=0.9,
+        embedding_func=lambda _q: current["vector"],
+    )
+    for i in range(size):
+        cache.set(f"q{i}", i, embedding=embeddings[i])
+
+    timings = []
+    for i, query in enumerate(queries):
+        current["vector"] = query
+        start = time.perf_counter()
+        cache.get(f"lookup-{i}")
+        timings.append((time.perf_counter() - start) * 1000)
+
+    legacy_entries = [(f"q{i}", embeddings[i]) for i in range(size)]
+    legacy_timings = []
+    for query in queries[:legacy_lookups]:
+        start = time.perf_counter()
+        legacy_lookup(legacy_entries, query, 0.9)
+        legacy_timings.append((time.perf_counter() - start) * 1000)
+
+    return timings, legacy_timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du cache sémantique")
+    parser.add_argument("--dim", type=int, default=1024, help="Dimension des embeddings (e5-large = 1024)")
+    parser.add_argument("--lookups", type=int, default=200, help="Nombre de lookups par taille")
+    parser.add_argument("--legacy-lookups", type=int, default=5, help="Lookups pour l'ancienne boucle")
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print(f"🧪 BENCHMARK CACHE SÉMANTIQUE (dim={args.dim}, {args.lookups} lookups)")
+    print("=" * 72)
+    print(f"{'Entrées':>8} | {'matrice p50':>12} | {'matrice p99':>12} | {'boucle p50':>11} | {'gain':>6}")
+    print("-" * 72)
+
+    for size in SIZES:
+        # Le HIT est loggé par le cache: on coupe stdout pendant la mesure
+        real_stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            timings, legacy_timings = bench_size(size, args.dim, args.lookups, args.legacy_lookups)
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+
+        p50 = statistics.median(timings)
+        p99 = percentile(timings, 0.99)
+        legacy_p50 = statistics.median(legacy_timings)
+        print(
+            f"{size:>8} | {p50:>9.3f} ms | {p99:>9.3f} ms | {legacy_p50:>8.2f} ms | "
+            f"{legacy_p50 / p50:>5.0f}x"
+        )
+
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
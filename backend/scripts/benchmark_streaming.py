@@ -0,0 +1,125 @@
+"""
+Benchmark du streaming SSE: connexion-secondes et frames par réponse.
+
+Compare, pour des réponses concurrentes:
+- legacy: sleep(0.12) après chaque chunk du provider, suivi de commande
+  caractère par caractère (3 ms) et 6 étapes "thinking" de 1.2 s
+- actuel: chunks à la vitesse du provider, regroupés par
+  coalesce_token_events (stream_coalesce_ms), étapes envoyées d'un coup
+
+Le provider est simulé (un token toutes les --token-ms ms) pour mesurer
+uniquement le coût du serveur, pas celui du LLM.
+
+Usage:
+    python scripts/benchmark_streaming.py [--answers 50] [--tokens 300] [--token-ms 15]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api.sse import coalesce_token_events, sse_event, text_segments
+
+
+ORDER_RESPONSE = (
+    "Votre commande n°13349 est en cours de fabrication. L'impression de vos livres a démarré "
+    "et la reliure est prévue demain. Expédition estimée sous 3 jours ouvrés, livraison par "
+    "Colissimo 48 h après l'expédition. Paiement validé le 12/11. "
+) * 3
+THINKING_STEPS = 6
+
+
+async def provider_tokens(tokens: int, token_ms: float):
+    """Provider simulé: un token de ~4 caractères toutes les token_ms."""
+    for i in range(tokens):
+        await asyncio.sleep(token_ms / 1000.0)
+        yield {"type": "token", "content": f"mot{i % 10} "}
+    yield {"type": "sources", "sources": []}
+    yield {"type": "done"}
+
+
+async def legacy_rag(tokens: int, token_ms: float):
+    async for event in provider_tokens(tokens, token_ms):
+        yield sse_event(event)
+        if event["type"] == "token":
+            await asyncio.sleep(0.12)
+
+
+async def current_rag(tokens: int, token_ms: float, window_ms: float):
+    async for event in coalesce_token_events(provider_tokens(tokens, token_ms), window_ms):
+        yield sse_event(event)
+
+
+async def legacy_order():
+    for _ in range(THINKING_STEPS):
+        yield sse_event({"type": "thinking", "content": "..."})
+        await asyncio.sleep(1.2)
+    for char in ORDER_RESPONSE:
+        yield sse_event({"type": "token", "content": char})
+        await asyncio.sleep(0.003)
+    yield sse_event({"type": "done"})
+
+
+async def current_order():
+    for _ in range(THINKING_STEPS):
+        yield sse_event({"type": "thinking", "content": "..."})
+    for segment in text_segments(ORDER_RESPONSE):
+        yield sse_event({"type": "token", "content": segment})
+    yield sse_event({"type": "done"})
+
+
+async def consume(stream) -> tuple:
+    """Durée pendant laquelle la connexion reste ouverte + nombre de frames."""
+    start = time.perf_counter()
+    frames = 0
+    async for _ in stream:
+        frames += 1
+    return time.perf_counter() - start, frames
+
+
+async def measure(factory, answers: int) -> dict:
+    start = time.perf_counter()
+    results = await asyncio.gather(*[consume(factory()) for _ in range(answers)])
+    wall = time.perf_counter() - start
+    durations = [d for d, _ in results]
+    return {
+        "connection_seconds": sum(durations),
+        "per_answer_s": statistics.mean(durations),
+        "frames": statistics.mean(f for _, f in results),
+        "wall_s": wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark connexion-secondes du streaming SSE")
+    parser.add_argument("--answers", type=int, default=50, help="Réponses concurrentes")
+    parser.add_argument("--tokens", type=int, default=300, help="Tokens par réponse RAG")
+    parser.add_argument("--token-ms", type=float, default=15.0, help="Intervalle entre tokens du provider")
+    parser.add_argument("--window-ms", type=float, default=30.0, help="stream_coalesce_ms")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("RAG legacy", lambda: legacy_rag(args.tokens, args.token_ms)),
+        ("RAG actuel", lambda: current_rag(args.tokens, args.token_ms, args.window_ms)),
+        ("Commande legacy", legacy_order),
+        ("Commande actuel", current_order),
+    ]
+
+    print("=" * 80)
+    print(f"🧪 BENCHMARK STREAMING ({args.answers} réponses concurrentes, "
+          f"{args.tokens} tokens à {args.token_ms:g} ms, fenêtre {args.window_ms:g} ms)")
+    print("=" * 80)
+    print(f"{'Scénario':>16} | {'conn-s / réponse':>16} | {'conn-s total':>12} | {'frames / réponse':>16}")
+    print("-" * 80)
+    for name, factory in scenarios:
+        r = asyncio.run(measure(factory, args.answers))
+        print(f"{name:>16} | {r['per_answer_s']:>14.2f} s | {r['connection_seconds']:>10.1f} s | {r['frames']:>16.0f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Évaluation hors ligne du pré-classifieur d'intention (règles avant LLM).
+
+Rejoue les questions de benchmark_chatbot.py (toutes des questions
+générales) et un jeu de messages de suivi de commande / salutations, puis
+mesure pour le niveau "règles" de MessageAnalyzer:
+- le taux de décision (messages qui n'iront pas au LLM)
+- la précision des décisions prises (une erreur = mauvaise intention)
+- la latence
+
+Aucun appel LLM: les messages ambigus sont seulement comptés comme
+"envoyés au LLM".
+
+Usage:
+    python scripts/evaluate_intent_rules.py [--verbose]
+"""
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(BACKEND_DIR))
+
+from app.services.message_analyzer import MessageAnalyzer
+from benchmark_chatbot import QUESTIONS
+
+
+# (message, intention attendue, numéro attendu)
+TRACKING_AND_SMALL_TALK = [
+    ("13348", "order_tracking", "13348"),
+    ("#13349", "order_tracking", "13349"),
+    ("n° 13348", "order_tracking", "13348"),
+    ("commande 13348", "order_tracking", "13348"),
+    ("Où en est ma commande 13348 ?", "order_tracking", "13348"),
+    ("ou en est ma commande 13349", "order_tracking", "13349"),
+    ("Suivi commande #12345", "order_tracking", "12345"),
+    ("Où est mon colis 99887 ?", "order_tracking", "99887"),
+    ("Je n'ai pas reçu la commande 55443", "order_tracking", "55443"),
+    ("Bonjour, où en est ma commande ?", "order_tracking", None),
+    ("Je voudrais suivre ma commande", "order_tracking", None),
+    ("Status 11223", "order_tracking", "11223"),
+    ("C'est pour quand la 99887 ?", "order_tracking", "99887"),
+    ("Mon colis est en retard", "order_tracking", None),
+    ("Bonjour", "general_question", None),
+    ("Merci !", "general_question", None),
+    ("Bonne journée", "general_question", None),
+    ("Quels sont vos tarifs ?", "general_question", None),
+    ("Comment créer une couverture ?", "general_question", None),
+    ("Faites-vous des reliures spirales ?", "general_question", None),
+    ("Annuler ma commande", "general_question", None),
+    ("Je veux annuler ma commande 13348", "general_question", "13348"),
+    ("Mon livre est mal imprimé", "general_question", None),
+    ("Livrez-vous en Belgique ?", "general_question", None),
+]
+
+
+def labelled_messages():
+    for q in QUESTIONS:
+        yield q["question"], "general_question", None, f"benchmark #{q['id']} ({q['category']})"
+    for message, intent, order_number in TRACKING_AND_SMALL_TALK:
+        yield message, intent, order_number, "suivi / small talk"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Précision et couverture des règles d'intention")
+    parser.add_argument("--verbose", action="store_true", help="Afficher chaque message")
+    args = parser.parse_args()
+
+    analyzer = MessageAnalyzer(llm_service=None)  # Règles uniquement: aucun appel LLM
+    decided = correct = total = 0
+    errors, deferred, latencies = [], [], []
+
+    for message, expected_intent, expected_number, origin in labelled_messages():
+        total += 1
+        started = time.perf_counter()
+        result = analyzer.classify_with_rules(message)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        if result is None:
+            deferred.append((message, origin))
+            status = "→ LLM"
+        else:
+            decided += 1
+            ok = result["intent"] == expected_intent and (
+                expected_intent != "order_tracking" or result["order_number"] == expected_number
+            )
+            correct += ok
+            status = "✅" if ok else "❌"
+            if not ok:
+                errors.append((message, expected_intent, expected_number, result))
+        if args.verbose:
+            print(f"{status:>5} | {origin:<32} | {message}")
+
+    latencies.sort()
+    print("=" * 80)
+    print("🧪 PRÉ-CLASSIFIEUR D'INTENTION (règles avant LLM)")
+    print("=" * 80)
+    print(f"Messages:            {total}")
+    print(f"Décidés par règles:  {decided} ({decided / total:.0%}) - pas d'appel LLM")
+    print(f"Envoyés au LLM:      {len(deferred)} ({len(deferred) / total:.0%})")
+    print(f"Précision (décidés): {correct}/{decided} ({correct / decided:.1%})" if decided else "Précision: n/a")
+    print(f"Latence règles:      p50 {latencies[len(latencies) // 2]:.3f} ms | max {latencies[-1]:.3f} ms")
+    if errors:
+        print("\n❌ Erreurs:")
+        for message, intent, number, result in errors:
+            print(f"   {message!r}: attendu {intent}/{number}, obtenu {result['intent']}/{result['order_number']}")
+    print("=" * 80)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,9 @@
-"""Script to index PDF documents into the vector store."""
+"""Script to index PDF documents into the vector store.
+
+Incremental by default: only new or changed chunks are embedded (see
+app/services/document_index.py). Use --full to rebuild from scratch.
+"""
+import argparse
 import sys
 import os
 from pathlib import Path
@@ -11,6 +16,7 @@ from app.core.config import settings
 from app.services.pdf_processor import PDFProcessor
 from app.services.embeddings import EmbeddingService
 from app.services.vectorstore import VectorStoreService
+from app.services.document_index import DocumentIndexer, IndexSummary
 
 
 def move_scraped_files():
@@ -34,8 +40,30 @@ def move_scraped_files():
     return moved_count
 
 
-def index_all_documents():
-    """Index all documents (callable function for imports)."""
+def print_summary(summary: IndexSummary):
+    """Print the chunks added / changed / removed, embedding time saved and throughput."""
+    mode = "full rebuild" if summary.full_rebuild else "incremental"
+    print(f"\n📊 Indexing summary ({mode})")
+    print(f"   Files:  {summary.files_added} added, {summary.files_changed} changed, "
+          f"{summary.files_removed} removed, {summary.files_unchanged} unchanged, {summary.files_failed} failed")
+    print(f"   Chunks: {summary.chunks_added} added, {summary.chunks_changed} changed, "
+          f"{summary.chunks_removed} removed, {summary.chunks_unchanged} unchanged")
+    print(f"   Embedding: {summary.embed_seconds:.1f}s spent in {summary.batches} batches, "
+          f"~{summary.embed_seconds_saved:.1f}s saved")
+    peak = f"{summary.peak_rss_mb:.0f} MB" if summary.peak_rss_mb is not None else "n/a"
+    print(f"   Run: {summary.elapsed_s:.1f}s, {summary.throughput_chunks_s:.1f} chunks/s, peak RSS {peak}")
+    print(f"   Total chunks in vector store: {summary.total_chunks}")
+
+
+def index_all_documents(full: bool = False) -> int:
+    """Index all documents (callable function for imports).
+    
+    Args:
+        full: Rebuild the whole collection instead of an incremental sync
+        
+    Returns:
+        Number of chunks in the vector store
+    """
     # Check if docs directory exists
     docs_path = Path(settings.docs_path)
     if not docs_path.exists():
@@ -55,23 +83,22 @@ def index_all_documents():
         embedding_service=embedding_service
     )
     
-    # Process PDFs
-    documents = pdf_processor.process_directory(str(docs_path))
-    
-    if not documents:
+    if not pdf_processor.list_documents(str(docs_path)):
         raise ValueError("No documents found to index")
     
-    # Clear existing vector store
-    vectorstore.clear()
+    # Incremental sync (content-addressed chunks + file manifest)
+    summary = DocumentIndexer(vectorstore, pdf_processor).sync(str(docs_path), full=full)
+    print_summary(summary)
     
-    # Add documents to vector store
-    vectorstore.add_documents(documents)
-    
-    return vectorstore.count()
+    return summary.total_chunks
 
 
 def main():
     """Index PDF documents."""
+    parser = argparse.ArgumentParser(description="Index docs/ into the vector store")
+    parser.add_argument("--full", action="store_true", help="Clear the collection and re-embed everything")
+    args = parser.parse_args()
+    
     print("📚 LibriAssist - Document Indexer")
     print("=" * 50)
     
@@ -106,22 +133,16 @@ def main():
     
     # Process PDFs
     print(f"\n📄 Processing PDFs from: {docs_path}")
-    documents = pdf_processor.process_directory(str(docs_path))
-    
-    if not documents:
+    if not pdf_processor.list_documents(str(docs_path)):
         print("\n❌ No documents were processed. Make sure PDF files exist in the docs directory.")
         return
     
-    # Clear existing vector store (optional)
-    print("\n🗑️  Clearing existing vector store...")
-    vectorstore.clear()
-    
-    # Add documents to vector store
-    print("\n💾 Adding documents to vector store...")
-    vectorstore.add_documents(documents)
+    # Only new / changed chunks are embedded (--full: clear and rebuild)
+    print(f"\n💾 Syncing vector store ({'full rebuild' if args.full else 'incremental'})...")
+    summary = DocumentIndexer(vectorstore, pdf_processor).sync(str(docs_path), full=args.full)
+    print_summary(summary)
     
     print("\n✅ Indexing complete!")
-    print(f"📊 Total documents in vector store: {vectorstore.count()}")
     print("\n💡 You can now start the API server with: python main.py")
 
 
@@ -0,0 +1,114 @@
+"""
+Préchauffage du cache de réponses + rapport de couverture du trafic réel.
+
+Rejoue une liste de questions dans RAGPipeline (priorité basse, concurrence
+limitée) pour remplir le cache sémantique. Avec SEMANTIC_CACHE_PERSIST_PATH,
+les réponses sont écrites dans le fichier partagé et les workers en cours
+d'exécution les récupèrent à leur prochaine synchronisation.
+
+Sources de questions (cumulables):
+- --benchmark: les questions de benchmark_chatbot.py
+- --questions FICHIER: .txt (une par ligne), .json ou .jsonl
+- --log FICHIER --top N: les N questions les plus fréquentes du journal
+
+Usage:
+    python scripts/warm_cache.py --benchmark --log data/query_log.jsonl --top 50
+    python scripts/warm_cache.py --benchmark --traffic data/query_log.jsonl --report-only
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.dirname(BACKEND_DIR))
+
+from app.core.config import settings
+from app.services.cache_warmer import coverage_report, iter_questions, load_questions, warm_cache
+from app.services.semantic_cache import close_response_cache
+
+
+def collect_questions(args) -> list:
+    questions = []
+    if args.benchmark:
+        from benchmark_chatbot import QUESTIONS
+        questions.extend(q["question"] for q in QUESTIONS)
+    for path in args.questions or []:
+        questions.extend(load_questions(path))
+    if args.log:
+        questions.extend(load_questions(args.log, top_n=args.top))
+    return questions
+
+
+def build_pipeline():
+    """Mêmes services que le démarrage de l'API."""
+    from app.services.embeddings import EmbeddingService
+    from app.services.vectorstore import VectorStoreService
+    from app.services.llm import OllamaService
+    from app.services.rag_pipeline import RAGPipeline
+
+    embedding_service = EmbeddingService(settings.embedding_model)
+    vectorstore = VectorStoreService(persist_directory=settings.vectorstore_path, embedding_service=embedding_service)
+    llm = OllamaService(base_url=settings.ollama_base_url, model=settings.ollama_model)
+    return RAGPipeline(
+        vectorstore=vectorstore,
+        llm_service=llm,
+        top_k=settings.top_k_results,
+        rerank_top_n=settings.rerank_top_n,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Préchauffage du cache de réponses")
+    parser.add_argument("--benchmark", action="store_true", help="Questions de benchmark_chatbot.py")
+    parser.add_argument("--questions", action="append", help="Fichier de questions (.txt/.json/.jsonl)")
+    parser.add_argument("--log", help="Journal des questions (QUERY_LOG_PATH)")
+    parser.add_argument("--top", type=int, default=settings.cache_warmup_top_n, help="Top-N du journal")
+    parser.add_argument("--concurrency", type=int, default=settings.cache_warmup_concurrency)
+    parser.add_argument("--traffic", help="Trafic réel pour le rapport de couverture (défaut: --log)")
+    parser.add_argument("--report-only", action="store_true", help="Rapport de couverture sans rejouer")
+    parser.add_argument("--exact-only", action="store_true", help="Couverture exacte (sans charger le modèle)")
+    args = parser.parse_args()
+
+    questions = collect_questions(args)
+    if not questions:
+        parser.error("aucune question: utilisez --benchmark, --questions ou --log")
+
+    pipeline = None
+    if not args.report_only:
+        pipeline = build_pipeline()
+        report = asyncio.run(warm_cache(pipeline, questions, concurrency=args.concurrency))
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        close_response_cache()
+
+    traffic_path = args.traffic or args.log
+    if traffic_path:
+        embed_func = None
+        threshold = 0.92
+        if not args.exact_only:
+            if pipeline is None:
+                pipeline = build_pipeline()
+            embed_func = pipeline.vectorstore.embedding_service.embed_query
+            if pipeline._semantic_cache is not None:
+                threshold = pipeline._semantic_cache.similarity_threshold
+        coverage = coverage_report(questions, list(iter_questions(traffic_path)), embed_func, threshold)
+        print("=" * 80)
+        print("🔥 COUVERTURE DU TRAFIC PAR LE JEU PRÉCHAUFFÉ")
+        print("=" * 80)
+        print(f"Jeu préchauffé:      {coverage['warm_set_size']} questions")
+        print(f"Trafic FAQ:          {coverage['faq_questions']} (suivi de commande exclu: {coverage['order_tracking_excluded']})")
+        print(f"Couvert (exact):     {coverage['covered_exact']}")
+        print(f"Couvert (similaire): {coverage['covered_semantic']}")
+        print(f"Couverture:          {coverage['coverage']}")
+        if coverage["top_uncovered"]:
+            print("\nQuestions fréquentes non couvertes:")
+            for item in coverage["top_uncovered"]:
+                print(f"   {item['count']:>4} × {item['question']}")
+        print("=" * 80)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,7 +9,10 @@
     title: window.LIBRIASSIST_CONFIG?.title || 'LibriAssist',
     subtitle: window.LIBRIASSIST_CONFIG?.subtitle || 'Assistant CoolLibri',
     welcomeMessage: window.LIBRIASSIST_CONFIG?.welcomeMessage || 'Bonjour ! Comment puis-je vous aider ?',
-    placeholder: window.LIBRIASSIST_CONFIG?.placeholder || 'Posez votre question...'
+    placeholder: window.LIBRIASSIST_CONFIG?.placeholder || 'Posez votre question...',
+    // Effet machine à écrire (ms par caractère, 0 = affichage immédiat).
+    // Le serveur envoie la réponse à la vitesse du LLM: le rythme est géré ici.
+    typingDelayMs: window.LIBRIASSIST_CONFIG?.typingDelayMs ?? 12
   };
 
   // Styles CSS du widget
@@ -413,13 +416,17 @@
       const decoder = new TextDecoder();
       let assistantMessage = '';
       let messageElement = null;
+      let typewriter = null;
+      let buffer = '';
 
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n');
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        // Garder la dernière ligne incomplète pour la lecture suivante
+        buffer = lines.pop() || '';
 
         for (const line of lines) {
           if (line.startsWith('data: ')) {
@@ -431,10 +438,10 @@
                 if (!messageElement) {
                   hideTyping(typingId);
                   messageElement = addMessage('', 'assistant');
+                  typewriter = createTypewriter(messageElement);
                 }
                 assistantMessage += data.content;
-                messageElement.textContent = assistantMessage;
-                scrollToBottom();
+                typewriter.push(data.content);
               }
               
               if (data.type === 'done') {
@@ -483,6 +490,35 @@
     return contentDiv;
   }
 
+  // Effet machine à écrire: révèle le texte reçu progressivement
+  function createTypewriter(element) {
+    let target = '';
+    let shown = 0;
+    let timer = null;
+
+    function tick() {
+      // Accélérer quand le texte reçu s'accumule (pas de retard qui s'empile)
+      const step = Math.max(1, Math.ceil((target.length - shown) / 40));
+      shown = Math.min(target.length, shown + step);
+      element.textContent = target.slice(0, shown);
+      scrollToBottom();
+      timer = shown < target.length ? setTimeout(tick, CONFIG.typingDelayMs) : null;
+    }
+
+    return {
+      push(text) {
+        target += text;
+        if (CONFIG.typingDelayMs <= 0) {
+          shown = target.length;
+          element.textContent = target;
+          scrollToBottom();
+        } else if (!timer) {
+          tick();
+        }
+      }
+    };
+  }
+
   // Afficher l'indicateur de frappe
   function showTyping() {
     const id = 'typing-' + Date.now();
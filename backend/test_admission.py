@@ -0,0 +1,176 @@
+"""Tests du contrôle d'admission (priorités, délestage, deadline)."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.admission import (
+    AdmissionController,
+    AdmissionRejectedError,
+    Deadline,
+    DeadlineExceededError,
+    resolve_priority,
+)
+from app.services.request_batcher import RequestBatcher, RequestPriority
+
+
+def test_queue_is_served_by_priority():
+    controller = AdmissionController(max_concurrent=1, max_queue=10)
+    order = []
+
+    async def request(name, priority):
+        async with controller.admit(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        # Le premier occupe l'unique slot, les autres attendent en file
+        first = asyncio.create_task(request("first", RequestPriority.NORMAL))
+        await asyncio.sleep(0)
+        others = [
+            asyncio.create_task(request("low", RequestPriority.LOW)),
+            asyncio.create_task(request("normal", RequestPriority.NORMAL)),
+            asyncio.create_task(request("high", RequestPriority.HIGH)),
+        ]
+        await asyncio.gather(first, *others)
+
+    asyncio.run(run())
+    assert order == ["first", "high", "normal", "low"]
+    stats = controller.get_stats()
+    assert stats["admitted"] == 4
+    assert stats["active"] == 0 and stats["queued"] == 0
+    assert stats["priorities"]["LOW"]["queue_time_ms"]["max"] > 0
+
+
+def test_sheds_when_estimated_wait_exceeds_budget():
+    controller = AdmissionController(
+        max_concurrent=1,
+        max_queue=10,
+        max_wait_s={RequestPriority.HIGH: 30.0, RequestPriority.NORMAL: 30.0, RequestPriority.LOW: 1.0},
+        initial_service_time_s=2.0,
+    )
+
+    async def run():
+        await controller.acquire(RequestPriority.NORMAL)
+        # LOW: attente estimée 2 s > 1 s autorisée -> refus immédiat
+        try:
+            await controller.acquire(RequestPriority.LOW)
+            raise AssertionError("LOW aurait dû être délesté")
+        except AdmissionRejectedError as e:
+            assert e.retry_after == 2
+        # NORMAL avec un deadline court: refusé aussi
+        try:
+            await controller.acquire(RequestPriority.NORMAL, Deadline(0.5))
+            raise AssertionError("deadline trop court")
+        except AdmissionRejectedError:
+            pass
+        controller.release()
+
+    asyncio.run(run())
+    stats = controller.get_stats()
+    assert stats["rejected_wait"] == 2
+    assert stats["active"] == 0
+
+
+def test_per_priority_quota():
+    controller = AdmissionController(
+        max_concurrent=1,
+        max_queue=10,
+        queue_quotas={RequestPriority.HIGH: 10, RequestPriority.NORMAL: 10, RequestPriority.LOW: 1},
+    )
+
+    async def run():
+        await controller.acquire(RequestPriority.NORMAL)
+        waiting = asyncio.create_task(controller.acquire(RequestPriority.LOW))
+        await asyncio.sleep(0)
+        try:
+            await controller.acquire(RequestPriority.LOW)
+            raise AssertionError("quota LOW dépassé")
+        except AdmissionRejectedError as e:
+            assert "pleine" in e.reason
+        # HIGH a encore de la place
+        high = asyncio.create_task(controller.acquire(RequestPriority.HIGH))
+        await asyncio.sleep(0)
+        controller.release()
+        await high
+        controller.release()
+        await waiting
+        controller.release()
+
+    asyncio.run(run())
+    assert controller.get_stats()["rejected_queue_full"] == 1
+    assert controller.get_stats()["active"] == 0
+
+
+def test_timeout_in_queue_frees_the_place():
+    controller = AdmissionController(
+        max_concurrent=1,
+        max_queue=10,
+        initial_service_time_s=0.01,
+        max_wait_s={p: 0.05 for p in RequestPriority},
+    )
+
+    async def run():
+        await controller.acquire(RequestPriority.NORMAL)
+        try:
+            await controller.acquire(RequestPriority.NORMAL)
+            raise AssertionError("aurait dû expirer en file")
+        except AdmissionRejectedError:
+            pass
+        assert controller.queued == 0
+        controller.release()
+        # Le slot n'a pas été donné au requérant parti
+        await controller.acquire(RequestPriority.NORMAL)
+        controller.release()
+
+    asyncio.run(run())
+    stats = controller.get_stats()
+    assert stats["timed_out_in_queue"] == 1
+    assert stats["active"] == 0
+
+
+def test_deadline_cancels_abandoned_llm_call():
+    batcher = RequestBatcher(batch_window_ms=10, max_concurrent=4)
+    state = {"started": 0, "cancelled": 0}
+
+    async def slow_llm(query, context, history):
+        state["started"] += 1
+        try:
+            await asyncio.sleep(1.0)
+        except asyncio.CancelledError:
+            state["cancelled"] += 1
+            raise
+        return "trop tard"
+
+    async def run():
+        deadline = Deadline(0.05)
+        try:
+            await deadline.wait_for(batcher.submit("q", "ctx", slow_llm), stage="l'appel LLM")
+            raise AssertionError("le deadline aurait dû expirer")
+        except DeadlineExceededError:
+            pass
+        await asyncio.sleep(0.02)
+        await batcher.stop()
+
+    asyncio.run(run())
+    assert state == {"started": 1, "cancelled": 1}
+    assert batcher.get_stats()["abandoned_requests"] == 1
+    assert batcher.get_stats()["inflight_requests"] == 0
+
+
+def test_resolve_priority_only_allows_downgrade():
+    assert resolve_priority("low") == RequestPriority.LOW
+    assert resolve_priority("high") == RequestPriority.NORMAL
+    assert resolve_priority(None, is_order_tracking=True) == RequestPriority.HIGH
+    assert resolve_priority("LOW", is_order_tracking=True) == RequestPriority.LOW
+
+
+if __name__ == "__main__":
+    test_queue_is_served_by_priority()
+    test_sheds_when_estimated_wait_exceeds_budget()
+    test_per_priority_quota()
+    test_timeout_in_queue_frees_the_place()
+    test_deadline_cancels_abandoned_llm_call()
+    test_resolve_priority_only_allows_downgrade()
+    print("✅ Tous les tests d'admission passent")
@@ -0,0 +1,137 @@
+"""Tests du préchauffage du cache (journal, chargement, rejeu, couverture)."""
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.models.schemas import ChatResponse
+from app.services.cache_warmer import coverage_report, flush_query_log, get_warmup_stats, load_questions, record_query, warm_cache
+from app.services.request_batcher import RequestPriority
+
+
+class FakePipeline:
+    """generate_response qui mesure la concurrence et la priorité reçue."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+    async def generate_response(self, query, deadline=None, priority=RequestPriority.NORMAL):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.calls.append((query, priority))
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return ChatResponse(answer="ok", conversation_id="warmup", intent="general_question")
+
+
+def fake_embedding(text):
+    """Même vecteur pour les questions qui partagent leur premier mot."""
+    seed = int(hashlib.md5(text.lower().split()[0].encode()).hexdigest()[:8], 16)
+    return np.random.default_rng(seed).standard_normal(16)
+
+
+def test_query_log_top_n_skips_order_tracking_and_history():
+    with tempfile.TemporaryDirectory() as tmp:
+        previous = settings.query_log_path
+        settings.query_log_path = os.path.join(tmp, "query_log.jsonl")
+        try:
+            for question in ["Quels sont vos tarifs ?"] * 3 + ["Livrez-vous en Belgique ?"] * 2 + ["Comment créer une couverture ?"]:
+                record_query(question)
+            record_query("Où en est ma commande 13348 ?")
+            record_query("Et pour 200 exemplaires ?", has_history=True)
+            record_query("  quels sont   VOS tarifs ?")
+            flush_query_log()
+            with open(settings.query_log_path, encoding="utf-8") as f:
+                logged = f.read()
+            questions = load_questions(settings.query_log_path, top_n=2)
+        finally:
+            settings.query_log_path = previous
+    assert questions == ["Quels sont vos tarifs ?", "Livrez-vous en Belgique ?"]
+    # Les suivis de commande ne sont jamais écrits (numéro de commande = donnée client)
+    assert "13348" not in logged
+    assert get_warmup_stats()["query_log_stats"]["skipped_order_tracking"] >= 1
+
+
+def test_query_log_writer_survives_a_failing_batch():
+    from app.services import cache_warmer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        previous_path, previous_check = settings.query_log_path, cache_warmer.is_cacheable
+        settings.query_log_path = os.path.join(tmp, "query_log.jsonl")
+
+        def broken(question):
+            raise ValueError("filtre cassé")
+
+        try:
+            cache_warmer.is_cacheable = broken
+            record_query("Quels sont vos délais ?")
+            assert flush_query_log(timeout_s=2.0) is True  # task_done() malgré l'exception
+            cache_warmer.is_cacheable = previous_check
+            record_query("Quels sont vos délais ?")
+            assert flush_query_log(timeout_s=2.0) is True
+            with open(settings.query_log_path, encoding="utf-8") as f:
+                logged = f.readlines()
+        finally:
+            settings.query_log_path = previous_path
+            cache_warmer.is_cacheable = previous_check
+    assert len(logged) == 1
+    assert get_warmup_stats()["query_log_stats"]["errors"] >= 1
+
+
+def test_warm_up_runs_at_low_priority_with_bounded_concurrency():
+    pipeline = FakePipeline()
+    questions = [f"Question FAQ numéro {i} ?" for i in range(10)] + ["Question FAQ numéro 1 ?", "13348"]
+    report = asyncio.run(warm_cache(pipeline, questions, concurrency=2))
+
+    assert report["questions"] == 10  # doublon et suivi de commande retirés
+    assert report["warmed"] == 10 and report["failed"] == 0
+    assert pipeline.peak == 2
+    assert all(priority is RequestPriority.LOW for _, priority in pipeline.calls)
+
+
+def test_coverage_counts_exact_and_similar_questions():
+    warm = ["Tarifs des livres ?", "Délais de livraison ?"]
+    traffic = [
+        "tarifs des livres ?",           # exact (normalisé)
+        "Tarifs pour 100 exemplaires",   # similaire (fake_embedding)
+        "Reliure spirale possible ?",    # non couvert
+        "Reliure spirale possible ?",
+        "Où en est ma commande 13348 ?", # exclu
+    ]
+    exact_only = coverage_report(warm, traffic)
+    assert exact_only["faq_questions"] == 4
+    assert exact_only["covered_exact"] == 1 and exact_only["coverage"] == "25.0%"
+
+    report = coverage_report(warm, traffic, embed_func=fake_embedding, threshold=0.92)
+    assert report["covered_semantic"] == 1
+    assert report["coverage"] == "50.0%"
+    assert report["order_tracking_excluded"] == 1
+    assert report["top_uncovered"][0] == {"question": "reliure spirale possible ?", "count": 2}
+
+
+def test_question_files_accept_text_and_json():
+    with tempfile.TemporaryDirectory() as tmp:
+        txt = os.path.join(tmp, "faq.txt")
+        with open(txt, "w", encoding="utf-8") as f:
+            f.write("# FAQ\nQuels formats ?\n\nQuels formats ?\nDélais ?\n")
+        js = os.path.join(tmp, "faq.json")
+        with open(js, "w", encoding="utf-8") as f:
+            json.dump([{"question": "Délais ?"}, "Papier recyclé ?"], f)
+        assert load_questions(txt) == ["Quels formats ?", "Délais ?"]
+        assert load_questions(js) == ["Délais ?", "Papier recyclé ?"]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
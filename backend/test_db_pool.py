@@ -0,0 +1,146 @@
+"""Tests du pool de connexions SQL (SQLite comme base locale de substitution)."""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.db_pool import ConnectionPool, PoolTimeoutError
+
+
+def make_database() -> str:
+    """Base SQLite avec une table [Order] minimale."""
+    path = os.path.join(tempfile.mkdtemp(), "orders.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE [Order] (OrderId INTEGER PRIMARY KEY, StatusName TEXT)")
+    conn.executemany("INSERT INTO [Order] VALUES (?, ?)", [(i, f"Statut {i % 5}") for i in range(1, 201)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+class CountingConnect:
+    """connect() qui compte les ouvertures et simule le coût du handshake/login."""
+
+    def __init__(self, path: str, latency_s: float = 0.02):
+        self.path = path
+        self.latency_s = latency_s
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.count += 1
+        time.sleep(self.latency_s)
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+
+def lookup(pool: ConnectionPool, order_id: int):
+    """Équivalent de get_order_tracking_details: une requête par appel."""
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("SELECT OrderId, StatusName FROM [Order] WHERE OrderId = ?", (order_id,))
+        row = cursor.fetchone()
+        cursor.close()
+        time.sleep(0.005)
+        return row
+
+
+def test_connect_count_stays_flat_under_concurrent_lookups():
+    connect = CountingConnect(make_database())
+    pool = ConnectionPool("test", connect, max_size=8, checkout_timeout_s=10.0)
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        rows = list(executor.map(lambda i: lookup(pool, i % 200 + 1), range(100)))
+    assert all(row is not None for row in rows)
+    assert connect.count <= 8
+
+    # Deuxième vague: uniquement des connexions réutilisées
+    before = connect.count
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        list(executor.map(lambda i: lookup(pool, i % 200 + 1), range(100)))
+    assert connect.count == before
+
+    stats = pool.get_stats()
+    assert stats["checkouts"] == 200
+    assert stats["connects"] == connect.count
+    assert stats["in_use"] == 0
+    assert stats["waiters"] == 0
+    assert stats["peak_in_use"] <= 8
+    assert stats["connect_latency_ms"]["p50"] >= 20
+
+
+def test_checkout_timeout_when_pool_exhausted():
+    pool = ConnectionPool("test", CountingConnect(make_database(), 0), max_size=1, checkout_timeout_s=0.05)
+    held = pool.acquire()
+    start = time.perf_counter()
+    try:
+        pool.acquire()
+        assert False, "PoolTimeoutError attendue"
+    except PoolTimeoutError:
+        pass
+    assert time.perf_counter() - start < 1.0
+    pool.release(held)
+    assert pool.get_stats()["timeouts"] == 1
+    # Connexion rendue: de nouveau disponible
+    pool.release(pool.acquire())
+
+
+def test_broken_connection_is_discarded():
+    connect = CountingConnect(make_database(), 0)
+    pool = ConnectionPool("test", connect, max_size=2)
+    try:
+        with pool.connection() as connection:
+            connection.execute("SELECT * FROM table_inexistante")
+    except sqlite3.OperationalError:
+        pass
+    stats = pool.get_stats()
+    assert stats["discarded"] == 1
+    assert stats["open"] == 0
+    assert lookup(pool, 1) is not None
+    assert connect.count == 2
+
+
+def test_idle_connection_health_check_and_max_lifetime():
+    connect = CountingConnect(make_database(), 0)
+    pool = ConnectionPool("test", connect, max_size=2, health_check_interval_s=0.0, max_lifetime_s=60.0)
+
+    # Connexion fermée côté serveur pendant qu'elle dormait dans le pool
+    entry = pool.acquire()
+    pool.release(entry)
+    entry.raw.close()
+    assert lookup(pool, 1) is not None
+    assert pool.get_stats()["health_check_failures"] == 1
+    assert connect.count == 2
+
+    # Connexion trop ancienne: recyclée au prochain checkout
+    pool.max_lifetime_s = 0.0
+    assert lookup(pool, 2) is not None
+    assert pool.get_stats()["recycled"] >= 1
+    assert connect.count >= 3
+
+
+def test_order_lookup_reports_pool_timeout_instead_of_not_found():
+    from app.services.database import DatabaseService
+
+    service = DatabaseService()
+    service.pool = ConnectionPool("test-busy", CountingConnect(make_database(), 0), max_size=1, checkout_timeout_s=0.05)
+    held = service.pool.acquire()
+    try:
+        # Pool saturé: l'appelant doit pouvoir répondre "réessayez", pas "commande introuvable"
+        service.get_order_tracking_details("987654")
+        assert False, "PoolTimeoutError attendue"
+    except PoolTimeoutError:
+        pass
+    finally:
+        service.pool.release(held)
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,212 @@
+"""Tests de l'indexation incrémentale (IDs par contenu + manifeste de fichiers)."""
+import hashlib
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from langchain.schema import Document
+
+from app.core.config import settings
+from app.services.document_index import DocumentIndexer
+from app.services.vectorstore import VectorStoreService, content_chunk_id
+
+
+class CountingEmbeddingService:
+    """embed_texts déterministe qui compte les textes embeddés."""
+
+    def __init__(self):
+        self.embedded = 0
+        self.calls = []
+
+    def embed_texts(self, texts, show_progress_bar=True):
+        self.embedded += len(texts)
+        self.calls.append(len(texts))
+        vectors = []
+        for text in texts:
+            seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+            vectors.append(np.random.default_rng(seed).standard_normal(8).tolist())
+        return vectors
+
+
+class ParagraphProcessor:
+    """Même interface que PDFProcessor: un chunk par paragraphe des .txt."""
+
+    def list_documents(self, directory_path):
+        return sorted(Path(directory_path).glob("*.txt"))
+
+    def process_file(self, file_path):
+        paragraphs = [p.strip() for p in Path(file_path).read_text(encoding="utf-8").split("\n\n") if p.strip()]
+        name = Path(file_path).name
+        return [
+            Document(page_content=p, metadata={"source": name, "chunk_id": i, "total_chunks": len(paragraphs)})
+            for i, p in enumerate(paragraphs)
+        ]
+
+
+def write(directory, name, paragraphs):
+    Path(directory, name).write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+
+def make_indexer(tmp, processor=None, **kwargs):
+    embeddings = CountingEmbeddingService()
+    vectorstore = VectorStoreService(persist_directory=os.path.join(tmp, "vectorstore"), embedding_service=embeddings)
+    return DocumentIndexer(vectorstore, processor or ParagraphProcessor(), **kwargs), embeddings
+
+
+class TrackingProcessor(ParagraphProcessor):
+    """Compte les fichiers extraits mais pas encore inscrits au manifeste."""
+
+    def __init__(self):
+        self.extracted = 0
+        self.indexer = None
+        self.max_in_flight = 0
+
+    def process_file(self, file_path):
+        self.extracted += 1
+        in_flight = self.extracted - self.indexer.progress["files_done"]
+        self.max_in_flight = max(self.max_in_flight, in_flight)
+        return super().process_file(file_path)
+
+
+def test_only_new_and_changed_chunks_are_embedded():
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = os.path.join(tmp, "docs")
+        os.makedirs(docs)
+        write(docs, "faq.txt", ["Délais: 5 jours.", "Formats: A5, A4.", "Papier: 90g."])
+        write(docs, "cgv.txt", ["Paiement à la commande.", "Retours sous 14 jours."])
+
+        indexer, embeddings = make_indexer(tmp)
+        first = indexer.sync(docs)
+        assert (first.files_added, first.chunks_added) == (2, 5)
+        assert embeddings.embedded == 5 and first.total_chunks == 5
+
+        second = indexer.sync(docs)
+        assert embeddings.embedded == 5  # rien de ré-embeddé
+        assert (second.files_unchanged, second.chunks_unchanged) == (2, 5)
+        assert second.embed_seconds_saved > 0
+
+        # Un paragraphe modifié, un ajouté: 2 chunks embeddés, 1 supprimé
+        write(docs, "faq.txt", ["Délais: 5 jours.", "Formats: A5, A4, carré.", "Papier: 90g.", "Reliure: spirale."])
+        third = indexer.sync(docs)
+        assert embeddings.embedded == 7
+        assert (third.files_changed, third.chunks_changed, third.chunks_removed) == (1, 2, 1)
+        assert third.chunks_unchanged == 2 + 2  # faq (2 conservés) + cgv
+        assert third.total_chunks == 6
+
+        # Positions mises à jour sans ré-embedding
+        kept = indexer.vectorstore.collection.get(ids=[content_chunk_id("faq.txt", "Papier: 90g.")])
+        assert kept["metadatas"][0]["chunk_id"] == 2 and kept["metadatas"][0]["total_chunks"] == 4
+
+        os.remove(os.path.join(docs, "cgv.txt"))
+        fourth = indexer.sync(docs)
+        assert (fourth.files_removed, fourth.chunks_removed) == (1, 2)
+        assert fourth.total_chunks == 4
+
+
+def test_interrupted_run_resumes_without_re_embedding():
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = os.path.join(tmp, "docs")
+        os.makedirs(docs)
+        write(docs, "faq.txt", ["Délais: 5 jours.", "Formats: A5, A4."])
+        indexer, embeddings = make_indexer(tmp)
+        indexer.sync(docs)
+
+        # Crash simulé: chunks de guide.txt upsertés, manifeste pas encore écrit
+        write(docs, "guide.txt", ["Étape 1: le fichier.", "Étape 2: la couverture."])
+        indexer.vectorstore.add_documents(ParagraphProcessor().process_file(os.path.join(docs, "guide.txt")))
+        embeddings.embedded = 0
+
+        summary = indexer.sync(docs)
+        assert not summary.full_rebuild
+        assert summary.files_added == 1 and summary.chunks_added == 0
+        assert embeddings.embedded == 0
+        assert summary.total_chunks == 4
+
+
+def test_legacy_positional_ids_and_settings_change_trigger_a_rebuild():
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = os.path.join(tmp, "docs")
+        os.makedirs(docs)
+        write(docs, "faq.txt", ["Délais: 5 jours.", "Formats: A5, A4."])
+        indexer, embeddings = make_indexer(tmp)
+        # Collection construite par l'ancien indexeur (doc_{i})
+        indexer.vectorstore.collection.add(ids=["doc_0"], embeddings=[[0.1] * 8], documents=["vieux"], metadatas=[{"source": "faq.txt"}])
+
+        summary = indexer.sync(docs)
+        assert summary.full_rebuild
+        assert sorted(indexer.vectorstore.get_ids()) == sorted(
+            content_chunk_id("faq.txt", text) for text in ("Délais: 5 jours.", "Formats: A5, A4.")
+        )
+
+        previous = settings.chunk_size
+        settings.chunk_size = previous + 100
+        try:
+            assert indexer.sync(docs).full_rebuild
+        finally:
+            settings.chunk_size = previous
+        assert embeddings.embedded == 4
+
+
+def test_streaming_pipeline_embeds_in_fixed_batches_with_bounded_memory():
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = os.path.join(tmp, "docs")
+        os.makedirs(docs)
+        for i in range(30):
+            write(docs, f"doc{i:02d}.txt", [f"Document {i}, paragraphe {j}." for j in range(5)])
+
+        processor = TrackingProcessor()
+        indexer, embeddings = make_indexer(tmp, processor, batch_size=8, queue_size=2)
+        processor.indexer = indexer
+        summary = indexer.sync(docs)
+
+        assert summary.files_added == 30 and summary.total_chunks == 150
+        # Lots fixes qui traversent les fichiers, seul le dernier est partiel
+        assert embeddings.calls == [8] * 18 + [6] and summary.batches == 19
+        # Files bornées: l'extraction ne prend qu'une avance fixe sur l'écriture
+        assert processor.max_in_flight <= 12
+        assert summary.throughput_chunks_s > 0 and summary.elapsed_s > 0
+
+
+def test_crash_mid_run_keeps_completed_files_and_resumes():
+    with tempfile.TemporaryDirectory() as tmp:
+        docs = os.path.join(tmp, "docs")
+        os.makedirs(docs)
+        indexer, embeddings = make_indexer(tmp, batch_size=4, queue_size=1)
+        indexer.sync(docs)  # manifeste initialisé: plus de reconstruction (qui recrée la collection)
+        for i in range(6):
+            write(docs, f"doc{i}.txt", [f"Doc {i} / {j}." for j in range(4)])
+
+        upsert = indexer.vectorstore.collection.upsert
+        written = []
+
+        def failing_upsert(**kwargs):
+            if len(written) == 3:
+                raise RuntimeError("disque plein")
+            written.append(kwargs["ids"])
+            return upsert(**kwargs)
+
+        indexer.vectorstore.collection.upsert = failing_upsert
+        try:
+            indexer.sync(docs)
+            raise AssertionError("l'erreur d'écriture doit remonter")
+        except RuntimeError:
+            pass
+        indexer.vectorstore.collection.upsert = upsert
+
+        # Les 3 fichiers écrits sont au manifeste, la reprise fait le reste
+        embeddings.embedded = 0
+        summary = indexer.sync(docs)
+        assert (summary.files_unchanged, summary.files_added) == (3, 3)
+        assert embeddings.embedded == 12 and summary.total_chunks == 24
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
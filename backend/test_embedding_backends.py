@@ -0,0 +1,72 @@
+"""Parité des backends d'embedding: ONNX int8 vs PyTorch sur le corpus docs/."""
+import glob
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from app.core.config import settings
+from app.services.embedding_backends import TorchEmbeddingBackend, OnnxEmbeddingBackend
+
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "docs")
+MAX_PASSAGES = 200
+
+# Seuils de parité (quantization int8 dynamique)
+MIN_MEAN_COSINE = 0.99
+MIN_COSINE = 0.97
+
+
+def load_passages(limit: int = MAX_PASSAGES):
+    """Paragraphes des fichiers .txt de docs/ (ordre stable)."""
+    passages = []
+    for path in sorted(glob.glob(os.path.join(DOCS_DIR, "*.txt"))):
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            for paragraph in f.read().split("\n\n"):
+                paragraph = paragraph.strip()
+                if len(paragraph) >= 40:
+                    passages.append(paragraph)
+    return passages[:limit]
+
+
+def test_onnx_matches_torch_on_docs_corpus():
+    passages = load_passages()
+    assert passages, "Corpus docs/ vide"
+
+    try:
+        torch_backend = TorchEmbeddingBackend(settings.embedding_model)
+    except OSError as e:
+        pytest.skip(f"Modèle {settings.embedding_model} indisponible (hors ligne ?): {e}")
+    reference = np.asarray(torch_backend.encode(passages), dtype=np.float32)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+
+    cache_dir = os.environ.get("EMBEDDING_ONNX_CACHE_DIR") or tempfile.mkdtemp(prefix="onnx-parity-")
+    onnx_backend = OnnxEmbeddingBackend(settings.embedding_model, cache_dir=cache_dir)
+    candidate = onnx_backend.encode(passages)
+
+    assert candidate.shape == reference.shape
+    cosines = np.sum(reference * candidate, axis=1)
+    print(f"Cosinus ONNX/torch sur {len(passages)} passages: "
+          f"moyenne={cosines.mean():.4f}, min={cosines.min():.4f}")
+    assert cosines.mean() >= MIN_MEAN_COSINE
+    assert cosines.min() >= MIN_COSINE
+
+    # Le plus proche voisin de chaque passage doit rester le même
+    torch_neighbours = np.argsort(-(reference @ reference.T), axis=1)[:, 1]
+    onnx_neighbours = np.argsort(-(candidate @ candidate.T), axis=1)[:, 1]
+    agreement = float(np.mean(torch_neighbours == onnx_neighbours))
+    print(f"Accord top-1 voisin: {agreement:.2%}")
+    assert agreement >= 0.9
+
+
+if __name__ == "__main__":
+    test_onnx_matches_torch_on_docs_corpus()
+    print("✅ test_onnx_matches_torch_on_docs_corpus")
@@ -0,0 +1,85 @@
+"""Tests du micro-batching des embeddings."""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+
+class FakeEncoder:
+    """Faux SentenceTransformer.encode batché (enregistre les tailles de batch)."""
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.batch_sizes = []
+        self.threads = set()
+
+    def __call__(self, texts):
+        self.batch_sizes.append(len(texts))
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        return [[float(len(t)), float(i)] for i, t in enumerate(texts)]
+
+
+def test_concurrent_calls_share_one_encode():
+    encoder = FakeEncoder()
+    batcher = EmbeddingBatcher(encoder, window_ms=20, max_batch_size=64)
+
+    async def run():
+        texts = [f"question {'x' * i}" for i in range(20)]
+        results = await asyncio.gather(*(batcher.embed(t) for t in texts))
+        await batcher.stop()
+        return texts, results
+
+    texts, results = asyncio.run(run())
+    # Chaque appelant reçoit le vecteur de SON texte
+    assert [r[0] for r in results] == [float(len(t)) for t in texts]
+    assert encoder.batch_sizes == [20]
+    assert all(name.startswith("embedding-batch") for name in encoder.threads)
+
+    stats = batcher.get_stats()
+    assert stats["total_batches"] == 1
+    assert stats["batch_size_histogram"]["<=32"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_max_batch_size_splits_batches():
+    encoder = FakeEncoder(delay=0)
+    batcher = EmbeddingBatcher(encoder, window_ms=50, max_batch_size=8)
+
+    async def run():
+        await asyncio.gather(*(batcher.embed(str(i)) for i in range(20)))
+        await batcher.stop()
+
+    asyncio.run(run())
+    assert max(encoder.batch_sizes) <= 8
+    assert sum(encoder.batch_sizes) == 20
+
+
+def test_encode_error_propagates_to_callers():
+    def failing(texts):
+        raise ValueError("modèle indisponible")
+
+    batcher = EmbeddingBatcher(failing, window_ms=1)
+
+    async def run():
+        try:
+            await batcher.embed("bonjour")
+        except ValueError as e:
+            return str(e)
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(run()) == "modèle indisponible"
+    assert batcher.get_stats()["errors"] == 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,158 @@
+"""Tests des pools d'exécution bornés (travail bloquant hors event loop)."""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.services import executors
+from app.services.executors import BoundedExecutor, ExecutorSaturatedError
+
+
+def blocking_call(seconds: float) -> str:
+    """Simule pyodbc / Ollama synchrone."""
+    time.sleep(seconds)
+    return "ok"
+
+
+def test_event_loop_stays_responsive_while_pool_is_busy():
+    pool = BoundedExecutor("db", max_workers=4, max_queue=32)
+
+    async def health_probe(samples):
+        # Équivalent de /health: doit rester rapide pendant la charge
+        for _ in range(20):
+            start = time.perf_counter()
+            await asyncio.sleep(0)
+            samples.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        samples = []
+        work = [pool.run(blocking_call, 0.05) for _ in range(16)]
+        results = await asyncio.gather(health_probe(samples), *work)
+        return samples, results[1:]
+
+    samples, results = asyncio.run(run())
+    assert results == ["ok"] * 16
+    # Aucun tick de l'event loop ne doit attendre un appel bloquant (50 ms)
+    assert max(samples) < 0.02
+    stats = pool.get_stats()
+    assert stats["completed"] == 16
+    assert stats["active"] == 0 and stats["queued"] == 0
+    assert stats["peak_pending"] == 16
+
+
+def test_rejects_when_queue_is_full():
+    pool = BoundedExecutor("llm", max_workers=1, max_queue=1)
+
+    async def run():
+        first = asyncio.ensure_future(pool.run(blocking_call, 0.1))
+        second = asyncio.ensure_future(pool.run(blocking_call, 0.1))
+        await asyncio.sleep(0.01)
+        try:
+            await pool.run(blocking_call, 0.1)
+            rejected = False
+        except ExecutorSaturatedError as e:
+            rejected = e.pool_name == "llm"
+        await asyncio.gather(first, second)
+        return rejected
+
+    assert asyncio.run(run())
+    assert pool.get_stats()["rejected"] == 1
+
+
+def test_cancelled_waiter_releases_queue_slot():
+    pool = BoundedExecutor("embedding", max_workers=1, max_queue=4)
+
+    async def run():
+        busy = asyncio.ensure_future(pool.run(blocking_call, 0.05))
+        waiting = asyncio.ensure_future(pool.run(blocking_call, 0.05))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await busy
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    stats = pool.get_stats()
+    assert stats["queued"] == 0
+    assert stats["active"] == 0
+
+
+class FakeOllama:
+    def __init__(self, delay_s: float = 0.0):
+        self.delay_s = delay_s
+
+    def is_available(self) -> bool:
+        time.sleep(self.delay_s)
+        return True
+
+
+class FakeVectorstore:
+    def count(self) -> int:
+        return 3
+
+
+def _install_pool(name: str, pool: BoundedExecutor):
+    previous = executors._executors.get(name)
+    executors._executors[name] = pool
+    return previous
+
+
+def _restore_pool(name: str, previous):
+    if previous is None:
+        executors._executors.pop(name, None)
+    else:
+        executors._executors[name] = previous
+
+
+def test_health_check_isolated_from_saturated_chat_pools():
+    from app.api.routes import health_check
+
+    llm = BoundedExecutor("llm", max_workers=1, max_queue=0)
+    previous = _install_pool("llm", llm)
+
+    async def run():
+        busy = asyncio.ensure_future(llm.run(blocking_call, 0.2))
+        await asyncio.sleep(0.01)
+        health = await health_check(ollama=FakeOllama(), vs=FakeVectorstore())
+        await busy
+        return health
+
+    try:
+        health = asyncio.run(run())
+    finally:
+        _restore_pool("llm", previous)
+    assert health.ollama_available is True
+    assert health.vectorstore_loaded is True
+
+
+def test_health_check_reports_unavailable_when_probe_saturated_or_slow():
+    from app.api.routes import health_check
+
+    probe = BoundedExecutor("probe", max_workers=1, max_queue=0)
+    previous = _install_pool("probe", probe)
+
+    async def run():
+        busy = asyncio.ensure_future(probe.run(blocking_call, 0.2))
+        await asyncio.sleep(0.01)
+        saturated = await health_check(ollama=FakeOllama(), vs=FakeVectorstore())
+        await busy
+        slow = await health_check(ollama=FakeOllama(delay_s=settings.health_probe_timeout_s + 0.5), vs=FakeVectorstore())
+        return saturated, slow
+
+    try:
+        saturated, slow = asyncio.run(run())
+    finally:
+        _restore_pool("probe", previous)
+    assert saturated.ollama_available is False
+    assert saturated.vectorstore_loaded is False
+    assert slow.ollama_available is False
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,68 @@
+"""Tests du cache d'extraction de texte (hash de fichier + mtime)."""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.extraction_cache import ExtractionCache
+
+
+def write(path, content: bytes):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def test_unchanged_file_is_served_from_cache_across_instances():
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, "faq.pdf")
+        write(pdf, b"%PDF-1.4 contenu")
+        cache_dir = os.path.join(tmp, "cache")
+
+        cache = ExtractionCache(cache_dir)
+        assert cache.get(pdf) is None
+        cache.set(pdf, "Texte extrait\n")
+
+        # Nouveau process d'indexation: même cache disque
+        reopened = ExtractionCache(cache_dir)
+        assert reopened.get(pdf) == "Texte extrait\n"
+        assert reopened.get_stats()["hits"] == 1
+        assert reopened.get_stats()["rehashed"] == 0
+
+
+def test_touched_file_is_rehashed_and_still_hits():
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, "faq.pdf")
+        write(pdf, b"%PDF-1.4 contenu")
+        cache = ExtractionCache(os.path.join(tmp, "cache"))
+        cache.set(pdf, "Texte")
+
+        later = time.time() + 10
+        os.utime(pdf, (later, later))  # mtime modifié, contenu identique
+        assert cache.get(pdf) == "Texte"
+        assert cache.get_stats()["rehashed"] == 1
+
+
+def test_modified_file_misses():
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = os.path.join(tmp, "faq.pdf")
+        write(pdf, b"%PDF-1.4 version 1")
+        cache = ExtractionCache(os.path.join(tmp, "cache"))
+        cache.set(pdf, "Version 1")
+
+        write(pdf, b"%PDF-1.4 version 2 plus longue")
+        assert cache.get(pdf) is None
+        cache.set(pdf, "Version 2")
+        assert cache.get(pdf) == "Version 2"
+
+        # Retour au contenu initial: retrouvé par son hash
+        write(pdf, b"%PDF-1.4 version 1")
+        assert cache.get(pdf) == "Version 1"
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,82 @@
+"""Tests du cache LRU + TTL partagé."""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.lru_cache import LRUCache, get_lru_caches_stats
+
+
+def test_frequently_used_entries_survive_eviction():
+    cache = LRUCache("test_lru", max_size=3)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+    # "a" est relue: c'est "b" (la moins récente) qui part
+    assert cache.get("a") == "A"
+    cache.set("d", "D")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert len(cache) == 3
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_default_and_per_entry_ttl():
+    cache = LRUCache("test_ttl", max_size=10, default_ttl_s=0.05)
+    cache.set("court", 1)
+    cache.set("long", 2, ttl_s=60)
+    cache.set("permanent", 3, ttl_s=None)
+    time.sleep(0.08)
+    assert cache.get("court") is None
+    assert "court" not in cache
+    assert cache.get("long") == 2
+    assert cache.get("permanent") is None  # None = TTL par défaut
+    assert cache.get_stats()["expired"] == 2
+
+    cache.set("x", 1)
+    time.sleep(0.08)
+    assert cache.cleanup_expired() == 1
+    assert len(cache) == 1
+
+
+def test_sharded_cache_is_bounded_and_thread_safe():
+    cache = LRUCache("test_shards", max_size=64, shards=8)
+
+    def worker(offset):
+        for i in range(500):
+            key = f"k{(offset * 500 + i) % 200}"
+            if cache.get(key) is None:
+                cache.set(key, i)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.get_stats()
+    assert stats["size"] <= 64
+    assert stats["hits"] + stats["misses"] == 8 * 500
+    assert stats["shards"] == 8
+
+
+def test_named_caches_share_one_stats_surface():
+    cache = LRUCache("test_registry", max_size=5)
+    cache.set("k", "v")
+    cache.get("k")
+    stats = get_lru_caches_stats()
+    assert stats["test_registry"]["hits"] == 1
+    assert stats["test_registry"]["size"] == 1
+    assert cache.delete("k") is True
+    assert cache.clear() == 0
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
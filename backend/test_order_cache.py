@@ -0,0 +1,108 @@
+"""Tests du cache des snapshots de commande."""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.order_cache import OrderSnapshotCache
+
+
+def order(order_id: int, status_id: int) -> dict:
+    return {"order_id": order_id, "status_id": status_id, "items": [{"line_id": 1}]}
+
+
+class FakeOrdersTable:
+    """fetch() qui compte les jointures exécutées."""
+
+    def __init__(self, orders: dict, latency_s: float = 0.005):
+        self.orders = orders
+        self.latency_s = latency_s
+        self.queries = 0
+
+    def __call__(self, order_number: str):
+        self.queries += 1
+        time.sleep(self.latency_s)
+        return self.orders.get(order_number)
+
+
+def test_repeated_lookups_hit_the_cache():
+    table = FakeOrdersTable({"13348": order(13348, 7)})
+    cache = OrderSnapshotCache(default_ttl_s=60)
+
+    for number in ("13348", 13348, " #13348 ", "13348"):
+        assert cache.get_or_fetch(number, table)["order_id"] == 13348
+    assert table.queries == 1
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == "75.0%"
+    assert stats["db_time_saved_ms"] >= 3 * 5
+
+
+def test_ttl_depends_on_order_status():
+    table = FakeOrdersTable({"1": order(1, 7), "2": order(2, 12)})
+    cache = OrderSnapshotCache(default_ttl_s=0.05, status_ttls={12: 60, 16: 60})
+
+    cache.get_or_fetch("1", table)
+    cache.get_or_fetch("2", table)
+    time.sleep(0.08)
+    # En fabrication: expiré et relu; livrée: toujours en cache
+    cache.get_or_fetch("1", table)
+    cache.get_or_fetch("2", table)
+    assert table.queries == 3
+    assert cache.get_stats()["expired"] == 1
+
+
+def test_unknown_orders_are_negatively_cached():
+    table = FakeOrdersTable({})
+    cache = OrderSnapshotCache(negative_ttl_s=60)
+
+    for _ in range(5):
+        assert cache.get_or_fetch("99999", table) is None
+    assert table.queries == 1
+    stats = cache.get_stats()
+    assert stats["negative_hits"] == 4
+    assert stats["negative_entries"] == 1
+
+
+def test_database_errors_are_not_cached():
+    cache = OrderSnapshotCache()
+    calls = []
+
+    def failing_fetch(order_number):
+        calls.append(order_number)
+        raise RuntimeError("SQL Server indisponible")
+
+    for _ in range(2):
+        try:
+            cache.get_or_fetch("13348", failing_fetch)
+            assert False, "RuntimeError attendue"
+        except RuntimeError:
+            pass
+    assert len(calls) == 2
+    assert cache.get_stats()["size"] == 0
+
+
+def test_invalidation_and_snapshot_isolation():
+    table = FakeOrdersTable({"13348": order(13348, 7)})
+    cache = OrderSnapshotCache(default_ttl_s=60)
+
+    data = cache.get_or_fetch("13348", table)
+    data["items"].clear()  # Un appelant modifie sa copie
+    assert cache.get_or_fetch("13348", table)["items"] == [{"line_id": 1}]
+
+    table.orders["13348"] = order(13348, 11)
+    assert cache.invalidate("13348") is True
+    assert cache.invalidate("13348") is False
+    assert cache.get_or_fetch("13348", table)["status_id"] == 11
+    assert cache.clear() == 1
+    assert table.queries == 2
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
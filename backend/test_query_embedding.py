@@ -0,0 +1,69 @@
+"""Tests du cache d'embeddings de requêtes et du contexte par requête."""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.query_embedding import QueryEmbeddingCache, QueryEmbeddingContext
+from app.services.semantic_cache import SemanticCache
+
+
+class CountingEmbedder:
+    """Faux modèle qui compte les appels d'encodage."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0, 0.5]
+
+
+def test_context_embeds_once():
+    embedder = CountingEmbedder()
+    context = QueryEmbeddingContext("Quels formats ?", embedder)
+    assert not context.is_computed
+    # Recherche vectorielle, lecture et écriture du cache: un seul encodage
+    for _ in range(3):
+        assert context.vector == [15.0, 1.0, 0.5]
+    assert embedder.calls == 1
+
+
+def test_lru_keyed_by_normalized_text():
+    embedder = CountingEmbedder()
+    cache = QueryEmbeddingCache(max_size=10)
+    cache.get_or_compute("Quels formats ?", embedder)
+    cache.get_or_compute("  quels   FORMATS ?", embedder)
+    assert embedder.calls == 1
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_size=2)
+    cache.set("a", [1.0])
+    cache.set("b", [2.0])
+    cache.get("a")
+    cache.set("c", [3.0])
+    assert cache.get("b") is None
+    assert cache.get("a") == [1.0]
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_semantic_cache_uses_precomputed_embedding():
+    embedder = CountingEmbedder()
+    cache = SemanticCache(max_size=10, embedding_func=embedder)
+    vector = np.array([1.0, 2.0, 3.0])
+    cache.set("délais ?", "5 jours", embedding=vector)
+    assert cache.get("délais de livraison ?", embedding=vector) == "5 jours"
+    assert embedder.calls == 0
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
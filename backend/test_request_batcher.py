@@ -0,0 +1,119 @@
+"""Tests du Request Batcher (single-flight et priorités)."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.request_batcher import RequestBatcher, RequestPriority
+
+
+def test_identical_concurrent_queries_share_one_call():
+    batcher = RequestBatcher(batch_window_ms=10, max_concurrent=4)
+    calls = []
+
+    async def process(query, context, history):
+        calls.append(query)
+        await asyncio.sleep(0.05)
+        return f"réponse: {query}"
+
+    async def run():
+        results = await asyncio.gather(*[
+            batcher.submit("Quels sont les délais ?", "ctx", process) for _ in range(10)
+        ])
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert calls == ["Quels sont les délais ?"]
+    assert results == ["réponse: Quels sont les délais ?"] * 10
+    stats = batcher.get_stats()
+    assert stats["coalesced_requests"] == 9
+    assert stats["executed_requests"] == 1
+    assert stats["inflight_requests"] == 0
+
+
+def test_different_context_or_history_is_not_coalesced():
+    batcher = RequestBatcher(batch_window_ms=10, max_concurrent=4)
+    calls = []
+
+    async def process(query, context, history):
+        calls.append((context, len(history or [])))
+        await asyncio.sleep(0.02)
+        return context
+
+    async def run():
+        await asyncio.gather(
+            batcher.submit("q", "ctx A", process),
+            batcher.submit("q", "ctx B", process),
+            batcher.submit("q", "ctx A", process, history=[{"role": "user", "content": "bonjour"}]),
+        )
+        await batcher.stop()
+
+    asyncio.run(run())
+    assert len(calls) == 3
+    assert batcher.stats["coalesced_requests"] == 0
+
+
+def test_error_is_propagated_to_all_waiters():
+    batcher = RequestBatcher(batch_window_ms=10, max_concurrent=2)
+    calls = []
+
+    async def process(query, context, history):
+        calls.append(query)
+        await asyncio.sleep(0.02)
+        raise ValueError("LLM indisponible")
+
+    async def run():
+        results = await asyncio.gather(
+            *[batcher.submit("q", "", process) for _ in range(3)],
+            return_exceptions=True,
+        )
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    # Un échec n'est pas mis en cache: la requête suivante relance l'appel
+    assert batcher.get_stats()["dedup_cache_size"] == 0
+
+
+def test_high_priority_is_drained_first():
+    batcher = RequestBatcher(batch_window_ms=10, max_concurrent=1)
+    order = []
+
+    async def run():
+        gate = asyncio.Event()
+
+        async def blocker(query, context, history):
+            await gate.wait()
+            return query
+
+        async def process(query, context, history):
+            order.append(query)
+            return query
+
+        # Occupe l'unique slot pendant qu'on remplit les queues
+        first = asyncio.create_task(batcher.submit("blocker", "", blocker))
+        await asyncio.sleep(0.01)
+        tasks = [
+            asyncio.create_task(batcher.submit("low", "", process, priority=RequestPriority.LOW)),
+            asyncio.create_task(batcher.submit("normal", "", process, priority=RequestPriority.NORMAL)),
+            asyncio.create_task(batcher.submit("high", "", process, priority=RequestPriority.HIGH)),
+        ]
+        await asyncio.sleep(0.01)
+        gate.set()
+        await asyncio.gather(first, *tasks)
+        await batcher.stop()
+
+    asyncio.run(run())
+    assert order == ["high", "normal", "low"]
+
+
+if __name__ == "__main__":
+    test_identical_concurrent_queries_share_one_call()
+    test_different_context_or_history_is_not_coalesced()
+    test_error_is_propagated_to_all_waiters()
+    test_high_priority_is_drained_first()
+    print("✅ Tous les tests du Request Batcher passent")
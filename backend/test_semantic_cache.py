@@ -0,0 +1,143 @@
+"""Tests du cache sémantique (index matriciel vectorisé)."""
+import os
+import sys
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.semantic_cache import SemanticCache, SemanticIndex, CacheEntry
+
+
+DIM = 32
+
+
+def make_cache(vectors, **kwargs):
+    """Cache dont l'embedding_func lit un dict question -> vecteur."""
+    return SemanticCache(embedding_func=lambda q: vectors[q], **kwargs)
+
+
+def test_exact_hit():
+    cache = SemanticCache(max_size=10)
+    cache.set("Quels formats ?", "7 formats", context_hash="ctx")
+    assert cache.get("  QUELS   formats ?", "ctx") == "7 formats"
+    assert cache.get_stats()["exact_hits"] == 1
+
+
+def test_semantic_hit_and_miss():
+    rng = np.random.default_rng(1)
+    base = rng.standard_normal(DIM)
+    vectors = {
+        "délais de livraison ?": base,
+        "quels délais pour livrer ?": base + 0.01 * rng.standard_normal(DIM),
+        "autre chose": rng.standard_normal(DIM),
+    }
+    cache = make_cache(vectors, max_size=10, similarity_threshold=0.95)
+    cache.set("délais de livraison ?", "5 jours", embedding=vectors["délais de livraison ?"])
+
+    assert cache.get("quels délais pour livrer ?") == "5 jours"
+    assert cache.get("autre chose") is None
+    stats = cache.get_stats()
+    assert stats["semantic_hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_eviction_compacts_and_keeps_rows_aligned():
+    rng = np.random.default_rng(2)
+    vectors = {f"q{i}": rng.standard_normal(DIM) for i in range(50)}
+    cache = make_cache(vectors, max_size=20, similarity_threshold=0.99)
+    for i in range(50):
+        cache.set(f"q{i}", i, embedding=vectors[f"q{i}"])
+    cache._exact_cache.clear()
+
+    index = cache._semantic_index
+    assert len(index) <= index.capacity
+    # Chaque ligne de la matrice correspond toujours à sa métadonnée
+    for row in range(len(index)):
+        entry = index._entries[row]
+        assert np.allclose(index._matrix[row], entry.embedding)
+    # La dernière entrée insérée survit à l'éviction
+    assert cache.get("q49") == 49
+
+
+def test_expired_entries_are_skipped_and_cleaned():
+    vectors = {"a": np.ones(DIM)}
+    cache = make_cache(vectors, max_size=10)
+    cache.set("a", "old", embedding=vectors["a"], ttl=0.0001)
+    cache._exact_cache.clear()
+    import time
+    time.sleep(0.01)
+    assert cache.get("a") is None
+    cache.cleanup_expired()
+    assert len(cache._semantic_index) == 0
+
+
+def test_invalidate_removes_semantic_row():
+    vectors = {"a": np.ones(DIM), "b": np.arange(DIM, dtype=float)}
+    cache = make_cache(vectors, max_size=10)
+    cache.set("a", "A", embedding=vectors["a"])
+    cache.set("b", "B", embedding=vectors["b"])
+
+    assert cache.invalidate("a")
+    assert cache.get("a") is None
+    assert len(cache._semantic_index) == 1
+    assert cache.get("b") == "B"
+    assert not cache.invalidate("a")
+
+
+def test_set_same_key_replaces_row_in_place():
+    rng = np.random.default_rng(5)
+    old, new = rng.standard_normal(DIM), rng.standard_normal(DIM)
+    cache = make_cache({"q": new}, max_size=10, similarity_threshold=0.99)
+    cache.set("q", "v1", embedding=old)
+    cache.set("q", "v2", embedding=new)
+
+    index = cache._semantic_index
+    assert len(index) == 1
+    assert np.allclose(index._matrix[0], index._entries[0].embedding)
+    cache._exact_cache.clear()
+    assert cache.get("q") == "v2"
+    assert index.search(old / np.linalg.norm(old), 0.99)[0] is None
+
+
+def test_concurrent_reads_during_writes():
+    rng = np.random.default_rng(3)
+    vectors = {f"q{i}": rng.standard_normal(DIM) for i in range(400)}
+    cache = make_cache(vectors, max_size=100, similarity_threshold=0.999)
+    errors = []
+
+    def writer():
+        for i in range(400):
+            cache.set(f"q{i}", i, embedding=vectors[f"q{i}"])
+
+    def reader():
+        index = cache._semantic_index
+        for i in range(400):
+            entry, _ = index.search(vectors[f"q{i}"] / np.linalg.norm(vectors[f"q{i}"]), 0.999)
+            # Un hit doit toujours renvoyer la bonne valeur
+            if entry is not None and entry.value != i:
+                errors.append((i, entry.value))
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+
+
+def test_index_dimension_change_resets():
+    index = SemanticIndex(capacity=8)
+    index.add(CacheEntry(key="a", value=1), np.ones(4, dtype=np.float32) / 2)
+    index.add(CacheEntry(key="b", value=2), np.ones(9, dtype=np.float32) / 3)
+    assert len(index) == 1
+    entry, _ = index.search(np.ones(9, dtype=np.float32) / 3, 0.9)
+    assert entry.value == 2
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,113 @@
+"""Tests du cache sémantique persistant (fichier SQLite partagé entre workers)."""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.semantic_cache import SemanticCache
+from app.services.semantic_store import SemanticStore
+
+DIM = 16
+
+
+def vector(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(DIM)
+
+
+def make_worker(path: str, **kwargs) -> SemanticCache:
+    """Un "worker": cache mémoire + store sur le fichier partagé (sans thread actif)."""
+    store = SemanticStore(path, sync_interval_s=3600, **kwargs)
+    return SemanticCache(max_size=100, similarity_threshold=0.95, store=store)
+
+
+def test_entries_survive_a_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "semantic.sqlite3")
+        first = make_worker(path)
+        first.set("Délais de livraison ?", "5 jours", context_hash="ctx", embedding=vector(1))
+        first.set("Formats ?", {"answer": "7 formats"}, context_hash="ctx")
+        first.close()
+
+        restarted = make_worker(path)
+        assert restarted._store.stats["warm_loaded"] == 2
+        assert restarted.get("délais de livraison ?", "ctx") == "5 jours"
+        assert restarted.get("Formats ?", "ctx") == {"answer": "7 formats"}
+        # L'embedding float32 est rechargé: le tier sémantique répond aussi
+        near = vector(1) + 0.01 * vector(2)
+        assert restarted.get("Quels délais pour livrer ?", "ctx", embedding=near) == "5 jours"
+        restarted.close()
+
+
+def test_workers_see_each_other_writes_and_invalidations():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "semantic.sqlite3")
+        worker_a, worker_b = make_worker(path), make_worker(path)
+
+        worker_a.set("Tarifs ?", "Voir la grille", embedding=vector(3))
+        assert worker_b.get("Tarifs ?") is None
+        worker_a._store.sync_once()
+        worker_b._store.sync_once()
+        assert worker_b.get("Tarifs ?") == "Voir la grille"
+        assert worker_b._store.stats["synced_from_peers"] == 1
+
+        worker_b.invalidate("Tarifs ?")
+        assert worker_b.get("Tarifs ?", embedding=vector(3)) is None
+        worker_b._store.sync_once()
+        worker_a._store.sync_once()
+        # Le tombstone retire aussi la ligne de l'index sémantique (pas de hit à 100 %)
+        assert worker_a.get("Tarifs ?", embedding=vector(3)) is None
+        assert len(worker_a._semantic_index) == 0
+
+        worker_a.set("Reliure ?", "Spirale ou dos carré", embedding=vector(4))
+        worker_a._store.sync_once()
+        worker_b._store.sync_once()
+        worker_a.clear()
+        worker_b._store.sync_once()
+        assert worker_b.get("Reliure ?") is None
+        assert worker_b._store.stats["peer_clears"] == 1
+
+        worker_a.close()
+        worker_b.close()
+
+
+def test_expired_entries_are_not_loaded_and_are_cleaned_up():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "semantic.sqlite3")
+        worker = make_worker(path)
+        worker.set("Question éphémère", "réponse", ttl=0.05, embedding=vector(5))
+        worker.set("Question durable", "réponse", embedding=vector(6))
+        worker.close()
+        time.sleep(0.1)
+
+        restarted = make_worker(path)
+        assert restarted._store.stats["warm_loaded"] == 1
+        assert restarted._store.cleanup() == 1
+        assert restarted.get_stats()["persistence"]["rows"] == 1
+        restarted.close()
+
+
+def test_store_keeps_only_the_most_recent_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "semantic.sqlite3")
+        worker = make_worker(path, max_entries=10)
+        for i in range(25):
+            worker.set(f"Question {i}", f"réponse {i}", embedding=vector(100 + i))
+        worker._store.flush()
+        assert worker._store.cleanup() == 15
+        worker.close()
+
+        restarted = make_worker(path)
+        assert restarted.get("Question 24") == "réponse 24"
+        assert restarted.get("Question 0") is None
+        restarted.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,145 @@
+"""Tests du retrieval spéculatif (lancé pendant l'analyse d'intention)."""
+import asyncio
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from langchain.schema import Document
+
+from app.core.config import settings
+from app.services.query_embedding import QueryEmbeddingContext
+from app.services.rag_pipeline import RAGPipeline, get_speculation_stats
+
+ANALYSIS_S = 0.2
+SEARCH_S = 0.2
+
+
+class FakeEmbeddingService:
+    def embed_query(self, text):
+        seed = int(hashlib.md5(text.lower().encode()).hexdigest()[:8], 16)
+        vector = np.random.default_rng(seed).standard_normal(16)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def query_context(self, query):
+        return QueryEmbeddingContext(query, self.embed_query)
+
+
+class SlowVectorStore:
+    """Recherche vectorielle de SEARCH_S secondes (exécutée dans le pool embedding)."""
+
+    def __init__(self):
+        self.embedding_service = FakeEmbeddingService()
+        self.searches = 0
+
+    def similarity_search(self, query, k=5, query_embedding=None):
+        self.searches += 1
+        time.sleep(SEARCH_S)
+        return [(Document(page_content=f"Passage {i} sur {query}", metadata={"source": f"doc{i}.txt"}), 0.9) for i in range(k)]
+
+
+class SlowIntentLLM:
+    """Analyse d'intention de ANALYSIS_S secondes, génération immédiate."""
+
+    def __init__(self, intent="GENERAL_QUESTION", order_number="null"):
+        self.intent = intent
+        self.order_number = order_number
+
+    async def generate(self, prompt, max_tokens=120):
+        await asyncio.sleep(ANALYSIS_S)
+        return f'{{"intent":"{self.intent}","order_number":"{self.order_number}","reasoning":"test"}}'
+
+    async def generate_response_stream_async(self, query, context, history=None, is_disconnected=None):
+        for chunk in ("Réponse ", "générée."):
+            yield chunk
+
+    def generate_response(self, query, context, history=None):
+        return "Réponse générée."
+
+
+def make_pipeline(llm):
+    return RAGPipeline(vectorstore=SlowVectorStore(), llm_service=llm, top_k=5, rerank_top_n=3)
+
+
+async def time_to_first_token(pipeline, query):
+    """Même enchaînement que /chat/stream: analyse (+ spéculation) puis stream_response."""
+    started = time.perf_counter()
+    analyzed = await pipeline.analyze_and_prefetch(query)
+    async for event in pipeline.stream_response(query, analyzed=analyzed):
+        if event["type"] == "token":
+            pipeline.record_first_token(analyzed)
+            return time.perf_counter() - started
+
+
+def run_with_ratio(ratio, coro_factory):
+    previous = settings.speculative_retrieval_ratio
+    settings.speculative_retrieval_ratio = ratio
+    try:
+        return asyncio.run(coro_factory())
+    finally:
+        settings.speculative_retrieval_ratio = previous
+
+
+def test_speculation_overlaps_retrieval_with_intent_analysis():
+    # Messages ambigus (non tranchés par les règles) -> analyse LLM
+    sequential = run_with_ratio(0.0, lambda: time_to_first_token(make_pipeline(SlowIntentLLM()), "Vous livrez en Belgique ? v1"))
+    speculative = run_with_ratio(1.0, lambda: time_to_first_token(make_pipeline(SlowIntentLLM()), "Vous livrez en Belgique ? v2"))
+
+    assert sequential >= ANALYSIS_S + SEARCH_S
+    assert speculative < ANALYSIS_S + SEARCH_S * 0.5
+    arms = get_speculation_stats()["arms"]
+    assert arms["speculative"]["ttft_ms"]["count"] >= 1
+    assert arms["sequential"]["ttft_ms"]["count"] >= 1
+
+
+def test_order_tracking_cancels_the_speculative_retrieval():
+    pipeline = make_pipeline(SlowIntentLLM(intent="ORDER_TRACKING", order_number="11223"))
+    before = get_speculation_stats()
+
+    async def run():
+        response = await pipeline.generate_response("Status 11223")
+        await asyncio.sleep(0)
+        return response
+
+    response = run_with_ratio(1.0, run)
+    after = get_speculation_stats()
+    assert response.intent == "order_tracking"
+    assert "11223" in response.answer
+    assert after["started"] - before["started"] == 1
+    assert after["cancelled"] - before["cancelled"] == 1
+    assert after["used"] == before["used"]
+
+
+def test_rule_decided_messages_are_not_speculated():
+    pipeline = make_pipeline(SlowIntentLLM())
+    before = get_speculation_stats()["started"]
+
+    async def run():
+        analyzed = await pipeline.analyze_and_prefetch("13348")
+        return analyzed
+
+    analyzed = run_with_ratio(1.0, run)
+    assert analyzed.prefetch is None and analyzed.arm is None
+    assert get_speculation_stats()["started"] == before
+    assert pipeline.vectorstore.searches == 0
+
+
+def test_generate_response_uses_the_prefetched_context():
+    pipeline = make_pipeline(SlowIntentLLM())
+    before = get_speculation_stats()["used"]
+    response = run_with_ratio(1.0, lambda: pipeline.generate_response("Vous livrez en Belgique ? v3"))
+    assert response.answer == "Réponse générée."
+    assert len(response.sources) == 3
+    assert pipeline.vectorstore.searches == 1
+    assert get_speculation_stats()["used"] == before + 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,99 @@
+"""Tests du regroupement des frames SSE (coalesce_token_events)."""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.api.sse import coalesce_token_events, text_segments
+
+
+async def tokens(contents, gap_s=0.0, tail=("done",)):
+    for content in contents:
+        if gap_s:
+            await asyncio.sleep(gap_s)
+        yield {"type": "token", "content": content}
+    for event_type in tail:
+        yield {"type": event_type}
+
+
+async def collect(stream):
+    return [event async for event in stream]
+
+
+def test_fast_tokens_are_merged_and_order_preserved():
+    words = [f"mot{i} " for i in range(100)]
+    events = asyncio.run(collect(coalesce_token_events(tokens(words), window_ms=30)))
+    assert events[-1] == {"type": "done"}
+    token_events = [e for e in events if e["type"] == "token"]
+    assert "".join(e["content"] for e in token_events) == "".join(words)
+    assert len(token_events) < 10
+
+
+def test_group_is_flushed_when_window_elapses():
+    async def run():
+        received = []
+        start = time.perf_counter()
+        async for event in coalesce_token_events(tokens(["a", "b"], gap_s=0.2), window_ms=20):
+            received.append((round(time.perf_counter() - start, 1), event))
+        return received
+
+    received = asyncio.run(run())
+    # Token lent: envoyé à la fin de sa fenêtre, sans attendre le suivant
+    assert [e["content"] for _, e in received if e["type"] == "token"] == ["a", "b"]
+    assert received[0][0] < 0.3
+
+
+def test_non_token_event_flushes_pending_tokens():
+    async def source():
+        yield {"type": "token", "content": "Bonjour"}
+        yield {"type": "sources", "sources": []}
+        yield {"type": "token", "content": " !"}
+
+    events = asyncio.run(collect(coalesce_token_events(source(), window_ms=50)))
+    assert [e["type"] for e in events] == ["token", "sources", "token"]
+
+
+def test_closing_the_stream_cancels_upstream():
+    state = {"cancelled": False}
+
+    async def slow_provider():
+        try:
+            yield {"type": "token", "content": "début"}
+            await asyncio.sleep(10)
+            yield {"type": "token", "content": "jamais"}
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def run():
+        stream = coalesce_token_events(slow_provider(), window_ms=10)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(run()) == {"type": "token", "content": "début"}
+    assert state["cancelled"]
+
+
+def test_disabled_window_passes_through():
+    events = asyncio.run(collect(coalesce_token_events(tokens(["a", "b", "c"]), window_ms=0)))
+    assert len(events) == 4
+
+
+def test_text_segments():
+    text = "Votre commande est en cours de fabrication. " * 10
+    segments = text_segments(text, max_chars=80)
+    assert "".join(segments) == text
+    assert all(len(s) <= 80 for s in segments)
+
+
+if __name__ == "__main__":
+    test_fast_tokens_are_merged_and_order_preserved()
+    test_group_is_flushed_when_window_elapses()
+    test_non_token_event_flushes_pending_tokens()
+    test_closing_the_stream_cancels_upstream()
+    test_disabled_window_passes_through()
+    test_text_segments()
+    print("✅ Tous les tests SSE passent")
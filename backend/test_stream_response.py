@@ -0,0 +1,140 @@
+"""Tests du streaming RAG partagé (RAGPipeline.stream_response)."""
+import asyncio
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from langchain.schema import Document
+
+from app.services.query_embedding import QueryEmbeddingContext
+from app.services.rag_pipeline import RAGPipeline, replay_segments
+
+
+class FakeEmbeddingService:
+    def embed_query(self, text):
+        seed = int(hashlib.md5(text.lower().encode()).hexdigest()[:8], 16)
+        vector = np.random.default_rng(seed).standard_normal(16)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def query_context(self, query):
+        return QueryEmbeddingContext(query, self.embed_query)
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.embedding_service = FakeEmbeddingService()
+        self.searches = 0
+
+    def similarity_search(self, query, k=5, query_embedding=None):
+        self.searches += 1
+        return [
+            (Document(page_content=f"Passage {i} sur {query}", metadata={"source": f"doc{i}.txt"}), 1.0 - i / 10)
+            for i in range(k)
+        ]
+
+
+class FakeLLM:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = []
+
+    async def generate_response_stream_async(self, query, context, history=None, is_disconnected=None):
+        self.calls.append(context)
+        for chunk in self.chunks:
+            if is_disconnected and await is_disconnected():
+                return
+            yield chunk
+
+
+def make_pipeline(chunks):
+    llm = FakeLLM(chunks)
+    pipeline = RAGPipeline(vectorstore=FakeVectorStore(), llm_service=llm, top_k=8, rerank_top_n=5)
+    return pipeline, llm
+
+
+async def collect(stream):
+    return [event async for event in stream]
+
+
+def answer_of(events):
+    return "".join(e["content"] for e in events if e["type"] == "token")
+
+
+def test_stream_uses_rerank_and_replays_from_cache():
+    pipeline, llm = make_pipeline(["Le format ", "A5 est ", "disponible."])
+    query = "Quels formats A5 proposez-vous ?"
+
+    first = asyncio.run(collect(pipeline.stream_response(query)))
+    assert answer_of(first) == "Le format A5 est disponible."
+    sources = [e for e in first if e["type"] == "sources"][0]["sources"]
+    # Rerank: 5 passages (rerank_top_n) et non les 8 du retrieval
+    assert len(sources) == 5
+    assert llm.calls[0].count("[Document") == 5
+    assert first[-1] == {"type": "done", "cached": False}
+
+    # Même question: rejouée depuis le cache, sans appel LLM
+    second = asyncio.run(collect(pipeline.stream_response(query)))
+    assert len(llm.calls) == 1
+    assert answer_of(second) == "Le format A5 est disponible."
+    assert [e for e in second if e["type"] == "sources"][0]["sources"] == sources
+    assert second[-1] == {"type": "done", "cached": True}
+
+
+def test_stream_hits_semantic_cache_written_by_generate_path():
+    pipeline, llm = make_pipeline(["jamais appelé"])
+    query = "Quel papier pour un roman ?"
+    prepared = asyncio.run(pipeline._prepare_context(query))
+    pipeline._semantic_cache.set(
+        query=query, value="Papier bouffant 80 g.", context_hash=prepared.context_hash,
+        embedding=prepared.query_embedding
+    )
+
+    events = asyncio.run(collect(pipeline.stream_response(query)))
+    assert answer_of(events) == "Papier bouffant 80 g."
+    assert events[-1]["cached"] is True
+    assert llm.calls == []
+
+
+def test_disconnected_or_failed_stream_is_not_cached():
+    pipeline, llm = make_pipeline(["Une ", "réponse ", "coupée"])
+    query = "Combien coûte la livraison en Belgique ?"
+    state = {"chunks": 0}
+
+    async def is_disconnected():
+        state["chunks"] += 1
+        return state["chunks"] > 2
+
+    events = asyncio.run(collect(pipeline.stream_response(query, is_disconnected=is_disconnected)))
+    assert not any(e["type"] == "done" for e in events)
+    assert pipeline._get_exact_cached(query, None) is None
+
+    pipeline.llm_service.chunks = ["Désolé, une erreur s'est produite."]
+    asyncio.run(collect(pipeline.stream_response(query)))
+    assert pipeline._get_exact_cached(query, None) is None
+
+
+def test_history_bypasses_cache():
+    pipeline, llm = make_pipeline(["Oui."])
+    history = [{"role": "user", "content": "Je veux imprimer un livre"}]
+    asyncio.run(collect(pipeline.stream_response("Et en couleur ?", history=history)))
+    asyncio.run(collect(pipeline.stream_response("Et en couleur ?", history=history)))
+    assert len(llm.calls) == 2
+
+
+def test_replay_segments_preserves_text():
+    text = "  Bonjour ! Le délai est de 5 à 7 jours ouvrés.\nÀ bientôt."
+    assert "".join(replay_segments(text)) == text
+    assert replay_segments("") == []
+
+
+if __name__ == "__main__":
+    test_stream_uses_rerank_and_replays_from_cache()
+    test_stream_hits_semantic_cache_written_by_generate_path()
+    test_disconnected_or_failed_stream_is_not_cached()
+    test_history_bypasses_cache()
+    test_replay_segments_preserves_text()
+    print("✅ Tous les tests du streaming RAG passent")
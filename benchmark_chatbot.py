@@ -286,7 +286,8 @@ def send_question(question: str) -> tuple[str, float, float]:
         response = requests.post(
             CHAT_STREAM_ENDPOINT,
             json=payload,
-            headers={"Content-Type": "application/json", "Accept": "text/event-stream"},
+            # Priorité LOW: le benchmark passe après le trafic réel
+            headers={"Content-Type": "application/json", "Accept": "text/event-stream", "X-Request-Priority": "low"},
             timeout=180,  # 3 minutes max par question
             stream=True  # Important pour le streaming
         )
@@ -132,8 +132,23 @@ export const chatAPI = {
     onError: (error: string) => void,
     onThinking?: (step: string) => void,
     onFinalResponse?: (content: string) => void,
-    onAnalysis?: (analysis: any) => void
+    onAnalysis?: (analysis: any) => void,
+    thinkingStepMs: number = 1200
   ): Promise<void> {
+    // Le serveur envoie toutes les étapes d'un coup: on les affiche ici
+    // au rythme de thinkingStepMs (effet thinking côté client)
+    let displayAt = Date.now()
+    const paced = (callback: () => void, holdMs: number = 0) => {
+      const now = Date.now()
+      const wait = Math.max(0, displayAt - now)
+      displayAt = Math.max(displayAt, now) + holdMs
+      if (wait === 0) {
+        callback()
+      } else {
+        setTimeout(callback, wait)
+      }
+    }
+
     try {
       console.log('[streamOrderTracking] Starting request for order:', orderNumber)
       console.log('[streamOrderTracking] URL:', `${API_BASE_URL}/order/${orderNumber}/tracking/stream`)
@@ -180,13 +195,13 @@ export const chatAPI = {
               const data = JSON.parse(line.slice(6))
 
               if (data.type === 'thinking' && onThinking) {
-                onThinking(data.content)
+                paced(() => onThinking(data.content), thinkingStepMs)
               } else if (data.type === 'final_response' && onFinalResponse) {
-                onFinalResponse(data.content)
+                paced(() => onFinalResponse(data.content))
               } else if (data.type === 'token') {
-                onToken(data.content)
+                paced(() => onToken(data.content))
               } else if (data.type === 'done') {
-                onComplete()
+                paced(onComplete)
               } else if (data.type === 'error') {
                 onError(data.message)
               } else if (data.type === 'analysis' && onAnalysis) {
@@ -6,7 +6,7 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import json
-from app.core.database import WorkspacesDB, ConversationsDB, MessagesDB
+from app.core.database_async import WorkspacesDB, ConversationsDB, MessagesDB
 from app.api.workspaces import get_user_from_token
 from app.services.rag_pipeline import RAGPipeline
 
@@ -37,27 +37,27 @@ async def chat(
     user = await get_user_from_token(authorization)
     
     # Vérifier l'accès au workspace
-    workspace = WorkspacesDB.get_by_id_and_user(data.workspace_id, user.id)
+    workspace = await WorkspacesDB.get_by_id_and_user(data.workspace_id, user.id)
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
     
     # Créer ou récupérer la conversation
     if data.conversation_id:
-        conversation = ConversationsDB.get_by_id(data.conversation_id)
+        conversation = await ConversationsDB.get_by_id(data.conversation_id)
         
         if not conversation or conversation.get('workspace_id') != data.workspace_id:
             raise HTTPException(status_code=404, detail="Conversation non trouvée")
     else:
         # Créer une nouvelle conversation
         title = data.message[:50] + "..." if len(data.message) > 50 else data.message
-        conversation = ConversationsDB.create(data.workspace_id, title)
+        conversation = await ConversationsDB.create(data.workspace_id, title)
     
     # Sauvegarder le message utilisateur
-    MessagesDB.create(conversation["id"], "user", data.message)
+    await MessagesDB.create(conversation["id"], "user", data.message)
     
     # Récupérer l'historique
-    history = MessagesDB.get_by_conversation(conversation["id"], limit=10)
+    history = await MessagesDB.get_by_conversation(conversation["id"], limit=10)
     history = [{"role": m["role"], "content": m["content"]} for m in history[:-1]]  # Exclure le dernier
     
     # Créer le pipeline RAG
@@ -79,7 +79,7 @@ async def chat(
                     yield f"data: {json.dumps(chunk)}\n\n"
             
             # Sauvegarder la réponse
-            MessagesDB.create(
+            await MessagesDB.create(
                 conversation["id"], 
                 "assistant", 
                 full_response, 
@@ -98,7 +98,7 @@ async def chat(
         response, sources = await rag.get_response(data.message, history)
         
         # Sauvegarder la réponse
-        MessagesDB.create(
+        await MessagesDB.create(
             conversation["id"], 
             "assistant", 
             response, 
@@ -121,12 +121,12 @@ async def list_conversations(
     user = await get_user_from_token(authorization)
     
     # Vérifier l'accès
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user.id)
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user.id)
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
     
-    conversations = ConversationsDB.get_by_workspace(workspace_id)
+    conversations = await ConversationsDB.get_by_workspace(workspace_id)
     return conversations
 
 
@@ -139,7 +139,7 @@ async def get_conversation_messages(
     user = await get_user_from_token(authorization)
     
     # Vérifier l'accès via le workspace
-    conversation = ConversationsDB.get_with_workspace_owner(conversation_id)
+    conversation = await ConversationsDB.get_with_workspace_owner(conversation_id)
     
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation non trouvée")
@@ -147,7 +147,7 @@ async def get_conversation_messages(
     if conversation.get("workspace_user_id") != user.id:
         raise HTTPException(status_code=403, detail="Accès refusé")
     
-    messages = MessagesDB.get_by_conversation(conversation_id)
+    messages = await MessagesDB.get_by_conversation(conversation_id)
     return messages
 
 
@@ -160,7 +160,7 @@ async def delete_conversation(
     user = await get_user_from_token(authorization)
     
     # Vérifier l'accès
-    conversation = ConversationsDB.get_with_workspace_owner(conversation_id)
+    conversation = await ConversationsDB.get_with_workspace_owner(conversation_id)
     
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation non trouvée")
@@ -169,6 +169,6 @@ async def delete_conversation(
         raise HTTPException(status_code=403, detail="Accès refusé")
     
     # Supprimer (cascade vers messages)
-    ConversationsDB.delete(conversation_id)
+    await ConversationsDB.delete(conversation_id)
     
     return {"message": "Conversation supprimée"}
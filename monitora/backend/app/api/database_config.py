@@ -68,10 +68,12 @@ def decrypt_password(encrypted: str) -> str:
 
 # =====================================================
 # ROUTES
+# Handlers synchrones (pyodbc et test de connexion bloquants):
+# FastAPI les exécute dans son pool de threads, hors de la boucle d'événements
 # =====================================================
 
 @router.get("/{workspace_id}/database")
-async def get_database_config(
+def get_database_config(
     workspace_id: str,
     user = Depends(get_current_user)
 ):
@@ -122,7 +124,7 @@ async def get_database_config(
 
 
 @router.post("/{workspace_id}/database")
-async def save_database_config(
+def save_database_config(
     workspace_id: str,
     config: DatabaseConfig,
     user = Depends(get_current_user)
@@ -177,7 +179,7 @@ async def save_database_config(
 
 
 @router.post("/{workspace_id}/database/test")
-async def test_database_connection(
+def test_database_connection(
     workspace_id: str,
     config: Optional[DatabaseConfig] = None,
     user = Depends(get_current_user)
@@ -277,7 +279,7 @@ async def test_database_connection(
 
 
 @router.delete("/{workspace_id}/database")
-async def delete_database_config(
+def delete_database_config(
     workspace_id: str,
     user = Depends(get_current_user)
 ):
@@ -7,7 +7,7 @@ import os
 import uuid
 import aiofiles
 import logging
-from app.core.database import DocumentsDB, WorkspacesDB
+from app.core.database_async import DocumentsDB, WorkspacesDB
 from app.core.config import settings
 from app.api.workspaces import get_user_from_token
 
@@ -21,7 +21,7 @@ MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
 async def verify_workspace_access(workspace_id: str, user_id: str) -> dict:
     """Vérifie que l'utilisateur a accès au workspace"""
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user_id)
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user_id)
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
@@ -38,7 +38,7 @@ async def list_documents(
     user = await get_user_from_token(authorization)
     await verify_workspace_access(workspace_id, user["id"])
     
-    documents = DocumentsDB.get_by_workspace(workspace_id)
+    documents = await DocumentsDB.get_by_workspace(workspace_id)
     return documents
 
 
@@ -103,7 +103,7 @@ async def upload_document(
         logger.info(f"File saved: {filepath}")
         
         # Enregistrer en base
-        doc = DocumentsDB.create(
+        doc = await DocumentsDB.create(
             workspace_id=workspace_id,
             filename=file.filename,
             file_path=filepath,
@@ -115,7 +115,7 @@ async def upload_document(
         
         # Sauvegarder le contenu binaire en base
         try:
-            DocumentsDB.save_content(doc['id'], content)
+            await DocumentsDB.save_content(doc['id'], content)
             logger.info(f"Content saved to DB for document: {doc['id']}")
         except Exception as e:
             logger.error(f"Error saving content to DB: {e}")
@@ -149,13 +149,13 @@ async def index_document(
         await verify_workspace_access(workspace_id, user["id"])
         
         # Récupérer le document
-        doc = DocumentsDB.get_by_id(document_id)
+        doc = await DocumentsDB.get_by_id(document_id)
         
         if not doc or doc.get('workspace_id') != workspace_id:
             raise HTTPException(status_code=404, detail="Document non trouvé")
         
         # Mettre à jour le statut
-        DocumentsDB.update_status(document_id, "processing")
+        await DocumentsDB.update_status(document_id, "processing")
         
         # Lancer la vectorisation en arrière-plan
         from app.services.vectorstore import vectorize_document
@@ -207,7 +207,7 @@ async def upload_multiple_documents(
             async with aiofiles.open(filepath, 'wb') as f:
                 await f.write(content)
             
-            doc = DocumentsDB.create(
+            doc = await DocumentsDB.create(
                 workspace_id=workspace_id,
                 filename=file.filename,
                 file_path=filepath,
@@ -242,7 +242,7 @@ async def get_document(
     user = await get_user_from_token(authorization)
     
     # Récupérer le document avec son workspace owner
-    doc = DocumentsDB.get_with_workspace_owner(document_id)
+    doc = await DocumentsDB.get_with_workspace_owner(document_id)
     
     if not doc:
         raise HTTPException(status_code=404, detail="Document non trouvé")
@@ -265,7 +265,7 @@ async def delete_document(
     user = await get_user_from_token(authorization)
     
     # Récupérer le document avec son workspace owner
-    doc = DocumentsDB.get_with_workspace_owner(document_id)
+    doc = await DocumentsDB.get_with_workspace_owner(document_id)
     
     if not doc:
         raise HTTPException(status_code=404, detail="Document non trouvé")
@@ -279,11 +279,11 @@ async def delete_document(
         os.remove(filepath)
     
     # Supprimer de la base
-    DocumentsDB.delete(document_id)
+    await DocumentsDB.delete(document_id)
     
     # Supprimer du vectorstore
-    from app.services.vectorstore import delete_document_from_vectorstore
-    delete_document_from_vectorstore(doc["workspace_id"], document_id)
+    from app.services.vectorstore import delete_document_from_vectorstore, run_indexing
+    await run_indexing(delete_document_from_vectorstore, doc["workspace_id"], document_id)
     
     return {"message": "Document supprimé"}
 
@@ -297,7 +297,7 @@ async def reindex_document(
     user = await get_user_from_token(authorization)
     
     # Récupérer le document avec son workspace owner
-    doc = DocumentsDB.get_with_workspace_owner(document_id)
+    doc = await DocumentsDB.get_with_workspace_owner(document_id)
     
     if not doc:
         raise HTTPException(status_code=404, detail="Document non trouvé")
@@ -306,7 +306,7 @@ async def reindex_document(
         raise HTTPException(status_code=403, detail="Accès refusé")
     
     # Mettre à jour le statut
-    DocumentsDB.update_status(document_id, "pending")
+    await DocumentsDB.update_status(document_id, "pending")
     
     # Relancer la vectorisation
     from app.services.vectorstore import vectorize_document
@@ -338,19 +338,19 @@ async def reindex_all_documents(
         await verify_workspace_access(workspace_id, user["id"])
         
         # Récupérer tous les documents du workspace
-        documents = DocumentsDB.get_by_workspace(workspace_id)
+        documents = await DocumentsDB.get_by_workspace(workspace_id)
         
         if not documents:
             raise HTTPException(status_code=400, detail="Aucun document à réindexer")
         
         # Supprimer l'ancien vectorstore
-        from app.services.vectorstore import delete_vectorstore, vectorize_document
-        delete_vectorstore(workspace_id)
+        from app.services.vectorstore import delete_vectorstore, vectorize_document, run_indexing
+        await run_indexing(delete_vectorstore, workspace_id)
         logger.info(f"Vectorstore supprimé pour workspace {workspace_id}")
         
         # Mettre tous les documents en status "processing"
         for doc in documents:
-            DocumentsDB.update_status(doc["id"], "processing", chunk_count=0)
+            await DocumentsDB.update_status(doc["id"], "processing", chunk_count=0)
         
         # Lancer la réindexation de tous les documents en séquence
         import asyncio
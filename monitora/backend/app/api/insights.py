@@ -6,7 +6,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import Optional, List
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from app.core.database import WorkspacesDB, InsightsDB, MessagesDB
+from app.core.database_async import WorkspacesDB, InsightsDB, MessagesDB
 from app.core.auth import get_current_user
 
 router = APIRouter()
@@ -63,16 +63,16 @@ async def get_workspace_insights(
     - Questions à faible confiance
     """
     # Vérifier que l'utilisateur possède ce workspace
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
     
     # Calculer les métriques
-    metrics = InsightsDB.calculate_metrics(workspace_id)
+    metrics = await InsightsDB.calculate_metrics(workspace_id)
     
     # Récupérer les questions à faible confiance
-    low_confidence = InsightsDB.get_low_confidence_questions(workspace_id)
+    low_confidence = await InsightsDB.get_low_confidence_questions(workspace_id)
     
     return {
         "metrics": metrics,
@@ -88,14 +88,14 @@ async def recalculate_insights(
 ):
     """Force le recalcul des insights d'un workspace"""
     # Vérifier ownership
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
     
     # Recalculer les métriques
     try:
-        metrics = InsightsDB.calculate_metrics(workspace_id)
+        metrics = await InsightsDB.calculate_metrics(workspace_id)
         return {"success": True, "metrics": metrics}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -109,13 +109,13 @@ async def mark_question_resolved(
 ):
     """Marque une question comme résolue (ajoutée à la documentation)"""
     # Vérifier que l'utilisateur possède ce workspace
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
     
     # Marquer comme résolu
-    success = MessagesDB.mark_resolved(message_id)
+    success = await MessagesDB.mark_resolved(message_id)
     
     if not success:
         raise HTTPException(status_code=404, detail="Message non trouvé")
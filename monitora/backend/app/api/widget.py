@@ -11,9 +11,9 @@ import json
 import base64
 import logging
 from urllib.parse import urlparse
-from app.core.database import (
+from app.core.database_async import (
     WorkspacesDB, ConversationsDB, MessagesDB, 
-    WorkspaceDatabasesDB, AnalyticsDB
+    WorkspaceDatabasesDB, run_db
 )
 from app.services.rag_pipeline import RAGPipeline, fix_email_format
 from app.services.intent_detector import IntentDetector
@@ -156,7 +156,7 @@ class WidgetConfig(BaseModel):
 async def get_widget_config(workspace_id: str, request: Request):
     """Récupère la configuration publique du widget"""
     
-    workspace = WorkspacesDB.get_by_id(workspace_id)
+    workspace = await WorkspacesDB.get_by_id(workspace_id)
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
@@ -247,7 +247,7 @@ async def widget_chat(
     # ========================================================
     # VALIDATION WORKSPACE
     # ========================================================
-    workspace = WorkspacesDB.get_by_id(workspace_id)
+    workspace = await WorkspacesDB.get_by_id(workspace_id)
     
     # Si le workspace est désactivé, renvoyer un message de maintenance
     if not workspace.get("is_active", True):
@@ -257,7 +257,7 @@ async def widget_chat(
         )
         
         # Sauvegarder le message utilisateur
-        MessagesDB.create(
+        await MessagesDB.create(
             conversation_id=conversation["id"],
             role="user",
             content=data.message
@@ -266,7 +266,7 @@ async def widget_chat(
         maintenance_msg = "Le chatbot est actuellement en maintenance et revient très bientôt ! 🚧"
         
         # Sauvegarder la réponse du système
-        msg = MessagesDB.create(
+        msg = await MessagesDB.create(
             conversation_id=conversation["id"],
             role="assistant",
             content=maintenance_msg
@@ -312,7 +312,7 @@ async def widget_chat(
     )
     
     # Sauvegarder le message utilisateur
-    MessagesDB.create(
+    await MessagesDB.create(
         conversation_id=conversation["id"],
         role="user",
         content=data.message
@@ -320,10 +320,10 @@ async def widget_chat(
     
     # Mieux : Mettre à jour les stats tout de suite pour capturer le 'nouveau visiteur'
     # avant que d'autres messages ne soient ajoutés (réponse bot)
-    _increment_analytics(workspace_id, data.visitor_id)
+    await run_db(_increment_analytics, workspace_id, data.visitor_id)
     
     # Mettre à jour le compteur de messages
-    ConversationsDB.increment_message_count(conversation["id"])
+    await ConversationsDB.increment_message_count(conversation["id"])
     
     # ========================================================
     # DÉTECTION D'INTENTION DE COMMANDE
@@ -332,7 +332,7 @@ async def widget_chat(
     
     if order_response:
         # Sauvegarder la réponse de commande
-        msg_result = MessagesDB.create(
+        msg_result = await MessagesDB.create(
             conversation_id=conversation["id"],
             role="assistant",
             content=order_response,
@@ -365,7 +365,7 @@ async def widget_chat(
     # RÉPONSE RAG CLASSIQUE
     # ========================================================
     # Récupérer l'historique (limité aux 6 derniers messages)
-    history_msgs = MessagesDB.get_by_conversation(conversation["id"], limit=6)
+    history_msgs = await MessagesDB.get_by_conversation(conversation["id"], limit=6)
     history = [{"role": m["role"], "content": m["content"]} for m in history_msgs]
     
     # Analytics déplacé plus haut pour gérer tous les cas (Order + RAG)
@@ -393,7 +393,7 @@ async def widget_chat(
         response_time_ms = int((time.time() - start_time) * 1000)
         
         # Sauvegarder la réponse avec le score RAG et temps de réponse
-        msg_result = MessagesDB.create(
+        msg_result = await MessagesDB.create(
             conversation_id=conversation["id"],
             role="assistant",
             content=response,
@@ -443,7 +443,7 @@ async def submit_feedback(workspace_id: str, request: Request):
         
         if session_id:
             # Trouver le dernier message assistant de cette conversation
-            msgs = MessagesDB.get_by_conversation(session_id)
+            msgs = await MessagesDB.get_by_conversation(session_id)
             # Filtrer assistant et prendre le dernier
             assistant_msgs = [m for m in msgs if m["role"] == "assistant"]
             if assistant_msgs:
@@ -461,7 +461,7 @@ async def submit_feedback(workspace_id: str, request: Request):
     # On va faire simple: update directement. Si le message n'existe pas, ca retourne False.
     # Pour la sécurité, on pourrait vérifier mais c'est un endpoint public de toute façon.
     
-    success = MessagesDB.update_feedback(message_id, feedback_value)
+    success = await MessagesDB.update_feedback(message_id, feedback_value)
     
     if not success:
          logger.warning(f"⚠️ Message {message_id} non trouvé ou non mis à jour")
@@ -493,7 +493,7 @@ async def _get_or_create_conversation(workspace_id: str, session_id: str, visito
     """Récupère ou crée une conversation avec visitor_id"""
     
     if session_id:
-        conv = ConversationsDB.get_by_id(session_id)
+        conv = await ConversationsDB.get_by_id(session_id)
         if conv and str(conv["workspace_id"]) == str(workspace_id):
             # Mettre à jour le visitor_id si fourni et pas encore défini
             if visitor_id and not conv.get("visitor_id"):
@@ -503,7 +503,7 @@ async def _get_or_create_conversation(workspace_id: str, session_id: str, visito
             return conv
     
     # Nouvelle conversation
-    return ConversationsDB.create(
+    return await ConversationsDB.create(
         workspace_id=workspace_id, 
         session_id=session_id, # On peut stocker le session_id frontend si on veut, ou laisser l'ID généré
         visitor_id=visitor_id
@@ -551,7 +551,7 @@ async def _check_order_intent(workspace_id: str, message: str, user_context: Opt
 
     
     # 2. Vérifier si la BDD externe est configurée ET activée
-    db_config = WorkspaceDatabasesDB.get_enabled_by_workspace(workspace_id)
+    db_config = await WorkspaceDatabasesDB.get_enabled_by_workspace(workspace_id)
     
     # Si pas de config OU désactivée, informer que le suivi n'est pas disponible
     if not db_config:
@@ -727,7 +727,7 @@ async def _stream_response_with_score(rag: RAGPipeline, message: str, history: l
     logger.debug(f"⏱️ Temps de réponse: {response_time_ms}ms (TTFB: {ttfb_ms}ms)")
     
     # Sauvegarder la réponse avec le score RAG et le temps de réponse
-    msg_result = MessagesDB.create(
+    msg_result = await MessagesDB.create(
         conversation_id=conversation_id,
         role="assistant",
         content=full_response,
@@ -744,9 +744,9 @@ async def _stream_response_with_score(rag: RAGPipeline, message: str, history: l
 
 
 def _increment_analytics(workspace_id: str, visitor_id: str):
-    """Incrémente les compteurs analytics quotidiens"""
+    """Incrémente les compteurs analytics quotidiens (bloquant, appelé via run_db)"""
     from datetime import date
-    from app.core.database import get_db
+    from app.core.database import get_db, AnalyticsDB
     
     today = date.today().isoformat()
     new_visitors = 0
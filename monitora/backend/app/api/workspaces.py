@@ -6,7 +6,8 @@ from typing import Optional
 from pydantic import BaseModel
 from app.core.config import settings, DEFAULT_RAG_CONFIG
 from app.core.auth_sqlserver import get_current_user, get_user_from_token_sqlserver
-from app.core.database import WorkspacesDB, get_db, to_json, parse_json, new_uuid
+from app.core.database import get_db, to_json, parse_json, new_uuid
+from app.core.database_async import WorkspacesDB, run_db
 
 router = APIRouter()
 
@@ -66,9 +67,8 @@ class RAGConfigUpdate(BaseModel):
 # ROUTES SQL Server
 # =====================================================
 
-@router.get("")
-async def list_workspaces(user = Depends(get_current_user)):
-    """Liste tous les workspaces de l'utilisateur"""
+def _list_workspaces(user_id: str) -> list:
+    """Workspaces d'un utilisateur avec leurs compteurs (bloquant, appelé via run_db)"""
     db = get_db()
     
     with db.cursor() as cursor:
@@ -79,7 +79,7 @@ async def list_workspaces(user = Depends(get_current_user)):
             FROM workspaces w
             WHERE w.user_id = ?
             ORDER BY w.created_at DESC
-        """, (user["id"],))
+        """, (user_id,))
         
         columns = [col[0] for col in cursor.description]
         rows = cursor.fetchall()
@@ -93,12 +93,14 @@ async def list_workspaces(user = Depends(get_current_user)):
         return workspaces
 
 
-@router.post("")
-async def create_workspace(
-    data: WorkspaceCreate,
-    user = Depends(get_current_user)
-):
-    """Crée un nouveau workspace"""
+@router.get("")
+async def list_workspaces(user = Depends(get_current_user)):
+    """Liste tous les workspaces de l'utilisateur"""
+    return await run_db(_list_workspaces, user["id"])
+
+
+def _create_workspace(user_id: str, data: WorkspaceCreate) -> dict:
+    """Insère un workspace et le relit (bloquant, appelé via run_db)"""
     db = get_db()
     workspace_id = new_uuid()
     
@@ -115,7 +117,7 @@ async def create_workspace(
             VALUES (?, ?, ?, ?, ?, ?, GETDATE(), GETDATE())
         """, (
             workspace_id,
-            user["id"],
+            user_id,
             data.name,
             data.description,
             to_json(DEFAULT_RAG_CONFIG),
@@ -132,13 +134,22 @@ async def create_workspace(
         return result
 
 
+@router.post("")
+async def create_workspace(
+    data: WorkspaceCreate,
+    user = Depends(get_current_user)
+):
+    """Crée un nouveau workspace"""
+    return await run_db(_create_workspace, user["id"], data)
+
+
 @router.get("/{workspace_id}")
 async def get_workspace(
     workspace_id: str,
     user = Depends(get_current_user)
 ):
     """Récupère un workspace par son ID"""
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
@@ -155,7 +166,7 @@ async def update_workspace(
     """Met à jour un workspace"""
     
     # Vérifier l'accès
-    existing = WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
+    existing = await WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
     if not existing:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
     
@@ -165,7 +176,7 @@ async def update_workspace(
     if not update_data:
         raise HTTPException(status_code=400, detail="Aucune donnée à mettre à jour")
     
-    result = WorkspacesDB.update(workspace_id, **update_data)
+    result = await WorkspacesDB.update(workspace_id, **update_data)
     return result
 
 
@@ -175,7 +186,7 @@ async def get_rag_config(
     user = Depends(get_current_user)
 ):
     """Récupère la configuration RAG d'un workspace"""
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
@@ -183,18 +194,8 @@ async def get_rag_config(
     return workspace.get("rag_config") or DEFAULT_RAG_CONFIG
 
 
-@router.get("/{workspace_id}/analytics")
-async def get_workspace_analytics(
-    workspace_id: str,
-    period: str = "30d",
-    user = Depends(get_current_user)
-):
-    """Récupère les analytics d'un workspace"""
-    # Vérifier l'accès
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
-    if not workspace:
-        raise HTTPException(status_code=404, detail="Workspace non trouvé")
-        
+def _compute_workspace_analytics(workspace_id: str, period: str) -> dict:
+    """Calcule les analytics d'un workspace (bloquant, appelé via run_db)"""
     db = get_db()
     
     # Récupérer les stats globales depuis la vue ou calculer en direct
@@ -326,6 +327,22 @@ async def get_workspace_analytics(
         }
 
 
+@router.get("/{workspace_id}/analytics")
+async def get_workspace_analytics(
+    workspace_id: str,
+    period: str = "30d",
+    user = Depends(get_current_user)
+):
+    """Récupère les analytics d'un workspace"""
+    # Vérifier l'accès
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
+    if not workspace:
+        raise HTTPException(status_code=404, detail="Workspace non trouvé")
+    
+    # Requêtes lourdes: exécutées hors de la boucle d'événements
+    return await run_db(_compute_workspace_analytics, workspace_id, period)
+
+
 @router.patch("/{workspace_id}/rag-config")
 async def update_rag_config(
     workspace_id: str,
@@ -335,7 +352,7 @@ async def update_rag_config(
     """Met à jour la configuration RAG d'un workspace"""
     
     # Récupérer le workspace actuel
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
@@ -345,7 +362,7 @@ async def update_rag_config(
     new_config = {k: v for k, v in config.model_dump().items() if v is not None}
     merged_config = {**current_config, **new_config}
     
-    result = WorkspacesDB.update(workspace_id, rag_config=merged_config)
+    result = await WorkspacesDB.update(workspace_id, rag_config=merged_config)
     return result
 
 
@@ -358,7 +375,7 @@ async def update_widget_config(
     """Met à jour la configuration du widget (couleur, textes, dimensions...)"""
     
     # Récupérer le workspace actuel
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
@@ -367,7 +384,7 @@ async def update_widget_config(
     current_config = workspace.get("widget_config") or {}
     merged_config = {**current_config, **config}
     
-    result = WorkspacesDB.update(workspace_id, widget_config=merged_config)
+    result = await WorkspacesDB.update(workspace_id, widget_config=merged_config)
     return result
 
 
@@ -379,7 +396,7 @@ async def delete_workspace(
     """Supprime un workspace et toutes ses données associées en cascade."""
     
     # Vérifier l'accès
-    workspace = WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
+    workspace = await WorkspacesDB.get_by_id_and_user(workspace_id, user["id"])
     
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace non trouvé")
@@ -387,7 +404,7 @@ async def delete_workspace(
     workspace_name = workspace.get("name", "")
     
     try:
-        WorkspacesDB.delete(workspace_id)
+        await WorkspacesDB.delete(workspace_id)
         return {
             "success": True,
             "message": f"Workspace '{workspace_name}' supprimé avec succès"
@@ -29,6 +29,13 @@ class Settings(BaseSettings):
     MSSQL_PASSWORD: str = "M3ss4ges"
     MSSQL_DRIVER: str = "ODBC Driver 18 for SQL Server"
     
+    # Pool de connexions (empruntée le temps d'un bloc cursor(), réutilisée en LIFO)
+    MSSQL_POOL_SIZE: int = 10                # Connexions ouvertes au plus
+    MSSQL_POOL_TIMEOUT_S: float = 10.0       # Attente max d'une connexion libre
+    MSSQL_POOL_MAX_LIFETIME_S: float = 1800  # Connexion recyclée au-delà
+    MSSQL_POOL_PING_IDLE_S: float = 10.0     # SELECT 1 avant réutilisation si inactive depuis plus longtemps
+    MSSQL_ASYNC_WORKERS: int = 10            # Threads DB de la façade async (<= MSSQL_POOL_SIZE)
+    
     # ===========================================
     # Supabase (legacy - à supprimer après migration)
     # ===========================================
@@ -80,6 +87,14 @@ class Settings(BaseSettings):
     VECTORSTORE_PATH: str = "./data/vectorstores"
     UPLOADS_PATH: str = "./data/uploads"
     
+    # Cache mémoire des index FAISS (recherche sans disque ni DB)
+    VECTORSTORE_CACHE_MAX_MB: int = 512          # Budget mémoire, éviction LRU au-delà
+    VECTORSTORE_FRESHNESS_CHECK_S: float = 30.0  # Vérification (en arrière-plan) de la version DB
+    VECTORSTORE_SEARCH_WORKERS: int = 4          # Threads de recherche (chargement FAISS + embedding requête)
+    EMBEDDING_CACHE_PATH: str = "./data/embedding_cache.sqlite3"  # Vecteurs des chunks (jamais recalculés)
+    VECTORSTORE_MAX_SEGMENTS: int = 8                # Au-delà, les segments en DB sont fusionnés
+    VECTORSTORE_COMPACT_TOMBSTONE_RATIO: float = 0.2  # Ou si cette part des chunks a été supprimée
+    
     @property
     def cors_origins_list(self) -> List[str]:
         """Retourne les origines CORS comme liste"""
@@ -6,10 +6,12 @@ import pyodbc
 import struct
 import json
 import uuid
+import threading
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from contextlib import contextmanager
 from app.core.config import settings
+from app.core.db_pool import ConnectionPool
 import logging
 
 logger = logging.getLogger(__name__)
@@ -30,10 +32,12 @@ def _handle_datetimeoffset(dto_value):
 # =====================================================
 
 class DatabaseConnection:
-    """Gestionnaire de connexion SQL Server"""
+    """Gestionnaire de connexion SQL Server (connexions poolées)"""
     
     _instance = None
     _connection_string = None
+    _pool = None
+    _pool_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -59,19 +63,37 @@ class DatabaseConnection:
         conn.add_output_converter(SQL_DATETIMEOFFSET, _handle_datetimeoffset)
         return conn
     
+    @property
+    def pool(self) -> ConnectionPool:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    DatabaseConnection._pool = ConnectionPool(
+                        self.get_connection,
+                        max_size=settings.MSSQL_POOL_SIZE,
+                        timeout_s=settings.MSSQL_POOL_TIMEOUT_S,
+                        max_lifetime_s=settings.MSSQL_POOL_MAX_LIFETIME_S,
+                        ping_idle_s=settings.MSSQL_POOL_PING_IDLE_S,
+                    )
+        return self._pool
+    
     @contextmanager
     def cursor(self):
-        """Context manager pour obtenir un curseur"""
-        conn = self.get_connection()
-        try:
-            cursor = conn.cursor()
+        """
+        Context manager pour obtenir un curseur
+        La connexion est rendue au pool à la fin du bloc (jamais gardée pendant
+        un await); le pool LIFO redonne la même connexion chaude au bloc suivant.
+        """
+        with self.pool.cursor() as cursor:
             yield cursor
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            raise e
-        finally:
-            conn.close()
+    
+    def get_pool_stats(self) -> dict:
+        return self.pool.get_stats()
+    
+    def close(self):
+        """Ferme les connexions inactives (arrêt de l'application)"""
+        if self._pool is not None:
+            self._pool.close_all()
 
 
 # Instance globale
@@ -385,6 +407,16 @@ class VectorStoreDB:
             row = cursor.fetchone()
             return row[0] if row else None
             
+    @staticmethod
+    def delete_file(workspace_id: str, file_name: str) -> bool:
+        """Supprime un fichier du vectorstore (segment compacté, ancien format)"""
+        with _db.cursor() as cursor:
+            cursor.execute("""
+                DELETE FROM vectorstore_contents 
+                WHERE workspace_id = ? AND file_name = ?
+            """, (workspace_id, file_name))
+            return cursor.rowcount > 0
+
     @staticmethod
     def delete_workspace_vectorstore(workspace_id: str) -> bool:
         """Supprime tout le vectorstore d'un workspace"""
@@ -0,0 +1,121 @@
+"""
+Façade asynchrone de la couche de données SQL Server
+Les appels pyodbc sont bloquants: exécutés directement dans un handler async,
+ils figent la boucle d'événements (et les streams SSE des autres visiteurs).
+
+Mêmes classes et mêmes méthodes que app.core.database, à attendre avec await:
+
+    from app.core.database_async import MessagesDB
+    msg = await MessagesDB.create(conversation_id=..., role="user", content=...)
+
+Les appels partent dans un pool de threads dédié, borné par MSSQL_ASYNC_WORKERS.
+Chaque appel emprunte une connexion au ConnectionPool (app.core.db_pool) le temps
+d'un bloc cursor() et la rend aussitôt: rien n'est partagé entre appels.
+"""
+import asyncio
+import time
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+from app.core import database
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "in_flight": 0, "max_in_flight": 0, "max_queue_wait_ms": 0.0}
+
+
+def _workers() -> int:
+    # Jamais plus de threads que de connexions: un thread n'attend pas le pool
+    return max(1, min(settings.MSSQL_ASYNC_WORKERS, settings.MSSQL_POOL_SIZE))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_workers(),
+                    thread_name_prefix="db"
+                )
+    return _executor
+
+
+def _run_tracked(submitted_at: float, func: Callable, args, kwargs) -> Any:
+    wait_ms = (time.perf_counter() - submitted_at) * 1000
+    with _stats_lock:
+        _stats["in_flight"] += 1
+        _stats["max_in_flight"] = max(_stats["max_in_flight"], _stats["in_flight"])
+        _stats["max_queue_wait_ms"] = max(_stats["max_queue_wait_ms"], round(wait_ms, 1))
+    try:
+        return func(*args, **kwargs)
+    finally:
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+
+
+async def run_db(func: Callable, *args, **kwargs) -> Any:
+    """Exécute une fonction bloquante d'accès DB dans le pool de threads DB"""
+    with _stats_lock:
+        _stats["calls"] += 1
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(),
+        _run_tracked,
+        time.perf_counter(),
+        func,
+        args,
+        kwargs,
+    )
+
+
+class AsyncDB:
+    """Expose les méthodes d'une classe *DB synchrone sous forme de coroutines"""
+
+    def __init__(self, sync_cls):
+        self._sync_cls = sync_cls
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._sync_cls, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await run_db(attr, *args, **kwargs)
+
+        setattr(self, name, call)
+        return call
+
+    def __repr__(self) -> str:
+        return f"AsyncDB({self._sync_cls.__name__})"
+
+
+WorkspacesDB = AsyncDB(database.WorkspacesDB)
+DocumentsDB = AsyncDB(database.DocumentsDB)
+VectorStoreDB = AsyncDB(database.VectorStoreDB)
+ConversationsDB = AsyncDB(database.ConversationsDB)
+MessagesDB = AsyncDB(database.MessagesDB)
+AnalyticsDB = AsyncDB(database.AnalyticsDB)
+WorkspaceDatabasesDB = AsyncDB(database.WorkspaceDatabasesDB)
+ProfilesDB = AsyncDB(database.ProfilesDB)
+InsightsDB = AsyncDB(database.InsightsDB)
+
+
+def get_async_db_stats() -> dict:
+    """Statistiques du pool de threads DB (pour /health)"""
+    with _stats_lock:
+        return {**_stats, "workers": _workers()}
+
+
+def shutdown():
+    """Arrête le pool de threads DB (arrêt de l'application)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
@@ -0,0 +1,166 @@
+"""
+Pool de connexions SQL Server
+Indépendant du driver: connect() fournit une connexion DB-API (pyodbc en production)
+
+- LIFO: le bloc suivant récupère la dernière connexion rendue (chaude, sans ping)
+- Une connexion n'est empruntée que le temps d'un bloc cursor(): jamais pendant
+  un await (appel LLM, stream), sinon le pool plafonne le nombre de requêtes HTTP
+"""
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class _PooledConnection:
+    """Connexion DB-API + dates de création / dernier retour au pool"""
+    
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.released_at = self.created_at
+        self.broken = False
+
+
+class ConnectionPool:
+    """
+    Pool borné de connexions SQL Server.
+    - max_size connexions au plus (attente puis erreur au-delà de timeout_s)
+    - pre-ping (SELECT 1) des connexions restées inactives plus de ping_idle_s
+    - connexions fermées au-delà de max_lifetime_s (bascule DNS, fuites côté serveur)
+    """
+    
+    def __init__(self, connect, max_size: int, timeout_s: float, max_lifetime_s: float, ping_idle_s: float):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout_s = timeout_s
+        self.max_lifetime_s = max_lifetime_s
+        self.ping_idle_s = ping_idle_s
+        self._idle: deque = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = {
+            "opened": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "reused": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "ping_failures": 0,
+            "expired": 0,
+        }
+    
+    def _close(self, pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.stats["closed"] += 1
+            self._cond.notify()
+    
+    def _is_alive(self, pooled: _PooledConnection) -> bool:
+        if time.monotonic() - pooled.released_at < self.ping_idle_s:
+            return True
+        try:
+            pooled.conn.cursor().execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+    
+    def acquire(self) -> _PooledConnection:
+        """Connexion validée (réutilisée si possible, créée sinon dans la limite du pool)"""
+        deadline = time.monotonic() + self.timeout_s
+        with self._cond:
+            self.stats["checkouts"] += 1
+        while True:
+            pooled = None
+            with self._cond:
+                while pooled is None:
+                    if self._idle:
+                        pooled = self._idle.pop()
+                    elif self._size < self.max_size:
+                        self._size += 1
+                        break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.stats["timeouts"] += 1
+                            raise TimeoutError(
+                                f"Pool SQL Server saturé ({self.max_size} connexions occupées depuis {self.timeout_s}s)"
+                            )
+                        self.stats["waits"] += 1
+                        self._cond.wait(remaining)
+            
+            if pooled is None:
+                # Nouvelle connexion (hors verrou: login TLS lent)
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.stats["opened"] += 1
+                return _PooledConnection(conn)
+            
+            if time.monotonic() - pooled.created_at > self.max_lifetime_s:
+                with self._cond:
+                    self.stats["expired"] += 1
+                self._close(pooled)
+                continue
+            if not self._is_alive(pooled):
+                with self._cond:
+                    self.stats["ping_failures"] += 1
+                self._close(pooled)
+                continue
+            with self._cond:
+                self.stats["reused"] += 1
+            return pooled
+    
+    def release(self, pooled: _PooledConnection, broken: bool = False):
+        """Rend une connexion au pool (fermée si cassée)"""
+        if broken:
+            self._close(pooled)
+            return
+        pooled.released_at = time.monotonic()
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+    
+    @contextmanager
+    def cursor(self):
+        """Curseur sur une connexion du pool: commit en fin de bloc, rollback sur erreur"""
+        pooled = self.acquire()
+        conn = pooled.conn
+        try:
+            cursor = conn.cursor()
+            yield cursor
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                # Connexion morte: ne pas la rendre au pool
+                pooled.broken = True
+            raise
+        finally:
+            self.release(pooled, broken=pooled.broken)
+    
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for pooled in idle:
+            self._close(pooled)
+    
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                **self.stats,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            }
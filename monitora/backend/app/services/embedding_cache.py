@@ -0,0 +1,103 @@
+"""
+Cache persistant des embeddings de chunks
+Un chunk déjà embeddé (même texte, même modèle) n'est jamais recalculé,
+y compris lors d'une reconstruction complète d'un vectorstore.
+
+Stockage SQLite local: clé = SHA256(modèle + texte), vecteur float32
+(la précision de l'index FAISS, donc aucune perte).
+"""
+import os
+import hashlib
+import sqlite3
+import threading
+import logging
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _chunk_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Embeddings de chunks par hash de contenu (SQLite, thread-safe)"""
+
+    def __init__(self, path: str, model: str):
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Vecteurs en cache (None pour les textes jamais embeddés)"""
+        keys = [_chunk_key(self.model, text) for text in texts]
+        found = {}
+        with self._lock:
+            # Par paquets: limite de variables SQLite
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})",
+                    part,
+                ).fetchall()
+                found.update(rows)
+            hits = sum(1 for key in keys if key in found)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(keys) - hits
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        rows = [
+            (_chunk_key(self.model, text), np.asarray(vector, dtype=np.float32).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self._conn.commit()
+            self.stats["writes"] += len(rows)
+
+    def embed(self, texts: Sequence[str], embed_documents: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """Embeddings de tous les textes: cache d'abord, modèle pour les manquants"""
+        vectors = self.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = embed_documents([texts[i] for i in missing])
+            self.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = list(vector)
+        logger.info(f"Embeddings: {len(texts) - len(missing)} en cache, {len(missing)} calculés")
+        return vectors
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {**self.stats, "entries": count}
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache(model: str) -> EmbeddingCache:
+    """Singleton du cache d'embeddings"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, model)
+    return _embedding_cache
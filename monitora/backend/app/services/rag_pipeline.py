@@ -3,12 +3,16 @@ Pipeline RAG complet
 Combine vectorstore + LLM pour générer des réponses
 Inclut cache sémantique pour les questions répétitives
 """
+import asyncio
 import logging
 import re
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from typing import AsyncIterator, List, Dict, Tuple, Optional
 from app.services.llm_provider import get_llm_provider
 from app.core.config import settings, DEFAULT_RAG_CONFIG
 from app.services.semantic_cache import search_cached_response, save_to_cache
+from app.core.database_async import run_db
 
 # Importer le bon module vectorstore selon le mode
 if settings.STORAGE_MODE == "supabase":
@@ -18,6 +22,20 @@ else:
 
 logger = logging.getLogger(__name__)
 
+# Recherche vectorielle (chargement FAISS à froid + embedding de la question):
+# pool dédié, pour ne pas occuper les threads DB bornés par MSSQL_POOL_SIZE
+_search_executor = ThreadPoolExecutor(
+    max_workers=settings.VECTORSTORE_SEARCH_WORKERS,
+    thread_name_prefix="vs-search"
+)
+
+
+async def _search(workspace_id: str, query: str, top_k: int):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _search_executor, functools.partial(search_vectorstore, workspace_id, query, top_k=top_k)
+    )
+
 
 def fix_email_format(text: str) -> str:
     """Corrige les emails CoolLibri malformés dans le texte.
@@ -164,7 +182,8 @@ class RAGPipeline:
         # ===== CACHE SÉMANTIQUE =====
         # Vérifier si une question similaire existe en cache (seulement si pas d'historique complexe)
         if self.config.get("enable_cache", True) and (not history or len(history) <= 2):
-            cached = search_cached_response(
+            cached = await run_db(
+                search_cached_response,
                 workspace_id=self.workspace_id,
                 question=query,
                 similarity_threshold=self.config.get("similarity_threshold", 0.92),
@@ -178,7 +197,7 @@ class RAGPipeline:
         # ===== PIPELINE RAG STANDARD =====
         # Recherche vectorielle
         top_k = self.config.get("top_k", settings.DEFAULT_TOP_K)
-        documents = search_vectorstore(self.workspace_id, query, top_k=top_k)
+        documents = await _search(self.workspace_id, query, top_k)
         
         # Construire le contexte
         context, sources = self._build_context(documents)
@@ -201,7 +220,7 @@ class RAGPipeline:
             
             # Sauvegarder en cache si activé
             if self.config.get("enable_cache", True):
-                save_to_cache(self.workspace_id, query, response)
+                await run_db(save_to_cache, self.workspace_id, query, response)
             
             return response, sources, False
             
@@ -221,7 +240,7 @@ class RAGPipeline:
         """
         # Recherche vectorielle
         top_k = self.config.get("top_k", settings.DEFAULT_TOP_K)
-        documents = search_vectorstore(self.workspace_id, query, top_k=top_k)
+        documents = await _search(self.workspace_id, query, top_k)
         
         # Construire le contexte
         context, sources = self._build_context(documents)
@@ -3,8 +3,12 @@ Service de gestion des Vectorstores
 Utilise LangChain avec FAISS pour le stockage vectoriel
 """
 import os
+import hashlib
+import inspect
 import logging
-from typing import List, Optional
+import threading
+import functools
+from typing import Dict, List, Optional
 from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -17,13 +21,48 @@ from langchain_community.document_loaders import (
 from langchain_core.documents import Document
 from app.core.config import settings
 from app.core.database import DocumentsDB, WorkspacesDB, VectorStoreDB
+from app.services.vectorstore_cache import get_index_cache
+from app.services.embedding_cache import get_embedding_cache
+from app.services.vectorstore_segments import persist_segments, sync_segments
 import tempfile
 import shutil
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Écritures d'index (indexation, suppression, reconstruction) hors de la boucle d'événements.
+# Un seul thread pour les appels API, et un verrou par workspace partagé par toutes
+# les fonctions qui réécrivent l'index local / le manifeste (y compris le chargement à froid)
+_indexing_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="indexing")
+_workspace_locks: Dict[str, threading.RLock] = {}
+_workspace_locks_guard = threading.Lock()
+
+
+def _workspace_lock(workspace_id: str) -> threading.RLock:
+    with _workspace_locks_guard:
+        return _workspace_locks.setdefault(workspace_id, threading.RLock())
+
+
+def _per_workspace(func):
+    """Exécute func sous le verrou du workspace (argument workspace_id)"""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        workspace_id = signature.bind(*args, **kwargs).arguments["workspace_id"]
+        with _workspace_lock(workspace_id):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+async def run_indexing(func, *args, **kwargs):
+    """Exécute une écriture d'index bloquante dans le thread d'indexation"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_indexing_executor, functools.partial(func, *args, **kwargs))
+
 # Embeddings (modèle léger mais efficace)
 EMBEDDINGS_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 embeddings = None
@@ -40,18 +79,79 @@ def get_embeddings():
     return embeddings
 
 
+def _content_key(text: str) -> str:
+    """Clé de déduplication d'un chunk (500 premiers caractères)"""
+    return hashlib.sha256(text[:500].encode("utf-8")).hexdigest()
+
+
+def _chunk_id(document_id: str, text: str) -> str:
+    """ID stable d'un chunk: même document + même texte = même ID"""
+    return f"{document_id}:{hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]}"
+
+
+def _embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embeddings via le cache persistant (seuls les textes inconnus passent par le modèle)"""
+    return get_embedding_cache(EMBEDDINGS_MODEL).embed(texts, get_embeddings().embed_documents)
+
+
+def _add_chunks(vectorstore: FAISS, chunks: List[Document], ids: List[str]):
+    """Ajoute des chunks à un index existant sans toucher aux autres vecteurs"""
+    texts = [chunk.page_content for chunk in chunks]
+    vectorstore.add_embeddings(
+        list(zip(texts, _embed_texts(texts))),
+        metadatas=[chunk.metadata for chunk in chunks],
+        ids=ids
+    )
+
+
+def _build_vectorstore(chunks: List[Document]) -> FAISS:
+    """Crée un index complet (les embeddings déjà calculés sont relus du cache)"""
+    unique = {}
+    for chunk in chunks:
+        unique.setdefault(_chunk_id(chunk.metadata.get("document_id", ""), chunk.page_content), chunk)
+    texts = [chunk.page_content for chunk in unique.values()]
+    return FAISS.from_embeddings(
+        list(zip(texts, _embed_texts(texts))),
+        get_embeddings(),
+        metadatas=[chunk.metadata for chunk in unique.values()],
+        ids=list(unique)
+    )
+
+
+def _remember_vectors(vectorstore: FAISS, ids: List[str]):
+    """Copie dans le cache d'embeddings les vecteurs d'un index (avant suppression / reconstruction)"""
+    if not ids:
+        return
+    try:
+        positions = {doc_id: idx for idx, doc_id in vectorstore.index_to_docstore_id.items()}
+        texts, vectors = [], []
+        for doc_id in ids:
+            doc = vectorstore.docstore.search(doc_id)
+            if doc_id in positions and isinstance(doc, Document):
+                texts.append(doc.page_content)
+                vectors.append(vectorstore.index.reconstruct(positions[doc_id]))
+        get_embedding_cache(EMBEDDINGS_MODEL).put_many(texts, vectors)
+    except Exception as e:
+        logger.warning(f"Vecteurs existants non récupérés: {e}")
+
+
 def get_vectorstore_path(workspace_id: str) -> str:
     """Retourne le chemin du vectorstore pour un workspace"""
     return os.path.join(settings.VECTORSTORE_PATH, workspace_id)
 
 
-def _ensure_vectorstore_local(workspace_id: str) -> bool:
+# db_updated_at non fourni: le timestamp DB est lu par _ensure_vectorstore_local
+_UNKNOWN = object()
+
+
+def _ensure_vectorstore_local(workspace_id: str, db_updated_at=_UNKNOWN) -> bool:
     """S'assure que le vectorstore est présent localement (depuis DB si besoin)"""
     vs_path = get_vectorstore_path(workspace_id)
     index_path = os.path.join(vs_path, "index.faiss")
     
     # Vérifier le timestamp DB
-    db_updated_at = VectorStoreDB.get_last_updated(workspace_id)
+    if db_updated_at is _UNKNOWN:
+        db_updated_at = VectorStoreDB.get_last_updated(workspace_id)
     
     should_download = False
     
@@ -74,7 +174,12 @@ def _ensure_vectorstore_local(workspace_id: str) -> bool:
     if not should_download:
         return os.path.exists(index_path)
     
-    # Télécharger depuis DB
+    # Format segmenté: seuls les segments absents en local sont téléchargés
+    synced = sync_segments(workspace_id, vs_path, get_embeddings())
+    if synced is not None:
+        return synced
+    
+    # Ancien format: télécharger index.faiss + index.pkl complets
     index_blob = VectorStoreDB.get_file(workspace_id, "index.faiss")
     pkl_blob = VectorStoreDB.get_file(workspace_id, "index.pkl")
     
@@ -91,36 +196,69 @@ def _ensure_vectorstore_local(workspace_id: str) -> bool:
     return os.path.exists(index_path)
 
 
-def _persist_vectorstore_to_db(workspace_id: str):
-    """Sauvegarde le vectorstore local dans la DB"""
+def _index_nbytes(workspace_id: str) -> int:
+    """Taille sur disque de l'index (estimation de son empreinte mémoire)"""
+    vs_path = get_vectorstore_path(workspace_id)
+    return sum(
+        os.path.getsize(os.path.join(vs_path, name))
+        for name in ("index.faiss", "index.pkl")
+        if os.path.exists(os.path.join(vs_path, name))
+    )
+
+
+@_per_workspace
+def _load_workspace_index(workspace_id: str):
+    """Loader du cache: synchro DB -> disque puis FAISS.load_local (chargement à froid)"""
+    version = VectorStoreDB.get_last_updated(workspace_id)
+    if not _ensure_vectorstore_local(workspace_id, version):
+        return None
+    vectorstore = FAISS.load_local(
+        get_vectorstore_path(workspace_id),
+        get_embeddings(),
+        allow_dangerous_deserialization=True
+    )
+    return vectorstore, version, _index_nbytes(workspace_id)
+
+
+def _index_cache():
+    return get_index_cache(_load_workspace_index, VectorStoreDB.get_last_updated)
+
+
+def _cache_vectorstore(workspace_id: str, vectorstore):
+    """Remplace l'index en cache après une indexation (évite un rechargement à froid)"""
+    try:
+        version = VectorStoreDB.get_last_updated(workspace_id)
+        _index_cache().put(workspace_id, vectorstore, version, _index_nbytes(workspace_id))
+    except Exception as e:
+        logger.warning(f"Cache vectorstore non mis à jour pour {workspace_id}: {e}")
+        _index_cache().invalidate(workspace_id)
+
+
+def get_index_cache_stats() -> dict:
+    """Statistiques du cache d'index (pour /health)"""
+    return _index_cache().get_stats()
+
+
+def _persist_vectorstore_to_db(workspace_id: str, vectorstore: FAISS):
+    """Sauvegarde en DB les changements du vectorstore local (segment des chunks ajoutés)"""
     vs_path = get_vectorstore_path(workspace_id)
     if not os.path.exists(vs_path):
         return
     
-    # Lire les fichiers
     try:
-        index_path = os.path.join(vs_path, "index.faiss")
-        pkl_path = os.path.join(vs_path, "index.pkl")
-        
-        if os.path.exists(index_path):
-            with open(index_path, "rb") as f:
-                VectorStoreDB.save_file(workspace_id, "index.faiss", f.read())
-        
-        if os.path.exists(pkl_path):
-            with open(pkl_path, "rb") as f:
-                VectorStoreDB.save_file(workspace_id, "index.pkl", f.read())
-                
-        logger.info(f"Vectorstore sauvegardé en DB pour {workspace_id}")
+        persist_segments(workspace_id, vs_path, vectorstore)
     except Exception as e:
         logger.error(f"Erreur sauvegarde vectorstore DB: {e}")
 
 
+@_per_workspace
 def delete_vectorstore(workspace_id: str) -> bool:
     """
     Supprime complètement le vectorstore d'un workspace.
     Local + DB
     """
     vs_path = get_vectorstore_path(workspace_id)
+    _index_cache().invalidate(workspace_id)
     
     # Supprimer local
     if os.path.exists(vs_path):
@@ -175,8 +313,15 @@ def split_documents(documents: List[Document], chunk_size: int = 1500, chunk_ove
 async def vectorize_document(document_id: str, workspace_id: str, file_path: str):
     """
     Vectorise un document et l'ajoute au vectorstore du workspace.
-    Fonction asynchrone appelée en arrière-plan après upload.
+    Fonction asynchrone appelée en arrière-plan après upload: le travail
+    bloquant (SQL Server, embeddings, FAISS) tourne dans le thread d'indexation.
     """
+    await run_indexing(_vectorize_document, document_id, workspace_id, file_path)
+
+
+@_per_workspace
+def _vectorize_document(document_id: str, workspace_id: str, file_path: str):
+    """Vectorisation d'un document (bloquant, voir vectorize_document)"""
     try:
         # Mettre à jour le statut
         DocumentsDB.update_status(document_id, "processing")
@@ -254,45 +399,47 @@ async def vectorize_document(document_id: str, workspace_id: str, file_path: str
         vs_path = get_vectorstore_path(workspace_id)
         
         if os.path.exists(vs_path):
-            # Charger le vectorstore existant
+            # Charger le vectorstore existant (copie privée: le cache de recherche reste intact)
             vectorstore = FAISS.load_local(
                 vs_path, 
                 get_embeddings(),
                 allow_dangerous_deserialization=True
             )
             
-            # Supprimer les anciens chunks de ce document (pour réindexation propre)
+            # Mise à jour incrémentale: seuls les chunks nouveaux sont embeddés
             try:
-                # Récupérer tous les documents du vectorstore qui ne sont PAS de ce document_id
-                all_docs = []
-                seen_contents = set()  # Pour éviter les doublons de contenu
-                docstore = vectorstore.docstore
-                
-                for doc_id in vectorstore.index_to_docstore_id.values():
-                    doc = docstore.search(doc_id)
-                    if doc and doc.metadata.get("document_id") != document_id:
-                        # Créer une clé unique basée sur le contenu pour éviter les doublons
-                        content_hash = hash(doc.page_content[:500] if len(doc.page_content) > 500 else doc.page_content)
-                        if content_hash not in seen_contents:
-                            seen_contents.add(content_hash)
-                            all_docs.append(doc)
+                docstore = vectorstore.docstore._dict
+                old_ids = [doc_id for doc_id, doc in docstore.items() if doc.metadata.get("document_id") == document_id]
                 
-                # Aussi vérifier les chunks à ajouter pour éviter les doublons
+                # Éviter les doublons de contenu avec les autres documents
+                seen_contents = {
+                    _content_key(doc.page_content)
+                    for doc in docstore.values()
+                    if doc.metadata.get("document_id") != document_id
+                }
                 unique_chunks = []
                 for chunk in chunks:
-                    content_hash = hash(chunk.page_content[:500] if len(chunk.page_content) > 500 else chunk.page_content)
+                    content_hash = _content_key(chunk.page_content)
                     if content_hash not in seen_contents:
                         seen_contents.add(content_hash)
                         unique_chunks.append(chunk)
                 
-                logger.info(f"Réindexation: {len(all_docs)} chunks existants conservés, {len(unique_chunks)} nouveaux ajoutés (suppression de {len(chunks) - len(unique_chunks)} doublons)")
+                new_ids = [_chunk_id(document_id, chunk.page_content) for chunk in unique_chunks]
+                kept = set(old_ids) & set(new_ids)
+                to_delete = [doc_id for doc_id in old_ids if doc_id not in kept]
+                to_add = [(doc_id, chunk) for doc_id, chunk in zip(new_ids, unique_chunks) if doc_id not in kept]
                 
-                # Recréer le vectorstore avec les docs existants + nouveaux chunks uniques
-                # Utiliser from_documents qui gère les IDs automatiquement
-                if all_docs or unique_chunks:
-                    vectorstore = FAISS.from_documents(all_docs + unique_chunks, get_embeddings())
-                else:
-                    vectorstore = FAISS.from_documents(chunks, get_embeddings())
+                # Vecteurs des chunks supprimés gardés en cache (ré-upload identique = 0 calcul)
+                _remember_vectors(vectorstore, to_delete)
+                if to_delete:
+                    vectorstore.delete(to_delete)
+                if to_add:
+                    _add_chunks(vectorstore, [chunk for _, chunk in to_add], [doc_id for doc_id, _ in to_add])
+                
+                logger.info(
+                    f"Indexation incrémentale: {len(to_add)} chunks ajoutés, {len(to_delete)} supprimés, "
+                    f"{len(kept)} inchangés ({len(chunks) - len(unique_chunks)} doublons ignorés)"
+                )
                     
             except Exception as e:
                 logger.error(f"Erreur lors de la mise à jour incrémentale: {e}")
@@ -345,20 +492,21 @@ async def vectorize_document(document_id: str, workspace_id: str, file_path: str
                         all_chunks_to_index.extend(d_chunks)
                 
                 if all_chunks_to_index:
-                     vectorstore = FAISS.from_documents(all_chunks_to_index, get_embeddings())
+                     vectorstore = _build_vectorstore(all_chunks_to_index)
                 else:
-                     vectorstore = FAISS.from_documents(chunks, get_embeddings())
+                     vectorstore = _build_vectorstore(chunks)
 
         else:
             # Créer nouveau vectorstore
-            vectorstore = FAISS.from_documents(chunks, get_embeddings())
+            vectorstore = _build_vectorstore(chunks)
         
         # Sauvegarder localement
         os.makedirs(os.path.dirname(vs_path), exist_ok=True)
         vectorstore.save_local(vs_path)
         
         # Persister en DB
-        _persist_vectorstore_to_db(workspace_id)
+        _persist_vectorstore_to_db(workspace_id, vectorstore)
+        _cache_vectorstore(workspace_id, vectorstore)
         
         # Mettre à jour le document avec le statut indexed
         DocumentsDB.update_status(document_id, "indexed", len(chunks))
@@ -373,18 +521,11 @@ async def vectorize_document(document_id: str, workspace_id: str, file_path: str
 
 
 def search_vectorstore(workspace_id: str, query: str, top_k: int = 8) -> List[Document]:
-    """Recherche dans le vectorstore d'un workspace"""
-    vs_path = get_vectorstore_path(workspace_id)
-    
-    if not _ensure_vectorstore_local(workspace_id):
-        return []
-    
+    """Recherche dans le vectorstore d'un workspace (index gardé en mémoire)"""
     try:
-        vectorstore = FAISS.load_local(
-            vs_path,
-            get_embeddings(),
-            allow_dangerous_deserialization=True
-        )
+        vectorstore = _index_cache().get(workspace_id)
+        if vectorstore is None:
+            return []
         
         results = vectorstore.similarity_search(query, k=top_k)
         return results
@@ -394,11 +535,11 @@ def search_vectorstore(workspace_id: str, query: str, top_k: int = 8) -> List[Do
         return []
 
 
+@_per_workspace
 def delete_document_from_vectorstore(workspace_id: str, document_id: str):
     """
     Supprime un document du vectorstore.
-    Note: FAISS ne supporte pas la suppression directe,
-    il faut reconstruire le vectorstore sans ce document.
+    Suppression par ID (remove_ids FAISS): aucun chunk n'est ré-embeddé.
     """
     vs_path = get_vectorstore_path(workspace_id)
     
@@ -412,19 +553,21 @@ def delete_document_from_vectorstore(workspace_id: str, document_id: str):
             allow_dangerous_deserialization=True
         )
         
-        # Récupérer tous les documents sauf celui à supprimer
-        all_docs = []
-        for doc_id in vectorstore.index_to_docstore_id.values():
-            doc = vectorstore.docstore.search(doc_id)
-            if doc and doc.metadata.get("document_id") != document_id:
-                all_docs.append(doc)
-        
-        if all_docs:
-            # Recréer le vectorstore
-            new_vectorstore = FAISS.from_documents(all_docs, get_embeddings())
-            new_vectorstore.save_local(vs_path)
-            # Persister en DB
-            _persist_vectorstore_to_db(workspace_id)
+        # IDs des chunks de ce document
+        to_delete = [
+            doc_id for doc_id, doc in vectorstore.docstore._dict.items()
+            if doc.metadata.get("document_id") == document_id
+        ]
+        
+        if len(to_delete) < len(vectorstore.index_to_docstore_id):
+            if to_delete:
+                # Vecteurs gardés en cache (ré-upload du même fichier sans recalcul)
+                _remember_vectors(vectorstore, to_delete)
+                vectorstore.delete(to_delete)
+                vectorstore.save_local(vs_path)
+                # Persister en DB
+                _persist_vectorstore_to_db(workspace_id, vectorstore)
+                _cache_vectorstore(workspace_id, vectorstore)
         else:
             # Plus de documents, supprimer le vectorstore
             delete_vectorstore(workspace_id)
@@ -435,6 +578,7 @@ def delete_document_from_vectorstore(workspace_id: str, document_id: str):
         logger.error(f"Erreur suppression vectorstore: {e}")
 
 
+@_per_workspace
 def rebuild_workspace_vectorstore(workspace_id: str):
     """Reconstruit entièrement le vectorstore d'un workspace"""
     
@@ -515,15 +659,24 @@ def rebuild_workspace_vectorstore(workspace_id: str):
     if all_chunks:
         vs_path = get_vectorstore_path(workspace_id)
         
+        # Vecteurs de l'index actuel gardés en cache: la reconstruction ne les recalcule pas
+        if os.path.exists(os.path.join(vs_path, "index.faiss")):
+            try:
+                previous = FAISS.load_local(vs_path, get_embeddings(), allow_dangerous_deserialization=True)
+                _remember_vectors(previous, list(previous.index_to_docstore_id.values()))
+            except Exception as e:
+                logger.warning(f"Index précédent illisible pour {workspace_id}: {e}")
+        
         # Supprimer l'ancien s'il existe pour repartir de zéro
         delete_vectorstore(workspace_id)
 
-        vectorstore = FAISS.from_documents(all_chunks, get_embeddings())
+        vectorstore = _build_vectorstore(all_chunks)
         os.makedirs(os.path.dirname(vs_path), exist_ok=True)
         vectorstore.save_local(vs_path)
         
         # Persister en DB
-        _persist_vectorstore_to_db(workspace_id)
+        _persist_vectorstore_to_db(workspace_id, vectorstore)
+        _cache_vectorstore(workspace_id, vectorstore)
         
         logger.info(f"Vectorstore {workspace_id} reconstruit: {len(all_chunks)} chunks")
     else:
@@ -0,0 +1,176 @@
+"""
+Cache mémoire des index FAISS par workspace
+Évite FAISS.load_local + requête SQL Server à chaque message du widget
+
+- LRU borné par un budget mémoire (taille des fichiers index.faiss + index.pkl)
+- Chaque entrée porte la version DB (vectorstore_contents.updated_at)
+- Workspace chaud: aucune lecture disque ni requête DB pour chercher
+- Fraîcheur vérifiée au plus toutes les VECTORSTORE_FRESHNESS_CHECK_S secondes,
+  en arrière-plan: la recherche continue sur l'index courant pendant le rechargement
+"""
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CachedIndex:
+    vectorstore: Any
+    version: Optional[datetime]
+    nbytes: int
+    checked_at: float
+    refreshing: bool = False
+
+
+class WorkspaceIndexCache:
+    """
+    Cache process-wide des vectorstores FAISS chargés.
+
+    loader(workspace_id) -> (vectorstore, version, nbytes) ou None si pas d'index
+    version_getter(workspace_id) -> version DB courante (requête légère)
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Optional[Tuple[Any, Optional[datetime], int]]],
+        version_getter: Callable[[str], Optional[datetime]],
+        max_bytes: int,
+        check_interval_s: float,
+    ):
+        self._loader = loader
+        self._version_getter = version_getter
+        self.max_bytes = max_bytes
+        self.check_interval_s = check_interval_s
+        self._entries: "OrderedDict[str, _CachedIndex]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vs-cache")
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "freshness_checks": 0,
+            "reloads": 0,
+            "evictions": 0,
+            "load_errors": 0,
+        }
+
+    def _load_lock(self, workspace_id: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(workspace_id, threading.Lock())
+
+    def get(self, workspace_id: str) -> Optional[Any]:
+        """Retourne le vectorstore du workspace (chargé au premier appel)"""
+        with self._lock:
+            entry = self._entries.get(workspace_id)
+            if entry is not None:
+                self._entries.move_to_end(workspace_id)
+                self.stats["hits"] += 1
+                if (
+                    not entry.refreshing
+                    and time.monotonic() - entry.checked_at >= self.check_interval_s
+                ):
+                    entry.refreshing = True
+                    self._executor.submit(self._refresh, workspace_id, entry)
+                return entry.vectorstore
+
+        # Chargement à froid: un seul chargement par workspace, même en concurrence
+        with self._load_lock(workspace_id):
+            with self._lock:
+                entry = self._entries.get(workspace_id)
+                if entry is not None:
+                    self.stats["hits"] += 1
+                    return entry.vectorstore
+                self.stats["misses"] += 1
+            return self._load(workspace_id)
+
+    def _load(self, workspace_id: str) -> Optional[Any]:
+        try:
+            loaded = self._loader(workspace_id)
+        except Exception as e:
+            self.stats["load_errors"] += 1
+            logger.error(f"Erreur chargement vectorstore {workspace_id}: {e}")
+            return None
+        if loaded is None:
+            return None
+        vectorstore, version, nbytes = loaded
+        self.put(workspace_id, vectorstore, version, nbytes)
+        return vectorstore
+
+    def _refresh(self, workspace_id: str, entry: _CachedIndex):
+        """Vérifie la version DB et recharge l'index si un autre process l'a modifié"""
+        try:
+            self.stats["freshness_checks"] += 1
+            version = self._version_getter(workspace_id)
+            if version is not None and (entry.version is None or version > entry.version):
+                logger.info(f"🔄 Vectorstore {workspace_id} modifié ({version}), rechargement")
+                with self._load_lock(workspace_id):
+                    if self._load(workspace_id) is not None:
+                        self.stats["reloads"] += 1
+        except Exception as e:
+            logger.warning(f"Vérification fraîcheur vectorstore {workspace_id} échouée: {e}")
+        finally:
+            entry.refreshing = False
+            entry.checked_at = time.monotonic()
+
+    def put(self, workspace_id: str, vectorstore: Any, version: Optional[datetime], nbytes: int):
+        """Insère / remplace l'index d'un workspace (après indexation locale)"""
+        with self._lock:
+            previous = self._entries.pop(workspace_id, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[workspace_id] = _CachedIndex(vectorstore, version, nbytes, time.monotonic())
+            self._bytes += nbytes
+            # Éviction LRU, en gardant toujours l'index qu'on vient d'insérer
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.stats["evictions"] += 1
+                logger.info(f"Vectorstore {evicted_id} évincé du cache ({evicted.nbytes / 1e6:.1f} Mo)")
+
+    def invalidate(self, workspace_id: str):
+        """Retire un workspace du cache (suppression du vectorstore)"""
+        with self._lock:
+            entry = self._entries.pop(workspace_id, None)
+            if entry is not None:
+                self._bytes -= entry.nbytes
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "workspaces": len(self._entries),
+                "memory_mb": round(self._bytes / 1e6, 1),
+                "max_memory_mb": round(self.max_bytes / 1e6, 1),
+            }
+
+
+_index_cache: Optional[WorkspaceIndexCache] = None
+_index_cache_lock = threading.Lock()
+
+
+def get_index_cache(
+    loader: Callable[[str], Optional[Tuple[Any, Optional[datetime], int]]] = None,
+    version_getter: Callable[[str], Optional[datetime]] = None,
+) -> Optional[WorkspaceIndexCache]:
+    """Singleton du cache (créé par le service vectorstore qui fournit le loader)"""
+    global _index_cache
+    if _index_cache is None and loader is not None:
+        with _index_cache_lock:
+            if _index_cache is None:
+                _index_cache = WorkspaceIndexCache(
+                    loader,
+                    version_getter,
+                    max_bytes=settings.VECTORSTORE_CACHE_MAX_MB * 1024 * 1024,
+                    check_interval_s=settings.VECTORSTORE_FRESHNESS_CHECK_S,
+                )
+    return _index_cache
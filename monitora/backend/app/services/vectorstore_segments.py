@@ -0,0 +1,312 @@
+"""
+Persistance segmentée des vectorstores en base
+Remplace l'envoi complet de index.faiss + index.pkl après chaque indexation
+
+- Segment: lot immuable de chunks (IDs, textes, métadonnées, vecteurs float32),
+  nommé par le SHA256 de son contenu ("segment:<sha>" dans vectorstore_contents)
+- Manifeste ("manifest.json"): version, liste des segments, chunks supprimés
+  (tombstones, par segment) et empreinte de ce contenu
+- Écriture: seul le segment des chunks ajoutés est envoyé, puis le manifeste
+- Lecture: seuls les segments absents en local sont téléchargés (checksum vérifié),
+  l'index FAISS est reconstruit à partir des vecteurs (aucun embedding)
+- Compaction: au-delà de VECTORSTORE_MAX_SEGMENTS segments ou d'une part de
+  chunks supprimés, tout est fusionné en un seul segment
+"""
+import io
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.core.database import VectorStoreDB
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+SEGMENT_PREFIX = "segment:"
+LEGACY_FILES = ("index.faiss", "index.pkl")
+
+
+def segment_hash(blob: bytes) -> str:
+    return hashlib.sha256(blob).hexdigest()
+
+
+def encode_segment(ids: List[str], documents: List[Document], vectors: np.ndarray) -> bytes:
+    """Sérialise un segment (npz, sans pickle)"""
+    meta = json.dumps(
+        {
+            "ids": ids,
+            "texts": [doc.page_content for doc in documents],
+            "metadatas": [doc.metadata for doc in documents],
+        },
+        ensure_ascii=False,
+        default=str,
+    ).encode("utf-8")
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        vectors=np.asarray(vectors, dtype=np.float32),
+        meta=np.frombuffer(meta, dtype=np.uint8),
+    )
+    return buffer.getvalue()
+
+
+def decode_segment(blob: bytes) -> Tuple[List[str], List[Document], np.ndarray]:
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        vectors = data["vectors"]
+        meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+    documents = [
+        Document(page_content=text, metadata=metadata)
+        for text, metadata in zip(meta["texts"], meta["metadatas"])
+    ]
+    return meta["ids"], documents, vectors
+
+
+class SegmentManifest:
+    """Liste des segments d'un workspace + chunks supprimés par segment"""
+
+    def __init__(self, version: int = 0, segments: List[dict] = None, tombstones: Dict[str, List[str]] = None):
+        self.version = version
+        self.segments = segments or []  # [{"sha": ..., "count": ..., "bytes": ...}]
+        self.tombstones = tombstones or {}  # sha -> IDs supprimés de ce segment
+
+    @classmethod
+    def from_json(cls, raw) -> "SegmentManifest":
+        data = json.loads(raw)
+        return cls(data.get("version", 0), data.get("segments", []), data.get("tombstones", {}))
+
+    def digest(self) -> str:
+        """Empreinte du contenu (segments + tombstones), indépendante de la version"""
+        content = {
+            "segments": [segment["sha"] for segment in self.segments],
+            "tombstones": {sha: sorted(ids) for sha, ids in self.tombstones.items() if ids},
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def to_json(self) -> bytes:
+        return json.dumps(
+            {"version": self.version, "digest": self.digest(), "segments": self.segments, "tombstones": self.tombstones}
+        ).encode("utf-8")
+
+    def tombstone_count(self) -> int:
+        return sum(len(ids) for ids in self.tombstones.values())
+
+    def chunk_count(self) -> int:
+        return sum(segment["count"] for segment in self.segments)
+
+
+class SegmentStore:
+    """Segments et manifeste en local, à côté de l'index FAISS reconstruit"""
+
+    def __init__(self, vs_path: str):
+        self.vs_path = vs_path
+        self.segments_dir = os.path.join(vs_path, "segments")
+        self.manifest_path = os.path.join(vs_path, MANIFEST_FILE)
+
+    def _segment_path(self, sha: str) -> str:
+        return os.path.join(self.segments_dir, f"{sha}.seg")
+
+    def has(self, sha: str) -> bool:
+        return os.path.exists(self._segment_path(sha))
+
+    def read(self, sha: str) -> bytes:
+        with open(self._segment_path(sha), "rb") as f:
+            return f.read()
+
+    def write(self, sha: str, blob: bytes):
+        os.makedirs(self.segments_dir, exist_ok=True)
+        tmp_path = f"{self._segment_path(sha)}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, self._segment_path(sha))
+
+    def load_manifest(self) -> Optional[SegmentManifest]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, "rb") as f:
+                return SegmentManifest.from_json(f.read())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Manifeste local illisible {self.manifest_path}: {e}")
+            return None
+
+    def save_manifest(self, manifest: SegmentManifest):
+        os.makedirs(self.vs_path, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(manifest.to_json())
+        os.replace(tmp_path, self.manifest_path)
+
+    def prune(self, manifest: SegmentManifest):
+        """Supprime les segments locaux qui ne sont plus référencés"""
+        if not os.path.isdir(self.segments_dir):
+            return
+        keep = {f"{segment['sha']}.seg" for segment in manifest.segments}
+        for name in os.listdir(self.segments_dir):
+            if name not in keep:
+                os.remove(os.path.join(self.segments_dir, name))
+
+    def live_chunks(self, manifest: SegmentManifest) -> Dict[str, str]:
+        """ID de chunk -> segment qui en porte la version vivante"""
+        live = {}
+        for segment in manifest.segments:
+            dead = set(manifest.tombstones.get(segment["sha"], []))
+            ids, _, _ = decode_segment(self.read(segment["sha"]))
+            for chunk_id in ids:
+                if chunk_id not in dead:
+                    live[chunk_id] = segment["sha"]
+        return live
+
+
+def _segment_from_index(vectorstore: FAISS, ids: List[str]) -> bytes:
+    """Segment des chunks donnés, vecteurs relus de l'index (aucun embedding)"""
+    positions = {chunk_id: idx for idx, chunk_id in vectorstore.index_to_docstore_id.items()}
+    vectors = np.vstack([vectorstore.index.reconstruct(positions[chunk_id]) for chunk_id in ids])
+    documents = [vectorstore.docstore.search(chunk_id) for chunk_id in ids]
+    return encode_segment(ids, documents, vectors)
+
+
+def _upload_segment(workspace_id: str, store: SegmentStore, blob: bytes) -> dict:
+    sha = segment_hash(blob)
+    store.write(sha, blob)
+    VectorStoreDB.save_file(workspace_id, f"{SEGMENT_PREFIX}{sha}", blob)
+    return {"sha": sha, "count": len(decode_segment(blob)[0]), "bytes": len(blob)}
+
+
+def _needs_compaction(manifest: SegmentManifest) -> bool:
+    if len(manifest.segments) > settings.VECTORSTORE_MAX_SEGMENTS:
+        return True
+    total = manifest.chunk_count()
+    return total > 0 and manifest.tombstone_count() / total > settings.VECTORSTORE_COMPACT_TOMBSTONE_RATIO
+
+
+def persist_segments(workspace_id: str, vs_path: str, vectorstore: FAISS):
+    """
+    Envoie en base le delta entre l'index local et le dernier manifeste:
+    un segment pour les chunks ajoutés, des tombstones pour les supprimés.
+    """
+    store = SegmentStore(vs_path)
+    manifest = store.load_manifest()
+    first_segmented = manifest is None
+    manifest = manifest or SegmentManifest()
+    base_version = manifest.version
+
+    live = store.live_chunks(manifest)
+    current = list(vectorstore.index_to_docstore_id.values())
+    current_ids = set(current)
+    added = [chunk_id for chunk_id in current if chunk_id not in live]
+    deleted = [chunk_id for chunk_id in live if chunk_id not in current_ids]
+    if not added and not deleted and not first_segmented:
+        return
+
+    # 1. Segments d'abord: un manifeste publié ne référence jamais un segment absent
+    if added:
+        manifest.segments.append(_upload_segment(workspace_id, store, _segment_from_index(vectorstore, added)))
+    for chunk_id in deleted:
+        manifest.tombstones.setdefault(live[chunk_id], []).append(chunk_id)
+
+    obsolete = []
+    if _needs_compaction(manifest) and current:
+        obsolete = [segment["sha"] for segment in manifest.segments]
+        compacted = _upload_segment(workspace_id, store, _segment_from_index(vectorstore, current))
+        obsolete = [sha for sha in obsolete if sha != compacted["sha"]]
+        manifest.segments = [compacted]
+        manifest.tombstones = {}
+        logger.info(f"Vectorstore {workspace_id} compacté: {len(obsolete)} segments fusionnés ({len(current)} chunks)")
+
+    # 2. Manifeste (petit), puis nettoyage de ce qui n'est plus référencé.
+    # Version relue en base: un autre écrivain parti de la même base a pu publier entre-temps
+    remote_raw = VectorStoreDB.get_file(workspace_id, MANIFEST_FILE)
+    remote_version = SegmentManifest.from_json(remote_raw).version if remote_raw is not None else 0
+    if remote_version > base_version:
+        logger.warning(
+            f"Vectorstore {workspace_id}: manifeste v{remote_version} publié par un autre écrivain "
+            f"(base locale v{base_version}), le contenu local le remplace"
+        )
+    manifest.version = max(remote_version, manifest.version) + 1
+    VectorStoreDB.save_file(workspace_id, MANIFEST_FILE, manifest.to_json())
+    store.save_manifest(manifest)
+    for sha in obsolete:
+        VectorStoreDB.delete_file(workspace_id, f"{SEGMENT_PREFIX}{sha}")
+    store.prune(manifest)
+    if first_segmented:
+        # Migration: l'ancien format complet n'est plus lu
+        for name in LEGACY_FILES:
+            VectorStoreDB.delete_file(workspace_id, name)
+
+    logger.info(
+        f"Vectorstore {workspace_id} v{manifest.version}: +{len(added)} / -{len(deleted)} chunks, "
+        f"{len(manifest.segments)} segments"
+    )
+
+
+def sync_segments(workspace_id: str, vs_path: str, embeddings) -> Optional[bool]:
+    """
+    Met l'index local à jour depuis le manifeste en base.
+
+    Returns:
+        None si le workspace est encore à l'ancien format (pas de manifeste),
+        sinon True si un index local à jour est disponible
+    """
+    raw = VectorStoreDB.get_file(workspace_id, MANIFEST_FILE)
+    if raw is None:
+        return None
+    remote = SegmentManifest.from_json(raw)
+    store = SegmentStore(vs_path)
+    index_path = os.path.join(vs_path, "index.faiss")
+
+    local = store.load_manifest()
+    # Version ET contenu: deux écrivains concurrents peuvent publier des manifestes divergents
+    if (
+        local is not None
+        and local.version == remote.version
+        and local.digest() == remote.digest()
+        and os.path.exists(index_path)
+    ):
+        os.utime(index_path)  # à jour: évite de re-vérifier à chaque appel
+        return True
+
+    fetched = 0
+    for segment in remote.segments:
+        if store.has(segment["sha"]):
+            continue
+        blob = VectorStoreDB.get_file(workspace_id, f"{SEGMENT_PREFIX}{segment['sha']}")
+        if blob is None or segment_hash(blob) != segment["sha"]:
+            # Segment compacté entre-temps ou corrompu: on garde l'index local actuel
+            logger.error(f"Segment {segment['sha'][:12]} invalide ou absent pour {workspace_id}")
+            return os.path.exists(index_path)
+        store.write(segment["sha"], blob)
+        fetched += 1
+
+    ids, documents, vectors = [], [], []
+    for segment in remote.segments:
+        dead = set(remote.tombstones.get(segment["sha"], []))
+        segment_ids, segment_docs, segment_vectors = decode_segment(store.read(segment["sha"]))
+        for chunk_id, doc, vector in zip(segment_ids, segment_docs, segment_vectors):
+            if chunk_id not in dead:
+                ids.append(chunk_id)
+                documents.append(doc)
+                vectors.append(vector)
+    if not ids:
+        return False
+
+    vectorstore = FAISS.from_embeddings(
+        list(zip([doc.page_content for doc in documents], vectors)),
+        embeddings,
+        metadatas=[doc.metadata for doc in documents],
+        ids=ids
+    )
+    vectorstore.save_local(vs_path)
+    store.save_manifest(remote)
+    store.prune(remote)
+    logger.info(
+        f"Vectorstore {workspace_id} synchronisé v{remote.version}: "
+        f"{fetched}/{len(remote.segments)} segments téléchargés, {len(ids)} chunks"
+    )
+    return True
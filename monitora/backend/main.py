@@ -12,6 +12,8 @@ import logging
 import os
 
 from app.core.config import settings
+from app.core.database import get_db
+from app.core import database_async
 from app.api.routes import router
 
 # Configuration des logs
@@ -47,10 +49,24 @@ app.add_middleware(
 # Inclure les routes
 app.include_router(router, prefix="/api")
 
+@app.on_event("shutdown")
+async def close_db_pool():
+    database_async.shutdown()
+    get_db().close()
+
 # Route de santé
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "service": "monitora-backend"}
+    health = {
+        "status": "ok",
+        "service": "monitora-backend",
+        "database_pool": get_db().get_pool_stats(),
+        "database_threads": database_async.get_async_db_stats(),
+    }
+    if settings.STORAGE_MODE != "supabase":
+        from app.services.vectorstore import get_index_cache_stats
+        health["vectorstore_cache"] = get_index_cache_stats()
+    return health
 
 # Test CORS
 @app.options("/api/{rest_of_path:path}")
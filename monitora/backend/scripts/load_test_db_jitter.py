@@ -0,0 +1,129 @@
+"""
+Test de charge: régularité des streams SSE du widget sous trafic DB concurrent.
+
+Mesure l'écart entre deux tokens reçus sur des streams /api/widget/{id}/chat,
+d'abord seuls, puis pendant que des clients martèlent /api/widget/{id}/config
+(une requête SQL Server par appel). Si les appels DB bloquent la boucle
+d'événements, les écarts (p95 / max) explosent pendant la charge.
+
+Usage (serveur lancé, workspace actif):
+    python scripts/load_test_db_jitter.py --workspace-id <id> [--base-url http://localhost:8001]
+        [--streams 3] [--db-clients 40] [--rounds 2]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_stream(client: httpx.AsyncClient, base_url: str, workspace_id: str, gaps: list):
+    """Un stream de chat: enregistre l'écart (ms) entre tokens successifs"""
+    payload = {
+        "message": "Quels sont vos délais de livraison ?",
+        "stream": True,
+        "visitor_id": f"loadtest-{uuid.uuid4().hex[:12]}",
+    }
+    last = None
+    async with client.stream("POST", f"{base_url}/api/widget/{workspace_id}/chat", json=payload) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if event.get("type") != "token":
+                continue
+            now = time.perf_counter()
+            if last is not None:
+                gaps.append((now - last) * 1000)
+            last = now
+
+
+async def db_client(client: httpx.AsyncClient, base_url: str, workspace_id: str, stop: asyncio.Event, counts: dict):
+    """Client DB-intensif: enchaîne les lectures de config du widget"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"{base_url}/api/widget/{workspace_id}/config")
+            counts["ok" if response.status_code == 200 else "errors"] += 1
+        except httpx.HTTPError:
+            counts["errors"] += 1
+        counts["latencies"].append((time.perf_counter() - started) * 1000)
+
+
+async def phase(base_url: str, workspace_id: str, streams: int, rounds: int, db_clients: int) -> dict:
+    gaps = []
+    counts = {"ok": 0, "errors": 0, "latencies": []}
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=streams + db_clients + 4)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        loaders = [
+            asyncio.create_task(db_client(client, base_url, workspace_id, stop, counts))
+            for _ in range(db_clients)
+        ]
+        started = time.perf_counter()
+        for _ in range(rounds):
+            await asyncio.gather(*(run_stream(client, base_url, workspace_id, gaps) for _ in range(streams)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*loaders)
+    return {
+        "tokens": len(gaps) + streams * rounds,
+        "gap_p50": statistics.median(gaps) if gaps else 0.0,
+        "gap_p95": percentile(gaps, 95),
+        "gap_p99": percentile(gaps, 99),
+        "gap_max": max(gaps) if gaps else 0.0,
+        "db_rps": counts["ok"] / elapsed if elapsed else 0.0,
+        "db_p95": percentile(counts["latencies"], 95),
+        "db_errors": counts["errors"],
+    }
+
+
+def print_phase(label: str, result: dict):
+    print(f"\n{label}")
+    print(f"   Tokens reçus:        {result['tokens']}")
+    print(
+        f"   Écart entre tokens:  p50 {result['gap_p50']:.0f} ms | p95 {result['gap_p95']:.0f} ms | "
+        f"p99 {result['gap_p99']:.0f} ms | max {result['gap_max']:.0f} ms"
+    )
+    if result["db_rps"]:
+        print(
+            f"   Trafic DB:           {result['db_rps']:.0f} req/s | p95 {result['db_p95']:.0f} ms | "
+            f"{result['db_errors']} erreurs"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Jitter des streams SSE sous charge DB")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--workspace-id", required=True)
+    parser.add_argument("--streams", type=int, default=3, help="Streams simultanés (limite: 30 messages/min par IP)")
+    parser.add_argument("--rounds", type=int, default=2, help="Vagues de streams par phase")
+    parser.add_argument("--db-clients", type=int, default=40, help="Clients DB concurrents pendant la charge")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("📈 JITTER DES STREAMS SOUS CHARGE DB")
+    print("=" * 80)
+    baseline = await phase(args.base_url, args.workspace_id, args.streams, args.rounds, 0)
+    print_phase("Streams seuls", baseline)
+    loaded = await phase(args.base_url, args.workspace_id, args.streams, args.rounds, args.db_clients)
+    print_phase(f"Streams + {args.db_clients} clients DB", loaded)
+
+    if baseline["gap_p95"]:
+        print(f"\n   Dégradation p95: x{loaded['gap_p95'] / baseline['gap_p95']:.1f} "
+              f"(max {baseline['gap_max']:.0f} -> {loaded['gap_max']:.0f} ms)")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,214 @@
+"""Tests du pool de connexions SQL Server (connexions factices, sans driver ODBC)."""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.core.db_pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *params):
+        if self.conn.dead:
+            raise ConnectionError("connexion perdue")
+        self.conn.queries += 1
+        time.sleep(self.conn.query_s)
+        return self
+
+    def fetchone(self):
+        return (1,)
+
+
+class FakeConnection:
+    def __init__(self, query_s: float):
+        self.query_s = query_s
+        self.queries = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.dead = False
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        if self.dead:
+            raise ConnectionError("connexion perdue")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class CountingConnect:
+    """connect() qui compte les ouvertures et simule le coût du login."""
+
+    def __init__(self, latency_s: float = 0.01, query_s: float = 0.005):
+        self.latency_s = latency_s
+        self.query_s = query_s
+        self.connections = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.latency_s)
+        conn = FakeConnection(self.query_s)
+        with self._lock:
+            self.connections.append(conn)
+        return conn
+
+
+def make_pool(connect, max_size=2, timeout_s=2.0, max_lifetime_s=1800, ping_idle_s=10.0) -> ConnectionPool:
+    return ConnectionPool(
+        connect,
+        max_size=max_size,
+        timeout_s=timeout_s,
+        max_lifetime_s=max_lifetime_s,
+        ping_idle_s=ping_idle_s,
+    )
+
+
+def test_sequential_blocks_reuse_warm_connection():
+    connect = CountingConnect()
+    pool = make_pool(connect)
+    for _ in range(5):
+        with pool.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    assert len(connect.connections) == 1
+    assert connect.connections[0].commits == 5
+    stats = pool.get_stats()
+    assert stats["reused"] == 4
+    assert stats["in_use"] == 0
+
+
+def test_connection_not_held_between_blocks():
+    """Requêtes avec une pause (appel LLM) entre deux requêtes SQL: plus de requêtes que de connexions."""
+    connect = CountingConnect()
+    pool = make_pool(connect, max_size=2, timeout_s=0.5)
+
+    def request():
+        with pool.cursor() as cursor:
+            cursor.execute("SELECT workspace")
+        time.sleep(0.3)  # LLM: aucune connexion empruntée
+        with pool.cursor() as cursor:
+            cursor.execute("INSERT message")
+        return True
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(lambda _: request(), range(6)))
+
+    assert results == [True] * 6
+    assert len(connect.connections) <= 2
+    assert pool.get_stats()["timeouts"] == 0
+
+
+def test_connect_count_bounded_under_concurrency():
+    connect = CountingConnect(query_s=0.01)
+    pool = make_pool(connect, max_size=3)
+    in_use = []
+    lock = threading.Lock()
+
+    def query(_):
+        with pool.cursor() as cursor:
+            with lock:
+                in_use.append(pool.get_stats()["in_use"])
+            cursor.execute("SELECT 1")
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        list(executor.map(query, range(60)))
+
+    assert len(connect.connections) <= 3
+    assert max(in_use) <= 3
+    stats = pool.get_stats()
+    assert stats["checkouts"] == 60
+    assert stats["idle"] == stats["size"]
+
+
+def test_checkout_timeout_when_pool_exhausted():
+    pool = make_pool(CountingConnect(), max_size=1, timeout_s=0.1)
+    held = pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.1
+    assert pool.get_stats()["timeouts"] == 1
+
+    pool.release(held)
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def test_broken_connection_is_discarded():
+    connect = CountingConnect()
+    pool = make_pool(connect)
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    first = connect.connections[0]
+    first.dead = True
+
+    with pytest.raises(ConnectionError):
+        with pool.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    assert first.closed
+    assert pool.get_stats()["size"] == 0
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    assert len(connect.connections) == 2
+
+
+def test_error_rolls_back_and_keeps_connection():
+    connect = CountingConnect()
+    pool = make_pool(connect)
+    with pytest.raises(ValueError):
+        with pool.cursor() as cursor:
+            cursor.execute("UPDATE")
+            raise ValueError("erreur applicative")
+    conn = connect.connections[0]
+    assert conn.rollbacks == 1 and conn.commits == 0
+    assert not conn.closed
+    assert pool.get_stats()["idle"] == 1
+
+
+def test_idle_connection_pinged_and_replaced():
+    connect = CountingConnect()
+    pool = make_pool(connect, ping_idle_s=0.0)
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    connect.connections[0].dead = True
+
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+    stats = pool.get_stats()
+    assert stats["ping_failures"] == 1
+    assert len(connect.connections) == 2
+
+
+def test_expired_connection_recycled():
+    connect = CountingConnect()
+    pool = make_pool(connect, max_lifetime_s=0.0)
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    time.sleep(0.01)
+    with pool.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    assert pool.get_stats()["expired"] == 1
+    assert connect.connections[0].closed
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,247 @@
+"""Tests de l'indexation incrémentale et du cache d'embeddings (DB et modèle factices)."""
+import os
+import sys
+import tempfile
+import types
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+# Driver ODBC absent des environnements de test: les classes *DB utilisées sont remplacées
+if "pyodbc" not in sys.modules:
+    try:
+        import pyodbc  # noqa: F401
+    except ImportError:
+        sys.modules["pyodbc"] = types.SimpleNamespace(Connection=object, Error=Exception)
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.services.embedding_cache import EmbeddingCache
+
+DIM = 16
+WORKSPACE = "ws-1"
+DOCUMENT = "doc-1"
+
+
+class CountingEmbeddings(Embeddings):
+    """Modèle déterministe qui enregistre chaque texte embeddé."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def _vector(self, text):
+        seed = int.from_bytes(text.encode("utf-8")[:8].ljust(8, b"\0"), "little") + len(text)
+        vector = np.random.default_rng(seed).standard_normal(DIM)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@contextmanager
+def patched(target, **attrs):
+    previous = {name: getattr(target, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(target, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(target, name, value)
+
+
+def test_embedding_cache_hits_skip_the_model():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(os.path.join(tmp, "embeddings.sqlite3"), "model-a")
+        model = CountingEmbeddings()
+
+        first = cache.embed(["alpha", "beta"], model.embed_documents)
+        second = cache.embed(["beta", "gamma", "alpha"], model.embed_documents)
+
+        assert model.embedded == ["alpha", "beta", "gamma"]
+        assert np.allclose(second[0], first[1]) and np.allclose(second[2], first[0])
+        stats = cache.get_stats()
+        assert stats["hits"] == 2 and stats["misses"] == 3 and stats["entries"] == 3
+
+
+def test_embedding_cache_is_keyed_by_model_and_persisted():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "embeddings.sqlite3")
+        EmbeddingCache(path, "model-a").put_many(["alpha"], [[1.0, 2.0, 3.0]])
+
+        reopened = EmbeddingCache(path, "model-a")
+        assert reopened.get_many(["alpha", "beta"]) == [[1.0, 2.0, 3.0], None]
+        # Autre modèle: l'embedding n'est pas réutilisé
+        assert EmbeddingCache(path, "model-b").get_many(["alpha"]) == [None]
+
+
+# =====================================================
+# Indexation (FAISS requis)
+# =====================================================
+
+class FakeDocumentsDB:
+    def __init__(self):
+        self.content = b""
+        self.statuses = []
+
+    def get_by_id(self, document_id):
+        return {"id": document_id, "file_type": "txt", "filename": "faq.txt"}
+
+    def get_content(self, document_id):
+        return self.content
+
+    def save_content(self, document_id, content):
+        self.content = content
+
+    def update_status(self, document_id, status, chunk_count=None):
+        self.statuses.append(status)
+
+    def get_all_by_workspace(self, workspace_id):
+        raise AssertionError("reconstruction complète inattendue")
+
+
+class FakeWorkspacesDB:
+    @staticmethod
+    def get_by_id(workspace_id):
+        return {"id": workspace_id, "rag_config": {"chunk_size": 60, "chunk_overlap": 0}}
+
+
+def paragraphs(*texts) -> bytes:
+    return "\n\n".join(texts).encode("utf-8")
+
+
+@contextmanager
+def indexing_env():
+    pytest.importorskip("faiss")
+    from app.services import vectorstore as vs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = CountingEmbeddings()
+        cache = EmbeddingCache(os.path.join(tmp, "embeddings.sqlite3"), "test-model")
+        documents = FakeDocumentsDB()
+        with patched(settings, VECTORSTORE_PATH=tmp), patched(
+            vs,
+            DocumentsDB=documents,
+            WorkspacesDB=FakeWorkspacesDB,
+            get_embeddings=lambda: model,
+            get_embedding_cache=lambda name: cache,
+            _ensure_vectorstore_local=lambda workspace_id, db_updated_at=None: True,
+            _persist_vectorstore_to_db=lambda workspace_id, vectorstore: None,
+            _cache_vectorstore=lambda workspace_id, vectorstore: None,
+        ):
+            yield vs, model, cache, documents
+
+
+def load_index(vs):
+    from langchain_community.vectorstores import FAISS
+    return FAISS.load_local(vs.get_vectorstore_path(WORKSPACE), vs.get_embeddings(), allow_dangerous_deserialization=True)
+
+
+def other_document_index(vs):
+    """Index existant avec le chunk d'un autre document (force la branche incrémentale)."""
+    other = Document(page_content="Autre document: horaires du service client.", metadata={"document_id": "doc-0"})
+    index = vs._build_vectorstore([other])
+    index.save_local(vs.get_vectorstore_path(WORKSPACE))
+
+
+def test_reindex_embeds_only_new_chunks_and_deletes_removed_ones():
+    with indexing_env() as (vs, model, cache, documents):
+        other_document_index(vs)
+        documents.content = paragraphs(
+            "Livraison en 5 jours ouvrés partout en France.",
+            "Paiement par carte bancaire ou virement.",
+            "Retours acceptés sous 14 jours après réception.",
+        )
+        vs._vectorize_document(DOCUMENT, WORKSPACE, "absent.txt")
+        first = load_index(vs)
+        first_ids = {i for i in first.index_to_docstore_id.values() if i.startswith(DOCUMENT)}
+        assert len(first_ids) == 3
+
+        model.embedded.clear()
+        documents.content = paragraphs(
+            "Livraison en 5 jours ouvrés partout en France.",
+            "Paiement par carte bancaire, virement ou PayPal.",
+            "Retours acceptés sous 14 jours après réception.",
+        )
+        vs._vectorize_document(DOCUMENT, WORKSPACE, "absent.txt")
+
+        # (a) seul le paragraphe modifié passe par le modèle
+        assert model.embedded == ["Paiement par carte bancaire, virement ou PayPal."]
+        assert documents.statuses[-1] == "indexed"
+
+        second = load_index(vs)
+        second_ids = {i for i in second.index_to_docstore_id.values() if i.startswith(DOCUMENT)}
+        removed = first_ids - second_ids
+        assert len(second_ids) == 3 and len(removed) == 1
+        # (b) l'ancien chunk a disparu de l'index et du docstore
+        removed_id = removed.pop()
+        assert removed_id not in second.docstore._dict
+        assert second.index.ntotal == len(second.index_to_docstore_id) == 4
+        assert "doc-0" in {doc.metadata["document_id"] for doc in second.docstore._dict.values()}
+
+
+def test_rebuild_embeds_nothing_when_vectors_are_cached():
+    with indexing_env() as (vs, model, cache, documents):
+        chunks = [
+            Document(page_content=f"Question fréquente numéro {i}.", metadata={"document_id": DOCUMENT})
+            for i in range(5)
+        ]
+        index = vs._build_vectorstore(chunks)
+        assert len(model.embedded) == 5
+
+        # Cache perdu: les vecteurs sont relus de l'index existant
+        with tempfile.TemporaryDirectory() as tmp:
+            fresh = EmbeddingCache(os.path.join(tmp, "embeddings.sqlite3"), "test-model")
+            with patched(vs, get_embedding_cache=lambda name: fresh):
+                vs._remember_vectors(index, list(index.index_to_docstore_id.values()))
+                model.embedded.clear()
+                rebuilt = vs._build_vectorstore(chunks)
+
+            # (c) reconstruction complète sans aucun calcul d'embedding
+            assert model.embedded == []
+            assert fresh.get_stats()["hits"] == 5
+            assert sorted(rebuilt.index_to_docstore_id.values()) == sorted(index.index_to_docstore_id.values())
+            for position, chunk_id in rebuilt.index_to_docstore_id.items():
+                original = {v: k for k, v in index.index_to_docstore_id.items()}[chunk_id]
+                assert np.allclose(rebuilt.index.reconstruct(position), index.index.reconstruct(original))
+
+
+def test_index_writes_are_serialized_per_workspace():
+    pytest.importorskip("faiss")
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services import vectorstore as vs
+
+    active, peak, lock = {}, {}, threading.Lock()
+
+    @vs._per_workspace
+    def write(workspace_id: str, pause: float = 0.02):
+        with lock:
+            active[workspace_id] = active.get(workspace_id, 0) + 1
+            peak[workspace_id] = max(peak.get(workspace_id, 0), active[workspace_id])
+        time.sleep(pause)
+        with lock:
+            active[workspace_id] -= 1
+
+    # Indexation, suppression et rechargement d'un même workspace ne se chevauchent pas
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: write("ws-a" if i % 2 else "ws-b", pause=0.02), range(8)))
+        list(executor.map(lambda i: write(workspace_id="ws-c"), range(4)))
+    assert peak == {"ws-a": 1, "ws-b": 1, "ws-c": 1}
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
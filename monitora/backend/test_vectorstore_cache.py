@@ -0,0 +1,157 @@
+"""Tests du cache mémoire des index FAISS (chargeur et version DB factices)."""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.services.vectorstore_cache import WorkspaceIndexCache
+
+V1 = datetime(2024, 1, 1)
+V2 = V1 + timedelta(minutes=5)
+
+
+class FakeLoader:
+    """loader(workspace_id) -> (index, version, taille), compte les chargements."""
+
+    def __init__(self, nbytes=100, delay_s=0.0):
+        self.nbytes = nbytes
+        self.delay_s = delay_s
+        self.versions = {}
+        self.loads = []
+        self._lock = threading.Lock()
+
+    def __call__(self, workspace_id):
+        time.sleep(self.delay_s)
+        with self._lock:
+            self.loads.append(workspace_id)
+            generation = len(self.loads)
+        version = self.versions.get(workspace_id, V1)
+        return f"index-{workspace_id}-{generation}", version, self.nbytes
+
+
+class FakeVersionGetter:
+    def __init__(self, loader):
+        self.loader = loader
+        self.calls = 0
+
+    def __call__(self, workspace_id):
+        self.calls += 1
+        return self.loader.versions.get(workspace_id, V1)
+
+
+def make_cache(loader, max_bytes=1000, check_interval_s=3600.0) -> WorkspaceIndexCache:
+    return WorkspaceIndexCache(loader, FakeVersionGetter(loader), max_bytes=max_bytes, check_interval_s=check_interval_s)
+
+
+def wait_for(condition, timeout_s=2.0):
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        assert time.monotonic() < deadline, "condition non atteinte"
+        time.sleep(0.01)
+
+
+def test_hit_does_not_reload():
+    loader = FakeLoader()
+    cache = make_cache(loader)
+    first = cache.get("ws-a")
+    assert cache.get("ws-a") == first
+    assert loader.loads == ["ws-a"]
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["freshness_checks"] == 0
+
+
+def test_lru_eviction_by_byte_budget():
+    loader = FakeLoader(nbytes=400)
+    cache = make_cache(loader, max_bytes=1000)
+    cache.get("ws-a")
+    cache.get("ws-b")
+    cache.get("ws-a")  # ws-b devient le moins récemment utilisé
+    cache.get("ws-c")  # 1200 octets > 1000: une éviction
+
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1 and stats["workspaces"] == 2
+    assert cache._bytes == 800
+    cache.get("ws-a")
+    assert loader.loads == ["ws-a", "ws-b", "ws-c"]
+    cache.get("ws-b")
+    assert loader.loads[-1] == "ws-b"
+
+
+def test_oversized_index_is_kept_alone():
+    loader = FakeLoader(nbytes=5000)
+    cache = make_cache(loader, max_bytes=1000)
+    cache.get("ws-a")
+    assert cache.get("ws-b") is not None
+    assert list(cache._entries) == ["ws-b"]
+
+
+def test_concurrent_cold_gets_load_once():
+    loader = FakeLoader(delay_s=0.1)
+    cache = make_cache(loader)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: cache.get("ws-a"), range(8)))
+
+    assert loader.loads == ["ws-a"]
+    assert len(set(results)) == 1
+    stats = cache.get_stats()
+    assert stats["misses"] == 1 and stats["hits"] == 7
+
+
+def test_version_change_reloads_in_background():
+    loader = FakeLoader()
+    cache = make_cache(loader, check_interval_s=0.0)
+    first = cache.get("ws-a")
+
+    # Même version: vérification sans rechargement
+    assert cache.get("ws-a") == first
+    wait_for(lambda: cache.get_stats()["freshness_checks"] == 1 and not cache._entries["ws-a"].refreshing)
+    assert loader.loads == ["ws-a"]
+
+    # Un autre process a réindexé: l'index courant est servi pendant le rechargement
+    loader.versions["ws-a"] = V2
+    loader.delay_s = 0.1
+    assert cache.get("ws-a") == first
+    wait_for(lambda: cache.get_stats()["reloads"] == 1)
+    assert len(loader.loads) == 2
+    assert cache._entries["ws-a"].version == V2
+    assert cache.get("ws-a") != first
+
+
+def test_invalidate_forces_reload():
+    loader = FakeLoader(nbytes=300)
+    cache = make_cache(loader)
+    first = cache.get("ws-a")
+    cache.invalidate("ws-a")
+    cache.invalidate("ws-unknown")
+
+    assert cache.get_stats()["workspaces"] == 0 and cache._bytes == 0
+    assert cache.get("ws-a") != first
+    assert loader.loads == ["ws-a", "ws-a"]
+
+
+def test_missing_index_and_loader_error_are_not_cached():
+    calls = []
+
+    def loader(workspace_id):
+        calls.append(workspace_id)
+        if workspace_id == "ws-broken":
+            raise OSError("index illisible")
+        return None
+
+    cache = WorkspaceIndexCache(loader, lambda workspace_id: None, max_bytes=1000, check_interval_s=3600.0)
+    assert cache.get("ws-empty") is None
+    assert cache.get("ws-broken") is None
+    assert cache.get("ws-empty") is None
+    assert calls == ["ws-empty", "ws-broken", "ws-empty"]
+    assert cache.get_stats()["load_errors"] == 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
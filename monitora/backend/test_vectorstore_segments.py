@@ -0,0 +1,308 @@
+"""Tests de la persistance segmentée des vectorstores (DB factice, sans SQL Server)."""
+import os
+import sys
+import tempfile
+import types
+from contextlib import contextmanager
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+# Driver ODBC absent des environnements de test: seul VectorStoreDB est utilisé, et il est remplacé
+if "pyodbc" not in sys.modules:
+    try:
+        import pyodbc  # noqa: F401
+    except ImportError:
+        sys.modules["pyodbc"] = types.SimpleNamespace(Connection=object, Error=Exception)
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+from app.services import vectorstore_segments as segments
+from app.services.vectorstore_segments import (
+    LEGACY_FILES,
+    MANIFEST_FILE,
+    SEGMENT_PREFIX,
+    SegmentManifest,
+    SegmentStore,
+    decode_segment,
+    encode_segment,
+    persist_segments,
+    segment_hash,
+    sync_segments,
+)
+
+DIM = 8
+WORKSPACE = "ws-1"
+
+
+class FakeVectorStoreDB:
+    """Table vectorstore_contents en mémoire (workspace, fichier) -> contenu."""
+
+    def __init__(self):
+        self.files = {}
+        self.saved = []
+        self.deleted = []
+
+    def save_file(self, workspace_id, file_name, content):
+        self.files[(workspace_id, file_name)] = bytes(content)
+        self.saved.append(file_name)
+
+    def get_file(self, workspace_id, file_name):
+        return self.files.get((workspace_id, file_name))
+
+    def delete_file(self, workspace_id, file_name):
+        self.deleted.append(file_name)
+        return self.files.pop((workspace_id, file_name), None) is not None
+
+    def segment_names(self):
+        return sorted(name for (_, name) in self.files if name.startswith(SEGMENT_PREFIX))
+
+
+class FakeIndex:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def reconstruct(self, position):
+        return self.vectors[position]
+
+
+class FakeDocstore:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def search(self, chunk_id):
+        return self.documents[chunk_id]
+
+
+class FakeVectorstore:
+    """Sous-ensemble de FAISS utilisé par persist_segments."""
+
+    def __init__(self, chunks):
+        ids = list(chunks)
+        self.index_to_docstore_id = dict(enumerate(ids))
+        self.index = FakeIndex([chunks[chunk_id][1] for chunk_id in ids])
+        self.docstore = FakeDocstore({chunk_id: chunks[chunk_id][0] for chunk_id in ids})
+
+
+def make_chunks(names):
+    """Chunks déterministes: ID -> (Document, vecteur)."""
+    chunks = {}
+    for name in names:
+        seed = sum(ord(c) for c in name)
+        chunks[name] = (
+            Document(page_content=f"texte {name}", metadata={"document_id": name.split(":")[0]}),
+            np.random.default_rng(seed).standard_normal(DIM).astype(np.float32),
+        )
+    return chunks
+
+
+@contextmanager
+def fake_db(**overrides):
+    db = FakeVectorStoreDB()
+    previous_db = segments.VectorStoreDB
+    previous_settings = {name: getattr(settings, name) for name in overrides}
+    segments.VectorStoreDB = db
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    try:
+        yield db
+    finally:
+        segments.VectorStoreDB = previous_db
+        for name, value in previous_settings.items():
+            setattr(settings, name, value)
+
+
+def remote_manifest(db) -> SegmentManifest:
+    return SegmentManifest.from_json(db.get_file(WORKSPACE, MANIFEST_FILE))
+
+
+def test_encode_decode_round_trip():
+    chunks = make_chunks(["d1:a", "d1:b", "d2:c"])
+    ids = list(chunks)
+    documents = [chunks[i][0] for i in ids]
+    vectors = np.vstack([chunks[i][1] for i in ids])
+
+    blob = encode_segment(ids, documents, vectors)
+    decoded_ids, decoded_docs, decoded_vectors = decode_segment(blob)
+
+    assert decoded_ids == ids
+    assert [d.page_content for d in decoded_docs] == [d.page_content for d in documents]
+    assert [d.metadata for d in decoded_docs] == [d.metadata for d in documents]
+    assert decoded_vectors.dtype == np.float32
+    assert np.array_equal(decoded_vectors, vectors)
+    # Contenu identique = même segment (nommage par hash)
+    assert segment_hash(encode_segment(ids, documents, vectors)) == segment_hash(blob)
+
+
+def test_persist_uploads_only_the_delta_and_tombstones():
+    with tempfile.TemporaryDirectory() as vs_path, fake_db(VECTORSTORE_MAX_SEGMENTS=8, VECTORSTORE_COMPACT_TOMBSTONE_RATIO=0.9) as db:
+        chunks = make_chunks(["d1:a", "d1:b", "d1:c", "d2:a"])
+        persist_segments(WORKSPACE, vs_path, FakeVectorstore(chunks))
+        first = remote_manifest(db)
+        assert first.version == 1
+        assert len(first.segments) == 1 and first.segments[0]["count"] == 4
+
+        # d1:c supprimé, d3:a ajouté: un segment d'un seul chunk + un tombstone
+        del chunks["d1:c"]
+        chunks.update(make_chunks(["d3:a"]))
+        db.saved.clear()
+        persist_segments(WORKSPACE, vs_path, FakeVectorstore(chunks))
+
+        second = remote_manifest(db)
+        assert second.version == 2
+        assert [segment["count"] for segment in second.segments] == [4, 1]
+        assert second.tombstones == {first.segments[0]["sha"]: ["d1:c"]}
+        assert db.saved == [f"{SEGMENT_PREFIX}{second.segments[1]['sha']}", MANIFEST_FILE]
+        added_ids, _, _ = decode_segment(db.get_file(WORKSPACE, db.saved[0]))
+        assert added_ids == ["d3:a"]
+
+        # Aucun changement: rien n'est envoyé
+        db.saved.clear()
+        persist_segments(WORKSPACE, vs_path, FakeVectorstore(chunks))
+        assert db.saved == []
+        assert remote_manifest(db).version == 2
+
+
+def test_compaction_merges_segments_and_deletes_obsolete_ones():
+    with tempfile.TemporaryDirectory() as vs_path, fake_db(VECTORSTORE_MAX_SEGMENTS=2, VECTORSTORE_COMPACT_TOMBSTONE_RATIO=0.9) as db:
+        chunks = {}
+        for name in ["d1:a", "d2:a"]:
+            chunks.update(make_chunks([name]))
+            persist_segments(WORKSPACE, vs_path, FakeVectorstore(chunks))
+        before = remote_manifest(db)
+        assert len(before.segments) == 2
+
+        # 3e segment > VECTORSTORE_MAX_SEGMENTS: tout est fusionné
+        chunks.update(make_chunks(["d3:a"]))
+        persist_segments(WORKSPACE, vs_path, FakeVectorstore(chunks))
+
+        manifest = remote_manifest(db)
+        assert len(manifest.segments) == 1 and manifest.segments[0]["count"] == 3
+        compacted_ids, _, _ = decode_segment(db.get_file(WORKSPACE, f"{SEGMENT_PREFIX}{manifest.segments[0]['sha']}"))
+        assert sorted(compacted_ids) == ["d1:a", "d2:a", "d3:a"]
+        assert db.segment_names() == [f"{SEGMENT_PREFIX}{manifest.segments[0]['sha']}"]
+        for segment in before.segments:
+            assert f"{SEGMENT_PREFIX}{segment['sha']}" in db.deleted
+
+        # Locaux: seuls les segments référencés restent
+        store = SegmentStore(vs_path)
+        assert sorted(os.listdir(store.segments_dir)) == sorted(f"{s['sha']}.seg" for s in manifest.segments)
+
+
+def test_tombstone_ratio_triggers_compaction():
+    with tempfile.TemporaryDirectory() as vs_path, fake_db(VECTORSTORE_MAX_SEGMENTS=8, VECTORSTORE_COMPACT_TOMBSTONE_RATIO=0.2) as db:
+        chunks = make_chunks(["d1:a", "d1:b", "d1:c", "d1:d"])
+        persist_segments(WORKSPACE, vs_path, FakeVectorstore(chunks))
+        first_sha = remote_manifest(db).segments[0]["sha"]
+
+        del chunks["d1:a"], chunks["d1:b"]  # 50 % de tombstones > 20 %
+        persist_segments(WORKSPACE, vs_path, FakeVectorstore(chunks))
+
+        manifest = remote_manifest(db)
+        assert manifest.tombstones == {}
+        assert len(manifest.segments) == 1 and manifest.segments[0]["count"] == 2
+        assert f"{SEGMENT_PREFIX}{first_sha}" in db.deleted
+        assert db.segment_names() == [f"{SEGMENT_PREFIX}{manifest.segments[0]['sha']}"]
+
+
+def test_first_segmented_write_removes_legacy_blobs():
+    with tempfile.TemporaryDirectory() as vs_path, fake_db() as db:
+        for name in LEGACY_FILES:
+            db.save_file(WORKSPACE, name, b"ancien format")
+        persist_segments(WORKSPACE, vs_path, FakeVectorstore(make_chunks(["d1:a"])))
+
+        for name in LEGACY_FILES:
+            assert db.get_file(WORKSPACE, name) is None
+        assert db.get_file(WORKSPACE, MANIFEST_FILE) is not None
+
+        # Les écritures suivantes ne retouchent plus à l'ancien format
+        db.deleted.clear()
+        persist_segments(WORKSPACE, vs_path, FakeVectorstore(make_chunks(["d1:a", "d1:b"])))
+        assert not set(LEGACY_FILES) & set(db.deleted)
+
+
+def test_sync_returns_none_for_legacy_workspace():
+    with tempfile.TemporaryDirectory() as vs_path, fake_db() as db:
+        db.save_file(WORKSPACE, "index.faiss", b"ancien format")
+        assert sync_segments(WORKSPACE, vs_path, embeddings=None) is None
+
+
+def test_sync_rejects_segment_with_bad_checksum():
+    with tempfile.TemporaryDirectory() as writer_path, tempfile.TemporaryDirectory() as reader_path, fake_db() as db:
+        persist_segments(WORKSPACE, writer_path, FakeVectorstore(make_chunks(["d1:a", "d1:b"])))
+        sha = remote_manifest(db).segments[0]["sha"]
+        db.files[(WORKSPACE, f"{SEGMENT_PREFIX}{sha}")] = b"corrompu"
+
+        # Pas d'index local utilisable: échec signalé, rien n'est écrit
+        assert sync_segments(WORKSPACE, reader_path, embeddings=None) is False
+        assert not SegmentStore(reader_path).has(sha)
+        assert SegmentStore(reader_path).load_manifest() is None
+
+
+def test_sync_rebuilds_index_from_segments_without_embedding():
+    import pytest
+    pytest.importorskip("faiss")
+
+    class NoEmbeddings:
+        def embed_documents(self, texts):
+            raise AssertionError("aucun embedding attendu")
+
+        def embed_query(self, text):
+            raise AssertionError("aucun embedding attendu")
+
+    with tempfile.TemporaryDirectory() as writer_path, tempfile.TemporaryDirectory() as reader_path, fake_db() as db:
+        chunks = make_chunks(["d1:a", "d1:b", "d2:a"])
+        persist_segments(WORKSPACE, writer_path, FakeVectorstore(chunks))
+        del chunks["d1:b"]
+        chunks.update(make_chunks(["d3:a"]))
+        persist_segments(WORKSPACE, writer_path, FakeVectorstore(chunks))
+
+        assert sync_segments(WORKSPACE, reader_path, NoEmbeddings()) is True
+        from langchain_community.vectorstores import FAISS
+        rebuilt = FAISS.load_local(reader_path, NoEmbeddings(), allow_dangerous_deserialization=True)
+        assert sorted(rebuilt.index_to_docstore_id.values()) == ["d1:a", "d2:a", "d3:a"]
+        assert SegmentStore(reader_path).load_manifest().version == remote_manifest(db).version
+
+
+def test_concurrent_writers_from_same_base_converge():
+    import shutil
+    import pytest
+    pytest.importorskip("faiss")
+
+    class NoEmbeddings:
+        def embed_documents(self, texts):
+            raise AssertionError("aucun embedding attendu")
+
+        def embed_query(self, text):
+            raise AssertionError("aucun embedding attendu")
+
+    with tempfile.TemporaryDirectory() as tmp, fake_db(VECTORSTORE_MAX_SEGMENTS=8) as db:
+        writer_a, writer_b = os.path.join(tmp, "a"), os.path.join(tmp, "b")
+        base = make_chunks(["d1:a", "d1:b"])
+        persist_segments(WORKSPACE, writer_a, FakeVectorstore(base))
+        shutil.copytree(writer_a, writer_b)  # deux instances parties du même manifeste v1
+        open(os.path.join(writer_a, "index.faiss"), "wb").close()
+
+        persist_segments(WORKSPACE, writer_a, FakeVectorstore({**base, **make_chunks(["d2:a"])}))
+        persist_segments(WORKSPACE, writer_b, FakeVectorstore({**base, **make_chunks(["d3:a"])}))
+
+        # Pas deux manifestes "v2" différents: le second écrivain publie au-dessus du premier
+        remote = remote_manifest(db)
+        assert remote.version == 3
+        assert SegmentStore(writer_b).load_manifest().digest() == remote.digest()
+
+        # L'instance A (index local présent) ne garde pas son contenu divergé
+        assert sync_segments(WORKSPACE, writer_a, NoEmbeddings()) is True
+        assert SegmentStore(writer_a).load_manifest().digest() == remote.digest()
+        from langchain_community.vectorstores import FAISS
+        rebuilt = FAISS.load_local(writer_a, NoEmbeddings(), allow_dangerous_deserialization=True)
+        assert sorted(rebuilt.index_to_docstore_id.values()) == ["d1:a", "d1:b", "d3:a"]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")